@@ -102,7 +102,8 @@ async def mobile_login(
             group_name = g.name
     
     # Create tokens (after role fix so token has correct role)
-    access_token = create_access_token(user.id, user.role.value)
+    await db.flush()  # apply the role fix (and its token_version bump) first
+    access_token = create_access_token(user.id, user.role.value, token_version=user.token_version)
     refresh_token = create_refresh_token(user.id)
     
     # Save refresh token to DB
@@ -18,15 +18,25 @@ from app.models.student import Student
 from app.models.group import Group
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.schedule import Schedule, WeekDay
-from app.models.notification import Notification
 from app.models.report import Report
 from app.core.dependencies import get_current_active_user
+from app.core.cache import cached_response, DASHBOARD_TABLES
 from app.config import today_tashkent
+from app.services.notification_service import NotificationService
+from app.services.attendance_rollup_service import AttendanceRollupService, attendance_rate
 
 router = APIRouter()
 
 
 @router.get("/stats")
+@cached_response(
+    "mobile:dashboard:stats",
+    ttl=30,
+    scope="user",
+    depends_on=DASHBOARD_TABLES + (
+        "notifications", "broadcast_notifications", "broadcast_notification_receipts",
+    ),
+)
 async def get_dashboard_stats(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
@@ -157,13 +167,7 @@ async def _student_dashboard(db: AsyncSession, user: User):
         data["today_lessons"] = 0
 
     # Unread notifications
-    unread = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == user.id,
-            Notification.is_read == False,
-        )
-    )
-    data["unread_notifications"] = unread.scalar() or 0
+    data["unread_notifications"] = await NotificationService(db).get_unread_count(user.id)
 
     return data
 
@@ -209,52 +213,21 @@ async def _leader_dashboard(db: AsyncSession, user: User):
     data["total_students"] = students_count.scalar() or 0
     data["active_students"] = data["total_students"]
 
-    # Today's attendance
-    today_stats = await db.execute(
-        select(
-            func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label("present"),
-            func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)).label("absent"),
-            func.sum(case((Attendance.status == AttendanceStatus.LATE, 1), else_=0)).label("late"),
-            func.sum(case((Attendance.status == AttendanceStatus.EXCUSED, 1), else_=0)).label("excused"),
-        ).join(Student).where(
-            Student.group_id == group.id,
-            Attendance.date == today,
-        )
-    )
-    ts = today_stats.first()
-    data["today_present"] = ts.present or 0
-    data["today_absent"] = ts.absent or 0
-    data["today_late"] = ts.late or 0
-    data["today_excused"] = ts.excused or 0
-    today_total = data["today_present"] + data["today_absent"] + data["today_late"] + data["today_excused"]
-    data["today_attendance_rate"] = round((data["today_present"] / today_total * 100) if today_total > 0 else 0.0, 1)
-
-    # Month attendance rate
-    month_stats = await db.execute(
-        select(
-            func.count(Attendance.id).label("total"),
-            func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label("present"),
-        ).join(Student).where(
-            Student.group_id == group.id,
-            Attendance.date >= month_start,
-        )
-    )
-    ms = month_stats.first()
-    data["month_attendance_rate"] = round(((ms.present or 0) / (ms.total or 1)) * 100, 1)
+    # Today / month / week attendance from the daily rollup
+    rollup = AttendanceRollupService(db)
+    ts = await rollup.status_counts(today, group_ids=[group.id])
+    data["today_present"] = ts["present"]
+    data["today_absent"] = ts["absent"]
+    data["today_late"] = ts["late"]
+    data["today_excused"] = ts["excused"]
+    data["today_attendance_rate"] = attendance_rate(ts)
+
+    ms = await rollup.status_counts(month_start, today, [group.id])
+    data["month_attendance_rate"] = attendance_rate(ms)
 
-    # Week rate
     week_start = today - timedelta(days=today.weekday())
-    week_stats = await db.execute(
-        select(
-            func.count(Attendance.id).label("total"),
-            func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label("present"),
-        ).join(Student).where(
-            Student.group_id == group.id,
-            Attendance.date >= week_start,
-        )
-    )
-    ws = week_stats.first()
-    data["week_attendance_rate"] = round(((ws.present or 0) / (ws.total or 1)) * 100, 1)
+    ws = await rollup.status_counts(week_start, today, [group.id])
+    data["week_attendance_rate"] = attendance_rate(ws)
 
     # Today's classes
     try:
@@ -271,13 +244,7 @@ async def _leader_dashboard(db: AsyncSession, user: User):
         data["today_lessons"] = 0
 
     # Unread notifications
-    unread = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == user.id,
-            Notification.is_read == False,
-        )
-    )
-    data["unread_notifications"] = unread.scalar() or 0
+    data["unread_notifications"] = await NotificationService(db).get_unread_count(user.id)
 
     return data
 
@@ -335,31 +302,11 @@ async def _teacher_dashboard(db: AsyncSession, user: User):
     )).scalar() or 0
 
     # Today's attendance rate for my groups
-    today_attendance_rate = 0.0
-    if group_ids:
-        total_att = (await db.execute(
-            select(func.count(Attendance.id))
-            .join(Student, Student.id == Attendance.student_id)
-            .where(Attendance.date == today, Student.group_id.in_(group_ids))
-        )).scalar() or 0
-        present_att = (await db.execute(
-            select(func.count(Attendance.id))
-            .join(Student, Student.id == Attendance.student_id)
-            .where(
-                Attendance.date == today,
-                Student.group_id.in_(group_ids),
-                Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
-            )
-        )).scalar() or 0
-        if total_att > 0:
-            today_attendance_rate = round(present_att / total_att * 100, 1)
+    today_counts = await AttendanceRollupService(db).status_counts(today, group_ids=group_ids)
+    today_attendance_rate = attendance_rate(today_counts, include_late=True)
 
     # Unread notifications
-    unread = (await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == user.id, Notification.is_read == False
-        )
-    )).scalar() or 0
+    unread = await NotificationService(db).get_unread_count(user.id)
 
     return {
         "role": "teacher",
@@ -397,24 +344,12 @@ async def _dean_dashboard(db: AsyncSession, user: User):
         select(func.count(Group.id)).where(Group.is_active == True)
     )).scalar() or 0
 
-    att_stats = await db.execute(
-        select(
-            func.count(Attendance.id).label("total"),
-            func.sum(case((Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]), 1), else_=0)).label("present"),
-            func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)).label("absent"),
-        ).where(Attendance.date == today)
-    )
-    row = att_stats.first()
-    total_today = row.total or 0
-    present = row.present or 0
-    absent = row.absent or 0
-    rate = round(present / total_today * 100, 1) if total_today > 0 else 0
-
-    unread = (await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == user.id, Notification.is_read == False
-        )
-    )).scalar() or 0
+    counts = await AttendanceRollupService(db).status_counts(today)
+    present = counts["present"] + counts["late"]
+    absent = counts["absent"]
+    rate = attendance_rate(counts, include_late=True)
+
+    unread = await NotificationService(db).get_unread_count(user.id)
 
     return {
         "role": "dean",
@@ -452,16 +387,9 @@ async def _registrar_dashboard(db: AsyncSession, user: User):
         select(func.count(Group.id)).where(Group.is_active == True)
     )).scalar() or 0
 
-    today_present = (await db.execute(
-        select(func.count(Attendance.id)).where(
-            Attendance.date == today, Attendance.status == AttendanceStatus.PRESENT
-        )
-    )).scalar() or 0
-    today_absent = (await db.execute(
-        select(func.count(Attendance.id)).where(
-            Attendance.date == today, Attendance.status == AttendanceStatus.ABSENT
-        )
-    )).scalar() or 0
+    counts = await AttendanceRollupService(db).status_counts(today)
+    today_present = counts["present"]
+    today_absent = counts["absent"]
 
     active_permits = 0
     try:
@@ -473,11 +401,7 @@ async def _registrar_dashboard(db: AsyncSession, user: User):
     except Exception:
         pass
 
-    unread = (await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == user.id, Notification.is_read == False
-        )
-    )).scalar() or 0
+    unread = await NotificationService(db).get_unread_count(user.id)
 
     return {
         "role": "registrar",
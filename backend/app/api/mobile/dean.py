@@ -32,6 +32,8 @@ from app.models.attendance import Attendance, AttendanceStatus
 from app.models.teacher_workload import TeacherWorkload
 from app.core.dependencies import get_current_active_user
 from app.config import today_tashkent, TASHKENT_TZ
+from app.services.attendance_rollup_service import AttendanceRollupService
+from app.core.cache import cached_response
 
 router = APIRouter()
 
@@ -53,6 +55,7 @@ async def require_mobile_dean(
 # ============================================
 
 @router.get("/dashboard")
+@cached_response("mobile:dashboard:dean")
 async def mobile_dean_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_mobile_dean),
@@ -68,21 +71,11 @@ async def mobile_dean_dashboard(
         select(func.count(Group.id)).where(Group.is_active == True)
     )).scalar() or 0
 
-    # Attendance stats in one query
-    att_row = (await db.execute(
-        select(
-            func.count(Attendance.id).label("total"),
-            func.count(Attendance.id).filter(
-                Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE])
-            ).label("present"),
-            func.count(Attendance.id).filter(
-                Attendance.status == AttendanceStatus.ABSENT
-            ).label("absent"),
-        ).where(Attendance.date == today)
-    )).one()
-    total_today = att_row.total or 0
-    present_count = att_row.present or 0
-    absent_count = att_row.absent or 0
+    # Attendance stats from the daily rollup
+    att_counts = await AttendanceRollupService(db).status_counts(today)
+    total_today = att_counts["total"]
+    present_count = att_counts["present"] + att_counts["late"]
+    absent_count = att_counts["absent"]
     attendance_rate = round(present_count / total_today * 100, 1) if total_today > 0 else 0
 
     # Today lessons
@@ -332,7 +325,6 @@ async def mobile_dean_attendance_export(
     db: AsyncSession = Depends(get_db), current_user: User = Depends(require_mobile_dean),
 ):
     """Export attendance to Excel — matches web v1/dean/attendance/export."""
-    from fastapi.responses import StreamingResponse
     from app.services.excel_service import ExcelService
 
     today = today_tashkent()
@@ -355,7 +347,7 @@ async def mobile_dean_attendance_export(
         d_to = d_from
 
     service = ExcelService(db)
-    file_data = await service.export_attendance_printable(
+    export = await service.export_attendance_printable(
         group_id=group_id, date_from=d_from, date_to=d_to, status_filter=status_filter,
     )
     fname_parts = ["davomat", d_from.strftime("%d_%m_%Y")]
@@ -365,11 +357,7 @@ async def mobile_dean_attendance_export(
         fname_parts.insert(1, f"guruh_{group_id}")
     filename = "_".join(fname_parts) + ".xlsx"
 
-    return StreamingResponse(
-        file_data,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return await export.response(filename)
 
 
 @router.post("/attendance/import")
@@ -416,6 +404,7 @@ async def mobile_dean_attendance_import(
 
     created = updated = 0
     errors = []
+    touched = set()  # (group_id, date) rollup slices to recount
     for row_idx, row in enumerate(rows[1:], start=2):
         try:
             sid_val = str(row[col_map["student_id"]]).strip() if row[col_map["student_id"]] else None
@@ -475,9 +464,11 @@ async def mobile_dean_attendance_import(
                 db.add(Attendance(student_id=student.id, date=att_date, status=att_status,
                                   subject=subject, lesson_number=lesson_number, recorded_by=current_user.id))
                 created += 1
+            touched.add((student.group_id, att_date))
         except Exception as e:
             errors.append(f"Qator {row_idx}: {str(e)}")
 
+    await AttendanceRollupService(db).refresh(touched)
     await db.commit()
     return {"success": True, "message": f"Import tugallandi: {created} yangi, {updated} yangilandi",
             "created": created, "updated": updated, "errors": errors[:20], "total_errors": len(errors)}
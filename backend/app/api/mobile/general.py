@@ -8,7 +8,7 @@ These provide group/notifications/students/attendance helpers used by the mobile
 
 from typing import Optional
 from datetime import date, timedelta
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
@@ -18,9 +18,12 @@ from app.models.student import Student
 from app.models.group import Group
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.schedule import Schedule, WeekDay
-from app.models.notification import Notification
+from app.services.attendance_rollup_service import AttendanceRollupService
+from app.services.attendance_service import AttendanceService
+from app.services.notification_service import NotificationService, read_badge
+from app.core.exceptions import NotFoundException
 from app.core.dependencies import get_current_active_user, require_leader
-from app.config import today_tashkent, now_tashkent
+from app.config import settings, today_tashkent
 
 router = APIRouter()
 
@@ -312,6 +315,7 @@ async def mobile_attendance_batch(
     """Batch create/update attendance records."""
     marked = 0
     errors = []
+    touched = set()  # (student_id, date) pairs for the rollup recount
 
     for record in records:
         try:
@@ -343,9 +347,11 @@ async def mobile_attendance_batch(
                 db.add(att)
 
             marked += 1
+            touched.add((sid, att_date))
         except Exception as e:
             errors.append(f"Student {record.get('student_id')}: {str(e)}")
 
+    await AttendanceRollupService(db).refresh_for_students(touched)
     await db.commit()
     return {"marked": marked, "errors": errors}
 
@@ -359,35 +365,27 @@ async def mobile_attendance_stats(
     current_user: User = Depends(get_current_active_user),
 ):
     """Get attendance statistics."""
-    from sqlalchemy import case
-
     start_date = today_tashkent() - timedelta(days=days)
-    query = select(
-        func.count(Attendance.id).label("total"),
-        func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label("present"),
-        func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)).label("absent"),
-        func.sum(case((Attendance.status == AttendanceStatus.LATE, 1), else_=0)).label("late"),
-        func.sum(case((Attendance.status == AttendanceStatus.EXCUSED, 1), else_=0)).label("excused"),
-    ).where(Attendance.date >= start_date)
-
+    student_ids = None
     if student_id:
-        query = query.where(Attendance.student_id == student_id)
-    elif group_id:
-        query = query.join(Student).where(Student.group_id == group_id)
-    else:
-        row = await db.execute(select(Student).where(Student.user_id == current_user.id))
-        student = row.scalar_one_or_none()
-        if student:
-            query = query.where(Attendance.student_id == student.id)
-
-    result = await db.execute(query)
-    stats = result.first()
+        student_ids = [student_id]
+    elif not group_id:
+        row = await db.execute(select(Student.id).where(Student.user_id == current_user.id))
+        own_id = row.scalar_one_or_none()
+        if own_id:
+            student_ids = [own_id]
+
+    stats = await AttendanceService(db).aggregate_totals(
+        student_ids=student_ids,
+        group_id=None if student_id else group_id,
+        date_from=start_date,
+    )
 
-    total = stats.total or 0
-    present = stats.present or 0
-    absent = stats.absent or 0
-    late_count = stats.late or 0
-    excused = stats.excused or 0
+    total = stats["total"]
+    present = stats["present"]
+    absent = stats["absent"]
+    late_count = stats["late"]
+    excused = stats["excused"]
 
     return {
         "total": total,
@@ -636,31 +634,26 @@ async def mobile_notifications(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Get notifications for current user."""
-    query = select(Notification).where(Notification.user_id == current_user.id)
-
-    if unread_only:
-        query = query.where(Notification.is_read == False)
-
-    count_q = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_q)).scalar() or 0
-
-    query = query.order_by(Notification.is_read, Notification.created_at.desc())
-    query = query.offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    notifications = result.scalars().all()
+    """Get notifications (broadcasts included) for current user."""
+    notifications, total = await NotificationService(db).list_notifications(
+        user_id=current_user.id,
+        page=page,
+        page_size=page_size,
+        is_read=False if unread_only else None,
+        unread_first=True,
+    )
 
     return {
         "items": [
             {
-                "id": n.id,
-                "title": n.title,
-                "message": n.message,
-                "type": n.type.value if n.type else "info",
-                "is_read": n.is_read,
-                "sender_id": n.sender_id if hasattr(n, "sender_id") else None,
-                "created_at": n.created_at.isoformat() if n.created_at else None,
-                "read_at": n.read_at.isoformat() if hasattr(n, "read_at") and n.read_at else None,
+                "id": n["id"],
+                "title": n["title"],
+                "message": n["message"],
+                "type": n["type"].value if n["type"] else "info",
+                "is_read": n["is_read"],
+                "sender_id": n["sender_id"],
+                "created_at": n["created_at"].isoformat() if n["created_at"] else None,
+                "read_at": n["read_at"].isoformat() if n["read_at"] else None,
             }
             for n in notifications
         ],
@@ -672,17 +665,20 @@ async def mobile_notifications(
 
 @router.get("/notifications/unread-count")
 async def mobile_unread_count(
+    request: Request,
+    response: Response,
+    wait: int = Query(0, ge=0, le=settings.NOTIFICATION_BADGE_MAX_WAIT),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Get unread notification count."""
-    res = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False,
-        )
-    )
-    count = res.scalar() or 0
+    """
+    Get unread notification count (ETag; If-None-Match + wait to long-poll).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    count, etag = await read_badge(db, current_user.id, if_none_match, wait)
+    if etag == if_none_match:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return {"count": count}
 
 
@@ -693,22 +689,12 @@ async def mobile_mark_notification_read(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Mark a notification as read."""
-    result = await db.execute(
-        select(Notification).where(
-            Notification.id == notification_id,
-            Notification.user_id == current_user.id,
-        )
-    )
-    notification = result.scalar_one_or_none()
-    if not notification:
+    """Mark a notification (negative ID: broadcast) as read."""
+    try:
+        await NotificationService(db).mark_as_read(notification_id, current_user.id)
+    except NotFoundException:
         raise HTTPException(status_code=404, detail="Bildirishnoma topilmadi")
 
-    notification.is_read = True
-    if hasattr(notification, "read_at"):
-        notification.read_at = now_tashkent()
-    await db.commit()
-
     return {"message": "O'qildi deb belgilandi"}
 
 
@@ -718,17 +704,7 @@ async def mobile_mark_all_read(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Mark all notifications as read."""
-    from sqlalchemy import update
-
-    await db.execute(
-        update(Notification)
-        .where(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False,
-        )
-        .values(is_read=True)
-    )
-    await db.commit()
+    """Mark all notifications, broadcasts included, as read."""
+    await NotificationService(db).mark_all_as_read(current_user.id)
 
     return {"message": "Barcha bildirishnomalar o'qildi deb belgilandi"}
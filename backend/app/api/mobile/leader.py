@@ -23,6 +23,7 @@ from app.models.schedule import Schedule
 from app.models.notification import Notification
 from app.core.dependencies import get_current_active_user, require_leader
 from app.config import today_tashkent
+from app.services.attendance_rollup_service import AttendanceRollupService
 
 router = APIRouter()
 
@@ -248,6 +249,7 @@ async def mark_quick_attendance(
         )
         db.add(attendance)
     
+    await AttendanceRollupService(db).refresh([(group.id, today)])
     await db.commit()
     
     return {"message": "Attendance marked", "status": status.value}
@@ -304,6 +306,7 @@ async def mark_bulk_attendance(
         except Exception as e:
             errors.append(f"Student {record.get('student_id')}: {str(e)}")
     
+    await AttendanceRollupService(db).refresh([(group.id, request.attendance_date)])
     await db.commit()
     
     return {
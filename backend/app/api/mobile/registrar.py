@@ -25,6 +25,8 @@ from pydantic import BaseModel
 
 from app.database import get_db
 from app.config import TASHKENT_TZ, today_tashkent
+from app.core.cache import cached_response
+from app.services.attendance_rollup_service import AttendanceRollupService
 from app.models.user import User, UserRole
 from app.models.student import Student
 from app.models.group import Group
@@ -87,6 +89,7 @@ class MobileNBPermitTeacherUpdate(BaseModel):
 # ============================================
 
 @router.get("/dashboard")
+@cached_response("mobile:dashboard:registrar")
 async def mobile_registrar_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_mobile_registrar),
@@ -95,12 +98,8 @@ async def mobile_registrar_dashboard(
     today = today_tashkent()
     total_students = await db.scalar(select(func.count(Student.id)).where(Student.is_active == True)) or 0
     total_groups = await db.scalar(select(func.count(Group.id)).where(Group.is_active == True)) or 0
-    today_present = await db.scalar(
-        select(func.count(Attendance.id)).where(and_(Attendance.date == today, Attendance.status == AttendanceStatus.PRESENT))
-    ) or 0
-    today_absent = await db.scalar(
-        select(func.count(Attendance.id)).where(and_(Attendance.date == today, Attendance.status == AttendanceStatus.ABSENT))
-    ) or 0
+    today_counts = await AttendanceRollupService(db).status_counts(today)
+    today_present, today_absent = today_counts["present"], today_counts["absent"]
     total_permits = await db.scalar(select(func.count(NBPermit.id))) or 0
     active_permits = await db.scalar(
         select(func.count(NBPermit.id)).where(
@@ -18,7 +18,7 @@ from app.models.user import User
 from app.models.student import Student
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.schedule import Schedule
-from app.models.notification import Notification
+from app.services.notification_service import NotificationService
 from app.core.dependencies import get_current_active_user
 from app.config import today_tashkent
 
@@ -109,19 +109,14 @@ async def get_mobile_dashboard(
     )
     
     # Unread notifications
-    unread = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False
-        )
-    )
+    unread = await NotificationService(db).get_unread_count(current_user.id)
     
     return {
         "student_name": student.full_name,
         "today_status": today_record.status.value if today_record else "not_marked",
         "attendance_rate": round(((stats.present or 0) / (stats.total or 1)) * 100, 1),
         "today_classes": schedule_count.scalar() or 0,
-        "unread_notifications": unread.scalar() or 0
+        "unread_notifications": unread
     }
 
 
@@ -308,36 +303,22 @@ async def get_notifications(
     """
     Get notifications for mobile.
     """
-    offset = (page - 1) * page_size
-    
-    # Get notifications
-    result = await db.execute(
-        select(Notification).where(
-            Notification.user_id == current_user.id
-        ).order_by(
-            Notification.is_read,
-            Notification.created_at.desc()
-        ).offset(offset).limit(page_size)
-    )
-    notifications = result.scalars().all()
-    
-    # Get total count
-    total_result = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == current_user.id
-        )
+    notifications, total = await NotificationService(db).list_notifications(
+        user_id=current_user.id,
+        page=page,
+        page_size=page_size,
+        unread_first=True
     )
-    total = total_result.scalar() or 0
     
     return {
         "notifications": [
             {
-                "id": n.id,
-                "title": n.title,
-                "message": n.message,
-                "type": n.type.value if n.type else "info",
-                "is_read": n.is_read,
-                "created_at": n.created_at.isoformat()
+                "id": n["id"],
+                "title": n["title"],
+                "message": n["message"],
+                "type": n["type"].value if n["type"] else "info",
+                "is_read": n["is_read"],
+                "created_at": n["created_at"].isoformat()
             }
             for n in notifications
         ],
@@ -354,21 +335,8 @@ async def mark_notification_read(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Mark notification as read.
+    Mark notification (negative ID: broadcast) as read.
     """
-    result = await db.execute(
-        select(Notification).where(
-            Notification.id == notification_id,
-            Notification.user_id == current_user.id
-        )
-    )
-    notification = result.scalar_one_or_none()
-    
-    if not notification:
-        from app.core.exceptions import NotFoundException
-        raise NotFoundException("Notification not found")
-    
-    notification.is_read = True
-    await db.commit()
+    await NotificationService(db).mark_as_read(notification_id, current_user.id)
     
     return {"message": "Marked as read"}
@@ -30,9 +30,13 @@ from app.models.group import Group
 from app.models.student import Student
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.teacher_workload import TeacherWorkload
+from app.core.auth_cache import load_password_hash
 from app.core.dependencies import get_current_active_user
-from app.core.security import get_password_hash, verify_password
+from app.core.password_hasher import password_hasher
 from app.config import today_tashkent, TASHKENT_TZ
+from app.services.attendance_rollup_service import AttendanceRollupService, attendance_rate
+from app.services.attendance_service import AttendanceService
+from app.core.cache import cached_response
 
 router = APIRouter()
 
@@ -102,6 +106,7 @@ async def _get_teacher_group_ids(db: AsyncSession, teacher_id: int) -> List[int]
 # ============================================
 
 @router.get("/dashboard")
+@cached_response("mobile:dashboard:teacher", scope="user")
 async def mobile_teacher_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_mobile_teacher),
@@ -138,21 +143,8 @@ async def mobile_teacher_dashboard(
         )
     )).scalar() or 0
 
-    today_attendance_rate = 0.0
-    if group_ids:
-        total_count = (await db.execute(
-            select(func.count(Attendance.id)).join(Student, Student.id == Attendance.student_id)
-            .where(and_(Attendance.date == today, Student.group_id.in_(group_ids)))
-        )).scalar() or 0
-        present_count = (await db.execute(
-            select(func.count(Attendance.id)).join(Student, Student.id == Attendance.student_id)
-            .where(and_(
-                Attendance.date == today, Student.group_id.in_(group_ids),
-                Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
-            ))
-        )).scalar() or 0
-        if total_count > 0:
-            today_attendance_rate = round(present_count / total_count * 100, 1)
+    today_counts = await AttendanceRollupService(db).status_counts(today, group_ids=group_ids)
+    today_attendance_rate = attendance_rate(today_counts, include_late=True)
 
     today_schedule = []
     for s in today_lessons:
@@ -397,6 +389,7 @@ async def mobile_teacher_mark_attendance(
                 note=item.note, late_minutes=item.late_minutes, recorded_by=current_user.id,
             ))
             created += 1
+    await AttendanceRollupService(db).refresh([(data.group_id, att_date)])
     await db.commit()
     return {"success": True, "message": f"Davomat saqlandi: {created} yangi, {updated} yangilandi",
             "created": created, "updated": updated}
@@ -427,23 +420,20 @@ async def mobile_teacher_attendance_summary(
         select(Student).where(and_(Student.group_id == group_id, Student.is_active == True)).order_by(Student.name)
     )).scalars().all()
 
+    aggregates = await AttendanceService(db).aggregate_by_student(
+        group_id=group_id, date_from=d_from, date_to=d_to
+    )
+
     summary = []
     for s in students:
-        row = (await db.execute(
-            select(
-                func.count(Attendance.id).label("total"),
-                func.count(case((Attendance.status == AttendanceStatus.PRESENT, 1))).label("present"),
-                func.count(case((Attendance.status == AttendanceStatus.ABSENT, 1))).label("absent"),
-                func.count(case((Attendance.status == AttendanceStatus.LATE, 1))).label("late"),
-                func.count(case((Attendance.status == AttendanceStatus.EXCUSED, 1))).label("excused"),
-            ).where(and_(Attendance.student_id == s.id, Attendance.date >= d_from, Attendance.date <= d_to))
-        )).one()
-        total = row.total or 0
+        row = aggregates.get(s.id, {})
+        total = row.get("total", 0)
+        present, late = row.get("present", 0), row.get("late", 0)
         summary.append({
             "student_id": s.id, "student_name": s.name, "hemis_id": s.hemis_id,
-            "total": total, "present": row.present or 0, "absent": row.absent or 0,
-            "late": row.late or 0, "excused": row.excused or 0,
-            "rate": round(((row.present or 0) + (row.late or 0)) / total * 100, 1) if total > 0 else 0,
+            "total": total, "present": present, "absent": row.get("absent", 0),
+            "late": late, "excused": row.get("excused", 0),
+            "rate": round((present + late) / total * 100, 1) if total > 0 else 0,
         })
     return {"group_id": group_id, "date_from": str(d_from), "date_to": str(d_to), "students": summary}
 
@@ -483,9 +473,10 @@ async def mobile_teacher_change_password(
     current_user: User = Depends(require_mobile_teacher),
 ):
     """Change password — matches web v1/teacher/change-password."""
-    if not verify_password(data.current_password, current_user.password_hash):
+    password_hash = await load_password_hash(db, current_user)
+    if not await password_hasher.verify(data.current_password, password_hash):
         raise HTTPException(status_code=400, detail="Joriy parol noto'g'ri")
-    current_user.password_hash = get_password_hash(data.new_password)
+    current_user.password_hash = await password_hasher.hash(data.new_password)
     if hasattr(current_user, "plain_password"):
         current_user.plain_password = data.new_password
     await db.commit()
@@ -24,6 +24,8 @@ from app.models.student import Student
 from app.models.teacher_workload import TeacherWorkload
 from app.core.dependencies import get_current_active_user, require_role
 from app.services.claude_ai import generate_schedule_with_ai, ai_optimize_schedule
+from app.services.schedule_occupancy import Booking, get_occupancy
+from app.services.schedule_validator import ScheduleValidator
 
 router = APIRouter()
 
@@ -512,6 +514,34 @@ async def academic_create_lecture_multi_group(
         db, data.teacher_name, data.teacher_id
     )
     
+    # One lecture for all groups: they share the room and teacher, but each
+    # group, the room and the teacher must be free at that slot
+    bookings = [
+        Booking(
+            group_id=group.id,
+            group_name=group.name,
+            subject=data.subject,
+            schedule_type=schedule_type.value,
+            day=day,
+            start_time=parse_time(data.start_time),
+            end_time=parse_time(data.end_time),
+            lesson_number=data.lesson_number,
+            room=data.room,
+            teacher_id=resolved_teacher_id,
+            teacher_name=resolved_teacher_name,
+        )
+        for group in found_groups
+    ]
+    conflicts = await ScheduleValidator(db).validate(bookings)
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "; ".join(c.message for c in conflicts),
+                "conflicts": [c.to_dict() for c in conflicts],
+            },
+        )
+    
     created_ids = []
     group_names = []
     
@@ -584,6 +614,8 @@ async def academic_bulk_create(
                 return matches[0].id, matches[0].name
         return t_id, t_name
     
+    candidates = []
+    
     for idx, item in enumerate(data.schedules):
         try:
             try:
@@ -624,17 +656,34 @@ async def academic_bulk_create(
                 academic_year=item.academic_year,
                 is_active=True,
             )
-            db.add(schedule)
-            created += 1
+            candidates.append((idx, schedule, Booking.from_schedule(schedule)))
         except Exception as e:
             errors.append(f"#{idx+1}: {str(e)}")
     
+    # Group, room and teacher conflicts with the timetable and within the batch
+    conflicts = await ScheduleValidator(db).validate([booking for _, _, booking in candidates])
+    rejected = {}
+    for conflict in conflicts:
+        rejected.setdefault(conflict.index, []).append(conflict.message)
+    for position, (idx, schedule, _) in enumerate(candidates):
+        if position in rejected:
+            errors.append(f"#{idx+1}: " + "; ".join(rejected[position]))
+            continue
+        db.add(schedule)
+        created += 1
+    
     await db.commit()
     
     return {
         "success": True,
         "created": created,
         "errors": errors,
+        "conflicts": [
+            # Positions in data.schedules rather than among the parsed items
+            {**d, "index": candidates[d["index"]][0],
+             "with_index": candidates[d["with_index"]][0] if d["with_index"] is not None else None}
+            for d in (c.to_dict() for c in conflicts)
+        ],
         "message": f"{created} ta jadval qo'shildi" + (f", {len(errors)} ta xato" if errors else ""),
     }
 
@@ -879,6 +928,31 @@ async def academic_ai_generate(
         language=data.language
     )
     
+    # Check the proposal against the current timetable and itself
+    group_names = {g["id"]: g["name"] for g in groups}
+    bookings = []
+    for item in result.get("schedules") or []:
+        try:
+            bookings.append(Booking(
+                group_id=int(item["group_id"]),
+                group_name=group_names.get(int(item["group_id"])),
+                subject=item.get("subject") or "",
+                schedule_type=item.get("schedule_type"),
+                day=WeekDay(item["day_of_week"]),
+                start_time=parse_time(item["start_time"]) if item.get("start_time") else None,
+                end_time=parse_time(item["end_time"]) if item.get("end_time") else None,
+                lesson_number=item.get("lesson_number"),
+                room=item.get("room"),
+                teacher_id=item.get("teacher_id"),
+                teacher_name=item.get("teacher_name"),
+            ))
+        except (KeyError, TypeError, ValueError):
+            bookings.append(Booking(group_id=0, subject="", day=None))
+    conflicts = (await get_occupancy()).conflicts(bookings)
+    for conflict in conflicts:
+        result["schedules"][conflict.index].setdefault("conflicts", []).append(conflict.message)
+    result["conflicts"] = [c.to_dict() for c in conflicts]
+    
     return result
 
 
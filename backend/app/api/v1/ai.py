@@ -2,7 +2,8 @@
 UniControl - AI Routes
 ======================
 OpenAI integration endpoints for AI analysis.
-Includes per-user monthly usage limits in UZS.
+Includes per-user monthly usage limits in UZS, checked and recorded by
+AIService around each model call (see app/services/ai_usage_service.py).
 
 - Student: 1000 UZS/month
 - Staff (leader/admin/super): 1500 UZS/month
@@ -20,108 +21,17 @@ from pydantic import BaseModel, Field
 from loguru import logger
 
 from app.database import get_db
-from app.config import now_tashkent
 from app.services.ai_service import AIService
+from app.services.ai_usage_service import get_or_create_usage
 from app.core.dependencies import get_current_active_user, require_leader
 from app.models.user import User, UserRole
 from app.models.student import Student
-from app.models.ai_usage import AIUsage
 from app.models.notification import Notification, NotificationType, NotificationPriority
 from app.models.subscription import GroupSubscription, SubscriptionStatus
 from app.models.group import Group
 
 router = APIRouter()
 
-# ================================================
-# COST CONSTANTS & HELPERS
-# ================================================
-# GPT-4o-mini: ~$0.15/1M input, ~$0.60/1M output tokens
-# Blended average: ~$0.30/1M tokens
-# 1 USD ≈ 12,800 UZS → 1M tokens ≈ 3,840 UZS
-COST_PER_TOKEN_UZS = 0.004  # ~0.004 UZS per token (conservative)
-
-STUDENT_MONTHLY_LIMIT_UZS = 1000.0   # 1000 so'm / oy
-STAFF_MONTHLY_LIMIT_UZS = 1500.0     # 1500 so'm / oy
-
-
-def get_monthly_limit(role: UserRole) -> float:
-    """Get monthly AI limit in UZS based on role."""
-    if role == UserRole.STUDENT:
-        return STUDENT_MONTHLY_LIMIT_UZS
-    return STAFF_MONTHLY_LIMIT_UZS
-
-
-async def get_or_create_usage(db: AsyncSession, user: User) -> AIUsage:
-    """Get or create the current month's AI usage record for a user."""
-    current_month = now_tashkent().strftime("%Y-%m")
-    
-    result = await db.execute(
-        select(AIUsage).where(
-            AIUsage.user_id == user.id,
-            AIUsage.month == current_month
-        )
-    )
-    usage = result.scalar_one_or_none()
-    
-    if not usage:
-        usage = AIUsage(
-            user_id=user.id,
-            month=current_month,
-            total_tokens=0,
-            input_tokens=0,
-            output_tokens=0,
-            request_count=0,
-            cost_uzs=0.0,
-            limit_uzs=get_monthly_limit(user.role),
-        )
-        db.add(usage)
-        await db.flush()
-    
-    return usage
-
-
-async def check_ai_limit(db: AsyncSession, user: User) -> AIUsage:
-    """Check if user has remaining AI budget. Raises 429 if exceeded."""
-    usage = await get_or_create_usage(db, user)
-    
-    if usage.cost_uzs >= usage.limit_uzs:
-        raise HTTPException(
-            status_code=429,
-            detail={
-                "error": "AI limit exceeded",
-                "message": f"Oylik AI limiti tugadi ({int(usage.limit_uzs)} so'm). Keyingi oyda qayta tiklanadi.",
-                "cost_uzs": round(usage.cost_uzs, 2),
-                "limit_uzs": usage.limit_uzs,
-                "remaining_uzs": 0,
-                "request_count": usage.request_count,
-                "month": usage.month,
-            }
-        )
-    
-    return usage
-
-
-async def record_ai_usage(
-    db: AsyncSession,
-    usage: AIUsage,
-    total_tokens: int,
-    input_tokens: int = 0,
-    output_tokens: int = 0
-):
-    """Record token usage and cost after an AI call."""
-    cost = total_tokens * COST_PER_TOKEN_UZS
-    
-    usage.total_tokens += total_tokens
-    usage.input_tokens += input_tokens
-    usage.output_tokens += output_tokens
-    usage.request_count += 1
-    usage.cost_uzs += cost
-    usage.updated_at = now_tashkent()
-    
-    await db.flush()
-    return cost
-
-
 # ================================================
 # SUBSCRIPTION CHECK — AI faqat Pro/Unlimited uchun
 # ================================================
@@ -377,10 +287,7 @@ async def analyze_student(
         if not own_student or own_student.id != request.student_id:
             raise HTTPException(status_code=403, detail="Students can only analyze their own data")
     
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.analyze_student(
         student_id=request.student_id,
         include_attendance=request.include_attendance,
@@ -388,11 +295,6 @@ async def analyze_student(
         include_behavior=request.include_behavior
     )
     
-    # Record usage
-    tokens_used = result.get("tokens_used", 0) if isinstance(result, dict) else getattr(result, "tokens_used", 0)
-    if tokens_used:
-        await record_ai_usage(db, usage, tokens_used)
-    
     # Send notification to student about AI analysis
     try:
         student_result = await db.execute(
@@ -435,10 +337,7 @@ async def analyze_group(
     # Obuna tekshirish — faqat Pro/Unlimited
     await check_ai_subscription(db, current_user)
 
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.analyze_group(
         group_id=request.group_id,
         semester=request.semester,
@@ -446,11 +345,6 @@ async def analyze_group(
         include_performance=request.include_performance
     )
     
-    # Record usage
-    tokens_used = result.get("tokens_used", 0) if isinstance(result, dict) else getattr(result, "tokens_used", 0)
-    if tokens_used:
-        await record_ai_usage(db, usage, tokens_used)
-    
     # Send notification to all students in the group
     try:
         from app.models.group import Group
@@ -510,21 +404,13 @@ async def predict_attendance(
         elif request.group_id:
             raise HTTPException(status_code=403, detail="Students cannot predict group attendance")
     
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.predict_attendance(
         student_id=request.student_id,
         group_id=request.group_id,
         days_ahead=request.days_ahead
     )
     
-    # Record usage
-    tokens_used = result.get("tokens_used", 0) if isinstance(result, dict) else getattr(result, "tokens_used", 0)
-    if tokens_used:
-        await record_ai_usage(db, usage, tokens_used)
-    
     return result
 
 
@@ -540,10 +426,7 @@ async def ai_chat(
     # Obuna tekshirish — faqat Pro/Unlimited
     await check_ai_subscription(db, current_user)
 
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.chat(
         message=request.message,
         context=request.context,
@@ -551,11 +434,6 @@ async def ai_chat(
         user_role=current_user.role.value
     )
     
-    # Record usage
-    tokens_used = result.get("tokens_used", 0) if isinstance(result, dict) else getattr(result, "tokens_used", 0)
-    if tokens_used:
-        await record_ai_usage(db, usage, tokens_used)
-    
     return result
 
 
@@ -573,20 +451,12 @@ async def summarize_report(
     # Obuna tekshirish — faqat Pro/Unlimited
     await check_ai_subscription(db, current_user)
 
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.summarize_report(
         report_id=request.report_id,
         language=request.language
     )
     
-    # Record usage
-    tokens_used = result.get("tokens_used", 0) if isinstance(result, dict) else getattr(result, "tokens_used", 0)
-    if tokens_used:
-        await record_ai_usage(db, usage, tokens_used)
-    
     return result
 
 
@@ -603,18 +473,9 @@ async def get_dashboard_insights(
     # Obuna tekshirish — faqat Pro/Unlimited
     await check_ai_subscription(db, current_user)
 
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.get_dashboard_insights(current_user.id, current_user.role.value)
     
-    # Record usage
-    if isinstance(result, dict):
-        tokens_used = result.get("tokens_used", 0)
-        if tokens_used:
-            await record_ai_usage(db, usage, tokens_used)
-    
     return result
 
 
@@ -641,18 +502,9 @@ async def get_student_recommendations(
         if not own_student or own_student.id != student_id:
             raise HTTPException(status_code=403, detail="Students can only view their own recommendations")
     
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.get_recommendations(student_id)
     
-    # Record usage
-    if isinstance(result, dict):
-        tokens_used = result.get("tokens_used", 0)
-        if tokens_used:
-            await record_ai_usage(db, usage, tokens_used)
-    
     return result
 
 
@@ -676,18 +528,9 @@ async def generate_notification_text(
     # Obuna tekshirish — faqat Pro/Unlimited
     await check_ai_subscription(db, current_user)
 
-    # Check AI limit
-    usage = await check_ai_limit(db, current_user)
-    
-    service = AIService(db)
+    service = AIService(db, user=current_user)
     result = await service.generate_notification_text(request.context, request.tone)
     
-    # Record usage
-    if isinstance(result, dict):
-        tokens_used = result.get("tokens_used", 0)
-        if tokens_used:
-            await record_ai_usage(db, usage, tokens_used)
-    
     return result
 
 
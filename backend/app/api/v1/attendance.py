@@ -247,7 +247,6 @@ async def export_attendance_printable(
     Export attendance to print-ready Excel.
     Leaders: auto-resolves own group. Dean+ can pass group_id.
     """
-    from fastapi.responses import StreamingResponse
     from app.services.excel_service import ExcelService
 
     # Leader auto-resolve group
@@ -265,7 +264,7 @@ async def export_attendance_printable(
         date_to = date_from
 
     service = ExcelService(db)
-    file_data = await service.export_attendance_printable(
+    export = await service.export_attendance_printable(
         group_id=group_id,
         date_from=date_from,
         date_to=date_to,
@@ -280,11 +279,7 @@ async def export_attendance_printable(
         fname_parts.append(date_to.strftime("%d_%m_%Y"))
     filename = "_".join(fname_parts) + ".xlsx"
 
-    return StreamingResponse(
-        file_data,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    return await export.response(filename)
 
 
 @router.get("/{attendance_id}", response_model=AttendanceResponse)
@@ -9,9 +9,7 @@ Version: 1.0.0
 
 from typing import Optional
 from fastapi import APIRouter, Depends, Query, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-import io
 
 from app.database import get_db
 from app.services.contract_service import ContractService
@@ -305,18 +303,14 @@ async def export_contracts(
 ):
     """Export contracts to Excel file."""
     service = ContractService(db)
-    file_data = await service.export_to_excel(academic_year, group_id)
+    export = await service.export_to_excel(academic_year, group_id)
     
     filename = f"kontrakt_malumotlari"
     if academic_year:
         filename += f"_{academic_year}"
     filename += ".xlsx"
     
-    return StreamingResponse(
-        io.BytesIO(file_data),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return await export.response(filename)
 
 
 @router.delete("/year/{academic_year}")
@@ -21,6 +21,9 @@ from app.models.group import Group
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.notification import Notification
 from app.models.report import Report, ReportStatus
+from app.services.notification_service import NotificationService
+from app.services.attendance_rollup_service import AttendanceRollupService, attendance_rate
+from app.core.cache import cached_response
 from app.core.dependencies import (
     get_current_active_user,
     require_leader,
@@ -66,13 +69,7 @@ async def get_student_dashboard(
     attendance_stats = attendance_result.first()
     
     # Get unread notifications
-    notif_result = await db.execute(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False
-        )
-    )
-    unread_notifications = notif_result.scalar() or 0
+    unread_notifications = await NotificationService(db).get_unread_count(current_user.id)
     
     return {
         "student": {
@@ -148,55 +145,22 @@ async def get_leader_dashboard(
     )
     students_count = students_result.scalar() or 0
     
-    # Get today's attendance — count UNIQUE students
+    # Today's attendance and this week's trend — unique students, from the rollup
     today = today_tashkent()
-    today_present_result = await db.execute(
-        select(
-            func.count(func.distinct(Attendance.student_id)).label('unique_total'),
-            func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.PRESENT, Attendance.student_id),
-                else_=None
-            ))).label('unique_present'),
-            func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.LATE, Attendance.student_id),
-                else_=None
-            ))).label('unique_late')
-        ).join(Student).where(
-            Student.group_id == group.id,
-            Attendance.date == today
-        )
-    )
-    today_stats = today_present_result.first()
+    rollup = AttendanceRollupService(db)
+    today_stats = await rollup.student_counts(today, group_ids=[group.id])
+    today_present = today_stats["present"] + today_stats["late"]
     
-    today_present = (today_stats.unique_present or 0) + (today_stats.unique_late or 0)
-    
-    # Get this week attendance trend — also use unique students
     week_start = today - timedelta(days=today.weekday())
-    week_attendance = await db.execute(
-        select(
-            Attendance.date,
-            func.count(func.distinct(Attendance.student_id)).label('unique_total'),
-            func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.PRESENT, Attendance.student_id),
-                else_=None
-            ))).label('unique_present'),
-            func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.LATE, Attendance.student_id),
-                else_=None
-            ))).label('unique_late')
-        ).join(Student).where(
-            Student.group_id == group.id,
-            Attendance.date >= week_start
-        ).group_by(Attendance.date).order_by(Attendance.date)
-    )
+    week_attendance = await rollup.daily_student_counts(week_start, today, group_ids=[group.id])
     weekly_trend = [
         {
-            "date": str(row.date),
+            "date": str(day),
             "total": students_count,
-            "present": (row.unique_present or 0) + (row.unique_late or 0),
-            "rate": round((((row.unique_present or 0) + (row.unique_late or 0)) / (students_count or 1)) * 100, 1)
+            "present": counts["present"] + counts["late"],
+            "rate": round(((counts["present"] + counts["late"]) / (students_count or 1)) * 100, 1)
         }
-        for row in week_attendance.fetchall()
+        for day, counts in week_attendance.items()
     ]
     
     # Get pending reports
@@ -229,6 +193,7 @@ async def get_leader_dashboard(
 
 
 @router.get("/admin")
+@cached_response("dashboard:admin")
 async def get_admin_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_admin)
@@ -250,47 +215,37 @@ async def get_admin_dashboard(
         )
     )
     
-    # Today's stats — count unique students
+    # Today's stats — unique students (a student has a record per lesson,
+    # so the per-record counts would count them several times)
     today = today_tashkent()
     total_students = students_count.scalar() or 0
-    today_attendance = await db.execute(
-        select(
-            func.count(func.distinct(Attendance.student_id)).label('unique_students'),
-            func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.PRESENT, Attendance.student_id),
-                else_=None
-            ))).label('unique_present')
-        ).where(Attendance.date == today)
-    )
-    today_stats = today_attendance.first()
+    rollup = AttendanceRollupService(db)
+    today_stats = await rollup.student_counts(today)
+    today_total = today_stats["students"]
+    today_present = today_stats["present"]
     
     # Pending reports
     pending_reports = await db.execute(
         select(func.count(Report.id)).where(Report.status == ReportStatus.PENDING)
     )
     
-    # Low attendance groups (below 80%) — use unique students per group
+    # Low attendance groups (below 80%) — present students per marked
+    # student, summed over the last week's days
     week_start = today - timedelta(days=7)
-    low_attendance_groups = await db.execute(
-        select(
-            Group.id,
-            Group.name,
-            func.count(func.distinct(Attendance.student_id)).label('unique_students'),
-            func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.PRESENT, Attendance.student_id),
-                else_=None
-            ))).label('unique_present')
-        ).join(Student, Student.group_id == Group.id)
-        .join(Attendance, Attendance.student_id == Student.id)
-        .where(Attendance.date >= week_start)
-        .group_by(Group.id)
-        .having(
-            (func.count(func.distinct(case(
-                (Attendance.status == AttendanceStatus.PRESENT, Attendance.student_id),
-                else_=None
-            ))) * 100 / func.count(func.distinct(Attendance.student_id))) < 80
+    week_rates = {
+        group_id: round(counts["present"] / counts["students"] * 100, 1)
+        for group_id, counts in (await rollup.group_student_counts(week_start, today)).items()
+    }
+    low_rates = {group_id: rate for group_id, rate in week_rates.items() if rate < 80}
+    low_attendance_groups = []
+    if low_rates:
+        group_names = await db.execute(
+            select(Group.id, Group.name).where(Group.id.in_(list(low_rates)))
         )
-    )
+        low_attendance_groups = [
+            {"id": group_id, "name": name, "rate": low_rates[group_id]}
+            for group_id, name in group_names.all()
+        ]
     
     return {
         "stats": {
@@ -299,23 +254,17 @@ async def get_admin_dashboard(
             "leaders": leaders_count.scalar() or 0
         },
         "today_attendance": {
-            "total": today_stats.unique_students or 0,
-            "present": today_stats.unique_present or 0,
-            "rate": round(((today_stats.unique_present or 0) / (today_stats.unique_students or 1)) * 100, 1)
+            "total": today_total,
+            "present": today_present,
+            "rate": round((today_present / (today_total or 1)) * 100, 1)
         },
         "pending_reports": pending_reports.scalar() or 0,
-        "low_attendance_groups": [
-            {
-                "id": row.id,
-                "name": row.name,
-                "rate": round(((row.unique_present or 0) / (row.unique_students or 1)) * 100, 1)
-            }
-            for row in low_attendance_groups.fetchall()
-        ]
+        "low_attendance_groups": low_attendance_groups
     }
 
 
 @router.get("/superadmin")
+@cached_response("dashboard:superadmin")
 async def get_superadmin_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_superadmin)
@@ -356,40 +305,11 @@ async def get_superadmin_dashboard(
         .group_by(User.role)
     )
     
-    # ===== Today Attendance =====
-    today_attendance = await db.execute(
-        select(
-            func.count(Attendance.id).label('total'),
-            func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label('present'),
-            func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)).label('absent'),
-            func.sum(case((Attendance.status == AttendanceStatus.LATE, 1), else_=0)).label('late')
-        ).where(Attendance.date == today)
-    )
-    today_stats = today_attendance.first()
-    
-    # ===== This Month Attendance =====
-    month_attendance = await db.execute(
-        select(
-            func.count(Attendance.id).label('total'),
-            func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label('present'),
-            func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)).label('absent'),
-            func.sum(case((Attendance.status == AttendanceStatus.LATE, 1), else_=0)).label('late')
-        ).where(Attendance.date >= month_start)
-    )
-    month_stats = month_attendance.first()
-    
-    # ===== Weekly Attendance Trend =====
-    attendance_trend = await db.execute(
-        select(
-            Attendance.date,
-            func.count(Attendance.id).label('total'),
-            func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)).label('present'),
-            func.sum(case((Attendance.status == AttendanceStatus.ABSENT, 1), else_=0)).label('absent'),
-            func.sum(case((Attendance.status == AttendanceStatus.LATE, 1), else_=0)).label('late')
-        ).where(Attendance.date >= week_start)
-        .group_by(Attendance.date)
-        .order_by(Attendance.date)
-    )
+    # ===== Attendance (today / month / weekly trend) — from the daily rollup =====
+    rollup = AttendanceRollupService(db)
+    today_stats = await rollup.status_counts(today)
+    month_stats = await rollup.status_counts(month_start, today)
+    attendance_trend = await rollup.daily_status_counts(week_start, today)
     
     # ===== Reports Stats =====
     total_reports = await db.execute(select(func.count(Report.id)))
@@ -445,29 +365,29 @@ async def get_superadmin_dashboard(
             for row in role_distribution.fetchall()
         },
         "today_attendance": {
-            "total": today_stats.total or 0,
-            "present": today_stats.present or 0,
-            "absent": today_stats.absent or 0,
-            "late": today_stats.late or 0,
-            "rate": round(((today_stats.present or 0) / max(today_stats.total or 1, 1)) * 100, 1)
+            "total": today_stats["total"],
+            "present": today_stats["present"],
+            "absent": today_stats["absent"],
+            "late": today_stats["late"],
+            "rate": attendance_rate(today_stats)
         },
         "month_attendance": {
-            "total": month_stats.total or 0,
-            "present": month_stats.present or 0,
-            "absent": month_stats.absent or 0,
-            "late": month_stats.late or 0,
-            "rate": round(((month_stats.present or 0) / max(month_stats.total or 1, 1)) * 100, 1)
+            "total": month_stats["total"],
+            "present": month_stats["present"],
+            "absent": month_stats["absent"],
+            "late": month_stats["late"],
+            "rate": attendance_rate(month_stats)
         },
         "attendance_trend": [
             {
-                "date": str(row.date),
-                "total": row.total,
-                "present": row.present or 0,
-                "absent": row.absent or 0,
-                "late": row.late or 0,
-                "rate": round(((row.present or 0) / max(row.total or 1, 1)) * 100, 1)
+                "date": str(day),
+                "total": counts["total"],
+                "present": counts["present"],
+                "absent": counts["absent"],
+                "late": counts["late"],
+                "rate": attendance_rate(counts)
             }
-            for row in attendance_trend.fetchall()
+            for day, counts in attendance_trend.items()
         ],
         "reports": {
             "total": total_reports.scalar() or 0,
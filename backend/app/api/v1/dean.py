@@ -15,7 +15,7 @@ Version: 1.0.0
 """
 
 from typing import Optional, List
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from fastapi import APIRouter, Depends, Query, HTTPException, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, distinct, case
@@ -29,7 +29,10 @@ from app.models.student import Student
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.teacher_workload import TeacherWorkload
 from app.core.dependencies import get_current_active_user
+from app.core.cache import cached_response
 from app.config import today_tashkent, TASHKENT_TZ
+from app.services.attendance_rollup_service import AttendanceRollupService
+from app.services.search_service import SearchService
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -53,6 +56,7 @@ async def require_dean(
 # ============================================
 
 @router.get("/dashboard")
+@cached_response("dashboard:dean")
 async def dean_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_dean)
@@ -74,22 +78,11 @@ async def dean_dashboard(
 
     total_students, total_groups = await get_counts()
 
-    # Combined attendance query: present, absent, total in ONE query
-    attendance_stats = await db.execute(
-        select(
-            func.count(Attendance.id).label("total"),
-            func.count(Attendance.id).filter(
-                Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE])
-            ).label("present"),
-            func.count(Attendance.id).filter(
-                Attendance.status == AttendanceStatus.ABSENT
-            ).label("absent"),
-        ).where(Attendance.date == today)
-    )
-    att_row = attendance_stats.one()
-    total_today = att_row.total or 0
-    present_count = att_row.present or 0
-    absent_count = att_row.absent or 0
+    # Today's attendance from the daily rollup (late counts as present here)
+    att_counts = await AttendanceRollupService(db).status_counts(today)
+    total_today = att_counts["total"]
+    present_count = att_counts["present"] + att_counts["late"]
+    absent_count = att_counts["absent"]
 
     attendance_rate = round(present_count / total_today * 100, 1) if total_today > 0 else 0
 
@@ -179,13 +172,7 @@ async def dean_students(
     query = select(Student).where(Student.is_active == True)
 
     if search:
-        query = query.where(
-            or_(
-                Student.name.ilike(f"%{search}%"),
-                Student.student_id.ilike(f"%{search}%"),
-                Student.phone.ilike(f"%{search}%"),
-            )
-        )
+        query = query.where(await SearchService(db).condition(Student, search))
 
     if group_id:
         query = query.where(Student.group_id == group_id)
@@ -471,7 +458,6 @@ async def dean_attendance_export(
     current_user: User = Depends(require_dean)
 ):
     """Export attendance to print-ready Excel."""
-    from fastapi.responses import StreamingResponse
     from app.services.excel_service import ExcelService
 
     today = today_tashkent()
@@ -494,7 +480,7 @@ async def dean_attendance_export(
         d_to = d_from
 
     service = ExcelService(db)
-    file_data = await service.export_attendance_printable(
+    export = await service.export_attendance_printable(
         group_id=group_id,
         date_from=d_from,
         date_to=d_to,
@@ -509,11 +495,7 @@ async def dean_attendance_export(
         fname_parts.insert(1, f"guruh_{group_id}")
     filename = "_".join(fname_parts) + ".xlsx"
 
-    return StreamingResponse(
-        file_data,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    return await export.response(filename)
 
 
 @router.post("/attendance/import")
@@ -527,48 +509,42 @@ async def dean_attendance_import(
     Expected columns: student_id (or hemis_id), date (YYYY-MM-DD), status (present/absent/late/excused), subject, lesson_number
     """
     import io
-    try:
-        import openpyxl
-    except ImportError:
-        raise HTTPException(status_code=500, detail="openpyxl kutubxonasi o'rnatilmagan")
+    import pandas as pd
+    from app.services.attendance_service import AttendanceService
+    from app.services.excel_service import text_column
 
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Faqat Excel (.xlsx) fayl yuklash mumkin")
 
     content = await file.read()
-    wb = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
-    ws = wb.active
-
-    rows = list(ws.iter_rows(min_row=1, values_only=True))
-    if len(rows) < 2:
+    try:
+        df = pd.read_excel(io.BytesIO(content), engine="openpyxl", dtype=object)
+    except Exception:
+        df = pd.DataFrame()
+    if df.empty:
         raise HTTPException(status_code=400, detail="Fayl bo'sh yoki sarlavha qatori topilmadi")
 
-    # Find column indices from header
-    header = [str(c).strip().lower() if c else '' for c in rows[0]]
-
-    # Map column names
+    # Map column names from header
+    header = [str(c).strip().lower() for c in df.columns]
+    aliases = {
+        'student_id': ('student_id', 'talaba_id', 'hemis_id', 'id'),
+        'date': ('date', 'sana', 'kun'),
+        'status': ('status', 'holat', 'davomat'),
+        'subject': ('subject', 'fan', 'dars'),
+        'lesson_number': ('lesson', 'lesson_number', 'dars_raqami', 'para'),
+    }
     col_map = {}
     for i, h in enumerate(header):
-        if h in ('student_id', 'talaba_id', 'hemis_id', 'id'):
-            col_map['student_id'] = i
-        elif h in ('date', 'sana', 'kun'):
-            col_map['date'] = i
-        elif h in ('status', 'holat', 'davomat'):
-            col_map['status'] = i
-        elif h in ('subject', 'fan', 'dars'):
-            col_map['subject'] = i
-        elif h in ('lesson', 'lesson_number', 'dars_raqami', 'para'):
-            col_map['lesson_number'] = i
+        for field, names in aliases.items():
+            if h in names:
+                col_map[field] = df.columns[i]
 
     if 'student_id' not in col_map or 'status' not in col_map:
         raise HTTPException(
             status_code=400,
             detail="Excel faylda 'student_id' va 'status' ustunlari topilmadi. Ustun nomlari: " + ", ".join(header)
         )
-
-    created = 0
-    updated = 0
-    errors = []
+    df = df[list(col_map.values())].set_axis(list(col_map.keys()), axis=1)
 
     status_map = {
         'kelgan': 'present', 'present': 'present', 'bor': 'present', '+': 'present', '1': 'present',
@@ -577,106 +553,70 @@ async def dean_attendance_import(
         'sababli': 'excused', 'excused': 'excused', 'uzr': 'excused',
     }
 
-    for row_idx, row in enumerate(rows[1:], start=2):
-        try:
-            student_id_val = str(row[col_map['student_id']]).strip() if row[col_map['student_id']] else None
-            if not student_id_val:
-                continue
-
-            # Find student
-            student = None
-            s_result = await db.execute(
-                select(Student).where(
-                    Student.student_id == student_id_val
-                )
-            )
-            student = s_result.scalar_one_or_none()
-            if not student:
-                # Try as numeric id
-                try:
-                    s_result2 = await db.execute(
-                        select(Student).where(Student.id == int(student_id_val))
-                    )
-                    student = s_result2.scalar_one_or_none()
-                except (ValueError, TypeError):
-                    pass
-
-            if not student:
-                errors.append(f"Qator {row_idx}: Talaba topilmadi ({student_id_val})")
-                continue
-
-            # Parse date
-            att_date = today_tashkent()
-            if 'date' in col_map and row[col_map['date']]:
-                raw_date = row[col_map['date']]
-                if isinstance(raw_date, datetime):
-                    att_date = raw_date.date()
-                elif isinstance(raw_date, date):
-                    att_date = raw_date
-                else:
-                    try:
-                        att_date = date.fromisoformat(str(raw_date).strip())
-                    except ValueError:
-                        att_date = today_tashkent()
-
-            # Parse status
-            raw_status = str(row[col_map['status']]).strip().lower() if row[col_map['status']] else 'absent'
-            att_status_str = status_map.get(raw_status, 'absent')
-            try:
-                att_status = AttendanceStatus(att_status_str)
-            except ValueError:
-                att_status = AttendanceStatus.ABSENT
-
-            # Parse optional fields
-            subject = None
-            if 'subject' in col_map and row[col_map['subject']]:
-                subject = str(row[col_map['subject']]).strip()
-
-            lesson_number = None
-            if 'lesson_number' in col_map and row[col_map['lesson_number']]:
-                try:
-                    lesson_number = int(row[col_map['lesson_number']])
-                except (ValueError, TypeError):
-                    pass
-
-            # Check existing
-            existing = await db.execute(
-                select(Attendance).where(
-                    and_(
-                        Attendance.student_id == student.id,
-                        Attendance.date == att_date,
-                        or_(
-                            Attendance.lesson_number == lesson_number,
-                            and_(
-                                Attendance.lesson_number.is_(None),
-                                lesson_number is None
-                            )
-                        )
-                    )
-                )
-            )
-            existing_att = existing.scalar_one_or_none()
-
-            if existing_att:
-                existing_att.status = att_status
-                existing_att.subject = subject or existing_att.subject
-                existing_att.recorded_by = current_user.id
-                updated += 1
-            else:
-                new_att = Attendance(
-                    student_id=student.id,
-                    date=att_date,
-                    status=att_status,
-                    subject=subject,
-                    lesson_number=lesson_number,
-                    recorded_by=current_user.id,
-                )
-                db.add(new_att)
-                created += 1
+    rows = pd.DataFrame({"row": df.index + 2, "key": text_column(df, 'student_id')}, index=df.index)
+    rows = rows[rows["key"] != ""]
 
-        except Exception as e:
-            errors.append(f"Qator {row_idx}: {str(e)}")
+    # Find students by student_id, then by numeric id — one query for the file
+    keys = rows["key"].unique().tolist()
+    numeric_keys = [int(k) for k in keys if k.isdigit() and len(k) < 10]
+    s_result = await db.execute(
+        select(Student.id, Student.student_id, Student.group_id).where(
+            or_(Student.student_id.in_(keys), Student.id.in_(numeric_keys))
+        )
+    )
+    found_students = s_result.all()
+    by_student_id = {s.student_id: s.id for s in found_students}
+    by_id = {str(s.id): s.id for s in found_students}
+    group_by_id = {s.id: s.group_id for s in found_students}
+    rows["student_db_id"] = rows["key"].map(by_student_id).fillna(rows["key"].map(by_id))
+
+    missing = rows["student_db_id"].isna()
+    errors = [
+        f"Qator {r.row}: Talaba topilmadi ({r.key})"
+        for r in rows[missing].itertuples(index=False)
+    ]
+    rows = rows[~missing]
+
+    # Parse date (ISO strings or Excel dates; anything else means today)
+    today = today_tashkent()
+    if 'date' in df:
+        raw_dates = df.loc[rows.index, 'date'].map(lambda v: v.strip() if isinstance(v, str) else v)
+        parsed = pd.to_datetime(raw_dates, errors="coerce", format="ISO8601")
+        rows["date"] = parsed.dt.date.where(parsed.notna(), today)
+    else:
+        rows["date"] = today
+
+    rows["status"] = (
+        text_column(df.loc[rows.index], 'status').str.lower()
+        .map(status_map).fillna('absent')
+    )
+    rows["subject"] = text_column(df.loc[rows.index], 'subject')
+    rows["lesson_number"] = (
+        (pd.to_numeric(df.loc[rows.index, 'lesson_number'], errors="coerce") // 1).astype("Int64")
+        if 'lesson_number' in df else pd.Series(pd.NA, index=rows.index, dtype="Int64")
+    )
+
+    # The last row wins when the same student, date and lesson repeat
+    rows["lesson_key"] = rows["lesson_number"].fillna(-1)
+    rows = rows.drop_duplicates(["student_db_id", "date", "lesson_key"], keep="last")
+
+    records = [
+        {
+            "student_id": int(r.student_db_id),
+            "date": r.date,
+            "status": AttendanceStatus(r.status),
+            "subject": r.subject or None,
+            "lesson_number": None if pd.isna(r.lesson_number) else int(r.lesson_number),
+            "recorded_by": current_user.id,
+        }
+        for r in rows.itertuples(index=False)
+    ]
+    created, updated = await AttendanceService(db).upsert_rows(
+        records, update_columns=("status", "recorded_by"), keep_existing=("subject",)
+    )
 
+    touched = {(group_by_id[r["student_id"]], r["date"]) for r in records}
+    await AttendanceRollupService(db).refresh(touched)
     await db.commit()
 
     return {
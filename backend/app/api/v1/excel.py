@@ -16,8 +16,9 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 import io
 
-from app.database import get_db
+from app.database import get_db, async_session_maker
 from app.services.excel_service import ExcelService
+from app.core.jobs import create_job, get_job, start_job, update_job
 from app.core.dependencies import get_current_active_user, require_admin, require_leader, require_superadmin
 from app.models.user import User, UserRole
 
@@ -277,6 +278,8 @@ async def import_kontingent(
     create_users: bool = Form(True),
     deactivate_missing: bool = Form(False),
     default_password: Optional[str] = Form(None),
+    dry_run: bool = Form(False),
+    background: bool = Form(False),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_superadmin)
 ):
@@ -301,9 +304,11 @@ async def import_kontingent(
         update_existing: If True, update existing students
         create_users: If True, create user accounts (default: True)
         default_password: Default password for new accounts (auto-generated if not set)
+        dry_run: Run the whole import and roll it back (preview counts/errors)
+        background: Return a job id immediately; poll GET /import/jobs/{job_id}
     
     Returns:
-        Import statistics and errors
+        Import statistics and errors, or the queued job when background=True
     """
     service = ExcelService(db)
     
@@ -316,15 +321,48 @@ async def import_kontingent(
         default_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(12))
     
     contents = await file.read()
-    result = await service.import_kontingent(
+    options = dict(
         file_data=contents,
         update_existing=update_existing,
         create_users=create_users,
         default_password=default_password,
         deactivate_missing=deactivate_missing,
+        dry_run=dry_run,
     )
     
-    return result
+    if not background:
+        return await service.import_kontingent(**options)
+    
+    job = await create_job("kontingent_import", owner_id=current_user.id, filename=file.filename)
+    
+    async def run(job):
+        async def progress(processed, total):
+            await update_job(job, processed=processed, total=total)
+        
+        async with async_session_maker() as session:
+            return await ExcelService(session).import_kontingent(**options, progress=progress)
+    
+    start_job(job, run)
+    return job
+
+
+@router.get("/import/jobs/{job_id}")
+async def get_import_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Status of a background import: status (queued, running, completed,
+    failed), rows processed / total, and the import result when done.
+    """
+    from app.core.exceptions import NotFoundException
+    
+    job = await get_job(job_id)
+    if job is None or (
+        job.get("owner_id") != current_user.id and current_user.role != UserRole.SUPERADMIN
+    ):
+        raise NotFoundException("Import topilmadi")
+    return job
 
 
 # Export Endpoints
@@ -358,11 +396,12 @@ async def export_my_data(
 @router.get("/export/students")
 async def export_students(
     group_id: Optional[int] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_leader)
 ):
     """
-    Export students to Excel file.
+    Export students to Excel (or CSV) file.
     
     Requires leader role or higher.
     Leaders can only export their own group's students.
@@ -383,17 +422,12 @@ async def export_students(
         if student_profile and student_profile.group_id:
             group_id = student_profile.group_id
     
-    file_data = await service.export_students(
-        group_id=group_id
+    export = await service.export_students(
+        group_id=group_id,
+        fmt=format,
     )
     
-    return StreamingResponse(
-        file_data,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": "attachment; filename=students.xlsx"
-        }
-    )
+    return await export.response(f"students.{format}")
 
 
 @router.get("/export/groups")
@@ -425,28 +459,24 @@ async def export_attendance(
     group_id: int = Query(...),
     date_from: date = Query(...),
     date_to: date = Query(...),
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_leader)
 ):
     """
-    Export attendance to Excel file.
+    Export attendance to Excel (or CSV) file.
     
     Requires leader role or higher.
     """
     service = ExcelService(db)
-    file_data = await service.export_attendance(
+    export = await service.export_attendance(
         group_id=group_id,
         date_from=date_from,
-        date_to=date_to
+        date_to=date_to,
+        fmt=format,
     )
     
-    return StreamingResponse(
-        file_data,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=attendance_{date_from}_{date_to}.xlsx"
-        }
-    )
+    return await export.response(f"attendance_{date_from}_{date_to}.{format}")
 
 
 @router.get("/export/schedules")
@@ -15,13 +15,16 @@ Version: 1.0.0
 """
 
 from typing import Optional
-from fastapi import APIRouter, Depends, Query, UploadFile, File as FastAPIFile, HTTPException, status
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, Query, Request, UploadFile, File as FastAPIFile, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
 
 from app.database import get_db
 from app.services.file_service import FileService
+from app.services.file_previews import (
+    PREVIEW_CACHE_CONTROL, PREVIEW_MEDIA_TYPE, is_previewable, preview_renderer
+)
+from app.services.file_storage import blob_response, is_first_request
 from app.schemas.file import (
     FileCreate, FileUpdate, FileResponse as FileResponseSchema,
     FileListResponse, FileUploadResponse,
@@ -193,6 +196,8 @@ async def get_file(
 @router.get("/{file_id}/download")
 async def download_file(
     file_id: int,
+    request: Request,
+    size: Optional[str] = Query(None, pattern="^(sm|md|lg)$", description="Rasm preview o'lchami (sm, md, lg)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -202,7 +207,13 @@ async def download_file(
     Returns the file as a download response with appropriate
     content-type and filename headers.
     
-    Increments the download counter.
+    - **ETag** is the content hash; a matching If-None-Match gets 304
+    - **Range** requests (resume, media seeking) get 206 Partial Content
+    - **size** returns a WebP preview of an image instead (sm 160 px,
+      md 480 px, lg 1024 px), cacheable for good; 404 for other files
+    
+    Increments the download counter (not for follow-up range requests
+    or previews).
     """
     service = FileService(db)
     file = await service.get_file(file_id, current_user.id)
@@ -213,14 +224,36 @@ async def download_file(
     if not os.path.exists(file.path):
         raise HTTPException(status_code=404, detail="Fayl diskda topilmadi")
     
-    # Increment download count
-    await service.increment_download_count(file_id)
-    
-    return FileResponse(
+    if size:
+        if not is_previewable(file.sha256, file.mime_type):
+            raise HTTPException(status_code=404, detail="Bu fayl uchun preview mavjud emas")
+        # Rendered on upload; rendered now if missing
+        preview = await preview_renderer.get(file.sha256, file.path, size)
+        if preview is None:
+            raise HTTPException(status_code=404, detail="Bu fayl uchun preview mavjud emas")
+        return await blob_response(
+            request,
+            path=str(preview),
+            filename=f"{os.path.splitext(file.name)[0]}.{size}.webp",
+            media_type=PREVIEW_MEDIA_TYPE,
+            etag=f"{file.sha256}-{size}",
+            cache_control=PREVIEW_CACHE_CONTROL,
+            inline=True,
+        )
+    
+    response = await blob_response(
+        request,
         path=file.path,
         filename=file.name,
-        media_type=file.mime_type or "application/octet-stream"
+        media_type=file.mime_type or "application/octet-stream",
+        etag=file.sha256,
     )
+    
+    # Increment download count
+    if response.status_code != 304 and is_first_request(request):
+        await service.increment_download_count(file_id)
+    
+    return response
 
 
 @router.put("/{file_id}", response_model=FileResponseSchema)
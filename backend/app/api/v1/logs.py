@@ -7,13 +7,14 @@ from typing import Optional, List
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, or_, and_
+from sqlalchemy import select, func, desc, and_
 from pydantic import BaseModel
 
 from app.database import get_db
 from app.models.user import User, UserRole
 from app.models.activity_log import ActivityLog, ActivityAction
 from app.core.dependencies import get_current_active_user
+from app.services.activity_log_service import ActivityLogService, search_document
 
 router = APIRouter()
 
@@ -82,51 +83,10 @@ async def get_log_stats(
     if current_user.role != UserRole.SUPERADMIN:
         raise HTTPException(status_code=403, detail="Faqat super admin")
     
-    # Total count
-    total_result = await db.execute(select(func.count(ActivityLog.id)))
-    total = total_result.scalar() or 0
+    # Pre-aggregated counters (no activity_logs scan)
+    stats = await ActivityLogService(db).stats()
     
-    # Auth actions count
-    auth_actions = [ActivityAction.LOGIN, ActivityAction.LOGOUT, ActivityAction.LOGIN_FAILED,
-                    ActivityAction.PASSWORD_CHANGE, ActivityAction.PASSWORD_RESET]
-    auth_result = await db.execute(
-        select(func.count(ActivityLog.id)).where(ActivityLog.action.in_(auth_actions))
-    )
-    auth_count = auth_result.scalar() or 0
-    
-    # CRUD actions count
-    crud_actions = [ActivityAction.CREATE, ActivityAction.UPDATE, ActivityAction.DELETE,
-                    ActivityAction.IMPORT, ActivityAction.EXPORT]
-    crud_result = await db.execute(
-        select(func.count(ActivityLog.id)).where(ActivityLog.action.in_(crud_actions))
-    )
-    crud_count = crud_result.scalar() or 0
-    
-    # Error count
-    error_result = await db.execute(
-        select(func.count(ActivityLog.id)).where(ActivityLog.action == ActivityAction.ERROR)
-    )
-    error_count = error_result.scalar() or 0
-    
-    # System + other count
-    system_count = total - auth_count - crud_count - error_count
-    
-    # Today count
-    from app.config import TASHKENT_TZ
-    today_start = datetime.now(TASHKENT_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
-    today_result = await db.execute(
-        select(func.count(ActivityLog.id)).where(ActivityLog.created_at >= today_start)
-    )
-    today_count = today_result.scalar() or 0
-    
-    return LogStatsResponse(
-        total=total,
-        auth_count=auth_count,
-        crud_count=crud_count,
-        system_count=system_count,
-        error_count=error_count,
-        today_count=today_count
-    )
+    return LogStatsResponse(**stats)
 
 
 @router.get("", response_model=LogsResponse)
@@ -173,23 +133,13 @@ async def get_logs(
             query = query.where(ActivityLog.action.in_(system_actions))
             count_query = count_query.where(ActivityLog.action.in_(system_actions))
     
-    # Search filter
+    # Search filter (served by the trigram index on the search document)
     if search:
         search_pattern = f"%{search}%"
-        query = query.where(
-            or_(
-                ActivityLog.description.ilike(search_pattern),
-                ActivityLog.entity_type.ilike(search_pattern),
-                ActivityLog.ip_address.ilike(search_pattern),
-            )
-        )
-        count_query = count_query.where(
-            or_(
-                ActivityLog.description.ilike(search_pattern),
-                ActivityLog.entity_type.ilike(search_pattern),
-                ActivityLog.ip_address.ilike(search_pattern),
-            )
-        )
+        query = query.where(search_document().ilike(search_pattern))
+        count_query = count_query.where(search_document().ilike(search_pattern))
+    
+    filtered = bool(action_type or search or user_id or entity_type or start_date or end_date)
     
     # User filter
     if user_id:
@@ -218,9 +168,12 @@ async def get_logs(
         except:
             pass
     
-    # Get total
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    # Get total (unfiltered totals come from the counters table)
+    if filtered:
+        total_result = await db.execute(count_query)
+        total = total_result.scalar() or 0
+    else:
+        total = await ActivityLogService(db).total()
     
     # Order by newest first + pagination
     query = query.order_by(desc(ActivityLog.created_at))
@@ -273,7 +226,7 @@ async def delete_log(
     if not log_entry:
         raise HTTPException(status_code=404, detail="Log topilmadi")
     
-    await db.delete(log_entry)
+    await ActivityLogService(db).delete_log(log_entry)
     await db.commit()
     return {"message": "Log o'chirildi"}
 
@@ -283,11 +236,15 @@ async def clear_logs(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Clear all logs."""
+    """
+    Clear all logs.
+    
+    Truncates the partitions instead of deleting row by row; routine
+    cleanup is handled by partition retention (ACTIVITY_LOG_RETENTION_MONTHS).
+    """
     if current_user.role != UserRole.SUPERADMIN:
         raise HTTPException(status_code=403, detail="Faqat super admin")
     
-    from sqlalchemy import delete
-    await db.execute(delete(ActivityLog))
+    await ActivityLogService(db).clear()
     await db.commit()
     return {"message": "Barcha loglar tozalandi"}
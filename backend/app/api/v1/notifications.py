@@ -8,11 +8,12 @@ Version: 1.0.0
 """
 
 from typing import Optional
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.services.notification_service import NotificationService
+from app.config import settings
+from app.services.notification_service import NotificationService, read_badge
 from app.schemas.notification import (
     NotificationCreate,
     NotificationResponse,
@@ -29,6 +30,9 @@ router = APIRouter()
 
 def _notification_to_response(n) -> dict:
     """Convert Notification model to response dict with sender_name."""
+    if isinstance(n, dict):
+        # Feed items from NotificationService are already response-shaped
+        return n
     data = {
         "id": n.id,
         "user_id": n.user_id,
@@ -148,14 +152,24 @@ async def broadcast_notification(
 
 @router.get("/unread-count")
 async def get_unread_count(
+    request: Request,
+    response: Response,
+    wait: int = Query(0, ge=0, le=settings.NOTIFICATION_BADGE_MAX_WAIT),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Get unread notifications count.
+    
+    Served from the maintained counter and tagged with an ETag. With
+    If-None-Match set to that ETag the response is 304; adding
+    wait=<seconds> holds the request until the count changes (long-poll).
     """
-    service = NotificationService(db)
-    count = await service.get_unread_count(current_user.id)
+    if_none_match = request.headers.get("if-none-match")
+    count, etag = await read_badge(db, current_user.id, if_none_match, wait)
+    if etag == if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return {"count": count}
 
 
@@ -166,9 +180,16 @@ async def get_notification(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Get notification by ID.
+    Get notification by ID (negative ID: a broadcast in the user's feed).
     """
     service = NotificationService(db)
+    if notification_id < 0:
+        item = await service.get_feed_item(notification_id, current_user.id)
+        if not item:
+            from app.core.exceptions import NotFoundException
+            raise NotFoundException("Notification not found")
+        return NotificationResponse(**item)
+    
     notification = await service.get_by_id(notification_id)
     
     if not notification:
@@ -244,9 +265,13 @@ async def delete_notification(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Delete notification.
+    Delete notification (negative ID: hide a broadcast from the user's feed).
     """
     service = NotificationService(db)
+    if notification_id < 0:
+        await service.delete(notification_id, current_user.id)
+        return {"message": "Notification deleted"}
+    
     notification = await service.get_by_id(notification_id)
     
     if not notification:
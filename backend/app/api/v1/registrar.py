@@ -21,6 +21,9 @@ from pydantic import BaseModel
 
 from app.database import get_db
 from app.config import TASHKENT_TZ, today_tashkent
+from app.core.cache import cached_response
+from app.services.attendance_rollup_service import AttendanceRollupService
+from app.services.search_service import SearchService
 from app.models.user import User, UserRole
 from app.models.student import Student
 from app.models.group import Group
@@ -94,6 +97,7 @@ class NBPermitTeacherUpdate(BaseModel):
 # ============================================
 
 @router.get("/dashboard")
+@cached_response("dashboard:registrar")
 async def get_registrar_dashboard(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_registrar)
@@ -111,17 +115,10 @@ async def get_registrar_dashboard(
         select(func.count(Group.id)).where(Group.is_active == True)
     )
     
-    # Today's attendance
-    today_present = await db.scalar(
-        select(func.count(Attendance.id)).where(
-            and_(Attendance.date == today, Attendance.status == AttendanceStatus.PRESENT)
-        )
-    )
-    today_absent = await db.scalar(
-        select(func.count(Attendance.id)).where(
-            and_(Attendance.date == today, Attendance.status == AttendanceStatus.ABSENT)
-        )
-    )
+    # Today's attendance (daily rollup)
+    today_counts = await AttendanceRollupService(db).status_counts(today)
+    today_present = today_counts["present"]
+    today_absent = today_counts["absent"]
     
     # NB Permits stats
     total_permits = await db.scalar(select(func.count(NBPermit.id)))
@@ -195,15 +192,7 @@ async def get_students(
     query = select(Student).where(Student.is_active == True)
     
     if search:
-        search_filter = f"%{search}%"
-        query = query.where(
-            or_(
-                Student.name.ilike(search_filter),
-                Student.student_id.ilike(search_filter),
-                Student.phone.ilike(search_filter),
-                Student.passport.ilike(search_filter)
-            )
-        )
+        query = query.where(await SearchService(db).condition(Student, search))
     
     if group_id:
         query = query.where(Student.group_id == group_id)
@@ -14,13 +14,12 @@ Version: 2.0.0
 
 from typing import Optional
 from datetime import date
-from fastapi import APIRouter, Depends, Query, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
-import io
 
-from app.database import get_db
+from app.database import async_session_maker, get_db
+from app.services.file_storage import blob_response, is_first_request
 from app.services.report_service import ReportService
 from app.schemas.report import (
     ReportCreate,
@@ -38,6 +37,7 @@ from app.core.dependencies import (
     require_superadmin,
 )
 from app.core.exceptions import ForbiddenException, NotFoundException
+from app.core.jobs import create_job, get_job, start_job
 
 router = APIRouter()
 
@@ -431,6 +431,7 @@ async def delete_report(
 @router.get("/{report_id}/download")
 async def download_report(
     report_id: int,
+    request: Request,
     format: str = Query("excel", enum=["excel", "pdf", "csv"]),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_leader),
@@ -440,6 +441,12 @@ async def download_report(
     
     - Leader: only own reports
     - Admin/Superadmin: any report
+    
+    The file is served from the artifact cache while the report's data is
+    unchanged, else rendered in a worker process first. For large reports
+    start a render job (POST /{report_id}/render) and download when it is
+    done. Only full downloads are counted, not revalidations (304) or
+    range continuations.
     """
     service = ReportService(db)
     report = await service.get_by_id(report_id)
@@ -448,16 +455,81 @@ async def download_report(
 
     _check_report_access(report, current_user)
 
-    file_data, content_type, filename = await service.download_report(
+    file_path, content_type, filename = await service.download_report(
         report_id, format
     )
 
-    return StreamingResponse(
-        io.BytesIO(file_data),
+    response = await blob_response(
+        request,
+        path=str(file_path),
+        filename=filename,
         media_type=content_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        etag=file_path.stem,
     )
 
+    # Increment download count
+    if response.status_code != 304 and is_first_request(request):
+        await service.increment_download_count(report_id)
+
+    return response
+
+
+@router.post("/{report_id}/render", status_code=status.HTTP_202_ACCEPTED)
+async def render_report(
+    report_id: int,
+    format: str = Query("excel", enum=["excel", "pdf", "csv"]),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_leader),
+):
+    """
+    Render a report file in the background.
+    
+    Returns a job to poll at GET /reports/jobs/{job_id}; when it is
+    completed, its result has the download_url (served from the cache).
+    """
+    service = ReportService(db)
+    report = await service.get_by_id(report_id)
+    if not report:
+        raise NotFoundException("Report not found")
+
+    _check_report_access(report, current_user)
+
+    job = await create_job("report_render", owner_id=current_user.id, report_id=report_id, format=format)
+
+    async def run(job):
+        async with async_session_maker() as session:
+            job_service = ReportService(session)
+            job_report = await job_service.get_by_id(report_id)
+            if not job_report:
+                raise NotFoundException("Report not found")
+            file_path = await job_service.artifact(job_report, format)
+        return {
+            "report_id": report_id,
+            "format": format,
+            "size": file_path.stat().st_size,
+            "download_url": f"/api/v1/reports/{report_id}/download?format={format}",
+        }
+
+    start_job(job, run)
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_render_job(
+    job_id: str,
+    current_user: User = Depends(require_leader),
+):
+    """
+    Status of a background render: status (queued, running, completed,
+    failed) and, when completed, the download URL.
+    """
+    job = await get_job(job_id)
+    if job is None or job.get("kind") != "report_render" or (
+        job.get("owner_id") != current_user.id and current_user.role != UserRole.SUPERADMIN
+    ):
+        raise NotFoundException("Hisobot topilmadi")
+    return job
+
 
 # ──────────────────────────────────────────────
 # APPROVE / REJECT (admin & superadmin only)
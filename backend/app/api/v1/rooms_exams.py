@@ -21,8 +21,9 @@ from app.models.exam_schedule import ExamSchedule
 from app.models.group import Group
 from app.models.student import Student
 from app.models.subject import Subject, Direction
-from app.models.schedule import Schedule, WeekDay
+from app.models.schedule import WeekDay, WeekType
 from app.core.dependencies import get_current_active_user
+from app.services.schedule_occupancy import get_occupancy, resource_key
 
 router = APIRouter()
 
@@ -184,44 +185,30 @@ async def get_rooms_occupancy(
     )
     rooms = rooms_result.scalars().all()
     
-    # Get schedule entries that use rooms
-    schedule_query = select(Schedule).where(
-        and_(Schedule.is_active == True, Schedule.room.isnot(None))
-    )
+    days = None
     if day:
         try:
-            weekday = WeekDay(day)
-            schedule_query = schedule_query.where(Schedule.day_of_week == weekday)
+            days = [WeekDay(day)]
         except ValueError:
             pass
     
-    schedules_result = await db.execute(schedule_query)
-    schedules = schedules_result.scalars().all()
-    
-    # Build occupancy map: room_name -> list of schedule slots
-    from collections import defaultdict
-    occupancy = defaultdict(list)
-    for s in schedules:
-        room_key = (s.room or "").strip().lower()
-        if room_key:
-            occupancy[room_key].append({
-                "day": s.day_of_week.value if s.day_of_week else None,
-                "lesson_number": s.lesson_number,
-                "start_time": s.start_time.strftime("%H:%M") if s.start_time else None,
-                "end_time": s.end_time.strftime("%H:%M") if s.end_time else None,
-                "subject": s.subject,
-                "group_name": s.group_name,
-                "teacher_name": s.teacher_name,
-            })
-    
+    occupancy = await get_occupancy()
     items = []
     for r in rooms:
-        room_key = r.name.strip().lower()
-        slots = occupancy.get(room_key, [])
-        busy_count = len(slots)
-        # Max 42 slots per week (7 days * 6 paras)
-        total_slots = 36  # 6 days * 6 paras
-        occupancy_rate = round(busy_count / total_slots * 100, 1) if total_slots > 0 else 0
+        resource = ("room", resource_key(r.name))
+        slots = [
+            {
+                "day": b.day.value if b.day else None,
+                "lesson_number": b.lesson_number,
+                "start_time": b.start_time.strftime("%H:%M") if b.start_time else None,
+                "end_time": b.end_time.strftime("%H:%M") if b.end_time else None,
+                "subject": b.subject,
+                "group_name": b.group_name,
+                "teacher_name": b.teacher_name,
+            }
+            for b in occupancy.bookings_of(resource)
+            if days is None or b.day in days
+        ]
         
         items.append({
             "id": r.id,
@@ -230,14 +217,52 @@ async def get_rooms_occupancy(
             "capacity": r.capacity,
             "room_type": r.room_type,
             "full_name": r.full_name,
-            "busy_slots": busy_count,
-            "occupancy_rate": occupancy_rate,
+            "busy_slots": occupancy.busy_lessons(resource, days),
+            # Share of the 6 days x 6 paras teaching week (or of the day)
+            "occupancy_rate": occupancy.occupancy_rate(resource, days),
             "schedule": slots,
         })
     
     return {"items": items, "total": len(items)}
 
 
+@router.get("/rooms/free")
+async def get_free_rooms(
+    day: str,
+    lesson_number: int = Query(..., ge=1, le=7),
+    week_type: str = "all",
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_academic)
+):
+    """Active rooms with no lesson at the given day and para."""
+    try:
+        weekday = WeekDay(day)
+        parity = WeekType(week_type)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Noto'g'ri kun yoki hafta turi")
+    
+    occupancy = await get_occupancy()
+    free = {resource_key(name) for name in occupancy.free_rooms(weekday, lesson_number, parity)}
+    
+    rooms_result = await db.execute(
+        select(Room).where(Room.is_active == True).order_by(Room.building, Room.name)
+    )
+    items = [
+        {
+            "id": r.id,
+            "name": r.name,
+            "building": r.building,
+            "capacity": r.capacity,
+            "room_type": r.room_type,
+            "full_name": r.full_name,
+        }
+        for r in rooms_result.scalars().all()
+        if resource_key(r.name) in free
+    ]
+    
+    return {"items": items, "total": len(items)}
+
+
 @router.get("/rooms/{room_id}")
 async def get_room(
     room_id: int,
@@ -9,7 +9,6 @@ Endpoints:
 - GET /statistics/contracts - Contract statistics (placeholder)
 """
 
-import time
 from datetime import date, datetime, timedelta
 from typing import Optional
 
@@ -18,32 +17,27 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models import User, Student, Group, Attendance
-from app.models.attendance import AttendanceStatus
+from app.models import User, Student, Group
 from app.models.user import UserRole
 from app.core.dependencies import get_current_active_user, require_admin
+from app.core.cache import cached_response
 from app.config import today_tashkent
+from app.services.attendance_rollup_service import AttendanceRollupService
 
 
 router = APIRouter()
 
-# Simple in-memory cache for dashboard stats
-_dashboard_cache = {"data": None, "timestamp": 0, "ttl": 30}  # 30 sekund
-
 
 @router.get("/dashboard")
+@cached_response("statistics:dashboard")
 async def get_dashboard_stats(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Get general dashboard statistics.
-    Uses in-memory cache (30s TTL) to reduce DB load.
+    Cached in Redis and invalidated when students, groups, users or attendance change.
     """
-    now = time.time()
-    if _dashboard_cache["data"] and (now - _dashboard_cache["timestamp"] < _dashboard_cache["ttl"]):
-        return _dashboard_cache["data"]
-
     # Total students
     students_result = await db.execute(select(func.count(Student.id)))
     total_students = students_result.scalar() or 0
@@ -64,12 +58,10 @@ async def get_dashboard_stats(
     
     # Today's attendance count
     today = today_tashkent()
-    today_attendance_result = await db.execute(
-        select(func.count(Attendance.id)).where(Attendance.date == today)
-    )
-    today_attendance = today_attendance_result.scalar() or 0
+    today_counts = await AttendanceRollupService(db).status_counts(today)
+    today_attendance = today_counts["total"]
     
-    result = {
+    return {
         "total_students": total_students,
         "total_groups": total_groups,
         "total_users": total_users,
@@ -77,12 +69,6 @@ async def get_dashboard_stats(
         "today_attendance": today_attendance
     }
 
-    # Cache saqlash
-    _dashboard_cache["data"] = result
-    _dashboard_cache["timestamp"] = now
-
-    return result
-
 
 @router.get("/attendance")
 async def get_attendance_stats(
@@ -101,67 +87,14 @@ async def get_attendance_stats(
     if not date_to:
         date_to = today_tashkent()
     
-    # Base date filter conditions
-    base_conditions = [
-        Attendance.date >= date_from,
-        Attendance.date <= date_to
-    ]
-    
-    # If group_id specified, get student IDs in that group
-    student_ids = None
-    if group_id:
-        students_query = select(Student.id).where(Student.group_id == group_id)
-        students_result = await db.execute(students_query)
-        student_ids = [s for s in students_result.scalars()]
-        if not student_ids:
-            return {
-                "total_records": 0,
-                "present_count": 0,
-                "absent_count": 0,
-                "late_count": 0,
-                "attendance_rate": 0.0,
-                "date_from": str(date_from),
-                "date_to": str(date_to)
-            }
-    
-    def _add_group_filter(q):
-        """Apply group filter if student_ids are set."""
-        if student_ids is not None:
-            return q.where(Attendance.student_id.in_(student_ids))
-        return q
-    
-    # Total records
-    query = select(func.count(Attendance.id)).where(*base_conditions)
-    query = _add_group_filter(query)
-    total_result = await db.execute(query)
-    total_records = total_result.scalar() or 0
-    
-    # Present count
-    present_query = select(func.count(Attendance.id)).where(
-        *base_conditions,
-        Attendance.status == AttendanceStatus.PRESENT
-    )
-    present_query = _add_group_filter(present_query)
-    present_result = await db.execute(present_query)
-    present_count = present_result.scalar() or 0
-    
-    # Absent count
-    absent_query = select(func.count(Attendance.id)).where(
-        *base_conditions,
-        Attendance.status == AttendanceStatus.ABSENT
-    )
-    absent_query = _add_group_filter(absent_query)
-    absent_result = await db.execute(absent_query)
-    absent_count = absent_result.scalar() or 0
-    
-    # Late count
-    late_query = select(func.count(Attendance.id)).where(
-        *base_conditions,
-        Attendance.status == AttendanceStatus.LATE
+    # One rollup read instead of four counts over attendances
+    counts = await AttendanceRollupService(db).status_counts(
+        date_from, date_to, [group_id] if group_id else None
     )
-    late_query = _add_group_filter(late_query)
-    late_result = await db.execute(late_query)
-    late_count = late_result.scalar() or 0
+    total_records = counts["total"]
+    present_count = counts["present"]
+    absent_count = counts["absent"]
+    late_count = counts["late"]
     
     # Attendance rate
     attendance_rate = 0.0
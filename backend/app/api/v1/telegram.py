@@ -381,20 +381,26 @@ async def search_groups_for_bot(
     _: bool = Depends(verify_bot_token)
 ):
     """
-    Search groups for bot users.
+    Search groups for bot users, best match first.
     Returns simplified group info.
     """
-    from sqlalchemy.orm import selectinload
+    from sqlalchemy import func
+    from app.services.search_service import SearchService
+    
+    group_ids = await SearchService(db).matching_ids(Group, q, limit=10)
+    if not group_ids:
+        return {"items": []}
     
+    student_count = (
+        select(func.count(Student.id))
+        .where(Student.group_id == Group.id)
+        .correlate(Group)
+        .scalar_subquery()
+    )
     result = await db.execute(
-        select(Group)
-        .options(selectinload(Group.students), selectinload(Group.leader))
-        .where(
-            Group.name.ilike(f"%{q}%") | Group.faculty.ilike(f"%{q}%")
-        )
-        .limit(10)
+        select(Group, student_count).where(Group.id.in_(group_ids))
     )
-    groups = result.scalars().all()
+    found = {g.id: (g, count) for g, count in result.all()}
     
     return {
         "items": [
@@ -404,9 +410,9 @@ async def search_groups_for_bot(
                 "name": g.name,
                 "faculty": g.faculty,
                 "course_year": g.course_year,
-                "student_count": len(g.students) if g.students else 0
+                "student_count": count
             }
-            for g in groups
+            for g, count in (found[gid] for gid in group_ids if gid in found)
         ]
     }
 
@@ -695,49 +701,16 @@ async def get_todays_birthdays(
     Get students with birthdays today.
     Bot calls this at 6:00 AM to send birthday messages.
     Returns list of students with their group info.
+
+    The all-groups list is precomputed a day ahead and cached in Redis
+    (see birthday_service); group_id filters that list.
     """
-    from app.config import TASHKENT_TZ
-    from datetime import datetime as dt
+    from app.services.birthday_service import get_birthdays
     
-    today = dt.now(TASHKENT_TZ).date()
-    
-    query = select(Student).where(Student.birth_date.isnot(None))
+    today = today_tashkent()
+    birthday_students = await get_birthdays(db, today)
     if group_id:
-        query = query.where(Student.group_id == group_id)
-    
-    result = await db.execute(query)
-    students = result.scalars().all()
-    
-    birthday_students = []
-    for student in students:
-        if not student.birth_date:
-            continue
-        try:
-            bday = student.birth_date
-            if bday.month == today.month and bday.day == today.day:
-                # Get group info
-                group_result = await db.execute(
-                    select(Group).where(Group.id == student.group_id)
-                )
-                group = group_result.scalar_one_or_none()
-                
-                age = today.year - bday.year
-                
-                birthday_students.append({
-                    "student_id": student.id,
-                    "user_id": student.user_id,
-                    "name": student.name or student.full_name or "Noma'lum",
-                    "birth_date": bday.isoformat(),
-                    "age": age,
-                    "group_id": student.group_id,
-                    "group_code": group.code if group else None,
-                    "group_name": group.name if group else None,
-                    "student_code": student.student_id,
-                    "phone": student.phone,
-                })
-        except Exception as e:
-            logger.warning(f"Birthday check error for student {student.id}: {e}")
-            continue
+        birthday_students = [b for b in birthday_students if b["group_id"] == group_id]
     
     return {"birthdays": birthday_students, "date": today.isoformat(), "count": len(birthday_students)}
 
@@ -82,6 +82,11 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Password hashing (bcrypt runs on a dedicated thread pool)
+    BCRYPT_ROUNDS: int = 12  # hashes with another cost are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 256  # calls queued or running; beyond -> 503
+    
     # ====================
     # CORS
     # ====================
@@ -123,6 +128,12 @@ class Settings(BaseSettings):
     CLAUDE_MAX_TOKENS: int = 8000
     CLAUDE_TEMPERATURE: float = 0.05
     CLAUDE_ANTHROPIC_VERSION: str = "2023-06-01"
+    CLAUDE_CONCURRENCY: int = 4  # parallel batch requests per import
+    CLAUDE_MAX_RETRIES: int = 3  # on timeouts, 429 and 5xx
+    CLAUDE_RETRY_BASE_DELAY: float = 1.0  # seconds, doubled per attempt
+    AI_CACHE_LRU_SIZE: int = 20000  # cached AI answers kept in process memory
+    AI_RESULT_CACHE_TTL_DAYS: int = 90  # cached schedule cell / group answers
+    AI_ANALYSIS_CACHE_TTL: int = 7 * 24 * 3600  # seconds; entries are keyed by data fingerprint
     
     # ====================
     # KUAF MUTOOLA API
@@ -151,11 +162,52 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
     
+    # Response cache (versioned, invalidated on writes)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: int = 60  # seconds
+    
+    # Authenticated-user snapshot cache (in-process LRU + Redis)
+    AUTH_USER_CACHE_TTL: int = 300  # seconds, Redis snapshot
+    AUTH_USER_LOCAL_TTL: int = 10  # seconds, per-process LRU
+    AUTH_USER_LOCAL_SIZE: int = 2048
+    
+    # Attendance change events for the Telegram bot (outbox -> Redis stream)
+    ATTENDANCE_EVENTS_ENABLED: bool = True
+    ATTENDANCE_EVENTS_STREAM: str = "attendance:events"
+    ATTENDANCE_EVENTS_MAXLEN: int = 100000  # approximate stream trim length
+    ATTENDANCE_EVENTS_SWEEP_SECONDS: int = 5  # relay sweep for commits made by other workers
+    
+    # Attendance rollup: periodic comparison with attendances over recent days
+    ATTENDANCE_ROLLUP_RECONCILE_SECONDS: int = 3600
+    ATTENDANCE_ROLLUP_RECONCILE_DAYS: int = 35
+    
+    # Unread notification counters (badge)
+    NOTIFICATION_COUNTERS_RECONCILE_SECONDS: int = 300  # also applies expiry
+    NOTIFICATION_BADGE_MAX_WAIT: int = 30  # longest long-poll on unread-count, seconds
+    
+    # Activity log writer (batched inserts from ActivityLoggingMiddleware)
+    ACTIVITY_LOG_QUEUE_SIZE: int = 10000
+    ACTIVITY_LOG_BATCH_SIZE: int = 500
+    ACTIVITY_LOG_FLUSH_MS: int = 1000
+    ACTIVITY_LOG_RETENTION_MONTHS: int = 12  # monthly partitions kept; 0 = forever
+    ACTIVITY_LOG_PARTITIONS_AHEAD: int = 2
+    
     # ====================
     # FILE STORAGE
     # ====================
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE_MB: int = 10
+    # Internal nginx location serving UPLOAD_DIR/blobs (X-Accel-Redirect); empty = send from the app
+    FILE_ACCEL_REDIRECT: str = ""
+    FILE_BLOBS_RECONCILE_SECONDS: int = 24 * 3600
+    # Threads copying and hashing uploads; concurrent uploads queue for them
+    UPLOAD_COPY_WORKERS: int = 2
+    # Image previews: worker processes and renders queued or running; beyond -> skipped/503
+    PREVIEW_WORKERS: int = 2
+    PREVIEW_MAX_PENDING: int = 64
+    # Report rendering (PDF/Excel/CSV): worker processes and renders queued or running; beyond -> 503
+    REPORT_WORKERS: int = 2
+    REPORT_MAX_PENDING: int = 16
     ALLOWED_EXTENSIONS: List[str] = ["xlsx", "xls", "csv", "pdf", "jpg", "jpeg", "png"]
     
     # ====================
@@ -163,6 +215,12 @@ class Settings(BaseSettings):
     # ====================
     RATE_LIMIT_PER_MINUTE: int = 200
     RATE_LIMIT_PER_HOUR: int = 1000
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 10  # per IP
+    RATE_LIMIT_STAFF_PER_MINUTE: int = 600  # admin/dean/registrar users
+    RATE_LIMIT_BOT_PER_MINUTE: int = 1200  # X-Bot-Token callers
+    # Peers (addresses or CIDR networks, comma-separated) whose X-Real-IP
+    # header names the client; other peers are limited by their own address
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
     
     # ====================
     # LOGGING
@@ -0,0 +1,157 @@
+"""
+UniControl - Activity Log Writer
+================================
+Batched, queue-backed writer for request activity logs.
+
+The activity middleware enqueues one row per request; a single flusher
+task drains the queue and bulk-inserts rows every ACTIVITY_LOG_BATCH_SIZE
+rows or ACTIVITY_LOG_FLUSH_MS milliseconds, whichever comes first, with
+one multi-row INSERT per batch. The queue is bounded: when it is full,
+new rows are dropped and counted instead of applying backpressure to
+requests. The lifespan handler starts the writer and drains it on
+shutdown.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.activity_log import ActivityLog
+from app.services.activity_log_service import ActivityLogService, count_rows
+
+
+class ActivityLogWriter:
+    """Bounded in-process queue with a batching flusher task."""
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval_ms: int = 1000
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._accepting = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Enqueue one activity_logs row (column -> value). Never blocks;
+        returns False and counts a drop if the queue is full or stopped.
+        """
+        if not self._accepting:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Activity log queue full, dropped {self.dropped} rows so far")
+            return False
+
+    def start(self) -> None:
+        """Start the flusher task on the running loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._wakeup = asyncio.Event()
+        self._accepting = True
+        self._task = asyncio.create_task(self._run(), name="activity-log-writer")
+        logger.info(
+            f"Activity log writer started (batch={self.batch_size}, "
+            f"interval={int(self.flush_interval * 1000)}ms, queue={self.max_queue})"
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting rows and flush everything still queued."""
+        if self._task is None:
+            return
+        self._accepting = False
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        logger.info(f"Activity log writer stopped: {self.stats()}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    async def _next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next queued row, or None on timeout / shutdown wake-up."""
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if not self._accepting:
+            return None
+        getter = asyncio.ensure_future(self._queue.get())
+        waker = asyncio.ensure_future(self._wakeup.wait())
+        done, _ = await asyncio.wait({getter, waker}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        waker.cancel()
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        return None
+
+    async def _run(self) -> None:
+        while self._accepting or not self._queue.empty():
+            first = await self._next(timeout=None)
+            if first is None:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                row = await self._next(timeout)
+                if row is None:
+                    break
+                batch.append(row)
+            await self._write(batch)
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        try:
+            async with async_session_maker() as session:
+                # executemany is sent as multi-row INSERT ... VALUES batches
+                await session.execute(insert(ActivityLog), rows)
+                await ActivityLogService(session).add_counts(count_rows(rows))
+                await session.commit()
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(rows)
+            logger.error(f"Activity log batch insert failed ({len(rows)} rows): {e}")
+
+
+activity_log_writer = ActivityLogWriter(
+    max_queue=settings.ACTIVITY_LOG_QUEUE_SIZE,
+    batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.ACTIVITY_LOG_FLUSH_MS,
+)
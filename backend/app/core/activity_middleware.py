@@ -5,25 +5,22 @@ Automatically logs all API requests to ActivityLog.
 Tracks every user action: page views, data access, mutations.
 Excludes health checks, static files, and docs endpoints.
 
-Uses BackgroundTask to avoid blocking the response
-and pure ASGI middleware to prevent RuntimeError: No response returned.
+Rows are handed to the batched ActivityLogWriter queue so requests never
+wait on the database, and pure ASGI middleware is used to prevent
+RuntimeError: No response returned.
 """
 
 import json
 import time
-import asyncio
 from typing import Optional
-from fastapi import Request, Response
+from fastapi import Request
 from starlette.types import ASGIApp, Receive, Scope, Send
-from sqlalchemy import select
-from app.database import async_session_maker
-from app.models.activity_log import ActivityLog, ActivityAction
-from app.models.user import User
+from app.models.activity_log import ActivityAction
 from app.config import TASHKENT_TZ
+from app.core.activity_log_writer import activity_log_writer
 from datetime import datetime
 import logging
-import jwt
-from app.config import settings
+from app.core.security import get_request_token_payload
 
 logger = logging.getLogger(__name__)
 
@@ -106,17 +103,18 @@ def _get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-def _extract_user_id(request: Request) -> Optional[int]:
-    """Try to extract user_id from JWT token in Authorization header."""
-    auth_header = request.headers.get("authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return None
-    token = auth_header[7:]
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload.get("sub") or payload.get("user_id")
-    except Exception:
+def _extract_user_id(scope: Scope) -> Optional[int]:
+    """
+    Get user_id for the request, reusing the auth context / token payload
+    already decoded by get_current_user when the route was authenticated.
+    """
+    auth = scope.get("state", {}).get("auth")
+    if auth is not None:
+        return auth.user_id
+    payload = get_request_token_payload(scope)
+    if payload is None:
         return None
+    return payload.get("sub") or payload.get("user_id")
 
 
 def _get_description(method: str, path: str) -> str:
@@ -168,35 +166,25 @@ def _should_skip(path: str, method: str) -> bool:
     return False
 
 
-async def _log_activity_background(user_id: int, method: str, path: str, status_code: int, duration_ms: float, query_params: str, ip: str, user_agent: str):
-    """Background task to log activity without blocking response."""
-    try:
-        action = METHOD_ACTION_MAP.get(method, ActivityAction.SYSTEM)
-        description = _get_description(method, path)
-        entity_type = _get_entity_type(path)
-
-        context_data = {
-            "method": method,
-            "path": path,
-            "status_code": status_code,
-            "duration_ms": duration_ms,
-            "query_params": query_params,
-        }
-
-        async with async_session_maker() as session:
-            log_entry = ActivityLog(
-                user_id=int(user_id),
-                action=action,
-                description=description,
-                entity_type=entity_type,
-                ip_address=ip,
-                user_agent=user_agent,
-                context=json.dumps(context_data, default=str, ensure_ascii=False),
-            )
-            session.add(log_entry)
-            await session.commit()
-    except Exception as e:
-        logger.error(f"Activity logging failed: {e}")
+def _build_log_row(user_id: int, method: str, path: str, status_code: int, duration_ms: float, query_params: str, ip: str, user_agent: str) -> dict:
+    """Build the activity_logs row for one request."""
+    context_data = {
+        "method": method,
+        "path": path,
+        "status_code": status_code,
+        "duration_ms": duration_ms,
+        "query_params": query_params,
+    }
+    return {
+        "user_id": int(user_id),
+        "action": METHOD_ACTION_MAP.get(method, ActivityAction.SYSTEM),
+        "description": _get_description(method, path),
+        "entity_type": _get_entity_type(path),
+        "ip_address": ip,
+        "user_agent": user_agent,
+        "context": json.dumps(context_data, default=str, ensure_ascii=False),
+        "created_at": datetime.now(TASHKENT_TZ),
+    }
 
 
 class ActivityLoggingMiddleware:
@@ -230,18 +218,15 @@ class ActivityLoggingMiddleware:
 
         duration_ms = round((time.time() - start_time) * 1000, 2)
 
-        # Extract user_id from headers
+        # Extract request metadata from headers
         headers_raw = scope.get("headers", [])
-        auth_header = ""
         user_agent = ""
         client_ip = "unknown"
         query_string = scope.get("query_string", b"").decode("utf-8", errors="ignore")
 
         for key, val in headers_raw:
             key_lower = key.decode("latin-1").lower()
-            if key_lower == "authorization":
-                auth_header = val.decode("latin-1")
-            elif key_lower == "user-agent":
+            if key_lower == "user-agent":
                 user_agent = val.decode("latin-1")[:500]
             elif key_lower == "x-forwarded-for":
                 client_ip = val.decode("latin-1").split(",")[0].strip()
@@ -251,16 +236,8 @@ class ActivityLoggingMiddleware:
             if client:
                 client_ip = client[0]
 
-        # Extract user_id from JWT
-        user_id = None
-        if auth_header.startswith("Bearer "):
-            token = auth_header[7:]
-            try:
-                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-                user_id = payload.get("sub") or payload.get("user_id")
-            except Exception:
-                pass
-
+        # Extract user_id (JWT is decoded at most once per request)
+        user_id = _extract_user_id(scope)
         if user_id is None:
             return
 
@@ -268,9 +245,9 @@ class ActivityLoggingMiddleware:
         if "/logs" in path and method == "GET":
             return
 
-        # Fire and forget - log in background
-        asyncio.create_task(
-            _log_activity_background(
+        # Queue for the batched writer (never blocks; drops are counted)
+        activity_log_writer.submit(
+            _build_log_row(
                 user_id, method, path, status_code, duration_ms,
                 query_string if query_string else None, client_ip, user_agent
             )
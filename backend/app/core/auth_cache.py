@@ -0,0 +1,321 @@
+"""
+UniControl - Authenticated User Cache
+=====================================
+Short-lived snapshots of the authenticated user, so get_current_user does
+not hit the users table on every request.
+
+Two layers:
+    * an in-process LRU keyed by (user_id, token_version) with a short TTL
+    * a Redis snapshot per user (auth:user:<id>) with a longer TTL
+
+A snapshot holds the user's columns plus the linked student/group ids,
+without password_hash (loaded on demand by load_password_hash) or
+refresh_token. It is rebuilt from the database on a miss. Commits that change a user
+(or a student's user/group link) drop the Redis snapshot and the local
+entries and bump the user's version (auth:user:ver:<id>); a rebuilt
+snapshot is written only if that version is still the one read before
+the rebuild, so a snapshot read before a change cannot land after it; other processes can serve their local copy for at most
+AUTH_USER_LOCAL_TTL seconds. Password, role and is_active changes also
+bump users.token_version, which revokes every access token issued
+before the change.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import copy
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import DateTime, Enum as SQLEnum, event, inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes, make_transient_to_detached
+
+from app.config import settings
+from app.database import get_redis
+from app.models.student import Student
+from app.models.user import User
+
+
+USER_PREFIX = "auth:user:"
+USER_VERSION_PREFIX = "auth:user:ver:"
+
+# Compare-and-set: write the snapshot only if the user's version is unchanged
+_SET_IF_VERSION_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Changes to these columns revoke previously issued access tokens
+REVOKING_FIELDS = ("password_hash", "role", "is_active")
+
+# Left out of snapshots and unloaded on attached users. refresh_token is
+# never read through current_user; password_hash is read with
+# load_password_hash(), so no hash is kept in Redis or memory.
+SKIPPED_COLUMNS = {"refresh_token", "password_hash"}
+
+_SESSION_KEY = "auth_dirty_users"
+_REHASH_KEY = "password_rehash"
+_pending_tasks: Set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class AuthContext:
+    """What the request knows about its authenticated user."""
+    user_id: int
+    role: str
+    is_active: bool
+    token_version: int
+    student_id: Optional[int] = None
+    group_id: Optional[int] = None
+
+
+# ==================== Snapshots ====================
+
+def _dump(user: User, student_id: Optional[int], group_id: Optional[int]) -> Dict[str, Any]:
+    columns = {}
+    for column in User.__table__.columns:
+        if column.key in SKIPPED_COLUMNS:
+            continue
+        value = getattr(user, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif hasattr(value, "value"):
+            value = value.value
+        elif isinstance(value, (list, dict)):
+            value = copy.deepcopy(value)
+        columns[column.key] = value
+    return {"columns": columns, "student_id": student_id, "group_id": group_id}
+
+
+def _load_columns(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    values = {}
+    for column in User.__table__.columns:
+        if column.key in SKIPPED_COLUMNS:
+            continue
+        value = snapshot["columns"].get(column.key)
+        if value is not None:
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, SQLEnum):
+                value = column.type.enum_class(value)
+            elif isinstance(value, (list, dict)):
+                # The user may change it in place; the snapshot is shared
+                value = copy.deepcopy(value)
+        values[column.key] = value
+    return values
+
+
+def context_from_snapshot(snapshot: Dict[str, Any]) -> AuthContext:
+    columns = snapshot["columns"]
+    return AuthContext(
+        user_id=columns["id"],
+        role=columns["role"],
+        is_active=columns["is_active"],
+        token_version=columns.get("token_version") or 0,
+        student_id=snapshot.get("student_id"),
+        group_id=snapshot.get("group_id"),
+    )
+
+
+def attach_user(db: AsyncSession, snapshot: Dict[str, Any]) -> User:
+    """
+    Rebuild the User from a snapshot and attach it to the session as a
+    persistent instance, without a SELECT. Routes can mutate and commit it
+    exactly like a freshly loaded user.
+    """
+    values = _load_columns(snapshot)
+    existing = db.identity_map.get(sa_inspect(User).identity_key_from_primary_key((values["id"],)))
+    if existing is not None:
+        return existing
+    user = User(**values)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+
+async def load_password_hash(db: AsyncSession, user: User) -> str:
+    """A user's password_hash, loaded if it came from a snapshot."""
+    if "password_hash" in sa_inspect(user).unloaded:
+        await db.refresh(user, ["password_hash"])
+    return user.password_hash
+
+
+# ==================== Two-level lookup ====================
+
+_local: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _local_get(key: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    entry = _local.get(key)
+    if entry is None:
+        return None
+    expires_at, snapshot = entry
+    if expires_at < time.monotonic():
+        _local.pop(key, None)
+        return None
+    _local.move_to_end(key)
+    return snapshot
+
+
+def _local_put(key: Tuple[int, int], snapshot: Dict[str, Any]) -> None:
+    _local[key] = (time.monotonic() + settings.AUTH_USER_LOCAL_TTL, snapshot)
+    _local.move_to_end(key)
+    while len(_local) > settings.AUTH_USER_LOCAL_SIZE:
+        _local.popitem(last=False)
+
+
+def _local_evict(user_id: int) -> None:
+    for key in [k for k in _local if k[0] == user_id]:
+        _local.pop(key, None)
+
+
+async def _build_snapshot(db: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+    user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+    if user is None:
+        return None
+    link = (await db.execute(
+        select(Student.id, Student.group_id).where(Student.user_id == user_id).limit(1)
+    )).first()
+    return _dump(user, link[0] if link else None, link[1] if link else None)
+
+
+async def get_user_snapshot(
+    db: AsyncSession,
+    user_id: int,
+    token_version: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Snapshot for the user named by a token, or None if the user no longer
+    exists. The caller compares token_version to detect revoked tokens.
+    """
+    key = (user_id, token_version)
+    snapshot = _local_get(key)
+    if snapshot is not None:
+        return snapshot
+
+    redis = None
+    version = None
+    try:
+        redis = await get_redis()
+        cached, version = await redis.mget(f"{USER_PREFIX}{user_id}", f"{USER_VERSION_PREFIX}{user_id}")
+        if cached is not None:
+            snapshot = json.loads(cached)
+            # Older than the token: the invalidation has not landed yet
+            if (snapshot["columns"].get("token_version") or 0) < token_version:
+                snapshot = None
+    except Exception as e:
+        logger.debug(f"User cache unavailable: {e}")
+        redis = None
+
+    current = True
+    if snapshot is None:
+        snapshot = await _build_snapshot(db, user_id)
+        if snapshot is None:
+            return None
+        if redis is not None:
+            try:
+                set_if_version = redis.register_script(_SET_IF_VERSION_SCRIPT)
+                current = bool(await set_if_version(
+                    keys=[f"{USER_PREFIX}{user_id}", f"{USER_VERSION_PREFIX}{user_id}"],
+                    args=[version or "0", json.dumps(snapshot), settings.AUTH_USER_CACHE_TTL],
+                ))
+            except Exception as e:
+                logger.debug(f"User cache write failed: {e}")
+
+    # Only tokens that match the current version may reuse the snapshot
+    # locally, and only if the user did not change while it was built
+    if current and (snapshot["columns"].get("token_version") or 0) == token_version:
+        _local_put(key, snapshot)
+    return snapshot
+
+
+async def invalidate_users(*user_ids: int) -> None:
+    """Drop cached snapshots for the given users."""
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        _local_evict(user_id)
+    try:
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                # Outlives any snapshot rebuild that read the previous version
+                pipe.incr(f"{USER_VERSION_PREFIX}{user_id}")
+                pipe.expire(f"{USER_VERSION_PREFIX}{user_id}", settings.AUTH_USER_CACHE_TTL)
+            pipe.delete(*(f"{USER_PREFIX}{uid}" for uid in user_ids))
+            await pipe.execute()
+    except Exception as e:
+        logger.debug(f"User cache invalidation failed for {user_ids}: {e}")
+
+
+# ==================== Automatic invalidation ====================
+
+def mark_password_rehash(user: User) -> None:
+    """
+    Flag a password_hash change as a cost-factor upgrade of the same
+    password, so it does not revoke the user's tokens.
+    """
+    sa_inspect(user).info[_REHASH_KEY] = True
+
+
+def _changed(obj: Any, field: str) -> bool:
+    return attributes.get_history(obj, field).has_changes()
+
+
+def _on_before_flush(session: Session, flush_context, instances) -> None:
+    dirty_users = session.info.setdefault(_SESSION_KEY, set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            rehash = sa_inspect(obj).info.pop(_REHASH_KEY, False)
+            fields = [f for f in REVOKING_FIELDS if not (rehash and f == "password_hash")]
+            if any(_changed(obj, f) for f in fields):
+                obj.token_version = (obj.token_version or 0) + 1
+            dirty_users.add(obj.id)
+        elif isinstance(obj, Student) and (_changed(obj, "user_id") or _changed(obj, "group_id")):
+            history = attributes.get_history(obj, "user_id")
+            dirty_users.update(uid for uid in (*history.deleted, obj.user_id) if uid)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            dirty_users.add(obj.id)
+        elif isinstance(obj, Student) and obj.user_id:
+            dirty_users.add(obj.user_id)
+    if not dirty_users:
+        session.info.pop(_SESSION_KEY, None)
+
+
+def _on_after_commit(session: Session) -> None:
+    user_ids = session.info.pop(_SESSION_KEY, None)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        _local_evict(user_id)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(invalidate_users(*user_ids))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+def _on_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def register_user_cache_invalidation() -> None:
+    """Install session hooks that drop user snapshots after each commit."""
+    if event.contains(Session, "after_commit", _on_after_commit):
+        return
+    event.listen(Session, "before_flush", _on_before_flush)
+    event.listen(Session, "after_commit", _on_after_commit)
+    event.listen(Session, "after_rollback", _on_after_rollback)
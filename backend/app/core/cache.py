@@ -0,0 +1,244 @@
+"""
+UniControl - Response Cache
+===========================
+Redis-backed, version-invalidated cache for read-heavy route responses.
+
+Each cached route depends on a set of tables. Every table has a version
+counter in Redis (cache:ver:<table>); cache keys embed the current
+versions, so a write to any dependency bumps its counter and every
+response built from the old data simply stops being addressed and
+expires on its own TTL. Versions are bumped automatically after commit
+for ORM writes to watched tables (see register_cache_invalidation).
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+from datetime import date
+from enum import Enum
+from itertools import chain
+from typing import Any, Callable, Iterable, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.config import settings
+from app.database import get_redis
+from app.models.user import User
+
+
+VERSION_PREFIX = "cache:ver:"
+RESPONSE_PREFIX = "cache:resp:"
+
+# Tables whose writes invalidate cached responses
+WATCHED_TABLES: Set[str] = {
+    "attendances",
+    "attendance_daily_stats",
+    "attendance_daily_students",
+    "students",
+    "groups",
+    "users",
+    "schedules",
+    "notifications",
+    "broadcast_notifications",
+    "broadcast_notification_receipts",
+    "reports",
+    "nb_permits",
+    "contracts",
+    "rooms",
+}
+
+# Default dependencies for role dashboards
+DASHBOARD_TABLES: Tuple[str, ...] = (
+    "attendances",
+    "attendance_daily_stats",
+    "attendance_daily_students",
+    "students",
+    "groups",
+    "users",
+    "schedules",
+    "reports",
+    "nb_permits",
+    "contracts",
+)
+
+_SESSION_KEY = "cache_dirty_tables"
+_pending_tasks: Set[asyncio.Task] = set()
+
+
+# ==================== Versions ====================
+
+async def invalidate(*tables: str) -> None:
+    """Bump the version of each table so dependent cached responses miss."""
+    if not tables:
+        return
+    try:
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for table in tables:
+                pipe.incr(f"{VERSION_PREFIX}{table}")
+            await pipe.execute()
+    except Exception as e:
+        logger.debug(f"Response cache invalidation failed for {tables}: {e}")
+
+
+async def _versions(redis, tables: Iterable[str]) -> str:
+    tables = sorted(set(tables))
+    if not tables:
+        return "0"
+    values = await redis.mget([f"{VERSION_PREFIX}{t}" for t in tables])
+    return ".".join(v or "0" for v in values)
+
+
+async def table_versions(*tables: str) -> str:
+    """Current versions of the tables, for keys of data cached outside routes."""
+    redis = await get_redis()
+    return await _versions(redis, tables)
+
+
+# ==================== Route decorator ====================
+
+def _is_query_param(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool, date, Enum))
+
+
+def _scope_key(scope: str, user: Optional[User]) -> str:
+    if user is None:
+        return "anon"
+    if scope == "user":
+        return f"user={user.id}"
+    return f"role={user.role.value}"
+
+
+def cached_response(
+    name: str,
+    ttl: Optional[int] = None,
+    scope: str = "role",
+    depends_on: Iterable[str] = DASHBOARD_TABLES,
+) -> Callable:
+    """
+    Cache a FastAPI route's JSON result in Redis.
+
+    Args:
+        name: Cache namespace for the route (e.g. "dashboard:admin")
+        ttl: Seconds to keep an entry (defaults to RESPONSE_CACHE_TTL)
+        scope: "role" shares entries between users of the same role,
+               "user" keys entries per user id
+        depends_on: Tables whose writes invalidate the entry
+
+    The key also includes every plain query parameter of the call.
+    If Redis is unavailable the route simply runs uncached.
+
+    Usage:
+        @router.get("/admin")
+        @cached_response("dashboard:admin")
+        async def get_admin_dashboard(db = Depends(get_db), ...):
+            ...
+    """
+    depends_on = tuple(depends_on)
+    if scope not in ("role", "user"):
+        raise ValueError(f"Unknown cache scope: {scope}")
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return await func(*args, **kwargs)
+
+            bound = signature.bind_partial(*args, **kwargs)
+            user = next(
+                (v for v in bound.arguments.values() if isinstance(v, User)), None
+            )
+            params = sorted(
+                (k, str(v)) for k, v in bound.arguments.items() if _is_query_param(v)
+            )
+            params_hash = hashlib.sha1(
+                json.dumps(params).encode("utf-8")
+            ).hexdigest()[:16]
+
+            try:
+                redis = await get_redis()
+                versions = await _versions(redis, depends_on)
+                key = (
+                    f"{RESPONSE_PREFIX}{name}:{versions}:"
+                    f"{_scope_key(scope, user)}:{params_hash}"
+                )
+                cached = await redis.get(key)
+            except Exception as e:
+                logger.debug(f"Response cache unavailable for {name}: {e}")
+                return await func(*args, **kwargs)
+
+            if cached is not None:
+                return json.loads(cached)
+
+            result = await func(*args, **kwargs)
+            try:
+                await redis.set(
+                    key,
+                    json.dumps(jsonable_encoder(result)),
+                    ex=ttl or settings.RESPONSE_CACHE_TTL,
+                )
+            except Exception as e:
+                logger.debug(f"Response cache write failed for {name}: {e}")
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# ==================== Automatic invalidation ====================
+
+def _mark(session: Session, table: Optional[str]) -> None:
+    if table in WATCHED_TABLES:
+        session.info.setdefault(_SESSION_KEY, set()).add(table)
+
+
+def _on_before_flush(session: Session, flush_context, instances) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        _mark(session, getattr(obj, "__tablename__", None))
+
+
+def _on_orm_execute(state: ORMExecuteState) -> None:
+    # Bulk ORM insert/update/delete statements bypass the flush
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None:
+        _mark(state.session, mapper.local_table.name)
+
+
+def _on_after_commit(session: Session) -> None:
+    tables = session.info.pop(_SESSION_KEY, None)
+    if not tables:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(invalidate(*tables))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+def _on_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def register_cache_invalidation() -> None:
+    """Install session hooks that bump table versions after each commit."""
+    if event.contains(Session, "after_commit", _on_after_commit):
+        return
+    event.listen(Session, "before_flush", _on_before_flush)
+    event.listen(Session, "do_orm_execute", _on_orm_execute)
+    event.listen(Session, "after_commit", _on_after_commit)
+    event.listen(Session, "after_rollback", _on_after_rollback)
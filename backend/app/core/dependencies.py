@@ -9,13 +9,13 @@ Version: 1.0.0
 
 from typing import Optional, List
 from functools import wraps
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.database import get_db
-from app.core.security import verify_token
+from app.core.auth_cache import attach_user, context_from_snapshot, get_user_snapshot
+from app.core.security import get_request_token_payload
 from app.models.user import User, UserRole
 from app.core.exceptions import UnauthorizedException, ForbiddenException
 
@@ -24,14 +24,46 @@ from app.core.exceptions import UnauthorizedException, ForbiddenException
 security = HTTPBearer()
 
 
+async def _resolve_user(request: Request, db: AsyncSession) -> User:
+    """
+    Resolve the request's user from its (once-decoded) access token via the
+    user snapshot cache, and publish the AuthContext on request.state.auth.
+    """
+    payload = get_request_token_payload(request.scope)
+    if payload is None:
+        raise UnauthorizedException("Invalid or expired token")
+    
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise UnauthorizedException("Invalid token payload")
+    token_version = int(payload.get("tv", 0))
+    
+    snapshot = await get_user_snapshot(db, int(user_id), token_version)
+    if snapshot is None:
+        raise UnauthorizedException("User not found")
+    
+    context = context_from_snapshot(snapshot)
+    if context.token_version != token_version:
+        raise UnauthorizedException("Token has been revoked")
+    
+    request.state.auth = context
+    return attach_user(db, snapshot)
+
+
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Get the current authenticated user from JWT token.
     
+    The token is decoded once per request and the user comes from the
+    authenticated-user cache (see app.core.auth_cache) rather than a
+    users table lookup on every request.
+    
     Args:
+        request: The current request
         credentials: The HTTP Bearer credentials
         db: Database session
         
@@ -39,30 +71,9 @@ async def get_current_user(
         The current user
         
     Raises:
-        UnauthorizedException: If token is invalid or user not found
+        UnauthorizedException: If token is invalid, revoked or user not found
     """
-    token = credentials.credentials
-    
-    # Verify token
-    payload = verify_token(token)
-    if payload is None:
-        raise UnauthorizedException("Invalid or expired token")
-    
-    # Get user ID from token
-    user_id = payload.get("sub")
-    if user_id is None:
-        raise UnauthorizedException("Invalid token payload")
-    
-    # Fetch user from database
-    result = await db.execute(
-        select(User).where(User.id == int(user_id))
-    )
-    user = result.scalar_one_or_none()
-    
-    if user is None:
-        raise UnauthorizedException("User not found")
-    
-    return user
+    return await _resolve_user(request, db)
 
 
 async def get_current_active_user(
@@ -146,6 +157,7 @@ async def require_teacher(
 
 
 async def get_optional_user(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(
         HTTPBearer(auto_error=False)
     ),
@@ -159,20 +171,10 @@ async def get_optional_user(
     if credentials is None:
         return None
     
-    token = credentials.credentials
-    payload = verify_token(token)
-    
-    if payload is None:
-        return None
-    
-    user_id = payload.get("sub")
-    if user_id is None:
+    try:
+        return await _resolve_user(request, db)
+    except UnauthorizedException:
         return None
-    
-    result = await db.execute(
-        select(User).where(User.id == int(user_id))
-    )
-    return result.scalar_one_or_none()
 
 
 class RoleChecker:
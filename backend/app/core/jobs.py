@@ -0,0 +1,179 @@
+"""
+UniControl - Background Jobs
+============================
+Minimal background job runner with pollable status.
+
+A job is a coroutine started on the worker's event loop. Its state
+(status, progress, result or error) is stored in Redis under job:<id>
+so any worker can answer a status poll; if Redis is unavailable the
+state is kept in process memory instead.
+
+Statuses: queued -> running -> completed | failed
+
+A job that is waiting or running carries a heartbeat, refreshed by its
+runner. If the worker dies the heartbeat goes stale, and the job is
+marked failed when it is next polled or when a worker starts up.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import contextlib
+import json
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+from app.config import now_tashkent
+from app.database import get_redis
+
+
+JOB_PREFIX = "job:"
+JOB_TTL = 24 * 3600  # seconds a finished job stays pollable
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = 3 * JOB_HEARTBEAT_SECONDS  # no heartbeat for this long: the worker is gone
+ACTIVE_STATUSES = ("queued", "running")
+LOCAL_JOBS_MAX = 500
+
+_local_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_running: Set[asyncio.Task] = set()
+
+
+async def _save(job: Dict[str, Any]) -> None:
+    payload = jsonable_encoder(job)
+    try:
+        redis = await get_redis()
+        await redis.set(f"{JOB_PREFIX}{job['id']}", json.dumps(payload), ex=JOB_TTL)
+        return
+    except Exception as e:
+        logger.debug(f"Job store unavailable, keeping job {job['id']} locally: {e}")
+    _local_jobs[job["id"]] = payload
+    _local_jobs.move_to_end(job["id"])
+    while len(_local_jobs) > LOCAL_JOBS_MAX:
+        _local_jobs.popitem(last=False)
+
+
+def _is_stale(job: Dict[str, Any]) -> bool:
+    """Waiting or running, but its worker stopped sending heartbeats."""
+    if job.get("status") not in ACTIVE_STATUSES:
+        return False
+    heartbeat = job.get("heartbeat_at") or job.get("created_at")
+    if not heartbeat:
+        return True
+    if isinstance(heartbeat, str):
+        heartbeat = datetime.fromisoformat(heartbeat)
+    return now_tashkent() - heartbeat > timedelta(seconds=JOB_STALE_SECONDS)
+
+
+async def _fail_stale(job: Dict[str, Any]) -> None:
+    logger.warning(f"Job {job.get('kind')} {job['id']} lost its worker, marking it failed")
+    await update_job(
+        job, status="failed", error="The worker running this job stopped", finished_at=now_tashkent()
+    )
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Current state of a job, or None if unknown or expired."""
+    if job_id in _local_jobs:
+        return _local_jobs[job_id]
+    try:
+        redis = await get_redis()
+        cached = await redis.get(f"{JOB_PREFIX}{job_id}")
+    except Exception as e:
+        logger.debug(f"Job store unavailable: {e}")
+        return None
+    if not cached:
+        return None
+    job = json.loads(cached)
+    if _is_stale(job):
+        await _fail_stale(job)
+    return job
+
+
+async def fail_stale_jobs() -> int:
+    """
+    Mark jobs left waiting or running by a dead worker as failed.
+    Called at startup; jobs of live workers keep fresh heartbeats.
+    Returns the number of jobs marked failed.
+    """
+    failed = 0
+    try:
+        redis = await get_redis()
+        async for key in redis.scan_iter(match=f"{JOB_PREFIX}*", count=500):
+            cached = await redis.get(key)
+            if not cached:
+                continue
+            job = json.loads(cached)
+            if _is_stale(job):
+                await _fail_stale(job)
+                failed += 1
+    except Exception as e:
+        logger.debug(f"Job store unavailable, no stale jobs to fail: {e}")
+    return failed
+
+
+async def create_job(kind: str, owner_id: Optional[int] = None, **meta: Any) -> Dict[str, Any]:
+    """Register a queued job and return its state."""
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "owner_id": owner_id,
+        "status": "queued",
+        "processed": 0,
+        "total": None,
+        "result": None,
+        "error": None,
+        "created_at": now_tashkent(),
+        "heartbeat_at": now_tashkent(),
+        "finished_at": None,
+        **meta,
+    }
+    await _save(job)
+    return job
+
+
+async def update_job(job: Dict[str, Any], **fields: Any) -> None:
+    job.update(fields)
+    await _save(job)
+
+
+async def _stop(task: asyncio.Task) -> None:
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def start_job(job: Dict[str, Any], work: Callable[[Dict[str, Any]], Awaitable[Any]]) -> None:
+    """
+    Run work(job) in the background. The coroutine may call update_job()
+    to report progress; its return value becomes the job result.
+    """
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            await update_job(job, heartbeat_at=now_tashkent())
+
+    async def runner():
+        await update_job(job, status="running", heartbeat_at=now_tashkent())
+        beat = asyncio.create_task(heartbeat())
+        error = None
+        try:
+            result = await work(job)
+        except Exception as e:
+            logger.exception(f"Job {job['kind']} {job['id']} failed")
+            error = e
+        finally:
+            await _stop(beat)
+        if error is not None:
+            await update_job(job, status="failed", error=str(error), finished_at=now_tashkent())
+            return
+        await update_job(job, status="completed", result=result, finished_at=now_tashkent())
+
+    task = asyncio.create_task(runner(), name=f"job-{job['kind']}-{job['id']}")
+    _running.add(task)
+    task.add_done_callback(_running.discard)
@@ -0,0 +1,92 @@
+"""
+UniControl - Password Hasher
+============================
+Async facade over bcrypt that keeps hashing off the event loop.
+
+bcrypt is deliberately slow (~100-300ms per call at cost 12) and releases
+the GIL while it works, so calls are run on a small dedicated thread pool
+instead of inside request handlers. The number of calls waiting for or
+running on the pool is tracked; when it reaches PASSWORD_HASH_MAX_PENDING
+new calls are rejected with 503 rather than queueing without bound.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.security import get_password_hash, verify_password
+
+
+class PasswordHasher:
+    """bcrypt hash/verify on a bounded worker pool."""
+
+    def __init__(self, workers: int = 4, max_pending: int = 256):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            if self.rejected % 100 == 1:
+                logger.warning(f"Password hasher saturated ({self.pending} pending), rejecting")
+            raise ServiceUnavailableException("Server band. Birozdan so'ng qayta urinib ko'ring.")
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured cost factor."""
+        hashed = await self._run(get_password_hash, password)
+        self.hashed += 1
+        return hashed
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Check a plain password against a stored bcrypt hash."""
+        ok = await self._run(verify_password, password, hashed_password)
+        self.verified += 1
+        return ok
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
@@ -4,78 +4,294 @@ UniControl - Rate Limiter Middleware
 Redis-based rate limiting to prevent abuse.
 Uses pure ASGI middleware to avoid BaseHTTPMiddleware issues.
 
+Limits are GCRA (generic cell rate algorithm) sliding windows evaluated by
+one Lua script per request (EVALSHA): every applicable limit is checked
+and, if all pass, recorded atomically in a single round trip that
+returns allowed / remaining / reset.
+
+Which limits apply comes from two policy tables:
+    * ROUTE_POLICIES - per-route rules (stricter login, exempt bulk imports)
+    * principal policies - the caller: bot (X-Bot-Token), user (per role)
+      or anonymous IP
+
+When Redis is unavailable an in-process token bucket enforces the same
+policies per worker.
+
 Author: UniControl Team
-Version: 1.1.0
+Version: 1.2.0
 """
 
+import hmac
+import ipaddress
 import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
 from starlette.types import ASGIApp, Receive, Scope, Send
 from loguru import logger
 
 from app.config import settings
 from app.database import get_redis
+from app.core.security import get_request_token_payload
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """`limit` requests per `window` seconds (bursts up to `limit`)."""
+    name: str
+    limit: int
+    window: int = 60
+
+
+# (method or None for any, regex on the path without /api[/v1|/mobile], policy)
+# policy None means the route is exempt from rate limiting.
+ROUTE_POLICIES: List[Tuple[Optional[str], "re.Pattern", Optional[RatePolicy]]] = [
+    (None, re.compile(r"^/(health|docs|redoc|openapi\.json)$"), None),
+    ("POST", re.compile(r"^/auth/login$"), RatePolicy("login", settings.RATE_LIMIT_LOGIN_PER_MINUTE)),
+    ("POST", re.compile(r"^/auth/refresh$"), RatePolicy("refresh", settings.RATE_LIMIT_LOGIN_PER_MINUTE * 3)),
+    # Bulk imports / exports are long-running single requests
+    ("POST", re.compile(r"/import(/[a-z_]+)?$"), None),
+    (None, re.compile(r"^/contracts/(import|export)"), None),
+]
+
+# Per-user limits by role (requests per minute); others use RATE_LIMIT_PER_MINUTE
+ROLE_LIMITS: Dict[str, int] = {
+    "superadmin": settings.RATE_LIMIT_STAFF_PER_MINUTE,
+    "admin": settings.RATE_LIMIT_STAFF_PER_MINUTE,
+    "academic_affairs": settings.RATE_LIMIT_STAFF_PER_MINUTE,
+    "registrar_office": settings.RATE_LIMIT_STAFF_PER_MINUTE,
+    "dean": settings.RATE_LIMIT_STAFF_PER_MINUTE,
+}
+
+BOT_POLICY = RatePolicy("bot", settings.RATE_LIMIT_BOT_PER_MINUTE)
+IP_POLICY = RatePolicy("ip", settings.RATE_LIMIT_PER_MINUTE)
+
+_API_PREFIXES = ("/api/v1/", "/api/mobile/", "/api/")
+
+# KEYS: one per limit. ARGV: (emission interval ms, window ms) per key.
+# Returns {allowed, remaining, reset_ms, retry_after_ms, denied_index}.
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local new_tats = {}
+local remaining = -1
+local reset = 0
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[i * 2 - 1])
+    local window = tonumber(ARGV[i * 2])
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + interval
+    local allow_at = new_tat - window
+    if now < allow_at then
+        return {0, 0, new_tat - interval - now, allow_at - now, i}
+    end
+    new_tats[i] = new_tat
+    local left = math.floor((window - (new_tat - now)) / interval)
+    if remaining < 0 or left < remaining then remaining = left end
+    if new_tat - now > reset then reset = new_tat - now end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, new_tats[i], 'PX', new_tats[i] - now)
+end
+return {1, remaining, reset, 0, 0}
+"""
+
+
+def _normalize_path(path: str) -> str:
+    for prefix in _API_PREFIXES:
+        if path.startswith(prefix):
+            return path[len(prefix) - 1:]
+    return path
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+_TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in settings.TRUSTED_PROXIES.split(",") if entry.strip()
+]
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _TRUSTED_PROXIES)
+
+
+def _client_ip(scope: Scope) -> str:
+    """
+    The socket peer, or the X-Real-IP it sends when it is one of
+    TRUSTED_PROXIES (nginx sets the header to its own peer address).
+    Anyone else could send any X-Real-IP and get a fresh limit.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else None
+    if peer and _is_trusted_proxy(peer):
+        real_ip = (_header(scope, b"x-real-ip") or "").strip()
+        try:
+            return str(ipaddress.ip_address(real_ip))
+        except ValueError:
+            pass
+    return peer or "unknown"
+
+
+def resolve_limits(scope: Scope) -> Optional[List[Tuple[str, RatePolicy]]]:
+    """
+    (key, policy) pairs that apply to the request, or None if exempt.
+    """
+    path = _normalize_path(scope.get("path", ""))
+    method = scope.get("method", "GET")
+    client_ip = _client_ip(scope)
+
+    limits: List[Tuple[str, RatePolicy]] = []
+    for rule_method, pattern, policy in ROUTE_POLICIES:
+        if (rule_method is None or rule_method == method) and pattern.search(path):
+            if policy is None:
+                return None
+            limits.append((f"rate_limit:{policy.name}:{client_ip}", policy))
+            break
+
+    bot_token = _header(scope, b"x-bot-token")
+    if bot_token and settings.TELEGRAM_BOT_TOKEN and hmac.compare_digest(
+        bot_token, settings.TELEGRAM_BOT_TOKEN
+    ):
+        limits.append(("rate_limit:bot", BOT_POLICY))
+        return limits
+
+    payload = get_request_token_payload(scope)
+    if payload and payload.get("sub"):
+        role = payload.get("role") or ""
+        policy = RatePolicy(f"user:{role}", ROLE_LIMITS.get(role, settings.RATE_LIMIT_PER_MINUTE))
+        limits.append((f"rate_limit:user:{payload['sub']}", policy))
+    else:
+        limits.append((f"rate_limit:ip:{client_ip}", IP_POLICY))
+    return limits
+
+
+class LocalTokenBucket:
+    """In-process fallback limiter used while Redis is unreachable."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def check(self, limits: List[Tuple[str, RatePolicy]]) -> Tuple[bool, int, float]:
+        """Returns (allowed, remaining, seconds until a token is available)."""
+        now = time.monotonic()
+        states = []
+        for key, policy in limits:
+            rate = policy.limit / policy.window
+            tokens, last = self._buckets.get(key, (float(policy.limit), now))
+            tokens = min(float(policy.limit), tokens + (now - last) * rate)
+            if tokens < 1:
+                return False, 0, (1 - tokens) / rate
+            states.append((key, tokens - 1))
+        for key, tokens in states:
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return True, int(min(t for _, t in states)), 0.0
 
 
 class RateLimitMiddleware:
     """
-    Pure ASGI Redis-based rate limiter.
-    Uses a sliding window counter per IP address.
+    Pure ASGI rate limiter: one EVALSHA per request, local fallback when
+    Redis is down.
     """
 
+    # Seconds to stay on the local fallback after a Redis error
+    REDIS_RETRY_AFTER = 5
+
     def __init__(self, app: ASGIApp):
         self.app = app
+        self._script = None
+        self._local = LocalTokenBucket()
+        self._redis_down_until = 0.0
+
+    async def _check_redis(self, limits: List[Tuple[str, RatePolicy]]) -> Tuple[bool, int, int, int]:
+        if self._script is None:
+            redis = await get_redis()
+            self._script = redis.register_script(_GCRA_SCRIPT)
+        args = []
+        for _, policy in limits:
+            window_ms = policy.window * 1000
+            args += [-(-window_ms // policy.limit), window_ms]
+        allowed, remaining, reset_ms, retry_ms, _ = await self._script(
+            keys=[key for key, _ in limits], args=args
+        )
+        return bool(allowed), int(remaining), int(reset_ms), int(retry_ms)
+
+    async def _check(self, limits: List[Tuple[str, RatePolicy]]) -> Tuple[bool, int, int, int]:
+        """(allowed, remaining, reset seconds, retry-after seconds)."""
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                allowed, remaining, reset_ms, retry_ms = await self._check_redis(limits)
+                return allowed, remaining, -(-reset_ms // 1000), -(-retry_ms // 1000)
+            except Exception as e:
+                logger.warning(f"Rate limiter Redis error, using local fallback: {e}")
+                self._script = None
+                self._redis_down_until = time.monotonic() + self.REDIS_RETRY_AFTER
+
+        allowed, remaining, wait = self._local.check(limits)
+        retry_after = int(wait) + 1 if not allowed else 0
+        return allowed, remaining, retry_after, retry_after
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
-        if scope["type"] != "http":
+        if scope["type"] != "http" or scope.get("method") == "OPTIONS":
             await self.app(scope, receive, send)
             return
 
-        path = scope.get("path", "")
-
-        # Skip rate limiting for health checks, docs
-        if path in ("/health", "/docs", "/redoc", "/openapi.json"):
+        limits = resolve_limits(scope)
+        if limits is None:
             await self.app(scope, receive, send)
             return
 
-        # Skip rate limiting for file upload/export endpoints
-        skip_paths = ("/api/v1/contracts/import", "/api/v1/contracts/export")
-        if any(path.startswith(sp) for sp in skip_paths):
-            await self.app(scope, receive, send)
+        allowed, remaining, reset, retry_after = await self._check(limits)
+        limit = min(policy.limit for _, policy in limits)
+
+        if not allowed:
+            logger.warning(
+                f"Rate limit exceeded: {', '.join(key for key, _ in limits)}"
+            )
+            body = json.dumps({
+                "detail": "So'rovlar limiti oshib ketdi. Biroz kutib turing.",
+                "retry_after": retry_after,
+            }).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    [b"content-type", b"application/json"],
+                    [b"retry-after", str(retry_after).encode()],
+                    [b"x-ratelimit-limit", str(limit).encode()],
+                    [b"x-ratelimit-remaining", b"0"],
+                ],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": body,
+            })
             return
 
-        client = scope.get("client")
-        client_ip = client[0] if client else "unknown"
-        key = f"rate_limit:{client_ip}"
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append([b"x-ratelimit-limit", str(limit).encode()])
+                headers.append([b"x-ratelimit-remaining", str(remaining).encode()])
+                headers.append([b"x-ratelimit-reset", str(reset).encode()])
+                message["headers"] = headers
+            await send(message)
 
-        try:
-            redis = await get_redis()
-            current = await redis.incr(key)
-            if current == 1:
-                await redis.expire(key, 60)
-
-            if current > settings.RATE_LIMIT_PER_MINUTE:
-                ttl = await redis.ttl(key)
-                logger.warning(
-                    f"Rate limit exceeded for {client_ip}: {current} requests/min"
-                )
-                body = json.dumps({
-                    "detail": "So'rovlar limiti oshib ketdi. Biroz kutib turing.",
-                    "retry_after": ttl,
-                }).encode("utf-8")
-                await send({
-                    "type": "http.response.start",
-                    "status": 429,
-                    "headers": [
-                        [b"content-type", b"application/json"],
-                        [b"retry-after", str(ttl).encode()],
-                    ],
-                })
-                await send({
-                    "type": "http.response.body",
-                    "body": body,
-                })
-                return
-        except Exception as e:
-            logger.debug(f"Rate limiter Redis error (allowing request): {e}")
-
-        await self.app(scope, receive, send)
+        await self.app(scope, receive, send_wrapper)
@@ -8,7 +8,7 @@ Version: 1.0.0
 """
 
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Union
+from typing import Any, MutableMapping, Optional, Union
 import jwt
 import bcrypt
 
@@ -34,7 +34,10 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using bcrypt with the configured cost factor.
+    
+    Blocks for the duration of the hash; request handlers should go
+    through app.core.password_hasher instead.
     
     Args:
         password: The plain text password to hash
@@ -44,14 +47,31 @@ def get_password_hash(password: str) -> str:
     """
     return bcrypt.hashpw(
         password.encode('utf-8'), 
-        bcrypt.gensalt()
+        bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     ).decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a stored hash was made with a different cost factor.
+    
+    Args:
+        hashed_password: A bcrypt hash ($2b$<cost>$...)
+        
+    Returns:
+        True if the hash should be recomputed with BCRYPT_ROUNDS
+    """
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return True
+
+
 def create_access_token(
     subject: Union[str, int],
     role: str,
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    token_version: int = 0
 ) -> str:
     """
     Create a JWT access token.
@@ -60,6 +80,7 @@ def create_access_token(
         subject: The subject (usually user ID)
         role: User role
         expires_delta: Optional custom expiration time
+        token_version: The user's current token_version (revocation counter)
         
     Returns:
         The encoded JWT token
@@ -74,6 +95,7 @@ def create_access_token(
     to_encode = {
         "sub": str(subject),
         "role": role,
+        "tv": token_version,
         "exp": expire,
         "iat": datetime.now(timezone.utc),
         "type": "access"
@@ -156,6 +178,38 @@ def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
         return None
 
 
+_PAYLOAD_STATE_KEY = "token_payload"
+
+
+def get_request_token_payload(scope: MutableMapping[str, Any]) -> Optional[dict]:
+    """
+    Decode the request's Bearer access token once per request.
+    
+    The payload (or None) is memoized in the ASGI scope state, which is
+    what request.state reads, so middleware and dependencies share it.
+    
+    Args:
+        scope: The ASGI scope (or request.scope)
+        
+    Returns:
+        The decoded access token payload or None
+    """
+    state = scope.setdefault("state", {})
+    if _PAYLOAD_STATE_KEY in state:
+        return state[_PAYLOAD_STATE_KEY]
+    
+    payload = None
+    for key, value in scope.get("headers", []):
+        if key.lower() == b"authorization":
+            auth_header = value.decode("latin-1")
+            if auth_header[:7].lower() == "bearer ":
+                payload = verify_token(auth_header[7:].strip())
+            break
+    
+    state[_PAYLOAD_STATE_KEY] = payload
+    return payload
+
+
 def generate_password_reset_token(email: str) -> str:
     """
     Generate a password reset token.
@@ -78,6 +78,30 @@ async_session_maker = async_sessionmaker(
 )
 
 
+# Attendance records that share a student, date and lesson with a later
+# updated one (the latest updated_at of each set is kept, then the highest id)
+ATTENDANCE_DUPLICATES_SQL = """
+    SELECT id, student_id, date, lesson_number, status, kept_id
+    FROM (
+        SELECT a.id, a.student_id, a.date, a.lesson_number, a.status,
+               FIRST_VALUE(a.id) OVER latest AS kept_id,
+               ROW_NUMBER() OVER latest AS position
+        FROM attendances a
+        WINDOW latest AS (
+            PARTITION BY a.student_id, a.date, a.lesson_number
+            ORDER BY a.updated_at DESC, a.id DESC
+        )
+    ) ranked
+    WHERE position > 1
+    ORDER BY student_id, date, lesson_number, id
+"""
+ATTENDANCE_DUPLICATES_COUNT_SQL = f"SELECT COUNT(*) FROM ({ATTENDANCE_DUPLICATES_SQL}) AS duplicates"
+ATTENDANCE_UNIQUE_CONSTRAINT_SQL = """
+    ALTER TABLE attendances ADD CONSTRAINT uq_attendance_student_date_lesson
+    UNIQUE NULLS NOT DISTINCT (student_id, date, lesson_number)
+"""
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency that provides a database session.
@@ -146,6 +170,14 @@ async def init_db() -> None:
                 ON students (group_id, is_active)
             """)
         )
+        # Birthday lookups match on (month, day) of birth_date
+        await conn.execute(
+            sa.text("""
+                CREATE INDEX IF NOT EXISTS ix_students_birth_month_day
+                ON students ((EXTRACT(MONTH FROM birth_date)), (EXTRACT(DAY FROM birth_date)))
+                WHERE birth_date IS NOT NULL
+            """)
+        )
         logger.info("Database indexes ensured")
         
         # Add week_type column to schedules if not exists
@@ -164,6 +196,8 @@ async def init_db() -> None:
         await conn.execute(sa.text("ALTER TABLE users ADD COLUMN IF NOT EXISTS device_tokens JSONB"))
         await conn.execute(sa.text("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_first_login BOOLEAN NOT NULL DEFAULT FALSE"))
         await conn.execute(sa.text("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN NOT NULL DEFAULT FALSE"))
+        await conn.execute(sa.text("ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0"))
+        await conn.execute(sa.text("ALTER TABLE users ADD COLUMN IF NOT EXISTS search_text TEXT"))
         logger.info("Database schema updated (users table columns ensured)")
         
         # Add missing columns to students table
@@ -176,11 +210,13 @@ async def init_db() -> None:
         await conn.execute(sa.text("ALTER TABLE students ADD COLUMN IF NOT EXISTS is_leader BOOLEAN NOT NULL DEFAULT FALSE"))
         await conn.execute(sa.text("ALTER TABLE students ADD COLUMN IF NOT EXISTS mutoola_student_id VARCHAR(100)"))
         await conn.execute(sa.text("ALTER TABLE students ADD COLUMN IF NOT EXISTS extra_data TEXT"))
+        await conn.execute(sa.text("ALTER TABLE students ADD COLUMN IF NOT EXISTS search_text TEXT"))
         logger.info("Database schema updated (students table columns ensured)")
         
         # Add missing columns to groups table
         await conn.execute(sa.text("ALTER TABLE groups ADD COLUMN IF NOT EXISTS contract_amount NUMERIC(12,2) NOT NULL DEFAULT 0"))
         await conn.execute(sa.text("ALTER TABLE groups ADD COLUMN IF NOT EXISTS mutoola_group_id VARCHAR(100)"))
+        await conn.execute(sa.text("ALTER TABLE groups ADD COLUMN IF NOT EXISTS search_text TEXT"))
         logger.info("Database schema updated (groups table columns ensured)")
         
         # Add missing columns to attendances table
@@ -202,8 +238,42 @@ async def init_db() -> None:
         await conn.execute(sa.text("ALTER TABLE schedules ADD COLUMN IF NOT EXISTS color VARCHAR(20)"))
         logger.info("Database schema updated (schedules table columns ensured)")
         
+        # Broadcasts sent before the lazy fan-out already have per-user
+        # notification copies: the column's first default marks them all,
+        # later rows are joined into feeds
+        await conn.execute(sa.text(
+            "ALTER TABLE broadcast_notifications ADD COLUMN IF NOT EXISTS fanned_out BOOLEAN NOT NULL DEFAULT TRUE"
+        ))
+        await conn.execute(sa.text("ALTER TABLE broadcast_notifications ALTER COLUMN fanned_out SET DEFAULT FALSE"))
+        logger.info("Database schema updated (broadcast_notifications columns ensured)")
+        
+        # Content hash of uploaded files (content-addressed storage)
+        await conn.execute(sa.text("ALTER TABLE files ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)"))
+        await conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_files_sha256 ON files (sha256)"))
+        logger.info("Database schema updated (files table columns ensured)")
+        
         logger.info("Database schema updated (all table columns ensured)")
 
+    # One attendance per student, date and lesson (target of ON CONFLICT upserts).
+    # Startup never deletes attendance: duplicates left from before the
+    # constraint are removed by the deploy step `python -m
+    # scripts.dedupe_attendance --apply` (run by docker-entrypoint.sh and
+    # run.sh before the server starts); while any remain, startup fails.
+    async with engine.begin() as conn:
+        exists = await conn.scalar(sa.text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_attendance_student_date_lesson'"
+        ))
+        if not exists:
+            duplicates = await conn.scalar(sa.text(ATTENDANCE_DUPLICATES_COUNT_SQL))
+            if duplicates:
+                raise RuntimeError(
+                    f"{duplicates} duplicate attendance records block the "
+                    "uq_attendance_student_date_lesson constraint; remove them "
+                    "with `python -m scripts.dedupe_attendance --apply`"
+                )
+            await conn.execute(sa.text(ATTENDANCE_UNIQUE_CONSTRAINT_SQL))
+            logger.info("Attendance unique constraint added")
+
     # Add missing user roles to enum - MUST run outside transaction
     # ALTER TYPE ... ADD VALUE cannot run inside a transaction block in PostgreSQL
     # Use direct asyncpg connection (not through SQLAlchemy) to avoid auto-transaction
@@ -238,6 +308,30 @@ async def init_db() -> None:
         logger.error(f"Failed to update user_role enum: {e}")
     
     logger.info("Database schema updated (all user roles ensured)")
+    
+    # Activity log partitions, retention, counters and search index
+    if not settings.DATABASE_URL.startswith("sqlite"):
+        from app.services.activity_log_service import setup_activity_log_storage
+        try:
+            await setup_activity_log_storage()
+        except Exception as e:
+            logger.error(f"Failed to set up activity log partitions: {e}")
+    
+    # Search text for rows written before it existed, and its trigram indexes
+    from app.services.search_service import setup_search_index
+    try:
+        await setup_search_index()
+    except Exception as e:
+        logger.error(f"Failed to set up search index: {e}")
+    
+    # Backfill the attendance rollup the first time it is deployed
+    from app.services.attendance_rollup_service import AttendanceRollupService
+    try:
+        async with async_session_maker() as session:
+            if await AttendanceRollupService(session).rebuild_if_empty():
+                logger.info("Attendance daily rollup backfilled from attendances")
+    except Exception as e:
+        logger.error(f"Failed to backfill attendance rollup: {e}")
 
 
 async def close_db() -> None:
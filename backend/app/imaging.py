@@ -0,0 +1,68 @@
+"""
+UniControl - Image Previews
+===========================
+WebP previews of uploaded images, rendered in worker processes.
+
+This module is what a preview worker process imports, so it depends on
+Pillow and the standard library only: importing app.services or app.core
+would load the whole application into every worker.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import os
+from typing import Dict
+
+from PIL import Image, ImageOps
+
+
+# Longest side in pixels of each preview size (?size= on downloads)
+PREVIEW_SIZES = {"sm": 160, "md": 480, "lg": 1024}
+PREVIEW_QUALITY = 80
+
+# Raster formats Pillow reads; SVG and the rest have no preview
+PREVIEW_MIME_TYPES = frozenset({
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/bmp",
+    "image/x-ms-bmp",
+})
+
+
+def render_previews(source: str, targets: Dict[str, str]) -> Dict[str, int]:
+    """
+    Render the previews named in `targets` ({size: output path}) from one
+    decode of `source`, largest first, each resized from the one before.
+    Returns the size in bytes of each preview written.
+
+    Raises:
+        OSError / PIL errors: the source is not a readable image, or it is
+            a decompression bomb
+    """
+    sizes = sorted(targets, key=lambda name: PREVIEW_SIZES[name], reverse=True)
+    largest = PREVIEW_SIZES[sizes[0]]
+    written = {}
+    with Image.open(source) as image:
+        # JPEG: decode at 1/2, 1/4 or 1/8 scale when that is still large enough
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        for name in sizes:
+            edge = PREVIEW_SIZES[name]
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            target = targets[name]
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp = f"{target}.{os.getpid()}.tmp"
+            try:
+                image.save(temp, "WEBP", quality=PREVIEW_QUALITY, method=4)
+                os.replace(temp, target)
+            except BaseException:
+                if os.path.exists(temp):
+                    os.unlink(temp)
+                raise
+            written[name] = os.path.getsize(target)
+    return written
@@ -8,6 +8,7 @@ Version: 1.0.1
 Updated: 2026-01-29
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -22,6 +23,22 @@ from app.database import init_db, close_db
 from app.core.exceptions import APIException
 from app.core.rate_limiter import RateLimitMiddleware
 from app.core.activity_middleware import ActivityLoggingMiddleware
+from app.core.activity_log_writer import activity_log_writer
+from app.core.password_hasher import password_hasher
+from app.core.jobs import fail_stale_jobs
+from app.services.activity_log_service import activity_log_maintenance_loop
+from app.services.birthday_service import birthday_precompute_loop
+from app.services.attendance_events import attendance_event_relay_loop, register_attendance_outbox
+from app.services.notification_counters import register_notification_counters
+from app.services.notification_service import unread_counter_reconcile_loop
+from app.services.file_storage import file_blob_reconcile_loop
+from app.services.attendance_rollup_service import attendance_rollup_reconcile_loop
+from app.services.file_previews import preview_renderer
+from app.services.report_artifacts import report_renderer
+from app.services.schedule_occupancy import register_schedule_occupancy
+from app.services.search_service import register_search_index
+from app.core.cache import register_cache_invalidation
+from app.core.auth_cache import register_user_cache_invalidation
 from app.api.v1 import api_router as api_v1_router
 from app.api.mobile import mobile_router
 
@@ -61,10 +78,39 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized successfully")
     
+    # Jobs left behind by a worker that died mid-run will never finish
+    stale_jobs = await fail_stale_jobs()
+    if stale_jobs:
+        logger.warning(f"Marked {stale_jobs} interrupted background jobs as failed")
+    
+    # Start the batched activity log writer and partition maintenance
+    activity_log_writer.start()
+    maintenance_task = asyncio.create_task(activity_log_maintenance_loop())
+    birthday_task = asyncio.create_task(birthday_precompute_loop())
+    counters_task = asyncio.create_task(unread_counter_reconcile_loop())
+    blobs_task = asyncio.create_task(file_blob_reconcile_loop())
+    rollup_task = asyncio.create_task(attendance_rollup_reconcile_loop())
+    # Publish attendance changes to the bot's Redis stream
+    relay_task = (
+        asyncio.create_task(attendance_event_relay_loop())
+        if settings.ATTENDANCE_EVENTS_ENABLED else None
+    )
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    maintenance_task.cancel()
+    birthday_task.cancel()
+    counters_task.cancel()
+    blobs_task.cancel()
+    rollup_task.cancel()
+    if relay_task:
+        relay_task.cancel()
+    await activity_log_writer.stop()
+    password_hasher.shutdown()
+    preview_renderer.shutdown()
+    report_renderer.shutdown()
     await close_db()
     logger.info("Database connections closed")
 
@@ -96,6 +142,19 @@ def create_application() -> FastAPI:
         lifespan=lifespan
     )
     
+    # Bump response-cache versions after commits that touch watched tables
+    register_cache_invalidation()
+    # Drop authenticated-user snapshots after commits that change users
+    register_user_cache_invalidation()
+    # Write attendance change events to the outbox in the same transaction
+    register_attendance_outbox()
+    # Keep unread notification counters in step with notification writes
+    register_notification_counters()
+    # Fill search_text on student, user and group writes
+    register_search_index()
+    # Apply schedule writes to the process's room/teacher/group occupancy
+    register_schedule_occupancy()
+    
     # ====================
     # MIDDLEWARE
     # ====================
@@ -202,7 +261,11 @@ def create_application() -> FastAPI:
             "status": "healthy",
             "app": settings.APP_NAME,
             "version": settings.APP_VERSION,
-            "environment": settings.ENVIRONMENT
+            "environment": settings.ENVIRONMENT,
+            "activity_log": activity_log_writer.stats(),
+            "password_hasher": password_hasher.stats(),
+            "previews": preview_renderer.stats(),
+            "reports": report_renderer.stats(),
         }
     
     # API v1 routes (Web)
@@ -11,11 +11,15 @@ Version: 1.0.0
 from app.models.user import User, UserRole
 from app.models.group import Group
 from app.models.student import Student
-from app.models.attendance import Attendance, AttendanceStatus
+from app.models.attendance import (
+    Attendance, AttendanceStatus, AttendanceDailyStat, AttendanceDailyStudents, AttendanceEvent,
+)
 from app.models.schedule import Schedule, WeekDay, ScheduleType
 from app.models.notification import (
     Notification,
     BroadcastNotification,
+    BroadcastNotificationReceipt,
+    NotificationCounter,
     NotificationType,
     NotificationPriority,
 )
@@ -27,9 +31,9 @@ from app.models.mutoola import (
     SyncStatus,
     SyncDirection,
 )
-from app.models.activity_log import ActivityLog, ActivityAction
+from app.models.activity_log import ActivityLog, ActivityAction, ActivityLogCounter
 from app.models.teacher_workload import TeacherWorkload
-from app.models.file import File, Folder, FileType
+from app.models.file import File, FileBlob, Folder, FileType
 from app.models.library import (
     Book,
     BookBorrow,
@@ -79,6 +83,7 @@ from app.models.subscription import (
 )
 from app.models.landing import LandingSettings
 from app.models.ai_usage import AIUsage
+from app.models.ai_cache import AIResultCache
 from app.models.holiday import Holiday, HolidayType
 from app.models.system_settings import SystemSettings
 from app.models.room import Room
@@ -96,6 +101,9 @@ __all__ = [
     # Attendance
     "Attendance",
     "AttendanceStatus",
+    "AttendanceDailyStat",
+    "AttendanceDailyStudents",
+    "AttendanceEvent",
     # Schedule
     "Schedule",
     "WeekDay",
@@ -103,6 +111,8 @@ __all__ = [
     # Notification
     "Notification",
     "BroadcastNotification",
+    "BroadcastNotificationReceipt",
+    "NotificationCounter",
     "NotificationType",
     "NotificationPriority",
     # Report
@@ -119,8 +129,10 @@ __all__ = [
     # Activity Log
     "ActivityLog",
     "ActivityAction",
+    "ActivityLogCounter",
     # File Management
     "File",
+    "FileBlob",
     "Folder",
     "FileType",
     # Library
@@ -181,6 +193,7 @@ __all__ = [
     "LandingSettings",
     # AI Usage
     "AIUsage",
+    "AIResultCache",
     # Holiday
     "Holiday",
     "HolidayType",
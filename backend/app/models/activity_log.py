@@ -7,10 +7,10 @@ Author: UniControl Team
 Version: 1.0.0
 """
 
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Enum as SAEnum
+from sqlalchemy import String, Integer, BigInteger, Date, DateTime, ForeignKey, Text, Enum as SAEnum, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.config import TASHKENT_TZ
@@ -64,6 +64,10 @@ class ActivityLog(Base):
     Activity log model.
     
     Tracks all user activities for audit purposes.
+    
+    On PostgreSQL the table is range-partitioned by month on created_at
+    (primary key (id, created_at)); partitions are created and dropped by
+    ActivityLogService. The ORM keeps id as the identity.
     """
     
     __tablename__ = "activity_logs"
@@ -162,3 +166,41 @@ class ActivityLog(Base):
     def user_name(self) -> Optional[str]:
         """Get user name."""
         return self.user.name if self.user else None
+
+
+class ActivityLogCounter(Base):
+    """
+    Pre-aggregated activity log counts.
+    
+    One row per (day, action), maintained by every activity_logs writer
+    so log statistics never scan the log table. Days are Tashkent dates.
+    """
+    
+    __tablename__ = "activity_log_counters"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    
+    day: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        index=True,
+        comment="Log date (Tashkent time)"
+    )
+    action: Mapped[ActivityAction] = mapped_column(
+        SAEnum(ActivityAction),
+        nullable=False,
+        comment="Action type"
+    )
+    count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+        comment="Number of log rows"
+    )
+    
+    __table_args__ = (
+        UniqueConstraint("day", "action", name="uq_activity_log_counters_day_action"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<ActivityLogCounter(day={self.day}, action={self.action.value}, count={self.count})>"
@@ -0,0 +1,55 @@
+"""
+UniControl - AI Result Cache Model
+==================================
+Persistent cache of AI answers keyed by a hash of their normalized input,
+so repeated questions (the same timetable cell, the same group name) are
+answered without calling the model again.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+from datetime import datetime
+from typing import Any
+from sqlalchemy import Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.config import TASHKENT_TZ
+from app.database import Base
+
+
+class AIResultCache(Base):
+    """
+    One cached AI answer.
+
+    kind separates the question types (e.g. "schedule_cell",
+    "group_match"); key_hash is the SHA-256 of the normalized input.
+    tokens is the model's token cost attributed to this answer, used to
+    report tokens saved on later hits.
+    """
+
+    __tablename__ = "ai_result_cache"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    key_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    result: Mapped[Any] = mapped_column(JSON, nullable=False)
+    tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    hit_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(TASHKENT_TZ),
+        nullable=False
+    )
+    last_used_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(TASHKENT_TZ),
+        nullable=False
+    )
+
+    __table_args__ = (
+        UniqueConstraint("kind", "key_hash", name="uq_ai_result_cache_kind_key"),
+    )
@@ -1,7 +1,8 @@
 """
 UniControl - Attendance Model
 =============================
-Attendance tracking model for students.
+Attendance tracking model for students and the daily per-group rollup
+used by dashboards.
 
 Author: UniControl Team
 Version: 1.0.0
@@ -11,7 +12,7 @@ from datetime import datetime, date, time
 from enum import Enum
 from typing import Optional, TYPE_CHECKING
 import sqlalchemy as sa
-from sqlalchemy import String, Integer, DateTime, Date, Time, ForeignKey, Text, Boolean, Enum as SAEnum
+from sqlalchemy import String, Integer, BigInteger, DateTime, Date, Time, ForeignKey, Text, Boolean, Enum as SAEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.config import TASHKENT_TZ
@@ -160,6 +161,12 @@ class Attendance(Base):
     __table_args__ = (
         sa.Index("ix_attendance_date_status", "date", "status"),
         sa.Index("ix_attendance_student_date", "student_id", "date"),
+        # One record per student, date and lesson; a NULL lesson is the whole day
+        sa.UniqueConstraint(
+            "student_id", "date", "lesson_number",
+            name="uq_attendance_student_date_lesson",
+            postgresql_nulls_not_distinct=True,
+        ),
         {"sqlite_autoincrement": True},
     )
     
@@ -192,3 +199,143 @@ class Attendance(Base):
     def is_excused(self) -> bool:
         """Check if absence was excused."""
         return self.status == AttendanceStatus.EXCUSED
+
+
+class AttendanceDailyStat(Base):
+    """
+    Pre-aggregated attendance counts.
+    
+    One row per (group, date, status) holding the number of attendance
+    records. Maintained incrementally by AttendanceService and rebuilt
+    from the attendances table by AttendanceRollupService.rebuild().
+    Dashboards read from here instead of scanning attendances.
+    """
+    
+    __tablename__ = "attendance_daily_stats"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    
+    group_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("groups.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="Group ID (student's group at write time)"
+    )
+    date: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        comment="Attendance date"
+    )
+    status: Mapped[AttendanceStatus] = mapped_column(
+        SAEnum(AttendanceStatus),
+        nullable=False,
+        comment="Attendance status"
+    )
+    count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Number of attendance records"
+    )
+    
+    __table_args__ = (
+        sa.UniqueConstraint("group_id", "date", "status", name="uq_attendance_daily_stats_group_date_status"),
+        sa.Index("ix_attendance_daily_stats_date", "date"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<AttendanceDailyStat(group_id={self.group_id}, date={self.date}, status={self.status.value}, count={self.count})>"
+
+
+class AttendanceDailyStudents(Base):
+    """
+    Distinct students per group and date.
+    
+    A student has a record per lesson, so how many students were marked
+    (or present) on a day cannot be summed from AttendanceDailyStat.
+    AttendanceRollupService recounts the row of every (group, date) it
+    changes, in the same transaction.
+    """
+    
+    __tablename__ = "attendance_daily_students"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    
+    group_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("groups.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="Group ID (student's group at write time)"
+    )
+    date: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        comment="Attendance date"
+    )
+    students: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Students with any attendance record"
+    )
+    present: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Students with a present record"
+    )
+    late: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Students with a late record"
+    )
+    
+    __table_args__ = (
+        sa.UniqueConstraint("group_id", "date", name="uq_attendance_daily_students_group_date"),
+        sa.Index("ix_attendance_daily_students_date", "date"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<AttendanceDailyStudents(group_id={self.group_id}, date={self.date}, students={self.students})>"
+
+
+class AttendanceEvent(Base):
+    """
+    Transactional outbox for attendance changes.
+    
+    A row is written in the same transaction as the attendance record it
+    points to (see app.services.attendance_events), then published to the
+    Redis stream the Telegram bot consumes and deleted. Deleting the
+    attendance before it is published drops the event with it.
+    """
+    
+    __tablename__ = "attendance_events"
+    
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    
+    attendance_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("attendances.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="Changed attendance record"
+    )
+    kind: Mapped[str] = mapped_column(
+        String(16),
+        nullable=False,
+        comment="created or updated (status changed)"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(TASHKENT_TZ),
+        nullable=False
+    )
+    
+    attendance: Mapped["Attendance"] = relationship("Attendance", lazy="noload")
+    
+    __table_args__ = (
+        sa.Index("ix_attendance_events_attendance", "attendance_id"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<AttendanceEvent(id={self.id}, attendance_id={self.attendance_id}, kind={self.kind})>"
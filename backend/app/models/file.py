@@ -15,6 +15,7 @@ Version: 1.0.0
 
 from datetime import datetime
 from enum import Enum
+from typing import Optional
 from sqlalchemy import (
     Column, Integer, String, DateTime, ForeignKey, 
     Text, Boolean, BigInteger, Enum as SQLEnum
@@ -23,6 +24,7 @@ from sqlalchemy.orm import relationship, backref
 
 from app.config import TASHKENT_TZ
 from app.database import Base
+from app.imaging import PREVIEW_MIME_TYPES
 
 
 class FileType(str, Enum):
@@ -54,6 +56,8 @@ class File(Base):
         stored_name: UUID-based stored filename (for security)
         path: Full storage path
         size: File size in bytes
+        sha256: Content hash; the content is the blob stored under it
+               (NULL for files uploaded before content-addressed storage)
         file_type: Categorized file type (document, image, etc.)
         mime_type: MIME type string (application/pdf, image/jpeg, etc.)
         folder_id: Optional parent folder reference
@@ -74,6 +78,7 @@ class File(Base):
     stored_name = Column(String(255), nullable=False, unique=True, comment="UUID-based stored name")
     path = Column(String(500), nullable=False, comment="Full storage path")
     size = Column(BigInteger, nullable=False, default=0, comment="File size in bytes")
+    sha256 = Column(String(64), nullable=True, index=True, comment="Content hash (file_blobs key)")
     
     # File type classification
     file_type = Column(
@@ -135,6 +140,38 @@ class File(Base):
             return f"{self.size / (1024 * 1024):.1f} MB"
         else:
             return f"{self.size / (1024 * 1024 * 1024):.1f} GB"
+    
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        """Small WebP preview for images in the content store, else None."""
+        if self.sha256 and self.mime_type in PREVIEW_MIME_TYPES:
+            return f"/api/v1/files/{self.id}/download?size=sm"
+        return None
+
+
+class FileBlob(Base):
+    """
+    Stored content shared by every File with the same SHA-256.
+    
+    The content lives at UPLOAD_DIR/blobs/<sha[:2]>/<sha[2:4]>/<sha> and is
+    removed when ref_count (the number of File rows pointing at it) drops
+    to zero. See app.services.file_storage.
+    
+    Attributes:
+        sha256: Content hash (primary key)
+        size: Content size in bytes
+        ref_count: Number of File rows with this sha256
+        created_at: First upload timestamp
+    """
+    __tablename__ = "file_blobs"
+    
+    sha256 = Column(String(64), primary_key=True, comment="Content hash")
+    size = Column(BigInteger, nullable=False, comment="Content size in bytes")
+    ref_count = Column(Integer, nullable=False, default=0, comment="Files referencing the blob")
+    created_at = Column(DateTime, default=lambda: datetime.now(TASHKENT_TZ).replace(tzinfo=None))
+    
+    def __repr__(self):
+        return f"<FileBlob(sha256='{self.sha256[:12]}', size={self.size}, refs={self.ref_count})>"
 
 
 class Folder(Base):
@@ -100,6 +100,13 @@ class Group(Base):
         comment="KUAF Mutoola group ID for sync"
     )
     
+    # Normalized name/codes/contacts for search (app.services.search_service)
+    search_text: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+        comment="Search document, maintained by the search index hook"
+    )
+    
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
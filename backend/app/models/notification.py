@@ -10,7 +10,7 @@ Version: 1.0.0
 from datetime import datetime
 from enum import Enum
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Boolean, Enum as SAEnum
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Boolean, UniqueConstraint, Enum as SAEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.config import TASHKENT_TZ
@@ -282,6 +282,13 @@ class BroadcastNotification(Base):
         nullable=False,
         comment="Number of notifications sent"
     )
+    fanned_out: Mapped[bool] = mapped_column(
+        Boolean,
+        default=False,
+        server_default="false",
+        nullable=False,
+        comment="Sent as per-user notifications (before the lazy fan-out), not joined into feeds"
+    )
     
     # Schedule
     scheduled_at: Mapped[Optional[datetime]] = mapped_column(
@@ -316,3 +323,88 @@ class BroadcastNotification(Base):
     
     def __repr__(self) -> str:
         return f"<BroadcastNotification(id={self.id}, title='{self.title}')>"
+
+
+class BroadcastNotificationReceipt(Base):
+    """
+    Per-user state of a broadcast notification.
+    
+    Broadcasts are not copied into notifications for every recipient;
+    NotificationService joins them into each user's feed at read time.
+    A receipt is only written when the user reads or deletes one.
+    """
+    
+    __tablename__ = "broadcast_notification_receipts"
+    
+    # Primary key
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    
+    broadcast_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("broadcast_notifications.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="Broadcast notification ID"
+    )
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="Recipient user ID"
+    )
+    
+    read_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="Time when the user read the broadcast"
+    )
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="Time when the user deleted the broadcast from their feed"
+    )
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "broadcast_id", name="uq_broadcast_receipt_user_broadcast"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<BroadcastNotificationReceipt(broadcast_id={self.broadcast_id}, user_id={self.user_id})>"
+
+
+class NotificationCounter(Base):
+    """
+    Maintained unread-notification count of a user (the badge).
+    
+    Kept in step with notifications and broadcast receipts in the same
+    transaction (see app.services.notification_counters) and reconciled
+    periodically, so the badge never counts the notifications table.
+    """
+    
+    __tablename__ = "notification_counters"
+    
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="User ID"
+    )
+    unread: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="Unread notifications, broadcasts included"
+    )
+    broadcasts_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="Broadcasts visible up to this time are included in unread"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(TASHKENT_TZ),
+        onupdate=lambda: datetime.now(TASHKENT_TZ),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<NotificationCounter(user_id={self.user_id}, unread={self.unread})>"
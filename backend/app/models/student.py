@@ -201,6 +201,13 @@ class Student(Base):
         comment="Additional data as JSON"
     )
     
+    # Normalized name/codes/contacts for search (app.services.search_service)
+    search_text: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+        comment="Search document, maintained by the search index hook"
+    )
+    
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -10,7 +10,7 @@ Version: 1.0.0
 
 from datetime import datetime
 from typing import Optional, List, Any
-from sqlalchemy import String, Boolean, DateTime, Enum as SQLEnum, Text
+from sqlalchemy import String, Boolean, DateTime, Enum as SQLEnum, Text, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSON
 import enum
@@ -46,6 +46,7 @@ class User(Base):
         avatar: Avatar URL or path
         is_active: Account status
         is_verified: Email verification status
+        token_version: Bumped on password/role/status change to revoke tokens
         last_login: Last login timestamp
         created_at: Account creation timestamp
         updated_at: Last update timestamp
@@ -123,6 +124,15 @@ class User(Base):
         comment="True if user needs to change password on first login"
     )
     
+    # Access tokens carry this value; a mismatch means the token was revoked
+    token_version: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
+        comment="Bumped on password, role or status change"
+    )
+    
     # Timestamps
     last_login: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True), 
@@ -172,6 +182,13 @@ class User(Base):
         comment="Device tokens for push notifications"
     )
     
+    # Normalized name/codes/contacts for search (app.services.search_service)
+    search_text: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+        comment="Search document, maintained by the search index hook"
+    )
+    
     # Relationships
     # student: Mapped[Optional["Student"]] = relationship(
     #     "Student", 
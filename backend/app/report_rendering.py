@@ -0,0 +1,699 @@
+"""
+UniControl - Report Rendering
+=============================
+PDF (ReportLab), Excel (openpyxl) and CSV layout of reports, rendered in
+worker processes.
+
+The report services collect a report's data as plain values (see
+ReportService.collect); this module only lays it out. It is what a
+report worker process imports, so it depends on the rendering libraries
+and the standard library only.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import csv
+import io
+import os
+from datetime import date, datetime
+from typing import Any, Dict
+
+import pytz
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+# Part of every artifact fingerprint: bump when a layout changes
+RENDERER_VERSION = 1
+# app.config.TASHKENT_TZ, without loading the settings in every worker
+TASHKENT_TZ = pytz.timezone("Asia/Tashkent")
+
+
+class PDFReportRenderer:
+    """Professional PDF report layout for UniControl."""
+
+    # Colors
+    PRIMARY = colors.HexColor("#6D28D9")       # Violet
+    PRIMARY_LIGHT = colors.HexColor("#EDE9FE")  # Light violet
+    HEADER_BG = colors.HexColor("#1E293B")      # Slate-800
+    SUCCESS = colors.HexColor("#059669")         # Emerald
+    WARNING = colors.HexColor("#D97706")         # Amber
+    DANGER = colors.HexColor("#DC2626")          # Red
+    TEXT_DARK = colors.HexColor("#1E293B")
+    TEXT_GRAY = colors.HexColor("#64748B")
+    BORDER = colors.HexColor("#E2E8F0")
+    ROW_ALT = colors.HexColor("#F8FAFC")
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self._setup_styles()
+
+    def _setup_styles(self):
+        """Setup custom paragraph styles."""
+        self.styles.add(ParagraphStyle(
+            name='DocTitle',
+            parent=self.styles['Heading1'],
+            fontSize=22,
+            textColor=self.HEADER_BG,
+            spaceAfter=6,
+            alignment=TA_CENTER,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='DocSubtitle',
+            parent=self.styles['Normal'],
+            fontSize=11,
+            textColor=self.TEXT_GRAY,
+            spaceAfter=20,
+            alignment=TA_CENTER,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='SectionTitle',
+            parent=self.styles['Heading2'],
+            fontSize=14,
+            textColor=self.PRIMARY,
+            spaceBefore=16,
+            spaceAfter=8,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='InfoLabel',
+            parent=self.styles['Normal'],
+            fontSize=9,
+            textColor=self.TEXT_GRAY,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='InfoValue',
+            parent=self.styles['Normal'],
+            fontSize=10,
+            textColor=self.TEXT_DARK,
+            fontName='Helvetica-Bold',
+        ))
+        self.styles.add(ParagraphStyle(
+            name='TableHeader',
+            parent=self.styles['Normal'],
+            fontSize=9,
+            textColor=colors.white,
+            fontName='Helvetica-Bold',
+            alignment=TA_CENTER,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='TableCell',
+            parent=self.styles['Normal'],
+            fontSize=8,
+            textColor=self.TEXT_DARK,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='TableCellCenter',
+            parent=self.styles['Normal'],
+            fontSize=8,
+            textColor=self.TEXT_DARK,
+            alignment=TA_CENTER,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='FooterText',
+            parent=self.styles['Normal'],
+            fontSize=7,
+            textColor=self.TEXT_GRAY,
+            alignment=TA_CENTER,
+        ))
+
+    def _header_footer(self, canvas, doc):
+        """Add header and footer to each page."""
+        canvas.saveState()
+        width, height = A4
+
+        # Header line
+        canvas.setStrokeColor(self.PRIMARY)
+        canvas.setLineWidth(2)
+        canvas.line(20 * mm, height - 15 * mm, width - 20 * mm, height - 15 * mm)
+
+        # Header text
+        canvas.setFont("Helvetica-Bold", 10)
+        canvas.setFillColor(self.HEADER_BG)
+        canvas.drawString(20 * mm, height - 13 * mm, "UniControl")
+
+        canvas.setFont("Helvetica", 7)
+        canvas.setFillColor(self.TEXT_GRAY)
+        canvas.drawRightString(width - 20 * mm, height - 13 * mm, f"Yaratilgan: {doc.generated_at}")
+
+        # Footer
+        canvas.setStrokeColor(self.BORDER)
+        canvas.setLineWidth(0.5)
+        canvas.line(20 * mm, 12 * mm, width - 20 * mm, 12 * mm)
+
+        canvas.setFont("Helvetica", 7)
+        canvas.setFillColor(self.TEXT_GRAY)
+        canvas.drawString(20 * mm, 8 * mm, "UniControl - University Control System")
+        canvas.drawRightString(width - 20 * mm, 8 * mm, f"Sahifa {doc.page}")
+
+        canvas.restoreState()
+
+    def _build_info_table(self, info_pairs: list) -> Table:
+        """Build a styled info key-value table."""
+        data = []
+        for label, value in info_pairs:
+            data.append([
+                Paragraph(label, self.styles['InfoLabel']),
+                Paragraph(str(value) if value else "—", self.styles['InfoValue']),
+            ])
+
+        t = Table(data, colWidths=[55 * mm, 100 * mm])
+        t.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('LINEBELOW', (0, 0), (-1, -1), 0.5, self.BORDER),
+        ]))
+        return t
+
+    def _build_data_table(self, headers: list, rows: list, col_widths=None) -> Table:
+        """Build a professional styled data table."""
+        # Header row
+        header_row = [Paragraph(h, self.styles['TableHeader']) for h in headers]
+
+        # Data rows
+        styled_rows = [header_row]
+        for row in rows:
+            styled_rows.append([
+                Paragraph(str(cell) if cell is not None else "—", self.styles['TableCellCenter'])
+                for cell in row
+            ])
+
+        t = Table(styled_rows, colWidths=col_widths, repeatRows=1)
+
+        style_commands = [
+            # Header
+            ('BACKGROUND', (0, 0), (-1, 0), self.HEADER_BG),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            # Data
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            # Grid
+            ('GRID', (0, 0), (-1, -1), 0.5, self.BORDER),
+            ('LINEBELOW', (0, 0), (-1, 0), 1.5, self.PRIMARY),
+        ]
+
+        # Alternating row colors
+        for i in range(1, len(styled_rows)):
+            if i % 2 == 0:
+                style_commands.append(('BACKGROUND', (0, i), (-1, i), self.ROW_ALT))
+
+        t.setStyle(TableStyle(style_commands))
+        return t
+
+    def _build_summary_cards(self, cards: list) -> Table:
+        """Build summary statistic cards."""
+        data = []
+        for title, value, color in cards:
+            data.append([
+                Paragraph(f'<font size="16" color="{color}"><b>{value}</b></font><br/>'
+                         f'<font size="8" color="#64748B">{title}</font>',
+                         self.styles['TableCellCenter'])
+            ])
+
+        # Horizontal layout
+        row = [d[0] for d in data]
+        t = Table([row], colWidths=[38 * mm] * len(row))
+        t.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOX', (0, 0), (-1, -1), 0.5, self.BORDER),
+            ('INNERGRID', (0, 0), (-1, -1), 0.5, self.BORDER),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ]))
+        return t
+
+    def _build(self, out, elements: list) -> None:
+        doc = SimpleDocTemplate(
+            out, pagesize=A4,
+            topMargin=22 * mm, bottomMargin=18 * mm,
+            leftMargin=20 * mm, rightMargin=20 * mm,
+        )
+        doc.generated_at = datetime.now(TASHKENT_TZ).strftime("%d.%m.%Y %H:%M")
+        doc.build(elements, onFirstPage=self._header_footer, onLaterPages=self._header_footer)
+
+    # ═══════════════════════════════════════════
+    # ATTENDANCE REPORT
+    # ═══════════════════════════════════════════
+    def attendance_report(self, data: Dict[str, Any]) -> list:
+        """Attendance report elements."""
+        report = data["report"]
+        elements = []
+
+        # Title
+        elements.append(Paragraph("DAVOMAT HISOBOTI", self.styles['DocTitle']))
+        subtitle = f"Davr: {self._fmt_date(report['date_from'])} — {self._fmt_date(report['date_to'])}"
+        elements.append(Paragraph(subtitle, self.styles['DocSubtitle']))
+        elements.append(HRFlowable(width="100%", thickness=1, color=self.PRIMARY))
+        elements.append(Spacer(1, 8 * mm))
+
+        # Info block
+        elements.append(self._build_info_table([
+            ("Hisobot turi:", "Davomat"),
+            ("Guruh:", data["group_name"]),
+            ("Davr:", subtitle.replace("Davr: ", "")),
+            ("Holati:", report["status"].upper()),
+            ("Yaratuvchi ID:", str(report["created_by"])),
+        ]))
+        elements.append(Spacer(1, 8 * mm))
+
+        totals = data["totals"]
+        total, present = totals["total"], totals["present"]
+
+        # Summary cards
+        elements.append(Paragraph("Umumiy ko'rsatkichlar", self.styles['SectionTitle']))
+        elements.append(self._build_summary_cards([
+            ("Jami yozuvlar", str(total), "#6D28D9"),
+            ("Keldi", str(present), "#059669"),
+            ("Kelmadi", str(totals["absent"]), "#DC2626"),
+            ("Kechikdi", str(totals["late"]), "#D97706"),
+            ("Davomat %", f"{round(present/total*100, 1) if total > 0 else 0}%", "#2563EB"),
+        ]))
+        elements.append(Spacer(1, 8 * mm))
+
+        # Students breakdown
+        if data["students"] is not None:
+            elements.append(Paragraph("Talabalar bo'yicha davomat", self.styles['SectionTitle']))
+
+            rows = []
+            for idx, (name, s_total, s_present, s_absent, s_late) in enumerate(data["students"], 1):
+                s_rate = f"{round(s_present/s_total*100, 1)}%" if s_total > 0 else "—"
+                rows.append([
+                    str(idx), name, str(s_total),
+                    str(s_present), str(s_absent), str(s_late), s_rate
+                ])
+
+            if rows:
+                elements.append(self._build_data_table(
+                    ["#", "Talaba", "Jami", "Keldi", "Kelmadi", "Kechikdi", "%"],
+                    rows,
+                    col_widths=[10*mm, 55*mm, 18*mm, 18*mm, 22*mm, 22*mm, 18*mm],
+                ))
+
+        elements.append(Spacer(1, 10 * mm))
+        elements.append(HRFlowable(width="100%", thickness=0.5, color=self.BORDER))
+        elements.append(Spacer(1, 4 * mm))
+        elements.append(Paragraph(
+            f"Hisobot #{report['id']} | UniControl tizimi tomonidan avtomatik yaratildi",
+            self.styles['FooterText']
+        ))
+        return elements
+
+    # ═══════════════════════════════════════════
+    # PAYMENT REPORT
+    # ═══════════════════════════════════════════
+    def payment_report(self, data: Dict[str, Any]) -> list:
+        """Payment/contract report elements."""
+        report = data["report"]
+        students = data["students"]
+        elements = []
+
+        elements.append(Paragraph("KONTRAKT TO'LOV HISOBOTI", self.styles['DocTitle']))
+        subtitle = f"Davr: {self._fmt_date(report['date_from'])} — {self._fmt_date(report['date_to'])}"
+        elements.append(Paragraph(subtitle, self.styles['DocSubtitle']))
+        elements.append(HRFlowable(width="100%", thickness=1, color=self.PRIMARY))
+        elements.append(Spacer(1, 8 * mm))
+
+        elements.append(self._build_info_table([
+            ("Hisobot turi:", "Kontrakt to'lovlari"),
+            ("Guruh:", data["group_name"]),
+            ("Jami talabalar:", str(len(students))),
+            ("Holati:", report["status"].upper()),
+        ]))
+        elements.append(Spacer(1, 8 * mm))
+
+        # Calculate totals
+        total_contract = sum(amount for _, _, amount, _ in students)
+        total_paid = sum(paid for _, _, _, paid in students)
+        total_remaining = total_contract - total_paid
+        paid_count = sum(1 for _, _, amount, paid in students if paid >= amount and amount > 0)
+        unpaid_count = len(students) - paid_count
+
+        elements.append(Paragraph("Moliyaviy ko'rsatkichlar", self.styles['SectionTitle']))
+        elements.append(self._build_summary_cards([
+            ("Jami kontrakt", self._fmt_money(total_contract), "#6D28D9"),
+            ("To'langan", self._fmt_money(total_paid), "#059669"),
+            ("Qoldiq", self._fmt_money(total_remaining), "#DC2626"),
+            ("To'lagan", str(paid_count), "#059669"),
+            ("Qarzdor", str(unpaid_count), "#DC2626"),
+        ]))
+        elements.append(Spacer(1, 8 * mm))
+
+        # Student details
+        elements.append(Paragraph("Talabalar bo'yicha to'lov holati", self.styles['SectionTitle']))
+
+        rows = []
+        for idx, (name, student_id, amount, paid) in enumerate(students, 1):
+            remaining = amount - paid
+            pct = f"{round(paid/amount*100, 1)}%" if amount > 0 else "—"
+            status_text = "To'liq" if remaining <= 0 and amount > 0 else "Qarzdor"
+
+            rows.append([
+                str(idx), name, student_id or "—",
+                self._fmt_money(amount), self._fmt_money(paid),
+                self._fmt_money(max(remaining, 0)), pct, status_text
+            ])
+
+        if rows:
+            elements.append(self._build_data_table(
+                ["#", "Talaba", "ID", "Kontrakt", "To'langan", "Qoldiq", "%", "Holat"],
+                rows,
+                col_widths=[8*mm, 40*mm, 22*mm, 22*mm, 22*mm, 22*mm, 14*mm, 18*mm],
+            ))
+
+        # Totals row
+        elements.append(Spacer(1, 4 * mm))
+        totals = Table([[
+            Paragraph(f"<b>JAMI:</b> Kontrakt: {self._fmt_money(total_contract)} | "
+                      f"To'langan: {self._fmt_money(total_paid)} | "
+                      f"Qoldiq: {self._fmt_money(total_remaining)}",
+                      self.styles['InfoValue'])
+        ]], colWidths=[168 * mm])
+        totals.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), self.PRIMARY_LIGHT),
+            ('BOX', (0, 0), (-1, -1), 1, self.PRIMARY),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 10),
+        ]))
+        elements.append(totals)
+
+        elements.append(Spacer(1, 10 * mm))
+        elements.append(Paragraph(
+            f"Hisobot #{report['id']} | UniControl tizimi tomonidan avtomatik yaratildi",
+            self.styles['FooterText']
+        ))
+        return elements
+
+    # ═══════════════════════════════════════════
+    # STUDENTS REPORT
+    # ═══════════════════════════════════════════
+    def students_report(self, data: Dict[str, Any]) -> list:
+        """Students list report elements."""
+        report = data["report"]
+        students = data["students"]
+        elements = []
+
+        elements.append(Paragraph("TALABALAR RO'YXATI HISOBOTI", self.styles['DocTitle']))
+        elements.append(HRFlowable(width="100%", thickness=1, color=self.PRIMARY))
+        elements.append(Spacer(1, 8 * mm))
+
+        elements.append(self._build_info_table([
+            ("Hisobot turi:", "Talabalar ro'yxati"),
+            ("Guruh:", data["group_name"]),
+            ("Jami talabalar:", str(len(students))),
+        ]))
+        elements.append(Spacer(1, 8 * mm))
+
+        elements.append(Paragraph("Talabalar", self.styles['SectionTitle']))
+
+        rows = []
+        for idx, (name, student_id, phone, birth_date, gender, enrollment_date) in enumerate(students, 1):
+            rows.append([
+                str(idx),
+                name,
+                student_id or "—",
+                phone or "—",
+                self._fmt_date(birth_date),
+                "Erkak" if gender == "male" else ("Ayol" if gender == "female" else "—"),
+                self._fmt_date(enrollment_date),
+            ])
+
+        if rows:
+            elements.append(self._build_data_table(
+                ["#", "F.I.Sh.", "Talaba ID", "Telefon", "Tug'ilgan sana", "Jinsi", "Qabul sanasi"],
+                rows,
+                col_widths=[8*mm, 45*mm, 25*mm, 25*mm, 25*mm, 16*mm, 24*mm],
+            ))
+
+        elements.append(Spacer(1, 10 * mm))
+        elements.append(Paragraph(
+            f"Hisobot #{report['id']} | Jami: {len(students)} ta talaba | UniControl",
+            self.styles['FooterText']
+        ))
+        return elements
+
+    # ═══════════════════════════════════════════
+    # GROUPS REPORT
+    # ═══════════════════════════════════════════
+    def groups_report(self, data: Dict[str, Any]) -> list:
+        """Groups report elements."""
+        report = data["report"]
+        groups = data["groups"]
+        elements = []
+
+        elements.append(Paragraph("GURUHLAR HISOBOTI", self.styles['DocTitle']))
+        elements.append(HRFlowable(width="100%", thickness=1, color=self.PRIMARY))
+        elements.append(Spacer(1, 8 * mm))
+
+        elements.append(self._build_info_table([
+            ("Hisobot turi:", "Guruhlar"),
+            ("Jami guruhlar:", str(len(groups))),
+        ]))
+        elements.append(Spacer(1, 8 * mm))
+
+        elements.append(Paragraph("Guruhlar ro'yxati", self.styles['SectionTitle']))
+
+        rows = []
+        for idx, (name, faculty, student_count, is_active) in enumerate(groups, 1):
+            rows.append([
+                str(idx),
+                name,
+                faculty or "—",
+                str(student_count),
+                "Faol" if is_active else "Nofaol",
+            ])
+
+        if rows:
+            elements.append(self._build_data_table(
+                ["#", "Guruh nomi", "Fakultet", "Talabalar soni", "Holat"],
+                rows,
+                col_widths=[10*mm, 50*mm, 50*mm, 30*mm, 25*mm],
+            ))
+
+        elements.append(Spacer(1, 10 * mm))
+        elements.append(Paragraph(
+            f"Hisobot #{report['id']} | Jami: {len(groups)} ta guruh | UniControl",
+            self.styles['FooterText']
+        ))
+        return elements
+
+    # ═══════════════════════════════════════════
+    # GENERIC / CUSTOM REPORT
+    # ═══════════════════════════════════════════
+    def generic_report(self, data: Dict[str, Any]) -> list:
+        """Generic/custom report elements."""
+        report = data["report"]
+        elements = []
+
+        title = report["name"] or "HISOBOT"
+        elements.append(Paragraph(title.upper(), self.styles['DocTitle']))
+        if report["description"]:
+            elements.append(Paragraph(report["description"], self.styles['DocSubtitle']))
+        elements.append(HRFlowable(width="100%", thickness=1, color=self.PRIMARY))
+        elements.append(Spacer(1, 8 * mm))
+
+        elements.append(self._build_info_table([
+            ("Hisobot nomi:", report["name"]),
+            ("Hisobot turi:", report["report_type"].replace("_", " ").title()),
+            ("Format:", report["format"].upper()),
+            ("Guruh:", data["group_name"]),
+            ("Davr:", f"{self._fmt_date(report['date_from'])} — {self._fmt_date(report['date_to'])}"),
+            ("Holati:", report["status"].upper()),
+            ("Yaratilgan:", self._fmt_datetime(report["created_at"])),
+        ]))
+
+        if report["ai_result"]:
+            elements.append(Spacer(1, 8 * mm))
+            elements.append(Paragraph("AI Tahlil natijasi", self.styles['SectionTitle']))
+            elements.append(Paragraph(report["ai_result"], self.styles['Normal']))
+
+        elements.append(Spacer(1, 15 * mm))
+        elements.append(HRFlowable(width="100%", thickness=0.5, color=self.BORDER))
+        elements.append(Spacer(1, 4 * mm))
+        elements.append(Paragraph(
+            f"Hisobot #{report['id']} | UniControl tizimi tomonidan yaratildi",
+            self.styles['FooterText']
+        ))
+        return elements
+
+    # ═══════════════════════════════════════════
+    # MAIN DISPATCHER
+    # ═══════════════════════════════════════════
+    def render(self, data: Dict[str, Any], out) -> None:
+        """Write the PDF of the collected report data to `out`."""
+        layouts = {
+            "attendance": self.attendance_report,
+            "payment": self.payment_report,
+            "students": self.students_report,
+            "groups": self.groups_report,
+        }
+        layout = layouts.get(data["kind"], self.generic_report)
+        self._build(out, layout(data))
+
+    # ═══════════════════════════════════════════
+    # HELPERS
+    # ═══════════════════════════════════════════
+    @staticmethod
+    def _fmt_date(d) -> str:
+        if d is None:
+            return "—"
+        if isinstance(d, (date, datetime)):
+            return d.strftime("%d.%m.%Y")
+        return str(d)
+
+    @staticmethod
+    def _fmt_datetime(dt) -> str:
+        if dt is None:
+            return "—"
+        if isinstance(dt, datetime):
+            return dt.strftime("%d.%m.%Y %H:%M")
+        return str(dt)
+
+    @staticmethod
+    def _fmt_money(amount) -> str:
+        if amount is None:
+            return "0"
+        return f"{int(amount):,}".replace(",", " ")
+
+
+def render_excel(data: Dict[str, Any], out) -> None:
+    """Write the Excel workbook of the collected report table to `out`."""
+    report = data["report"]
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Hisobot"
+
+    # Styles
+    header_font = Font(name='Arial', bold=True, size=11, color='FFFFFF')
+    header_fill = PatternFill(start_color='1E293B', end_color='1E293B', fill_type='solid')
+    header_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    thin_border = Border(
+        left=Side(style='thin', color='E2E8F0'),
+        right=Side(style='thin', color='E2E8F0'),
+        top=Side(style='thin', color='E2E8F0'),
+        bottom=Side(style='thin', color='E2E8F0'),
+    )
+
+    # Title row
+    ws.merge_cells('A1:G1')
+    title_cell = ws['A1']
+    title_cell.value = report["name"] or "Hisobot"
+    title_cell.font = Font(name='Arial', bold=True, size=16, color='6D28D9')
+    title_cell.alignment = Alignment(horizontal='center')
+    ws.row_dimensions[1].height = 30
+
+    # Info rows
+    ws['A3'] = "Turi:"
+    ws['B3'] = report["report_type"].replace("_", " ").title()
+    ws['A4'] = "Holat:"
+    ws['B4'] = report["status"].upper()
+    ws['A5'] = "Davr:"
+    ws['B5'] = f"{report['date_from'] or '—'} — {report['date_to'] or '—'}"
+
+    start_row = 7
+
+    def header(headers):
+        for col, h in enumerate(headers, 1):
+            cell = ws.cell(row=start_row, column=col, value=h)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_align
+            cell.border = thin_border
+
+    if data["kind"] == "attendance":
+        header(["#", "Talaba", "Sana", "Holat", "Izoh"])
+        status_map = {"present": "Keldi", "absent": "Kelmadi", "late": "Kechikdi"}
+        for idx, (name, day, status, note) in enumerate(data["rows"], 1):
+            row = start_row + idx
+            ws.cell(row=row, column=1, value=idx).border = thin_border
+            ws.cell(row=row, column=2, value=name).border = thin_border
+            ws.cell(row=row, column=3, value=str(day)).border = thin_border
+            ws.cell(row=row, column=4, value=status_map.get(status, status)).border = thin_border
+            ws.cell(row=row, column=5, value=note or "").border = thin_border
+
+    elif data["kind"] == "students":
+        header(["#", "Talaba", "ID", "Telefon", "Kontrakt", "To'langan", "Qoldiq"])
+        for idx, (name, student_id, phone, amount, paid) in enumerate(data["rows"], 1):
+            row = start_row + idx
+            ws.cell(row=row, column=1, value=idx).border = thin_border
+            ws.cell(row=row, column=2, value=name).border = thin_border
+            ws.cell(row=row, column=3, value=student_id or "—").border = thin_border
+            ws.cell(row=row, column=4, value=phone or "—").border = thin_border
+            for col, value in ((5, amount), (6, paid), (7, max(amount - paid, 0))):
+                cell = ws.cell(row=row, column=col, value=value)
+                cell.border = thin_border
+                cell.number_format = '#,##0'
+    else:
+        # Generic
+        ws.cell(row=start_row, column=1, value="Ma'lumot").font = header_font
+        ws.cell(row=start_row, column=1).fill = header_fill
+        ws.cell(row=start_row + 1, column=1, value=report["description"] or "Maxsus hisobot")
+
+    # Auto-width
+    for col in ws.columns:
+        max_length = 0
+        column_letter = None
+        for cell in col:
+            if hasattr(cell, 'column_letter'):
+                column_letter = cell.column_letter
+            if cell.value:
+                max_length = max(max_length, len(str(cell.value)))
+        if column_letter:
+            ws.column_dimensions[column_letter].width = min(max_length + 4, 40)
+
+    wb.save(out)
+
+
+def render_csv(data: Dict[str, Any], out) -> None:
+    """Write the CSV of the collected report table to `out` (UTF-8 with BOM)."""
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    if data["kind"] == "attendance":
+        writer.writerow(["#", "Talaba", "Sana", "Holat"])
+        for idx, (name, day, status, _) in enumerate(data["rows"], 1):
+            writer.writerow([idx, name, str(day), status])
+    else:
+        writer.writerow(["#", "Talaba", "ID", "Kontrakt", "To'langan", "Qoldiq"])
+        for idx, (name, student_id, _, amount, paid) in enumerate(data["rows"], 1):
+            writer.writerow([idx, name, student_id or "", amount, paid, max(amount - paid, 0)])
+    text.flush()
+    text.detach()
+
+
+def render_report(fmt: str, data: Dict[str, Any], target: str) -> int:
+    """
+    Render collected report data as `fmt` (pdf, excel or csv) into
+    `target`, written under a temp name and moved into place. Returns the
+    artifact size in bytes.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as out:
+            if fmt == "excel":
+                render_excel(data, out)
+            elif fmt == "csv":
+                render_csv(data, out)
+            else:
+                PDFReportRenderer().render(data, out)
+        os.replace(temp, target)
+    except BaseException:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
+    return os.path.getsize(target)
@@ -69,6 +69,7 @@ class FileResponse(BaseModel):
     path: str
     size: int
     size_formatted: str
+    sha256: Optional[str] = None
     file_type: FileType
     mime_type: Optional[str]
     extension: Optional[str]
@@ -83,6 +84,7 @@ class FileResponse(BaseModel):
     
     # Computed fields
     url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -215,6 +217,9 @@ class StorageStats(BaseModel):
     total_folders: int
     total_size: int
     total_size_formatted: str
+    # Bytes on disk: content shared by several files counted once
+    physical_size: int = 0
+    physical_size_formatted: str = "0 B"
     files_by_type: dict
     recent_uploads: List[FileResponse]
     
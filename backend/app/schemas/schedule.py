@@ -24,7 +24,7 @@ class ScheduleBase(BaseModel):
     specific_date: Optional[date] = None
     start_time: time
     end_time: time
-    lesson_number: Optional[int] = None
+    lesson_number: Optional[int] = Field(None, ge=1, le=7)
     week_type: WeekType = WeekType.ALL
     room: Optional[str] = Field(None, max_length=100)
     building: Optional[str] = Field(None, max_length=100)
@@ -50,7 +50,7 @@ class ScheduleUpdate(BaseModel):
     specific_date: Optional[date] = None
     start_time: Optional[time] = None
     end_time: Optional[time] = None
-    lesson_number: Optional[int] = None
+    lesson_number: Optional[int] = Field(None, ge=1, le=7)
     week_type: Optional[WeekType] = None
     room: Optional[str] = Field(None, max_length=100)
     building: Optional[str] = Field(None, max_length=100)
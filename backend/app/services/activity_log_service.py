@@ -0,0 +1,371 @@
+"""
+UniControl - Activity Log Service
+=================================
+Storage management and statistics for activity_logs.
+
+On PostgreSQL activity_logs is range-partitioned by month on created_at:
+    * partitions (activity_logs_pYYYYMM) are created ahead of time,
+    * retention drops whole partitions instead of deleting rows,
+    * a pre-existing plain table is attached once as activity_logs_legacy.
+
+Log statistics come from activity_log_counters, maintained by every
+writer, and the logs search box is served by a trigram index over
+description / entity_type / ip_address.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import re
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import TASHKENT_TZ, settings, today_tashkent
+from app.database import async_session_maker
+from app.models.activity_log import ActivityAction, ActivityLog, ActivityLogCounter
+
+
+TABLE = "activity_logs"
+LEGACY_PARTITION = "activity_logs_legacy"
+PARTITION_PREFIX = "activity_logs_p"
+
+# Serializes partition DDL across workers
+_ADVISORY_LOCK_ID = 7310412
+
+# Search document; the trigram index is built on the same expression
+SEARCH_EXPRESSION = (
+    "coalesce(description, '') || ' ' || coalesce(entity_type, '') "
+    "|| ' ' || coalesce(ip_address, '')"
+)
+
+AUTH_ACTIONS = [
+    ActivityAction.LOGIN, ActivityAction.LOGOUT, ActivityAction.LOGIN_FAILED,
+    ActivityAction.PASSWORD_CHANGE, ActivityAction.PASSWORD_RESET,
+]
+CRUD_ACTIONS = [
+    ActivityAction.CREATE, ActivityAction.UPDATE, ActivityAction.DELETE,
+    ActivityAction.IMPORT, ActivityAction.EXPORT,
+]
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def search_document():
+    """SQL expression matched by the trigram index (for ILIKE search)."""
+    qualified = re.sub(
+        r"\b(description|entity_type|ip_address)\b", rf"{TABLE}.\1", SEARCH_EXPRESSION
+    )
+    return literal_column(f"({qualified})")
+
+
+def count_rows(rows: Iterable[dict]) -> Dict[Tuple[date, ActivityAction], int]:
+    """Aggregate log rows into (Tashkent day, action) counts."""
+    counts: Counter = Counter()
+    for row in rows:
+        created_at = row.get("created_at") or datetime.now(TASHKENT_TZ)
+        counts[(created_at.astimezone(TASHKENT_TZ).date(), ActivityAction(row["action"]))] += 1
+    return dict(counts)
+
+
+def _month_start(year: int, month: int) -> datetime:
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return TASHKENT_TZ.localize(datetime(year, month, 1))
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value.upper() in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+class ActivityLogService:
+    """Activity log partitions, retention and counters."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.db.bind.dialect.name == "postgresql"
+
+    def _insert(self):
+        if self.is_postgres:
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(ActivityLogCounter)
+
+    # ==================== Counters ====================
+
+    async def add_counts(self, counts: Dict[Tuple[date, ActivityAction], int]) -> None:
+        """Apply (day, action) deltas with one multi-row UPSERT (no commit)."""
+        rows = [
+            {"day": day, "action": action, "count": n}
+            for (day, action), n in counts.items() if n
+        ]
+        if not rows:
+            return
+        stmt = self._insert().values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "action"],
+            set_={"count": ActivityLogCounter.count + stmt.excluded.count},
+        )
+        await self.db.execute(stmt)
+
+    async def rebuild_counters(self) -> int:
+        """Recount activity_log_counters from activity_logs (no commit)."""
+        day = func.date(func.timezone(TASHKENT_TZ.zone, ActivityLog.created_at)) \
+            if self.is_postgres else func.date(ActivityLog.created_at)
+        result = await self.db.execute(
+            select(day, ActivityLog.action, func.count(ActivityLog.id))
+            .group_by(day, ActivityLog.action)
+        )
+        await self.db.execute(delete(ActivityLogCounter))
+        counts = {}
+        for d, action, n in result.all():
+            if isinstance(d, str):
+                d = date.fromisoformat(d)
+            counts[(d, action)] = n
+        await self.add_counts(counts)
+        return len(counts)
+
+    async def stats(self) -> Dict[str, int]:
+        """Totals for the logs dashboard, read from counters."""
+        result = await self.db.execute(
+            select(ActivityLogCounter.action, func.sum(ActivityLogCounter.count))
+            .group_by(ActivityLogCounter.action)
+        )
+        by_action = {action: int(n or 0) for action, n in result.all()}
+        total = sum(by_action.values())
+        auth_count = sum(by_action.get(a, 0) for a in AUTH_ACTIONS)
+        crud_count = sum(by_action.get(a, 0) for a in CRUD_ACTIONS)
+        error_count = by_action.get(ActivityAction.ERROR, 0)
+        today_count = (await self.db.execute(
+            select(func.coalesce(func.sum(ActivityLogCounter.count), 0))
+            .where(ActivityLogCounter.day == today_tashkent())
+        )).scalar() or 0
+        return {
+            "total": total,
+            "auth_count": auth_count,
+            "crud_count": crud_count,
+            "system_count": total - auth_count - crud_count - error_count,
+            "error_count": error_count,
+            "today_count": int(today_count),
+        }
+
+    async def total(self) -> int:
+        """Total number of logs (from counters)."""
+        return int((await self.db.execute(
+            select(func.coalesce(func.sum(ActivityLogCounter.count), 0))
+        )).scalar() or 0)
+
+    # ==================== Deletion ====================
+
+    async def delete_log(self, log: ActivityLog) -> None:
+        """Delete one log row and its counter contribution (no commit)."""
+        await self.add_counts({(log.created_at.astimezone(TASHKENT_TZ).date(), log.action): -1})
+        await self.db.delete(log)
+
+    async def clear(self) -> None:
+        """Remove every log and counter (no commit)."""
+        if self.is_postgres:
+            await self.db.execute(text(f"TRUNCATE {TABLE}"))
+        else:
+            await self.db.execute(delete(ActivityLog))
+        await self.db.execute(delete(ActivityLogCounter))
+
+    # ==================== Partitions (PostgreSQL) ====================
+
+    async def _relkind(self, name: str) -> Optional[str]:
+        return (await self.db.execute(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": name},
+        )).scalar()
+
+    async def partitions(self) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+        """(name, lower, upper) for each partition; None means MIN/MAXVALUE."""
+        result = await self.db.execute(text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:table)
+            ORDER BY c.relname
+        """), {"table": TABLE})
+        parts = []
+        for name, bound in result.all():
+            match = _BOUND_RE.search(bound or "")
+            if match:
+                parts.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+        return parts
+
+    async def _convert_to_partitioned(self) -> None:
+        """Turn a plain activity_logs table into a partitioned one, once."""
+        logger.info("Converting activity_logs to a monthly partitioned table")
+        seq = (await self.db.execute(
+            text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": TABLE}
+        )).scalar()
+        await self.db.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_PARTITION}"))
+        indexes = (await self.db.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :t"),
+            {"t": LEGACY_PARTITION},
+        )).scalars().all()
+        for index in indexes:
+            await self.db.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index[:50]}_legacy"'))
+        if seq:
+            await self.db.execute(text(f"ALTER SEQUENCE {seq} OWNED BY NONE"))
+
+        await self.db.execute(text(f"""
+            CREATE TABLE {TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (created_at)
+        """))
+        await self.db.execute(text(f"ALTER TABLE {TABLE} ADD CONSTRAINT pk_{TABLE} PRIMARY KEY (id, created_at)"))
+        await self.db.execute(text(f"""
+            ALTER TABLE {TABLE} ADD CONSTRAINT fk_{TABLE}_user_id_users
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE SET NULL
+        """))
+        for column in ("user_id", "action", "entity_type", "entity_id", "created_at"):
+            await self.db.execute(text(f"CREATE INDEX ix_{TABLE}_{column} ON {TABLE} ({column})"))
+        if seq:
+            await self.db.execute(text(f"ALTER SEQUENCE {seq} OWNED BY {TABLE}.id"))
+
+        has_rows = (await self.db.execute(text(f"SELECT 1 FROM {LEGACY_PARTITION} LIMIT 1"))).first()
+        if has_rows:
+            # A partition cannot keep its own PK; ATTACH builds (id, created_at)
+            legacy_pk = (await self.db.execute(text(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = to_regclass(:t) AND contype = 'p'"
+            ), {"t": LEGACY_PARTITION})).scalar()
+            if legacy_pk:
+                await self.db.execute(text(f'ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT "{legacy_pk}"'))
+            now = datetime.now(TASHKENT_TZ)
+            upper = _month_start(now.year, now.month + 1)
+            await self.db.execute(text(f"""
+                ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_PARTITION}
+                FOR VALUES FROM (MINVALUE) TO ('{upper.isoformat()}')
+            """))
+        else:
+            await self.db.execute(text(f"DROP TABLE {LEGACY_PARTITION}"))
+
+    async def ensure_partitions(self, months_ahead: Optional[int] = None) -> List[str]:
+        """
+        Make sure activity_logs is partitioned and has partitions from the
+        current month to months_ahead months ahead. Returns created names.
+        """
+        if not self.is_postgres:
+            return []
+        months_ahead = settings.ACTIVITY_LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        await self.db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+
+        if await self._relkind(TABLE) == "r":
+            await self._convert_to_partitioned()
+
+        existing = await self.partitions()
+        now = datetime.now(TASHKENT_TZ)
+        created = []
+        for offset in range(months_ahead + 1):
+            lower = _month_start(now.year, now.month + offset)
+            upper = _month_start(now.year, now.month + offset + 1)
+            overlaps = any(
+                (lo is None or lo < upper) and (hi is None or hi > lower)
+                for _, lo, hi in existing
+            )
+            if overlaps:
+                continue
+            name = f"{PARTITION_PREFIX}{lower:%Y%m}"
+            await self.db.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE}
+                FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')
+            """))
+            existing.append((name, lower, upper))
+            created.append(name)
+        if created:
+            logger.info(f"Activity log partitions created: {created}")
+        return created
+
+    async def drop_expired_partitions(self, retention_months: Optional[int] = None) -> List[str]:
+        """
+        Drop partitions entirely older than the retention window and their
+        counters. retention_months <= 0 keeps everything.
+        """
+        retention_months = settings.ACTIVITY_LOG_RETENTION_MONTHS if retention_months is None else retention_months
+        if not self.is_postgres or retention_months <= 0:
+            return []
+        await self.db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+
+        now = datetime.now(TASHKENT_TZ)
+        cutoff = _month_start(now.year, now.month - retention_months)
+        dropped = []
+        for name, _, upper in await self.partitions():
+            if upper is not None and upper <= cutoff:
+                await self.db.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        if dropped:
+            # Counters go with the data: keep days still covered by a partition
+            lowers = [lower for _, lower, _ in await self.partitions()]
+            if lowers and None not in lowers:
+                floor = min(lowers).astimezone(TASHKENT_TZ).date()
+                await self.db.execute(
+                    delete(ActivityLogCounter).where(ActivityLogCounter.day < floor)
+                )
+            logger.info(f"Activity log partitions dropped (retention {retention_months} months): {dropped}")
+        return dropped
+
+    async def ensure_search_index(self) -> None:
+        """Trigram index for the logs search box (needs pg_trgm)."""
+        if not self.is_postgres:
+            return
+        await self.db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await self.db.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS ix_{TABLE}_search_trgm
+            ON {TABLE} USING gin (({SEARCH_EXPRESSION}) gin_trgm_ops)
+        """))
+
+
+# ==================== Setup & maintenance ====================
+
+async def setup_activity_log_storage() -> None:
+    """Partitions, search index and counter backfill; run from init_db."""
+    async with async_session_maker() as session:
+        service = ActivityLogService(session)
+        await service.ensure_partitions()
+        await service.drop_expired_partitions()
+        await session.commit()
+
+        has_counters = (await session.execute(select(ActivityLogCounter.id).limit(1))).first()
+        if not has_counters and (await session.execute(select(ActivityLog.id).limit(1))).first():
+            groups = await service.rebuild_counters()
+            await session.commit()
+            logger.info(f"Activity log counters backfilled ({groups} day/action rows)")
+
+    try:
+        async with async_session_maker() as session:
+            await ActivityLogService(session).ensure_search_index()
+            await session.commit()
+    except Exception as e:
+        logger.warning(f"Activity log search index not created (pg_trgm unavailable?): {e}")
+
+
+async def run_activity_log_maintenance() -> None:
+    """Create upcoming partitions and apply retention."""
+    async with async_session_maker() as session:
+        service = ActivityLogService(session)
+        await service.ensure_partitions()
+        await service.drop_expired_partitions()
+        await session.commit()
+
+
+async def activity_log_maintenance_loop(interval_hours: float = 6) -> None:
+    """Background loop started from the lifespan handler."""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            await run_activity_log_maintenance()
+        except Exception as e:
+            logger.error(f"Activity log maintenance failed: {e}")
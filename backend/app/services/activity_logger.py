@@ -10,6 +10,7 @@ Version: 1.0.0
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.activity_log import ActivityLog, ActivityAction
+from app.services.activity_log_service import ActivityLogService, count_rows
 import json
 import logging
 
@@ -59,6 +60,7 @@ async def log_activity(
             context=json.dumps(context, default=str, ensure_ascii=False) if context else None,
         )
         db.add(log_entry)
+        await ActivityLogService(db).add_counts(count_rows([{"action": action}]))
         # flush instead of commit to avoid breaking ongoing transactions
         # the session's get_db dependency will commit at the end
         await db.flush()
@@ -0,0 +1,129 @@
+"""
+UniControl - AI Analysis Cache
+==============================
+Caches AIService analyses keyed by (model, PROMPT_VERSION, endpoint,
+entity, fingerprint), where the fingerprint is a hash of exactly the data
+the prompt is built from.
+An identical analysis is served instantly until that data changes; then
+the key changes and the old entry simply expires.
+
+Concurrent identical requests are single-flighted within a worker: the
+first one calls the model and the rest await its result. If the leader
+fails (e.g. its user is over budget) the waiters retry on their own.
+
+Results live in Redis (ai:analysis:*, AI_ANALYSIS_CACHE_TTL) with an
+in-process fallback (same TTL) when Redis is unavailable.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+from app.config import settings
+from app.database import get_redis
+
+
+ANALYSIS_PREFIX = "ai:analysis:"
+# Part of the cache key: bump when the analysis prompts change
+PROMPT_VERSION = 1
+LOCAL_ENTRIES_MAX = 500
+
+# key -> (result, expires at monotonic time)
+_local: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def fingerprint(data: Any) -> str:
+    """Stable hash of JSON-able prompt inputs."""
+    payload = json.dumps(jsonable_encoder(data), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+async def _load(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        redis = await get_redis()
+        cached = await redis.get(key)
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.debug(f"AI analysis cache unavailable, using local: {e}")
+    entry = _local.get(key)
+    if entry is None:
+        return None
+    if entry[1] <= time.monotonic():
+        del _local[key]
+        return None
+    return entry[0]
+
+
+async def _store(key: str, result: Dict[str, Any]) -> None:
+    payload = jsonable_encoder(result)
+    try:
+        redis = await get_redis()
+        await redis.set(key, json.dumps(payload, ensure_ascii=False), ex=settings.AI_ANALYSIS_CACHE_TTL)
+        return
+    except Exception as e:
+        logger.debug(f"AI analysis cache unavailable, storing locally: {e}")
+    _local[key] = (payload, time.monotonic() + settings.AI_ANALYSIS_CACHE_TTL)
+    _local.move_to_end(key)
+    while len(_local) > LOCAL_ENTRIES_MAX:
+        _local.popitem(last=False)
+
+
+def _served_from_cache(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {**result, "tokens_used": 0, "cached": True}
+
+
+async def cached_analysis(
+    endpoint: str,
+    entity: Any,
+    data: Any,
+    build: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Return the cached result for (endpoint, entity, fingerprint(data))
+    under the current model and prompt version, or run build() once for
+    all concurrent callers and cache it. Cached results report
+    tokens_used=0 and cached=True.
+    """
+    key = (
+        f"{ANALYSIS_PREFIX}{settings.OPENAI_MODEL}:v{PROMPT_VERSION}:"
+        f"{endpoint}:{entity}:{fingerprint(data)}"
+    )
+
+    cached = await _load(key)
+    if cached is not None:
+        return _served_from_cache(cached)
+
+    while True:
+        flight = _inflight.get(key)
+        if flight is None:
+            break
+        try:
+            return _served_from_cache(await asyncio.shield(flight))
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise  # this request was cancelled, not the leader
+            # Leader failed: loop and take over
+
+    flight = asyncio.get_running_loop().create_future()
+    _inflight[key] = flight
+    try:
+        result = await build()
+        flight.set_result(result)
+        await _store(key, result)
+    except BaseException:
+        if not flight.done():
+            flight.cancel()
+        raise
+    finally:
+        _inflight.pop(key, None)
+    return {**result, "cached": False}
@@ -0,0 +1,196 @@
+"""
+UniControl - AI Result Cache
+============================
+Content-addressed cache for AI answers: the question text is normalized
+and hashed, and the answer is kept in an in-process LRU in front of the
+ai_result_cache table. Callers look keys up in bulk, send only the
+misses to the model and store the new answers back.
+
+Keys also carry the model and the caller's prompt version, so a model
+or prompt change misses instead of serving old answers, and entries
+expire AI_RESULT_CACHE_TTL_DAYS after they were stored.
+
+Normalization keeps letter case (it is part of the answer) but folds
+the differences timetables are full of: Unicode forms, apostrophe
+variants (ʻ ’ ` → '), runs of spaces and blank lines.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings, now_tashkent
+from app.models.ai_cache import AIResultCache
+
+
+_APOSTROPHES = str.maketrans({c: "'" for c in "ʻʼ’‘`´"})
+_SPACES_RE = re.compile(r"[ \t\xa0]+")
+_LOOKUP_CHUNK = 1000
+
+# (kind, key_hash) -> (result, tokens, expires at epoch); shared by all sessions of a worker
+_lru: "OrderedDict[Tuple[str, str], Tuple[Any, int, float]]" = OrderedDict()
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a question text, used for the cache key."""
+    text = unicodedata.normalize("NFC", str(text)).translate(_APOSTROPHES)
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(text: str, model: str, prompt_version: int) -> str:
+    """SHA-256 of the model, the prompt version and the normalized text."""
+    payload = f"{model}\n{prompt_version}\n{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _ttl_seconds() -> int:
+    return settings.AI_RESULT_CACHE_TTL_DAYS * 24 * 3600
+
+
+def _lru_put(kind: str, key: str, value: Tuple[Any, int], expires_at: float) -> None:
+    _lru[(kind, key)] = (*value, expires_at)
+    _lru.move_to_end((kind, key))
+    while len(_lru) > settings.AI_CACHE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+class AIResultCacheService:
+    """
+    Bulk get/put over the LRU and the database for one import run.
+    Counts hits, misses and the tokens the hits would have cost.
+    Without a session only the in-process LRU is used.
+    """
+
+    def __init__(self, db: Optional[AsyncSession] = None):
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    async def get_many(
+        self,
+        kind: str,
+        keys: Iterable[str],
+        valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Cached results for the given keys. Absent keys, and results
+        rejected by valid(result), are misses.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Tuple[Any, int]] = {}
+        now = time.time()
+        for key in keys:
+            cached = _lru.get((kind, key))
+            if cached is None:
+                continue
+            if cached[2] <= now:
+                del _lru[(kind, key)]
+                continue
+            _lru.move_to_end((kind, key))
+            found[key] = cached[:2]
+
+        missing = [k for k in keys if k not in found]
+        if self.db is not None and (missing or found):
+            try:
+                # Savepoint: a cache failure must not abort the caller's transaction
+                async with self.db.begin_nested():
+                    cutoff = now_tashkent() - timedelta(seconds=_ttl_seconds())
+                    for i in range(0, len(missing), _LOOKUP_CHUNK):
+                        rows = await self.db.execute(
+                            select(
+                                AIResultCache.key_hash,
+                                AIResultCache.result,
+                                AIResultCache.tokens,
+                                AIResultCache.created_at,
+                            )
+                            .where(
+                                AIResultCache.kind == kind,
+                                AIResultCache.key_hash.in_(missing[i:i + _LOOKUP_CHUNK]),
+                                AIResultCache.created_at > cutoff,
+                            )
+                        )
+                        for key, result, tokens, created_at in rows:
+                            found[key] = (result, tokens)
+                            _lru_put(kind, key, (result, tokens), created_at.timestamp() + _ttl_seconds())
+                    if found:
+                        await self._touch(kind, list(found))
+            except Exception as e:
+                logger.warning(f"AI cache lookup failed, treating as misses: {e}")
+
+        if valid is not None:
+            found = {k: v for k, v in found.items() if valid(v[0])}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        self.tokens_saved += sum(tokens for _, tokens in found.values())
+        return {key: result for key, (result, _) in found.items()}
+
+    async def put_many(self, kind: str, entries: Dict[str, Tuple[Any, int]]) -> None:
+        """
+        Store key -> (result, tokens) answers from the model, and drop
+        this kind's expired rows.
+        """
+        if not entries:
+            return
+        expires_at = time.time() + _ttl_seconds()
+        for key, value in entries.items():
+            _lru_put(kind, key, value, expires_at)
+        if self.db is None:
+            return
+
+        now = now_tashkent()
+        rows = [
+            {"kind": kind, "key_hash": key, "result": result, "tokens": tokens,
+             "hit_count": 0, "created_at": now, "last_used_at": now}
+            for key, (result, tokens) in entries.items()
+        ]
+        stmt = pg_insert(AIResultCache)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_ai_result_cache_kind_key",
+            set_={"result": stmt.excluded.result, "tokens": stmt.excluded.tokens,
+                  "created_at": stmt.excluded.created_at,
+                  "last_used_at": stmt.excluded.last_used_at},
+        )
+        try:
+            async with self.db.begin_nested():
+                await self.db.execute(stmt, rows)
+                await self.db.execute(
+                    delete(AIResultCache).where(
+                        AIResultCache.kind == kind,
+                        AIResultCache.created_at <= now - timedelta(seconds=_ttl_seconds()),
+                    )
+                )
+        except Exception as e:
+            logger.warning(f"AI cache write failed: {e}")
+
+    async def _touch(self, kind: str, keys: list) -> None:
+        for i in range(0, len(keys), _LOOKUP_CHUNK):
+            await self.db.execute(
+                update(AIResultCache)
+                .where(AIResultCache.kind == kind,
+                       AIResultCache.key_hash.in_(keys[i:i + _LOOKUP_CHUNK]))
+                .values(hit_count=AIResultCache.hit_count + 1, last_used_at=now_tashkent())
+                .execution_options(synchronize_session=False)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
@@ -13,18 +13,40 @@ Intelligent AI agent that enhances Excel schedule import using Claude API.
 
 4. Bulk Processing — Sends data in batches for efficiency
 
+5. Result Cache — Cell and group-name answers are cached by a hash of the
+   normalized text, the model and PROMPT_VERSION (ai_result_cache table +
+   in-process LRU, both expiring); only unseen cells go to Claude, in
+   concurrent batches with retry/backoff
+
 Author: UniControl Team
 Version: 3.0.0 — Switched from OpenAI to Claude API
 """
 
+import asyncio
+import hashlib
 import json
+import random
 import re
 from typing import Optional, List, Dict, Any, Tuple
 from loguru import logger
 
 import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.config import settings
 from app.models.schedule import ScheduleType, WeekDay
+from app.services.ai_result_cache import AIResultCacheService, cache_key
+
+
+CELL_CACHE_KIND = "schedule_cell"
+GROUP_CACHE_KIND = "group_match"
+CELL_FIELDS = ("subject", "schedule_type", "teacher", "room", "building")
+CELL_BATCH_SIZE = 40
+# Part of the cache key: bump when the cell or group prompts change
+PROMPT_VERSION = 1
+
+# Worth retrying: rate limited, overloaded or a transient server error
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
 
 
 class AIScheduleAgent:
@@ -32,9 +54,17 @@ class AIScheduleAgent:
     AI agent for intelligent schedule import matching.
     Uses Claude API for smart matching when fuzzy/regex fails.
     All config from .env via settings.
+
+    db enables the persistent result cache (without it only the
+    in-process LRU is used); http_client replaces the per-call httpx
+    client, e.g. with an httpx.MockTransport stub.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        db: Optional[AsyncSession] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.api_key = settings.CLAUDE_API_KEY or ""
         self.api_url = settings.CLAUDE_API_URL
         self.model = settings.CLAUDE_MODEL
@@ -42,6 +72,8 @@ class AIScheduleAgent:
         self.temperature = settings.CLAUDE_TEMPERATURE
         self.anthropic_version = settings.CLAUDE_ANTHROPIC_VERSION
         self.total_tokens_used = 0
+        self.http_client = http_client
+        self.cache = AIResultCacheService(db)
 
     def is_available(self) -> bool:
         """Check if AI is available (API key configured)."""
@@ -55,62 +87,103 @@ class AIScheduleAgent:
         temperature: float = None,
     ) -> Optional[str]:
         """Call Claude API and return content. Returns None on failure."""
+        content, _ = await self._request_claude(system_prompt, user_prompt, max_tokens, temperature)
+        return content
+
+    async def _post(self, headers: Dict[str, str], payload: Dict[str, Any]) -> httpx.Response:
+        if self.http_client is not None:
+            return await self.http_client.post(self.api_url, headers=headers, json=payload)
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            return await client.post(self.api_url, headers=headers, json=payload)
+
+    async def _request_claude(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = None,
+        temperature: float = None,
+    ) -> Tuple[Optional[str], int]:
+        """
+        Call Claude API and return (content, tokens used). Timeouts,
+        429 and 5xx responses are retried with exponential backoff and
+        jitter (honouring Retry-After). Returns (None, 0) on failure.
+        """
         max_tokens = max_tokens or self.max_tokens
         temperature = temperature if temperature is not None else self.temperature
         if not self.api_key:
-            return None
+            return None, 0
 
-        try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                resp = await client.post(
-                    self.api_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": self.anthropic_version,
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": max_tokens,
-                        "temperature": temperature,
-                        "system": system_prompt,
-                        "messages": [
-                            {"role": "user", "content": user_prompt}
-                        ],
-                    },
-                )
-
-                if resp.status_code != 200:
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": self.anthropic_version,
+            "content-type": "application/json"
+        }
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "system": system_prompt,
+            "messages": [
+                {"role": "user", "content": user_prompt}
+            ],
+        }
+
+        retries = max(settings.CLAUDE_MAX_RETRIES, 0)
+        for attempt in range(retries + 1):
+            retry_after = None
+            try:
+                resp = await self._post(headers, payload)
+            except httpx.TimeoutException:
+                logger.warning(f"Claude API timeout in AI Schedule Agent (attempt {attempt + 1})")
+            except httpx.TransportError as e:
+                logger.warning(f"Claude API connection error (attempt {attempt + 1}): {e}")
+            except Exception as e:
+                logger.error(f"AI Schedule Agent Claude call failed: {e}")
+                return None, 0
+            else:
+                if resp.status_code == 200:
+                    try:
+                        return self._extract_content(resp.json())
+                    except Exception as e:
+                        logger.error(f"AI Schedule Agent: bad Claude response: {e}")
+                        return None, 0
+                if resp.status_code not in RETRY_STATUSES:
                     logger.error(f"Claude API error: {resp.status_code} - {resp.text}")
-                    return None
-
-                data = resp.json()
-                content = data.get("content", [{}])[0].get("text", "")
-                
-                # Track token usage
-                usage = data.get("usage", {})
-                tokens = (usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
-                self.total_tokens_used += tokens
-                
-                logger.info(
-                    f"AI Schedule Agent (Claude): {tokens} tokens used "
-                    f"(total: {self.total_tokens_used})"
-                )
-                
-                # Extract JSON from response (Claude may wrap in ```json ... ```)
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0].strip()
-                elif "```" in content:
-                    content = content.split("```")[1].split("```")[0].strip()
-                
-                return content
-
-        except httpx.TimeoutException:
-            logger.error("Claude API timeout in AI Schedule Agent")
-            return None
-        except Exception as e:
-            logger.error(f"AI Schedule Agent Claude call failed: {e}")
-            return None
+                    return None, 0
+                logger.warning(f"Claude API {resp.status_code} (attempt {attempt + 1}), retrying")
+                retry_after = resp.headers.get("retry-after")
+
+            if attempt < retries:
+                delay = settings.CLAUDE_RETRY_BASE_DELAY * (2 ** attempt)
+                try:
+                    delay = max(delay, float(retry_after)) if retry_after else delay
+                except ValueError:
+                    pass
+                await asyncio.sleep(delay * random.uniform(1.0, 1.25))
+
+        logger.error(f"Claude API: giving up after {retries + 1} attempts")
+        return None, 0
+
+    def _extract_content(self, data: Dict[str, Any]) -> Tuple[str, int]:
+        content = data.get("content", [{}])[0].get("text", "")
+
+        # Track token usage
+        usage = data.get("usage", {})
+        tokens = (usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+        self.total_tokens_used += tokens
+
+        logger.info(
+            f"AI Schedule Agent (Claude): {tokens} tokens used "
+            f"(total: {self.total_tokens_used})"
+        )
+
+        # Extract JSON from response (Claude may wrap in ```json ... ```)
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0].strip()
+
+        return content, tokens
 
     # ═══════════════════════════════════════════════════════
     # 1. SMART GROUP MATCHING
@@ -123,6 +196,8 @@ class AIScheduleAgent:
     ) -> Dict[str, Optional[str]]:
         """
         Use AI to match Excel group names to database group names.
+        Cached answers are reused while the matched group still exists;
+        a cached "no match" only while the DB group list is unchanged.
         """
         if not excel_groups or not db_groups:
             return {}
@@ -130,6 +205,24 @@ class AIScheduleAgent:
         if not self.is_available():
             return {}
 
+        db_set = set(db_groups)
+        fingerprint = hashlib.sha256("\n".join(sorted(db_set)).encode("utf-8")).hexdigest()[:16]
+
+        def still_valid(answer: Dict[str, Any]) -> bool:
+            if answer.get("db_name") is None:
+                return answer.get("groups") == fingerprint
+            return answer["db_name"] in db_set
+
+        keys = {name: cache_key(name, self.model, PROMPT_VERSION) for name in excel_groups}
+        cached = await self.cache.get_many(GROUP_CACHE_KIND, keys.values(), valid=still_valid)
+        validated: Dict[str, Optional[str]] = {
+            name: cached[keys[name]]["db_name"] for name in excel_groups if keys[name] in cached
+        }
+        excel_groups = [name for name in excel_groups if name not in validated]
+        if not excel_groups:
+            logger.info(f"AI Group Matching: all {len(validated)} groups answered from cache")
+            return validated
+
         system_prompt = """Sen O'zbekiston universitetlari uchun guruh nomlarini moslashtiradigan AI agentsan.
 
 Senga Excel fayldagi guruh nomlari va bazadagi guruh nomlari beriladi.
@@ -167,29 +260,37 @@ Bazadagi guruh nomlari:
 
 Har bir Excel guruh nomini bazadagi eng mos guruhga moslashtir."""
 
-        content = await self._call_claude(system_prompt, user_prompt, max_tokens=4000)
+        content, tokens = await self._request_claude(system_prompt, user_prompt, max_tokens=4000)
         if not content:
-            return {}
+            return validated
 
         try:
             result = json.loads(content)
             matches = result.get("matches", {})
 
-            db_set = set(db_groups)
-            validated = {}
+            asked = set(excel_groups)
+            answered = {}
             for excel_name, db_name in matches.items():
                 if db_name and db_name in db_set:
                     validated[excel_name] = db_name
                 else:
                     validated[excel_name] = None
+                if excel_name in asked:
+                    answered[excel_name] = validated[excel_name]
+
+            per_name = -(-tokens // len(answered)) if answered else 0
+            await self.cache.put_many(GROUP_CACHE_KIND, {
+                keys[name]: ({"db_name": db_name, "groups": fingerprint}, per_name)
+                for name, db_name in answered.items()
+            })
 
             ai_matched = sum(1 for v in validated.values() if v is not None)
-            logger.info(f"AI Group Matching: {ai_matched}/{len(excel_groups)} guruh moslashtirildi")
+            logger.info(f"AI Group Matching: {ai_matched}/{len(validated)} guruh moslashtirildi")
             return validated
 
-        except (json.JSONDecodeError, KeyError) as e:
+        except (json.JSONDecodeError, KeyError, AttributeError) as e:
             logger.error(f"AI group matching response parse error: {e}")
-            return {}
+            return validated
 
     # ═══════════════════════════════════════════════════════
     # 2. SMART CELL CONTENT PARSING (ALL CELLS)
@@ -200,27 +301,66 @@ Har bir Excel guruh nomini bazadagi eng mos guruhga moslashtir."""
         cells: List[Dict[str, str]],
     ) -> List[Dict[str, Any]]:
         """
-        Use AI to parse ALL schedule cell contents for maximum accuracy.
-        Processes in batches of 40 cells.
+        Use AI to parse schedule cell contents ({"id", "content"} each).
+
+        Cells with the same normalized text are asked once. Answers come
+        from the result cache where possible; the unseen cells are sent
+        in batches of 40, at most CLAUDE_CONCURRENCY batches at a time.
         """
         if not cells or not self.is_available():
             return []
 
-        all_results = []
-        batch_size = 40
+        ids_by_key: Dict[str, List[str]] = {}
+        content_by_key: Dict[str, str] = {}
+        for cell in cells:
+            key = cache_key(cell["content"], self.model, PROMPT_VERSION)
+            ids_by_key.setdefault(key, []).append(cell["id"])
+            content_by_key.setdefault(key, cell["content"])
 
-        for i in range(0, len(cells), batch_size):
-            batch = cells[i : i + batch_size]
-            batch_results = await self._parse_cells_batch(batch)
-            all_results.extend(batch_results)
+        answers = await self.cache.get_many(CELL_CACHE_KIND, ids_by_key)
+        unseen = [key for key in ids_by_key if key not in answers]
+        logger.info(
+            f"AI Cell Parsing: {len(cells)} cells, {len(ids_by_key)} distinct, "
+            f"{len(answers)} cached, {len(unseen)} to send"
+        )
 
-        return all_results
+        if unseen:
+            semaphore = asyncio.Semaphore(max(settings.CLAUDE_CONCURRENCY, 1))
+
+            async def run(batch: List[str]):
+                async with semaphore:
+                    return batch, await self._parse_cells_batch([
+                        {"id": str(i), "content": content_by_key[key]}
+                        for i, key in enumerate(batch)
+                    ])
+
+            batches = [
+                unseen[i : i + CELL_BATCH_SIZE]
+                for i in range(0, len(unseen), CELL_BATCH_SIZE)
+            ]
+            fresh: Dict[str, Tuple[Dict[str, Any], int]] = {}
+            for batch, (parsed, tokens) in await asyncio.gather(*(run(b) for b in batches)):
+                by_id = {str(item.get("id")): item for item in parsed}
+                per_cell = -(-tokens // len(batch))
+                for i, key in enumerate(batch):
+                    item = by_id.get(str(i))
+                    if item is not None:
+                        fresh[key] = ({f: item.get(f) for f in CELL_FIELDS}, per_cell)
+
+            await self.cache.put_many(CELL_CACHE_KIND, fresh)
+            answers.update({key: answer for key, (answer, _) in fresh.items()})
+
+        return [
+            {**answers[key], "id": cell_id}
+            for key, cell_ids in ids_by_key.items() if key in answers
+            for cell_id in cell_ids
+        ]
 
     async def _parse_cells_batch(
         self,
         cells: List[Dict[str, str]],
-    ) -> List[Dict[str, Any]]:
-        """Parse a batch of cells using AI."""
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Parse a batch of cells using AI; returns (parsed items, tokens used)."""
 
         system_prompt = """Sen O'zbekiston universitetlari dars jadvali hujayralarini tahlil qiladigan AI agentsan.
 
@@ -271,13 +411,13 @@ JSON formatda javob ber:
 
 Har bir katakchadan fan, tur, o'qituvchi, xona, binoni ajrat. Aniq bo'lmasa null qo'y."""
 
-        content = await self._call_claude(system_prompt, user_prompt, max_tokens=4000)
+        content, tokens = await self._request_claude(system_prompt, user_prompt, max_tokens=4000)
         if not content:
-            return []
+            return [], tokens
 
         try:
             result = json.loads(content)
-            parsed = result.get("parsed", [])
+            parsed = [item for item in result.get("parsed", []) if isinstance(item, dict)]
 
             valid_types = {"lecture", "practice", "lab", "seminar", "exam", "consultation"}
             for item in parsed:
@@ -286,11 +426,11 @@ Har bir katakchadan fan, tur, o'qituvchi, xona, binoni ajrat. Aniq bo'lmasa null
                     item["schedule_type"] = "lecture"
 
             logger.info(f"AI Cell Parsing: {len(parsed)} cells parsed")
-            return parsed
+            return parsed, tokens
 
-        except (json.JSONDecodeError, KeyError) as e:
+        except (json.JSONDecodeError, KeyError, AttributeError) as e:
             logger.error(f"AI cell parsing response parse error: {e}")
-            return []
+            return [], tokens
 
     # ═══════════════════════════════════════════════════════
     # 3. QUALITY ANALYSIS
@@ -417,6 +557,7 @@ Tahlil qil va aniq takliflar ber."""
                 "ai_parsed_cells": 0,
                 "analysis": None,
                 "tokens_used": 0,
+                "cache": self.cache.stats(),
             }
 
         logger.info(f"AI Schedule Agent: enhancing {len(records)} records...")
@@ -499,13 +640,16 @@ Tahlil qil va aniq takliflar ber."""
             "ai_parsed_cells": ai_parsed_count,
             "analysis": analysis,
             "tokens_used": self.total_tokens_used,
+            "cache": self.cache.stats(),
         }
 
         logger.info(
             f"AI Schedule Agent complete: "
             f"{len(result['ai_matched_groups'])} groups matched, "
             f"{ai_parsed_count} cells parsed, "
-            f"{self.total_tokens_used} tokens used"
+            f"{self.total_tokens_used} tokens used, "
+            f"cache hit rate {result['cache']['hit_rate']:.0%} "
+            f"({result['cache']['tokens_saved']} tokens saved)"
         )
 
         return result
@@ -4,6 +4,11 @@ UniControl - AI Service
 Handles AI analysis using OpenAI API (gpt-4o-mini).
 Full integration: student analysis, group analysis, chat, predictions, etc.
 
+Every model call is checked against and recorded in the caller's monthly
+ai_usage budget. Student/group analyses, dashboard insights and
+recommendations are cached by a fingerprint of their prompt data (see
+ai_analysis_cache), so repeated clicks on unchanged data are free.
+
 Author: UniControl Team
 Version: 3.0.1
 """
@@ -12,7 +17,7 @@ import json
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, case
 from sqlalchemy.orm import joinedload
 import openai
 from loguru import logger
@@ -26,13 +31,16 @@ from app.models.report import Report, ReportType, ReportStatus
 from app.models.schedule import Schedule, WeekDay
 from app.models.holiday import Holiday
 from app.core.exceptions import BadRequestException, ExternalAPIException, NotFoundException
+from app.services.ai_analysis_cache import cached_analysis
+from app.services.ai_usage_service import check_ai_limit, record_ai_usage
 
 
 class AIService:
     """AI analysis service — model va API sozlamalari .env dan olinadi."""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, user: Optional[User] = None):
         self.db = db
+        self.user = user  # whose AI budget model calls are charged to
         if settings.OPENAI_API_KEY:
             kwargs = {"api_key": settings.OPENAI_API_KEY}
             if settings.OPENAI_API_BASE_URL:
@@ -54,10 +62,15 @@ class AIService:
         temperature: float = None,
         response_format: str = None
     ) -> tuple:
-        """Call OpenAI API and return (content, tokens_used). Defaults from settings."""
+        """
+        Call OpenAI API and return (content, tokens_used). Defaults from settings.
+        With a user, the monthly budget is checked first (429 when spent)
+        and the tokens are recorded afterwards.
+        """
         max_tokens = max_tokens or settings.OPENAI_MAX_TOKENS
         temperature = temperature if temperature is not None else settings.OPENAI_TEMPERATURE
         self._check_api_key()
+        usage = await check_ai_limit(self.db, self.user) if self.user else None
         
         try:
             kwargs = {
@@ -78,8 +91,6 @@ class AIService:
             content = response.choices[0].message.content
             tokens = response.usage.total_tokens
             
-            return content, tokens
-            
         except openai.APIError as e:
             logger.error(f"OpenAI API error: {e}")
             raise ExternalAPIException("OpenAI", str(e))
@@ -87,6 +98,22 @@ class AIService:
             logger.error(f"OpenAI call failed: {e}")
             raise ExternalAPIException("OpenAI", f"Kutilmagan xatolik: {str(e)}")
 
+        if usage is not None:
+            await record_ai_usage(
+                self.db, usage, tokens,
+                input_tokens=response.usage.prompt_tokens or 0,
+                output_tokens=response.usage.completion_tokens or 0,
+            )
+        return content, tokens
+
+    async def _status_counts(self, *conditions, group_id: Optional[int] = None) -> Dict[AttendanceStatus, int]:
+        """Attendance rows per status matching the conditions (one aggregate query)."""
+        query = select(Attendance.status, func.count(Attendance.id)).where(*conditions)
+        if group_id:
+            query = query.join(Student, Student.id == Attendance.student_id).where(Student.group_id == group_id)
+        result = await self.db.execute(query.group_by(Attendance.status))
+        return {status: count for status, count in result.all()}
+
     # =========================================
     # STUDENT ANALYSIS
     # =========================================
@@ -111,19 +138,16 @@ class AIService:
         
         if include_attendance:
             date_from = today_tashkent() - timedelta(days=90)
-            att_result = await self.db.execute(
-                select(Attendance)
-                .where(Attendance.student_id == student_id)
-                .where(Attendance.date >= date_from)
-                .order_by(Attendance.date.desc())
+            counts = await self._status_counts(
+                Attendance.student_id == student_id,
+                Attendance.date >= date_from,
             )
-            attendances = att_result.scalars().all()
             
-            total = len(attendances)
-            present = sum(1 for a in attendances if a.status == AttendanceStatus.PRESENT)
-            absent = sum(1 for a in attendances if a.status == AttendanceStatus.ABSENT)
-            late = sum(1 for a in attendances if a.status == AttendanceStatus.LATE)
-            excused = sum(1 for a in attendances if a.status == AttendanceStatus.EXCUSED)
+            total = sum(counts.values())
+            present = counts.get(AttendanceStatus.PRESENT, 0)
+            absent = counts.get(AttendanceStatus.ABSENT, 0)
+            late = counts.get(AttendanceStatus.LATE, 0)
+            excused = counts.get(AttendanceStatus.EXCUSED, 0)
             
             context["attendance"] = {
                 "total": total,
@@ -144,6 +168,19 @@ class AIService:
             "is_active": student.is_active,
         }
         
+        return await cached_analysis(
+            "student", student_id, context,
+            lambda: self._analyze_student_ai(student_id, student_name, group_name, context),
+        )
+
+    async def _analyze_student_ai(
+        self,
+        student_id: int,
+        student_name: str,
+        group_name: str,
+        context: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Model call behind analyze_student."""
         system_prompt = """Sen UniControl universitetlar uchun boshqaruv tizimining AI tahlilchisisiz.
 Talaba haqida berilgan ma'lumotlarni chuqur tahlil qilib, JSON formatda javob ber.
 
@@ -228,6 +265,7 @@ Bu talabani tahlil qilib, JSON formatda natija ber."""
         students_result = await self.db.execute(
             select(Student).options(joinedload(Student.user))
             .where(Student.group_id == group_id)
+            .order_by(Student.id)
         )
         students = students_result.unique().scalars().all()
         
@@ -241,15 +279,21 @@ Bu talabani tahlil qilib, JSON formatda natija ber."""
             at_risk = []
             total_rate = 0
             
-            for s in students:
-                att_result = await self.db.execute(
-                    select(Attendance)
-                    .where(Attendance.student_id == s.id)
-                    .where(Attendance.date >= date_from)
+            # (total, present) per student in one grouped query
+            att_result = await self.db.execute(
+                select(
+                    Attendance.student_id,
+                    func.count(Attendance.id),
+                    func.sum(case((Attendance.status == AttendanceStatus.PRESENT, 1), else_=0)),
                 )
-                atts = att_result.scalars().all()
-                total = len(atts)
-                present = sum(1 for a in atts if a.status == AttendanceStatus.PRESENT)
+                .join(Student, Student.id == Attendance.student_id)
+                .where(Student.group_id == group_id, Attendance.date >= date_from)
+                .group_by(Attendance.student_id)
+            )
+            student_counts = {sid: (total, present) for sid, total, present in att_result.all()}
+            
+            for s in students:
+                total, present = student_counts.get(s.id, (0, 0))
                 rate = round(present / total * 100, 1) if total > 0 else 0
                 total_rate += rate
                 
@@ -266,6 +310,19 @@ Bu talabani tahlil qilib, JSON formatda natija ber."""
             context["top_performers"] = sorted(top_performers, key=lambda x: x["rate"], reverse=True)[:5]
             context["at_risk_students"] = sorted(at_risk, key=lambda x: x["rate"])[:5]
         
+        return await cached_analysis(
+            "group", group_id, context,
+            lambda: self._analyze_group_ai(group_id, group.name, len(students), context),
+        )
+
+    async def _analyze_group_ai(
+        self,
+        group_id: int,
+        group_name: str,
+        total_students: int,
+        context: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Model call behind analyze_group."""
         system_prompt = """Sen UniControl o'quv markazi boshqaruv tizimining AI tahlilchisisiz.
 Guruh haqida berilgan ma'lumotlarni tahlil qilib, JSON formatda javob ber.
 
@@ -283,8 +340,8 @@ O'zbek tilida javob ber."""
 
         user_prompt = f"""Guruh tahlili:
 
-Guruh: {group.name}
-Talabalar soni: {len(students)}
+Guruh: {group_name}
+Talabalar soni: {total_students}
 
 Ma'lumotlar:
 {json.dumps(context, indent=2, ensure_ascii=False)}
@@ -677,12 +734,9 @@ Xulosa qil. JSON formatda javob ber."""
         )
         total_students = total_students_r.scalar() or 0
         
-        att_result = await self.db.execute(
-            select(Attendance).where(Attendance.date >= date_30)
-        )
-        attendances = att_result.scalars().all()
-        total_att = len(attendances)
-        present_att = sum(1 for a in attendances if a.status == AttendanceStatus.PRESENT)
+        counts = await self._status_counts(Attendance.date >= date_30)
+        total_att = sum(counts.values())
+        present_att = counts.get(AttendanceStatus.PRESENT, 0)
         overall_rate = round(present_att / total_att * 100, 1) if total_att > 0 else 0
         
         groups_r = await self.db.execute(select(func.count(Group.id)))
@@ -704,6 +758,13 @@ Xulosa qil. JSON formatda javob ber."""
             "user_role": user_role
         }
         
+        return await cached_analysis(
+            "dashboard", user_role, context,
+            lambda: self._dashboard_insights_ai(context),
+        )
+
+    async def _dashboard_insights_ai(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Model call behind get_dashboard_insights."""
         system_prompt = """Sen UniControl universitetlar uchun boshqaruv tizimining AI tizimisiz.
 Berilgan statistikadan foydali, amaliy xulosalar va tavsiyalar chiqar.
 
@@ -770,19 +831,30 @@ JSON formatda insight va tavsiyalar ber."""
             raise NotFoundException(f"Talaba #{student_id} topilmadi")
         
         date_from = today_tashkent() - timedelta(days=30)
-        att_result = await self.db.execute(
-            select(Attendance)
-            .where(Attendance.student_id == student_id)
-            .where(Attendance.date >= date_from)
+        counts = await self._status_counts(
+            Attendance.student_id == student_id,
+            Attendance.date >= date_from,
         )
-        attendances = att_result.scalars().all()
-        total = len(attendances)
-        present = sum(1 for a in attendances if a.status == AttendanceStatus.PRESENT)
-        absent = sum(1 for a in attendances if a.status == AttendanceStatus.ABSENT)
+        total = sum(counts.values())
+        present = counts.get(AttendanceStatus.PRESENT, 0)
+        absent = counts.get(AttendanceStatus.ABSENT, 0)
         rate = round(present / total * 100, 1) if total > 0 else 0
         
-        student_name = student.user.name if student.user else f"#{student_id}"
-        
+        context = {
+            "student_name": student.user.name if student.user else f"#{student_id}",
+            "group_name": student.group.name if student.group else "N/A",
+            "rate": rate,
+            "present": present,
+            "total": total,
+            "absent": absent,
+        }
+        return await cached_analysis(
+            "recommendations", student_id, context,
+            lambda: self._recommendations_ai(student_id, context),
+        )
+
+    async def _recommendations_ai(self, student_id: int, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Model call behind get_recommendations."""
         system_prompt = """Sen talabaga shaxsiy tavsiyalar beruvchi AI yordamchisiz.
 
 JSON format:
@@ -797,9 +869,9 @@ JSON format:
 category: attendance, study, social, health
 O'zbek tilida, samimiy va motivatsion tarzda javob ber."""
 
-        user_prompt = f"""Talaba: {student_name}
-Guruh: {student.group.name if student.group else 'N/A'}
-Oxirgi 30 kun davomati: {rate}% ({present}/{total} kelgan, {absent} kelmagan)
+        user_prompt = f"""Talaba: {context["student_name"]}
+Guruh: {context["group_name"]}
+Oxirgi 30 kun davomati: {context["rate"]}% ({context["present"]}/{context["total"]} kelgan, {context["absent"]} kelmagan)
 
 Shaxsiy tavsiyalar ber. JSON formatda."""
 
@@ -818,7 +890,7 @@ Shaxsiy tavsiyalar ber. JSON formatda."""
             }
         
         result_data["student_id"] = student_id
-        result_data["current_rate"] = rate
+        result_data["current_rate"] = context["rate"]
         result_data["tokens_used"] = tokens
         return result_data
 
@@ -865,17 +937,12 @@ JSON format:
         """Get quick insights without OpenAI call."""
         
         date_from = today_tashkent() - timedelta(days=30)
-        query = select(Attendance).where(Attendance.date >= date_from)
-        if group_id:
-            query = query.join(Student).where(Student.group_id == group_id)
-        
-        result = await self.db.execute(query)
-        attendances = result.scalars().all()
+        counts = await self._status_counts(Attendance.date >= date_from, group_id=group_id)
         
-        total = len(attendances)
-        present = sum(1 for a in attendances if a.status == AttendanceStatus.PRESENT)
-        absent = sum(1 for a in attendances if a.status == AttendanceStatus.ABSENT)
-        late = sum(1 for a in attendances if a.status == AttendanceStatus.LATE)
+        total = sum(counts.values())
+        present = counts.get(AttendanceStatus.PRESENT, 0)
+        absent = counts.get(AttendanceStatus.ABSENT, 0)
+        late = counts.get(AttendanceStatus.LATE, 0)
         rate = round(present / total * 100, 1) if total > 0 else 0
         late_rate = round(late / total * 100, 1) if total > 0 else 0
         
@@ -0,0 +1,120 @@
+"""
+UniControl - AI Usage Accounting
+================================
+Per-user monthly AI budget in UZS, stored in ai_usage.
+
+AIService checks the budget right before every model call and records
+the tokens it spent right after, so answers served from the analysis
+cache neither need budget nor consume it.
+
+- Student: 1000 UZS/month
+- Staff (leader/admin/super): 1500 UZS/month
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import now_tashkent
+from app.models.ai_usage import AIUsage
+from app.models.user import User, UserRole
+
+
+# ================================================
+# COST CONSTANTS & HELPERS
+# ================================================
+# GPT-4o-mini: ~$0.15/1M input, ~$0.60/1M output tokens
+# Blended average: ~$0.30/1M tokens
+# 1 USD ≈ 12,800 UZS → 1M tokens ≈ 3,840 UZS
+COST_PER_TOKEN_UZS = 0.004  # ~0.004 UZS per token (conservative)
+
+STUDENT_MONTHLY_LIMIT_UZS = 1000.0   # 1000 so'm / oy
+STAFF_MONTHLY_LIMIT_UZS = 1500.0     # 1500 so'm / oy
+
+
+def get_monthly_limit(role: UserRole) -> float:
+    """Get monthly AI limit in UZS based on role."""
+    if role == UserRole.STUDENT:
+        return STUDENT_MONTHLY_LIMIT_UZS
+    return STAFF_MONTHLY_LIMIT_UZS
+
+
+async def get_or_create_usage(db: AsyncSession, user: User) -> AIUsage:
+    """Get or create the current month's AI usage record for a user."""
+    current_month = now_tashkent().strftime("%Y-%m")
+
+    # Concurrent first requests of the month must not collide on the unique index
+    await db.execute(
+        pg_insert(AIUsage)
+        .values(
+            user_id=user.id,
+            month=current_month,
+            total_tokens=0,
+            input_tokens=0,
+            output_tokens=0,
+            request_count=0,
+            cost_uzs=0.0,
+            limit_uzs=get_monthly_limit(user.role),
+            created_at=now_tashkent(),
+            updated_at=now_tashkent(),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "month"])
+    )
+    result = await db.execute(
+        select(AIUsage)
+        .where(AIUsage.user_id == user.id, AIUsage.month == current_month)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+async def check_ai_limit(db: AsyncSession, user: User) -> AIUsage:
+    """Check if user has remaining AI budget. Raises 429 if exceeded."""
+    usage = await get_or_create_usage(db, user)
+
+    if usage.cost_uzs >= usage.limit_uzs:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": "AI limit exceeded",
+                "message": f"Oylik AI limiti tugadi ({int(usage.limit_uzs)} so'm). Keyingi oyda qayta tiklanadi.",
+                "cost_uzs": round(usage.cost_uzs, 2),
+                "limit_uzs": usage.limit_uzs,
+                "remaining_uzs": 0,
+                "request_count": usage.request_count,
+                "month": usage.month,
+            }
+        )
+
+    return usage
+
+
+async def record_ai_usage(
+    db: AsyncSession,
+    usage: AIUsage,
+    total_tokens: int,
+    input_tokens: int = 0,
+    output_tokens: int = 0
+):
+    """Record token usage and cost after an AI call (atomic increment)."""
+    cost = total_tokens * COST_PER_TOKEN_UZS
+
+    await db.execute(
+        update(AIUsage)
+        .where(AIUsage.id == usage.id)
+        .values(
+            total_tokens=AIUsage.total_tokens + total_tokens,
+            input_tokens=AIUsage.input_tokens + input_tokens,
+            output_tokens=AIUsage.output_tokens + output_tokens,
+            request_count=AIUsage.request_count + 1,
+            cost_uzs=AIUsage.cost_uzs + cost,
+            updated_at=now_tashkent(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.refresh(usage)
+    return cost
@@ -0,0 +1,203 @@
+"""
+UniControl - Attendance Events
+==============================
+Pushes attendance changes to the Telegram bot through a Redis Stream
+instead of having the bot poll every subscribed group.
+
+1. Outbox: a session hook adds an attendance_events row for every new
+   attendance record and every status change, in the same flush and
+   transaction as the change itself. Nothing is published for a
+   rolled-back write, and nothing is lost if Redis is down. The hook
+   sees AttendanceService and every route that writes Attendance
+   through the ORM. Bulk writes through Core (AttendanceService.upsert_rows,
+   the Excel whole-day update) return the ids they touched and add the
+   same rows with add_bulk_events.
+2. Relay: a lifespan task in each worker publishes pending rows with
+   XADD to ATTENDANCE_EVENTS_STREAM and then deletes them. A commit
+   with events wakes it immediately; a periodic sweep picks up commits
+   made by other workers. Rows are claimed with FOR UPDATE SKIP LOCKED,
+   so workers never publish the same row twice.
+
+Each stream entry has group_id and data fields. data is the JSON
+record in the same shape as /telegram/attendance/group/{id}/updates,
+plus group_id, kind and event_id.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import json
+from typing import Iterable, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import ColumnElement, Table, delete, event, insert, inspect as sa_inspect, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import async_session_maker, get_redis
+from app.models.attendance import Attendance, AttendanceEvent
+from app.models.group import Group
+from app.models.student import Student
+
+
+RELAY_BATCH_SIZE = 500
+_SESSION_KEY = "attendance_events"
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+# ==================== Outbox ====================
+
+def _status_changed(attendance: Attendance) -> bool:
+    history = sa_inspect(attendance).attrs.status.history
+    return bool(history.added and history.deleted and history.added[0] != history.deleted[0])
+
+
+def _on_before_flush(session: Session, flush_context, instances) -> None:
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Attendance):
+            events.append(AttendanceEvent(attendance=obj, kind="created"))
+    for obj in session.dirty:
+        if isinstance(obj, Attendance) and obj not in session.deleted and _status_changed(obj):
+            events.append(AttendanceEvent(attendance=obj, kind="updated"))
+    if events:
+        session.add_all(events)
+        session.info[_SESSION_KEY] = True
+
+
+def _on_after_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_KEY, None) and _wakeup is not None:
+        _wakeup.set()
+
+
+def _on_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def status_changed_column(table: Table) -> ColumnElement[bool]:
+    """
+    For the RETURNING clause of a Core write to attendances: whether the
+    row's status differs from before the statement (true for new rows). A
+    subquery in RETURNING reads the statement's snapshot, i.e. the old row.
+    """
+    return literal_column(
+        f"(SELECT old.status FROM {table.name} AS old WHERE old.id = {table.name}.id)"
+        f" IS DISTINCT FROM {table.name}.status"
+    )
+
+
+async def add_bulk_events(db: AsyncSession, events: Iterable[Tuple[int, str]]) -> None:
+    """
+    Outbox rows for attendance written through Core, which the flush hook
+    does not see: (attendance id, "created" or "updated") pairs, added in
+    the caller's transaction.
+    """
+    if not settings.ATTENDANCE_EVENTS_ENABLED:
+        return
+    rows = [{"attendance_id": attendance_id, "kind": kind} for attendance_id, kind in events]
+    if rows:
+        await db.execute(insert(AttendanceEvent), rows)
+        db.info[_SESSION_KEY] = True
+
+
+def register_attendance_outbox() -> None:
+    """Install session hooks that write attendance_events rows."""
+    if not settings.ATTENDANCE_EVENTS_ENABLED:
+        return
+    if event.contains(Session, "after_commit", _on_after_commit):
+        return
+    event.listen(Session, "before_flush", _on_before_flush)
+    event.listen(Session, "after_commit", _on_after_commit)
+    event.listen(Session, "after_rollback", _on_after_rollback)
+
+
+# ==================== Relay ====================
+
+async def publish_pending(limit: int = RELAY_BATCH_SIZE) -> int:
+    """
+    Publish up to `limit` pending events in id order and delete them.
+    Events for records the backend already sent itself
+    (telegram_notified) are dropped. Returns the number of rows claimed.
+    """
+    async with async_session_maker() as db:
+        rows = (await db.execute(
+            select(
+                AttendanceEvent.id, AttendanceEvent.kind,
+                Attendance.id, Attendance.status, Attendance.note, Attendance.excuse_reason,
+                Attendance.late_minutes, Attendance.lesson_number, Attendance.subject,
+                Attendance.date, Attendance.updated_at, Attendance.telegram_notified,
+                Student.name, Group.id, Group.name,
+            )
+            .join(Attendance, Attendance.id == AttendanceEvent.attendance_id)
+            .join(Student, Student.id == Attendance.student_id)
+            .outerjoin(Group, Group.id == Student.group_id)
+            .order_by(AttendanceEvent.id)
+            .limit(limit)
+            .with_for_update(of=AttendanceEvent, skip_locked=True)
+        )).all()
+        if not rows:
+            return 0
+
+        redis = await get_redis()
+        pipe = redis.pipeline(transaction=False)
+        published = 0
+        for (event_id, kind, att_id, status, note, excuse_reason, late_minutes, lesson_number,
+             subject, att_date, updated_at, notified, student_name, group_id, group_code) in rows:
+            if notified or group_id is None:
+                continue
+            record = {
+                "id": att_id,
+                "student_name": student_name or "Unknown",
+                "status": status.value if status else None,
+                "reason": note or excuse_reason or "",
+                "late_minutes": late_minutes or 0,
+                "lesson_number": lesson_number,
+                "subject": subject,
+                "date": att_date.isoformat() if att_date else None,
+                "group_id": group_id,
+                "group_code": group_code,
+                "updated_at": updated_at.isoformat() if updated_at else None,
+                "kind": kind,
+                "event_id": event_id,
+            }
+            pipe.xadd(
+                settings.ATTENDANCE_EVENTS_STREAM,
+                {"group_id": group_id, "data": json.dumps(record, ensure_ascii=False)},
+                maxlen=settings.ATTENDANCE_EVENTS_MAXLEN,
+                approximate=True,
+            )
+            published += 1
+        if published:
+            await pipe.execute()
+
+        # A crash between XADD and this commit republishes the batch;
+        # the bot drops notifications it has already sent.
+        await db.execute(
+            delete(AttendanceEvent).where(AttendanceEvent.id.in_([row[0] for row in rows]))
+        )
+        await db.commit()
+        return len(rows)
+
+
+async def attendance_event_relay_loop() -> None:
+    """
+    Background loop started from the lifespan handler: publishes the
+    outbox right after local commits and sweeps it every
+    ATTENDANCE_EVENTS_SWEEP_SECONDS.
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.ATTENDANCE_EVENTS_SWEEP_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        try:
+            while await publish_pending() == RELAY_BATCH_SIZE:
+                pass
+        except Exception as e:
+            logger.warning(f"Attendance event relay failed, will retry: {e}")
@@ -0,0 +1,583 @@
+"""
+UniControl - Attendance Rollup Service
+======================================
+Maintains and reads the attendance_daily_stats rollup table.
+
+Writers record (group, date, status) deltas and flush them in one
+multi-row UPSERT inside their own transaction, so the rollup commits
+atomically with the attendance rows. Dashboards read O(groups x days)
+rollup rows instead of scanning attendances.
+
+The distinct-student counts (attendance_daily_students) are not
+additive, so each flush recounts them for the (group, date) slices it
+touched. A transaction advisory lock per group serializes the recounts,
+so each one sees the writes committed before it.
+
+A background loop periodically compares recent days with attendances
+and refreshes the slices that drifted.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, case, delete, func, insert, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings, today_tashkent
+from app.database import async_session_maker
+from app.models.attendance import Attendance, AttendanceDailyStat, AttendanceDailyStudents, AttendanceStatus
+from app.models.student import Student
+
+RECONCILE_LOCK_KEY = 0x726F6C6C  # pg advisory lock held by the reconciling worker
+
+
+def empty_counts() -> Dict[str, int]:
+    """Zeroed status counters in the shape dashboards return."""
+    return {"total": 0, "present": 0, "absent": 0, "late": 0, "excused": 0}
+
+
+def attendance_rate(counts: Dict[str, int], include_late: bool = False) -> float:
+    """Percentage of present (optionally + late) records, rounded to 0.1."""
+    total = counts.get("total", 0)
+    if not total:
+        return 0.0
+    present = counts.get("present", 0)
+    if include_late:
+        present += counts.get("late", 0)
+    return round(present / total * 100, 1)
+
+
+def empty_student_counts() -> Dict[str, int]:
+    """Zeroed distinct-student counters."""
+    return {"students": 0, "present": 0, "late": 0}
+
+
+def _students_source(students=Student.__table__):
+    """
+    Distinct students per (group, date) with any, a present and a late
+    record; `students` supplies each student's (id, group_id).
+    """
+    distinct_students = func.count(func.distinct(Attendance.student_id))
+    return (
+        select(
+            students.c.group_id,
+            Attendance.date,
+            distinct_students.label("students"),
+            distinct_students.filter(Attendance.status == AttendanceStatus.PRESENT).label("present"),
+            distinct_students.filter(Attendance.status == AttendanceStatus.LATE).label("late"),
+        )
+        .join(students, students.c.id == Attendance.student_id)
+        .group_by(students.c.group_id, Attendance.date)
+    )
+
+
+_STUDENTS_COLUMNS = ["group_id", "date", "students", "present", "late"]
+
+
+def _add_count(counts: Dict[str, int], status: AttendanceStatus, n: int) -> None:
+    counts[status.value] = counts.get(status.value, 0) + n
+    counts["total"] += n
+
+
+class AttendanceRollupService:
+    """Attendance daily rollup maintenance and queries."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._pending: Dict[Tuple[int, date, AttendanceStatus], int] = defaultdict(int)
+        self._student_groups: Dict[int, Optional[int]] = {}
+        # Students moved by move_students whose row may not be updated yet
+        self._moved: Dict[int, Optional[int]] = {}
+
+    # ==================== Write side ====================
+
+    async def group_ids_for_students(self, student_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+        """Resolve student -> group ids, caching per service instance."""
+        missing = {sid for sid in student_ids if sid not in self._student_groups}
+        if missing:
+            result = await self.db.execute(
+                select(Student.id, Student.group_id).where(Student.id.in_(missing))
+            )
+            for sid, gid in result.all():
+                self._student_groups[sid] = gid
+            for sid in missing:
+                self._student_groups.setdefault(sid, None)
+        return {sid: self._student_groups.get(sid) for sid in student_ids}
+
+    async def group_id_for_student(self, student_id: int) -> Optional[int]:
+        """Resolve a single student's group id."""
+        return (await self.group_ids_for_students([student_id]))[student_id]
+
+    def add(self, group_id: Optional[int], day: date, status: AttendanceStatus, delta: int = 1) -> None:
+        """Queue a count change for (group, date, status)."""
+        if group_id is None or not delta:
+            return
+        self._pending[(group_id, day, AttendanceStatus(status))] += delta
+
+    def move(
+        self,
+        group_id: Optional[int],
+        old_day: date,
+        old_status: AttendanceStatus,
+        new_day: date,
+        new_status: AttendanceStatus
+    ) -> None:
+        """Queue the change of one record from one (date, status) to another."""
+        if old_day == new_day and AttendanceStatus(old_status) == AttendanceStatus(new_status):
+            return
+        self.add(group_id, old_day, old_status, -1)
+        self.add(group_id, new_day, new_status, 1)
+
+    async def move_students(self, moves: Dict[int, Tuple[Optional[int], Optional[int]]]) -> None:
+        """
+        Move the counts of students' attendance from one group to another
+        (no commit): {student id: (old group, new group)}, new group None
+        when the student is deleted. Call while their attendance rows still
+        exist, i.e. before a delete is flushed. The student rows may be
+        updated before or after the call.
+        """
+        moves = {sid: groups for sid, groups in moves.items() if groups[0] != groups[1]}
+        if not moves:
+            return
+        result = await self.db.execute(
+            select(Attendance.student_id, Attendance.date, Attendance.status, func.count(Attendance.id))
+            .where(Attendance.student_id.in_(list(moves)))
+            .group_by(Attendance.student_id, Attendance.date, Attendance.status)
+        )
+        for sid, day, status, count in result.all():
+            old_group, new_group = moves[sid]
+            self.add(old_group, day, status, -count)
+            self.add(new_group, day, status, count)
+        for sid, (_, new_group) in moves.items():
+            self._student_groups[sid] = new_group
+            self._moved[sid] = new_group
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Apply queued deltas with a single multi-row UPSERT and recount the
+        distinct students of the touched slices (no commit).
+        """
+        rows = [
+            {"group_id": gid, "date": day, "status": st, "count": delta}
+            for (gid, day, st), delta in self._pending.items()
+            if delta
+        ]
+        self._pending.clear()
+        if not rows:
+            return
+
+        stmt = pg_insert(AttendanceDailyStat).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_attendance_daily_stats_group_date_status",
+            set_={"count": AttendanceDailyStat.count + stmt.excluded.count},
+        )
+        await self.db.execute(stmt)
+        await self.recount_students({(row["group_id"], row["date"]) for row in rows})
+
+    async def recount_students(self, slices: Iterable[Tuple[Optional[int], date]]) -> None:
+        """
+        Recount the distinct students of (group, date) slices from
+        attendances (no commit). Pending ORM changes are flushed first.
+        """
+        slices = {(gid, day) for gid, day in slices if gid is not None}
+        if not slices:
+            return
+        await self.db.flush()
+        for gid in sorted({gid for gid, _ in slices}):
+            await self.db.execute(
+                select(func.pg_advisory_xact_lock(func.hashtext(f"attendance_rollup:{gid}")))
+            )
+        keys = list(slices)
+        students = Student.__table__
+        if self._moved:
+            students = select(
+                Student.id,
+                case(self._moved, value=Student.id, else_=Student.group_id).label("group_id"),
+            ).subquery()
+        await self.db.execute(
+            delete(AttendanceDailyStudents).where(
+                tuple_(AttendanceDailyStudents.group_id, AttendanceDailyStudents.date).in_(keys)
+            )
+        )
+        await self.db.execute(
+            insert(AttendanceDailyStudents).from_select(
+                _STUDENTS_COLUMNS,
+                _students_source(students).where(tuple_(students.c.group_id, Attendance.date).in_(keys)),
+            )
+        )
+
+    async def refresh(self, slices: Iterable[Tuple[Optional[int], date]]) -> None:
+        """
+        Recompute the given (group, date) slices from attendances (no commit).
+
+        Used by write paths that change many rows without tracking each
+        old status (bulk imports, batch marking). Pending ORM changes are
+        flushed first so the recount sees them.
+        """
+        await self.db.flush()
+        by_date: Dict[date, set] = defaultdict(set)
+        for gid, day in slices:
+            if gid is not None:
+                by_date[day].add(gid)
+
+        for day, group_ids in by_date.items():
+            await self.db.execute(
+                delete(AttendanceDailyStat).where(
+                    AttendanceDailyStat.date == day,
+                    AttendanceDailyStat.group_id.in_(group_ids),
+                )
+            )
+            source = (
+                select(
+                    Student.group_id,
+                    Attendance.date,
+                    Attendance.status,
+                    func.count(Attendance.id),
+                )
+                .join(Student, Student.id == Attendance.student_id)
+                .where(Attendance.date == day, Student.group_id.in_(group_ids))
+                .group_by(Student.group_id, Attendance.date, Attendance.status)
+            )
+            await self.db.execute(
+                insert(AttendanceDailyStat).from_select(
+                    ["group_id", "date", "status", "count"], source
+                )
+            )
+        await self.recount_students((gid, day) for day, gids in by_date.items() for gid in gids)
+
+    async def refresh_for_students(self, pairs: Iterable[Tuple[int, date]]) -> None:
+        """Recompute the slices touched by (student_id, date) pairs (no commit)."""
+        pairs = list(pairs)
+        groups = await self.group_ids_for_students({sid for sid, _ in pairs})
+        await self.refresh({(groups.get(sid), day) for sid, day in pairs})
+
+    async def rebuild(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> int:
+        """
+        Rebuild the rollup from attendances for a date range (all dates by default).
+        Commits and returns the number of rollup rows written.
+        """
+        wipe = delete(AttendanceDailyStat)
+        source = (
+            select(
+                Student.group_id,
+                Attendance.date,
+                Attendance.status,
+                func.count(Attendance.id),
+            )
+            .join(Student, Student.id == Attendance.student_id)
+            .where(Student.group_id.is_not(None))
+            .group_by(Student.group_id, Attendance.date, Attendance.status)
+        )
+        wipe_students = delete(AttendanceDailyStudents)
+        students_source = _students_source().where(Student.group_id.is_not(None))
+        if date_from:
+            wipe = wipe.where(AttendanceDailyStat.date >= date_from)
+            source = source.where(Attendance.date >= date_from)
+            wipe_students = wipe_students.where(AttendanceDailyStudents.date >= date_from)
+            students_source = students_source.where(Attendance.date >= date_from)
+        if date_to:
+            wipe = wipe.where(AttendanceDailyStat.date <= date_to)
+            source = source.where(Attendance.date <= date_to)
+            wipe_students = wipe_students.where(AttendanceDailyStudents.date <= date_to)
+            students_source = students_source.where(Attendance.date <= date_to)
+
+        await self.db.execute(wipe)
+        await self.db.execute(
+            insert(AttendanceDailyStat).from_select(
+                ["group_id", "date", "status", "count"], source
+            )
+        )
+        await self.db.execute(wipe_students)
+        await self.db.execute(
+            insert(AttendanceDailyStudents).from_select(_STUDENTS_COLUMNS, students_source)
+        )
+        await self.db.commit()
+
+        count_query = select(func.count(AttendanceDailyStat.id))
+        if date_from:
+            count_query = count_query.where(AttendanceDailyStat.date >= date_from)
+        if date_to:
+            count_query = count_query.where(AttendanceDailyStat.date <= date_to)
+        rows = (await self.db.execute(count_query)).scalar() or 0
+        logger.info(f"Attendance rollup rebuilt: {rows} rows ({date_from or '*'} .. {date_to or '*'})")
+        return rows
+
+    async def rebuild_if_empty(self) -> bool:
+        """Backfill the rollup once when it (or its student counts) is empty but attendances exist."""
+        has_rollup = (await self.db.execute(select(AttendanceDailyStat.id).limit(1))).first()
+        has_students = (await self.db.execute(select(AttendanceDailyStudents.id).limit(1))).first()
+        if has_rollup and has_students:
+            return False
+        has_source = (await self.db.execute(select(Attendance.id).limit(1))).first()
+        if not has_source:
+            return False
+        await self.rebuild()
+        return True
+
+    async def reconcile(self, date_from: date) -> List[Tuple[int, date]]:
+        """
+        Compare the rollup from date_from on with attendances and refresh
+        the (group, date) slices that drifted (writes that bypassed the
+        service, group changes made elsewhere). Each comparison is one
+        statement, so it sees a consistent snapshot. Commits and returns
+        the refreshed slices.
+        """
+        expected = (
+            select(
+                Student.group_id,
+                Attendance.date,
+                Attendance.status,
+                func.count(Attendance.id).label("count"),
+            )
+            .join(Student, Student.id == Attendance.student_id)
+            .where(Attendance.date >= date_from, Student.group_id.is_not(None))
+            .group_by(Student.group_id, Attendance.date, Attendance.status)
+            .subquery()
+        )
+        actual = (
+            select(AttendanceDailyStat)
+            .where(AttendanceDailyStat.date >= date_from, AttendanceDailyStat.count != 0)
+            .subquery()
+        )
+        drifted = select(
+            func.coalesce(expected.c.group_id, actual.c.group_id),
+            func.coalesce(expected.c.date, actual.c.date),
+        ).select_from(
+            expected.join(actual, and_(
+                actual.c.group_id == expected.c.group_id,
+                actual.c.date == expected.c.date,
+                actual.c.status == expected.c.status,
+            ), full=True)
+        ).where(func.coalesce(expected.c.count, 0) != func.coalesce(actual.c.count, 0))
+        slices = set((await self.db.execute(drifted)).all())
+
+        expected_students = (
+            _students_source()
+            .where(Attendance.date >= date_from, Student.group_id.is_not(None))
+            .subquery()
+        )
+        exp = expected_students.c
+        actual_students = (
+            select(AttendanceDailyStudents)
+            .where(AttendanceDailyStudents.date >= date_from)
+            .subquery()
+        )
+        act = actual_students.c
+        drifted_students = select(
+            func.coalesce(exp.group_id, act.group_id),
+            func.coalesce(exp.date, act.date),
+        ).select_from(
+            expected_students.join(actual_students, and_(
+                act.group_id == exp.group_id, act.date == exp.date,
+            ), full=True)
+        ).where(or_(
+            act.group_id.is_(None),
+            exp.group_id.is_(None),
+            act.students != exp.students,
+            act.present != exp.present,
+            act.late != exp.late,
+        ))
+        slices.update((await self.db.execute(drifted_students)).all())
+
+        if slices:
+            await self.refresh(slices)
+        await self.db.commit()
+        return sorted(slices)
+
+    # ==================== Read side ====================
+
+    def _filtered(
+        self,
+        query,
+        date_from: date,
+        date_to: Optional[date],
+        group_ids: Optional[List[int]],
+        model=AttendanceDailyStat,
+    ):
+        if date_to is None:
+            query = query.where(model.date == date_from)
+        else:
+            query = query.where(model.date >= date_from, model.date <= date_to)
+        if group_ids is not None:
+            query = query.where(model.group_id.in_(group_ids))
+        return query
+
+    async def status_counts(
+        self,
+        date_from: date,
+        date_to: Optional[date] = None,
+        group_ids: Optional[List[int]] = None
+    ) -> Dict[str, int]:
+        """
+        Status totals for a single date (date_to=None) or an inclusive range.
+        group_ids=None means all groups.
+        """
+        counts = empty_counts()
+        if group_ids is not None and not group_ids:
+            return counts
+        query = self._filtered(
+            select(AttendanceDailyStat.status, func.sum(AttendanceDailyStat.count))
+            .group_by(AttendanceDailyStat.status),
+            date_from, date_to, group_ids,
+        )
+        for status, n in (await self.db.execute(query)).all():
+            _add_count(counts, status, int(n or 0))
+        return counts
+
+    async def daily_status_counts(
+        self,
+        date_from: date,
+        date_to: date,
+        group_ids: Optional[List[int]] = None
+    ) -> Dict[date, Dict[str, int]]:
+        """Per-date status totals, ordered by date; dates without records are omitted."""
+        daily: Dict[date, Dict[str, int]] = {}
+        if group_ids is not None and not group_ids:
+            return daily
+        query = self._filtered(
+            select(
+                AttendanceDailyStat.date,
+                AttendanceDailyStat.status,
+                func.sum(AttendanceDailyStat.count),
+            )
+            .group_by(AttendanceDailyStat.date, AttendanceDailyStat.status)
+            .order_by(AttendanceDailyStat.date),
+            date_from, date_to, group_ids,
+        )
+        for day, status, n in (await self.db.execute(query)).all():
+            if not n:
+                continue
+            _add_count(daily.setdefault(day, empty_counts()), status, int(n))
+        return daily
+
+    async def group_status_counts(
+        self,
+        date_from: date,
+        date_to: Optional[date] = None,
+        group_ids: Optional[List[int]] = None
+    ) -> Dict[int, Dict[str, int]]:
+        """Per-group status totals; groups without records are omitted."""
+        per_group: Dict[int, Dict[str, int]] = {}
+        if group_ids is not None and not group_ids:
+            return per_group
+        query = self._filtered(
+            select(
+                AttendanceDailyStat.group_id,
+                AttendanceDailyStat.status,
+                func.sum(AttendanceDailyStat.count),
+            )
+            .group_by(AttendanceDailyStat.group_id, AttendanceDailyStat.status),
+            date_from, date_to, group_ids,
+        )
+        for gid, status, n in (await self.db.execute(query)).all():
+            if not n:
+                continue
+            _add_count(per_group.setdefault(gid, empty_counts()), status, int(n))
+        return per_group
+
+    async def student_counts(
+        self,
+        date_from: date,
+        date_to: Optional[date] = None,
+        group_ids: Optional[List[int]] = None
+    ) -> Dict[str, int]:
+        """
+        Distinct students with any, a present and a late record on a date;
+        over a range they are summed per date (student-days).
+        """
+        counts = empty_student_counts()
+        if group_ids is not None and not group_ids:
+            return counts
+        query = self._filtered(
+            select(
+                func.sum(AttendanceDailyStudents.students),
+                func.sum(AttendanceDailyStudents.present),
+                func.sum(AttendanceDailyStudents.late),
+            ),
+            date_from, date_to, group_ids, AttendanceDailyStudents,
+        )
+        students, present, late = (await self.db.execute(query)).one()
+        counts.update(students=int(students or 0), present=int(present or 0), late=int(late or 0))
+        return counts
+
+    async def daily_student_counts(
+        self,
+        date_from: date,
+        date_to: date,
+        group_ids: Optional[List[int]] = None
+    ) -> Dict[date, Dict[str, int]]:
+        """Per-date distinct-student counts, ordered by date; dates without records are omitted."""
+        daily: Dict[date, Dict[str, int]] = {}
+        if group_ids is not None and not group_ids:
+            return daily
+        query = self._filtered(
+            select(
+                AttendanceDailyStudents.date,
+                func.sum(AttendanceDailyStudents.students),
+                func.sum(AttendanceDailyStudents.present),
+                func.sum(AttendanceDailyStudents.late),
+            )
+            .group_by(AttendanceDailyStudents.date)
+            .order_by(AttendanceDailyStudents.date),
+            date_from, date_to, group_ids, AttendanceDailyStudents,
+        )
+        for day, students, present, late in (await self.db.execute(query)).all():
+            if students:
+                daily[day] = {"students": int(students), "present": int(present or 0), "late": int(late or 0)}
+        return daily
+
+    async def group_student_counts(
+        self,
+        date_from: date,
+        date_to: Optional[date] = None,
+        group_ids: Optional[List[int]] = None
+    ) -> Dict[int, Dict[str, int]]:
+        """Per-group distinct-student counts (student-days over a range); groups without records are omitted."""
+        per_group: Dict[int, Dict[str, int]] = {}
+        if group_ids is not None and not group_ids:
+            return per_group
+        query = self._filtered(
+            select(
+                AttendanceDailyStudents.group_id,
+                func.sum(AttendanceDailyStudents.students),
+                func.sum(AttendanceDailyStudents.present),
+                func.sum(AttendanceDailyStudents.late),
+            )
+            .group_by(AttendanceDailyStudents.group_id),
+            date_from, date_to, group_ids, AttendanceDailyStudents,
+        )
+        for gid, students, present, late in (await self.db.execute(query)).all():
+            if students:
+                per_group[gid] = {"students": int(students), "present": int(present or 0), "late": int(late or 0)}
+        return per_group
+
+
+async def attendance_rollup_reconcile_loop() -> None:
+    """
+    Background loop started from the lifespan handler: every
+    ATTENDANCE_ROLLUP_RECONCILE_SECONDS, reconciles the last
+    ATTENDANCE_ROLLUP_RECONCILE_DAYS of the rollup with attendances.
+    Only one worker at a time does the work.
+    """
+    while True:
+        await asyncio.sleep(settings.ATTENDANCE_ROLLUP_RECONCILE_SECONDS)
+        try:
+            async with async_session_maker() as db:
+                locked = (await db.execute(
+                    select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_KEY))
+                )).scalar()
+                if locked:
+                    since = today_tashkent() - timedelta(days=settings.ATTENDANCE_ROLLUP_RECONCILE_DAYS)
+                    changed = await AttendanceRollupService(db).reconcile(since)
+                    if changed:
+                        logger.warning(f"Reconciled {len(changed)} drifted attendance rollup slices")
+        except Exception as e:
+            logger.error(f"Attendance rollup reconciliation failed: {e}")
@@ -8,9 +8,10 @@ Version: 1.0.0
 """
 
 from datetime import datetime, date, time
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Iterable, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, case, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import joinedload
 
 from app.models.attendance import Attendance, AttendanceStatus
@@ -25,6 +26,8 @@ from app.schemas.attendance import (
     StudentAttendanceSummary,
 )
 from app.core.exceptions import NotFoundException, ConflictException
+from app.services.attendance_events import add_bulk_events, status_changed_column
+from app.services.attendance_rollup_service import AttendanceRollupService
 
 
 class AttendanceService:
@@ -32,6 +35,7 @@ class AttendanceService:
     
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.rollup = AttendanceRollupService(db)
     
     async def get_by_id(self, attendance_id: int) -> Optional[Attendance]:
         """Get attendance by ID."""
@@ -118,26 +122,41 @@ class AttendanceService:
     ) -> Tuple[Attendance, bool]:
         """Create attendance record. Returns (attendance, is_new) tuple.
         is_new=True if a new record was created, False if existing was updated (upsert)."""
+        attendance, is_new = await self._upsert(attendance_data, recorded_by)
+        await self.rollup.flush()
+        await self.db.commit()
+        if is_new:
+            await self.db.refresh(attendance)
+        return attendance, is_new
+    
+    async def _upsert(
+        self,
+        attendance_data: AttendanceCreate,
+        recorded_by: Optional[int] = None
+    ) -> Tuple[Attendance, bool]:
+        """Insert or update one record and queue its rollup delta (no commit)."""
+        group_id = await self.rollup.group_id_for_student(attendance_data.student_id)
+        
         # Check if attendance already exists for this student and date
         existing_result = await self.db.execute(
             select(Attendance).where(
                 and_(
                     Attendance.student_id == attendance_data.student_id,
                     Attendance.date == attendance_data.date,
-                    Attendance.lesson_number == attendance_data.lesson_number
+                    # The constraint treats NULL lessons as equal
+                    Attendance.lesson_number.is_not_distinct_from(attendance_data.lesson_number)
                 )
             )
         )
         existing = existing_result.scalar_one_or_none()
         
         if existing:
-            # Track if status actually changed
-            old_status = existing.status
+            old_date, old_status = existing.date, existing.status
             # Update existing record
             for field, value in attendance_data.model_dump().items():
                 setattr(existing, field, value)
             existing.recorded_by = recorded_by
-            await self.db.commit()
+            self.rollup.move(group_id, old_date, old_status, existing.date, existing.status)
             # Return is_new=False — this is an upsert update
             return existing, False
         
@@ -148,11 +167,48 @@ class AttendanceService:
         )
         
         self.db.add(attendance)
-        await self.db.commit()
-        await self.db.refresh(attendance)
+        self.rollup.add(group_id, attendance.date, attendance.status)
         
         return attendance, True
     
+    async def upsert_rows(
+        self,
+        rows: List[Dict[str, Any]],
+        update_columns: Iterable[str] = ("status",),
+        keep_existing: Iterable[str] = (),
+    ) -> Tuple[int, int]:
+        """
+        Insert or update many records in one INSERT ... ON CONFLICT on
+        (student_id, date, lesson_number), with an attendance event for each
+        new record and status change. No commit and no rollup bookkeeping;
+        callers refresh the touched rollup slices.
+        
+        Args:
+            rows: Attendance column values; keys must be unique per row
+            update_columns: Columns overwritten on an existing record
+            keep_existing: Columns overwritten only by non-NULL values
+            
+        Returns:
+            (created, updated)
+        """
+        if not rows:
+            return 0, 0
+        stmt = pg_insert(Attendance)
+        current = Attendance.__table__.c
+        set_ = {col: stmt.excluded[col] for col in update_columns}
+        set_.update({col: func.coalesce(stmt.excluded[col], current[col]) for col in keep_existing})
+        set_["updated_at"] = stmt.excluded.updated_at
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_attendance_student_date_lesson", set_=set_
+        ).returning(current.id, literal_column("xmax = 0"), status_changed_column(Attendance.__table__))
+        written = (await self.db.execute(stmt, rows)).all()
+        await add_bulk_events(self.db, (
+            (attendance_id, "created" if inserted else "updated")
+            for attendance_id, inserted, changed in written if changed
+        ))
+        created = sum(1 for _, inserted, _ in written if inserted)
+        return created, len(written) - created
+    
     async def update(
         self,
         attendance_id: int,
@@ -163,10 +219,14 @@ class AttendanceService:
         if not attendance:
             raise NotFoundException("Attendance record not found")
         
+        old_status = attendance.status
         update_data = attendance_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(attendance, field, value)
         
+        group_id = await self.rollup.group_id_for_student(attendance.student_id)
+        self.rollup.move(group_id, attendance.date, old_status, attendance.date, attendance.status)
+        await self.rollup.flush()
         await self.db.commit()
         await self.db.refresh(attendance)
         
@@ -178,7 +238,10 @@ class AttendanceService:
         if not attendance:
             raise NotFoundException("Attendance record not found")
         
+        group_id = await self.rollup.group_id_for_student(attendance.student_id)
+        self.rollup.add(group_id, attendance.date, attendance.status, -1)
         await self.db.delete(attendance)
+        await self.rollup.flush()
         await self.db.commit()
         
         return True
@@ -190,10 +253,20 @@ class AttendanceService:
     ) -> Tuple[List[Attendance], int]:
         """Create attendance records in batch. 
         Returns (attendances, new_count) — new_count is how many were truly new (not upsert)."""
-        attendances = []
+        by_student: Dict[int, Attendance] = {}
+        created = []
         new_count = 0
         
-        for item in batch_data.attendances:
+        # Resolve all groups up front so _upsert doesn't query per student
+        await self.rollup.group_ids_for_students(
+            [item.student_id for item in batch_data.attendances]
+        )
+        
+        # Date and lesson are shared by the batch: a student listed twice
+        # is one record, and the last entry wins (nothing is flushed
+        # between entries, so two inserts would hit the unique constraint)
+        items = {item.student_id: item for item in batch_data.attendances}
+        for item in items.values():
             attendance_data = AttendanceCreate(
                 student_id=item.student_id,
                 date=batch_data.date,
@@ -205,12 +278,19 @@ class AttendanceService:
                 note=item.note,
             )
             
-            attendance, is_new = await self.create(attendance_data, recorded_by)
-            attendances.append(attendance)
+            attendance, is_new = await self._upsert(attendance_data, recorded_by)
+            by_student[item.student_id] = attendance
             if is_new:
                 new_count += 1
+                created.append(attendance)
+        
+        # One rollup UPSERT and one commit for the whole batch
+        await self.rollup.flush()
+        await self.db.commit()
+        for attendance in created:
+            await self.db.refresh(attendance)
         
-        return attendances, new_count
+        return [by_student[item.student_id] for item in batch_data.attendances], new_count
     
     async def get_daily_summary(
         self,
@@ -266,46 +346,119 @@ class AttendanceService:
             attendance_rate=float(present / total * 100) if total > 0 else 0
         )
     
-    async def get_student_stats(
+    # ==================== Aggregates ====================
+    
+    @staticmethod
+    def _aggregate_columns():
+        """Conditional counts + late minutes, shared by all aggregate queries."""
+        return (
+            func.count(Attendance.id).label("total"),
+            func.count(case((Attendance.status == AttendanceStatus.PRESENT, 1))).label("present"),
+            func.count(case((Attendance.status == AttendanceStatus.ABSENT, 1))).label("absent"),
+            func.count(case((Attendance.status == AttendanceStatus.LATE, 1))).label("late"),
+            func.count(case((Attendance.status == AttendanceStatus.EXCUSED, 1))).label("excused"),
+            func.coalesce(func.sum(Attendance.late_minutes), 0).label("late_minutes"),
+        )
+    
+    @staticmethod
+    def _aggregate_row(row) -> Dict[str, int]:
+        if row is None:
+            return {"total": 0, "present": 0, "absent": 0, "late": 0, "excused": 0, "late_minutes": 0}
+        return {
+            "total": row.total or 0,
+            "present": row.present or 0,
+            "absent": row.absent or 0,
+            "late": row.late or 0,
+            "excused": row.excused or 0,
+            "late_minutes": int(row.late_minutes or 0),
+        }
+    
+    def _aggregate_filters(
         self,
-        student_id: int,
-        date_from: Optional[date] = None,
-        date_to: Optional[date] = None
-    ) -> AttendanceStats:
-        """Get attendance statistics for a student."""
-        query = select(Attendance).where(Attendance.student_id == student_id)
-        
+        query,
+        student_ids: Optional[Iterable[int]],
+        group_id: Optional[int],
+        date_from: Optional[date],
+        date_to: Optional[date]
+    ):
+        if student_ids is not None:
+            query = query.where(Attendance.student_id.in_(list(student_ids)))
+        if group_id is not None:
+            query = query.join(Student, Student.id == Attendance.student_id).where(
+                Student.group_id == group_id
+            )
         if date_from:
             query = query.where(Attendance.date >= date_from)
         if date_to:
             query = query.where(Attendance.date <= date_to)
+        return query
+    
+    async def aggregate_by_student(
+        self,
+        student_ids: Optional[Iterable[int]] = None,
+        group_id: Optional[int] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict[int, Dict[str, int]]:
+        """
+        Per-student status counts and late minutes in ONE grouped query.
         
-        result = await self.db.execute(query)
-        attendances = result.scalars().all()
-        
-        total = len(attendances)
-        present = sum(1 for a in attendances if a.status == AttendanceStatus.PRESENT)
-        absent = sum(1 for a in attendances if a.status == AttendanceStatus.ABSENT)
-        late = sum(1 for a in attendances if a.status == AttendanceStatus.LATE)
-        excused = sum(1 for a in attendances if a.status == AttendanceStatus.EXCUSED)
+        Returns {student_id: {total, present, absent, late, excused, late_minutes}};
+        students without records are absent from the dict.
+        """
+        query = self._aggregate_filters(
+            select(Attendance.student_id, *self._aggregate_columns()),
+            student_ids, group_id, date_from, date_to,
+        ).group_by(Attendance.student_id)
         
+        result = await self.db.execute(query)
+        return {row.student_id: self._aggregate_row(row) for row in result.all()}
+    
+    async def aggregate_totals(
+        self,
+        student_ids: Optional[Iterable[int]] = None,
+        group_id: Optional[int] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict[str, int]:
+        """Status counts and late minutes over all matching records in one query."""
+        query = self._aggregate_filters(
+            select(*self._aggregate_columns()),
+            student_ids, group_id, date_from, date_to,
+        )
+        result = await self.db.execute(query)
+        return self._aggregate_row(result.first())
+    
+    @staticmethod
+    def _to_stats(agg: Dict[str, int]) -> AttendanceStats:
+        total = agg["total"]
         return AttendanceStats(
             total_days=total,
-            present_days=present,
-            absent_days=absent,
-            late_days=late,
-            excused_days=excused,
-            attendance_rate=float(present / total * 100) if total > 0 else 0,
-            late_rate=float(late / total * 100) if total > 0 else 0
+            present_days=agg["present"],
+            absent_days=agg["absent"],
+            late_days=agg["late"],
+            excused_days=agg["excused"],
+            attendance_rate=float(agg["present"] / total * 100) if total > 0 else 0,
+            late_rate=float(agg["late"] / total * 100) if total > 0 else 0
         )
     
+    async def get_student_stats(
+        self,
+        student_id: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> AttendanceStats:
+        """Get attendance statistics for a student."""
+        agg = await self.aggregate_totals([student_id], date_from=date_from, date_to=date_to)
+        return self._to_stats(agg)
+    
     async def get_group_attendance_summary(
         self,
         group_id: int,
         date_from: date,
         date_to: date
     ) -> List[StudentAttendanceSummary]:
-        """Get attendance summary for all students in a group."""
+        """Get attendance summary for all students in a group (2 queries total)."""
         # Get students
         students_result = await self.db.execute(
             select(Student)
@@ -316,19 +469,15 @@ class AttendanceService:
         )
         students = students_result.unique().scalars().all()
         
+        aggregates = await self.aggregate_by_student(
+            group_id=group_id, date_from=date_from, date_to=date_to
+        )
+        
         summaries = []
         
         for student in students:
-            stats = await self.get_student_stats(student.id, date_from, date_to)
-            
-            # Get total late minutes
-            late_result = await self.db.execute(
-                select(func.sum(Attendance.late_minutes))
-                .where(Attendance.student_id == student.id)
-                .where(Attendance.date >= date_from)
-                .where(Attendance.date <= date_to)
-            )
-            total_late = late_result.scalar() or 0
+            agg = aggregates.get(student.id) or self._aggregate_row(None)
+            stats = self._to_stats(agg)
             
             summaries.append(StudentAttendanceSummary(
                 student_id=student.id,
@@ -340,7 +489,7 @@ class AttendanceService:
                 late_days=stats.late_days,
                 excused_days=stats.excused_days,
                 attendance_rate=stats.attendance_rate,
-                total_late_minutes=total_late
+                total_late_minutes=agg["late_minutes"]
             ))
         
         return summaries
@@ -381,5 +530,7 @@ class AttendanceService:
                 self.db.add(attendance)
                 count += 1
         
+        self.rollup.add(group_id, target_date, AttendanceStatus.ABSENT, count)
+        await self.rollup.flush()
         await self.db.commit()
         return count
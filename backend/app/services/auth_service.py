@@ -16,12 +16,13 @@ from loguru import logger
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserLogin, Token, UserResponse
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    password_needs_rehash,
     create_access_token,
     create_refresh_token,
     verify_token,
 )
+from app.core.auth_cache import load_password_hash, mark_password_rehash
+from app.core.password_hasher import password_hasher
 from app.core.exceptions import (
     UnauthorizedException,
     BadRequestException,
@@ -69,7 +70,7 @@ class AuthService:
         
         logger.debug(f"User found: id={user.id}, login={user.login}, role={user.role}")
         
-        if not verify_password(password, user.password_hash):
+        if not await password_hasher.verify(password, user.password_hash):
             logger.warning(f"Wrong password attempt for user: {login}")
             raise UnauthorizedException("Login yoki parol noto'g'ri")
         
@@ -78,6 +79,11 @@ class AuthService:
         if not user.is_active:
             raise UnauthorizedException("Akkount faollashtirilmagan")
         
+        # Upgrade hashes made with an old cost factor while we have the password
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = await password_hasher.hash(password)
+            mark_password_rehash(user)
+        
         # Update last login
         user.last_login = now_tashkent()
         await self.db.commit()
@@ -123,7 +129,7 @@ class AuthService:
                         await self.db.flush()
         
         # Create tokens
-        access_token = create_access_token(user.id, user.role.value)
+        access_token = create_access_token(user.id, user.role.value, token_version=user.token_version)
         refresh_token = create_refresh_token(user.id)
         
         # Save refresh token to DB for server-side validation
@@ -173,7 +179,7 @@ class AuthService:
             raise UnauthorizedException("Refresh token has been revoked")
         
         # Create new tokens
-        access_token = create_access_token(user.id, user.role.value)
+        access_token = create_access_token(user.id, user.role.value, token_version=user.token_version)
         new_refresh_token = create_refresh_token(user.id)
         
         # Update stored refresh token (token rotation)
@@ -224,7 +230,7 @@ class AuthService:
             login=login_value,
             email=user_data.email,
             name=user_data.name,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await password_hasher.hash(user_data.password),
             role=user_data.role,
             phone=user_data.phone,
             avatar=user_data.avatar,
@@ -256,10 +262,11 @@ class AuthService:
         Raises:
             BadRequestException: If current password is wrong
         """
-        if not verify_password(current_password, user.password_hash):
+        password_hash = await load_password_hash(self.db, user)
+        if not await password_hasher.verify(current_password, password_hash):
             raise BadRequestException("Current password is incorrect")
         
-        user.password_hash = get_password_hash(new_password)
+        user.password_hash = await password_hasher.hash(new_password)
         await self.db.commit()
         
         return True
@@ -309,7 +316,7 @@ class AuthService:
             login=email,
             email=email,
             name=name,
-            password_hash=get_password_hash(password),
+            password_hash=await password_hasher.hash(password),
             role=UserRole.SUPERADMIN,
             is_active=True,
         )
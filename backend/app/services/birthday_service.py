@@ -0,0 +1,118 @@
+"""
+UniControl - Birthday Service
+=============================
+Birthday lists for the Telegram bot's 06:00 greetings job.
+
+Students are matched on (month, day) of birth_date through the
+ix_students_birth_month_day expression index, with their group joined
+in the same query. A birthday on 29 February is celebrated on
+28 February in non-leap years.
+
+The list for a day, across all groups, is precomputed a day ahead and
+kept in Redis under birthdays:<date>:<students/groups versions>, so the
+bot's morning call is a single GET. A write to students or groups bumps
+the version (see app.core.cache), which makes the list recompute on the
+next request.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import calendar
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from loguru import logger
+from sqlalchemy import and_, extract, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import today_tashkent
+from app.core.cache import table_versions
+from app.database import async_session_maker, get_redis
+from app.models.group import Group
+from app.models.student import Student
+
+
+BIRTHDAYS_PREFIX = "birthdays:"
+BIRTHDAYS_TTL = 2 * 24 * 3600  # a list is computed a day ahead and used for a day
+DEPENDS_ON = ("students", "groups")
+
+
+def _month_day_matches(day: date):
+    month = extract("month", Student.birth_date)
+    dom = extract("day", Student.birth_date)
+    condition = and_(month == day.month, dom == day.day)
+    if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+        condition = or_(condition, and_(month == 2, dom == 29))
+    return condition
+
+
+async def find_birthdays(db: AsyncSession, day: date) -> List[Dict[str, Any]]:
+    """Students whose birthday is on the given day, with group info."""
+    result = await db.execute(
+        select(
+            Student.id, Student.user_id, Student.name, Student.birth_date,
+            Student.group_id, Student.student_id, Student.phone, Group.name,
+        )
+        .outerjoin(Group, Group.id == Student.group_id)
+        .where(Student.birth_date.isnot(None), _month_day_matches(day))
+        .order_by(Student.group_id, Student.id)
+    )
+    return [
+        {
+            "student_id": sid,
+            "user_id": user_id,
+            "name": name or "Noma'lum",
+            "birth_date": birth_date.isoformat(),
+            "age": day.year - birth_date.year,
+            "group_id": group_id,
+            "group_code": group_name,
+            "group_name": group_name,
+            "student_code": student_code,
+            "phone": phone,
+        }
+        for sid, user_id, name, birth_date, group_id, student_code, phone, group_name in result.all()
+    ]
+
+
+async def _cache_key(day: date) -> str:
+    return f"{BIRTHDAYS_PREFIX}{day.isoformat()}:{await table_versions(*DEPENDS_ON)}"
+
+
+async def get_birthdays(db: AsyncSession, day: date) -> List[Dict[str, Any]]:
+    """The day's birthday list from Redis, computing and caching it on a miss."""
+    try:
+        redis = await get_redis()
+        key = await _cache_key(day)
+        cached = await redis.get(key)
+    except Exception as e:
+        logger.debug(f"Birthday cache unavailable: {e}")
+        return await find_birthdays(db, day)
+
+    if cached is not None:
+        return json.loads(cached)
+
+    birthdays = await find_birthdays(db, day)
+    try:
+        await redis.set(key, json.dumps(birthdays, ensure_ascii=False), ex=BIRTHDAYS_TTL)
+    except Exception as e:
+        logger.debug(f"Birthday cache write failed: {e}")
+    return birthdays
+
+
+async def birthday_precompute_loop(interval_hours: float = 1) -> None:
+    """
+    Background loop started from the lifespan handler: keeps today's and
+    tomorrow's lists warm (a no-op GET when they are already cached).
+    """
+    while True:
+        try:
+            today = today_tashkent()
+            async with async_session_maker() as db:
+                for day in (today, today + timedelta(days=1)):
+                    await get_birthdays(db, day)
+        except Exception as e:
+            logger.error(f"Birthday precompute failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
@@ -25,6 +25,7 @@ from app.schemas.contract import (
     ContractImportResult,
 )
 from app.core.exceptions import NotFoundException, ConflictException, BadRequestException
+from app.services.table_export import XlsxExport, stream_rows
 
 logger = logging.getLogger(__name__)
 
@@ -651,42 +652,38 @@ class ContractService:
         self,
         academic_year: Optional[str] = None,
         group_id: Optional[int] = None,
-    ) -> bytes:
-        """Export contracts to Excel."""
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        
+    ) -> XlsxExport:
+        """Export contracts to Excel, streamed from the database."""
         query = (
-            select(Contract)
-            .options(
-                joinedload(Contract.student).joinedload(Student.group)
+            select(
+                Student.name, Student.jshshir, Student.passport, Student.phone,
+                Contract.course, Contract.student_status, Group.name, Contract.direction,
+                Contract.education_form, Contract.contract_amount, Contract.grant_percentage,
+                Contract.grant_amount, Contract.debt_amount, Contract.payment_percentage,
+                Contract.total_paid, Contract.refund_amount, Contract.year_start_balance,
+                Contract.year_end_balance,
             )
+            .select_from(Contract)
+            .outerjoin(Student, Student.id == Contract.student_id)
+            .outerjoin(Group, Group.id == Student.group_id)
         )
         
         if academic_year:
             query = query.where(Contract.academic_year == academic_year)
         if group_id:
-            query = query.join(Contract.student).where(Student.group_id == group_id)
+            query = query.where(Student.group_id == group_id)
         
         query = query.order_by(Contract.id)
         
-        result = await self.db.execute(query)
-        contracts = result.unique().scalars().all()
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = academic_year or "Kontrakt ma'lumotlari"
+        export = XlsxExport(academic_year or "Kontrakt ma'lumotlari")
         
         # Header style
-        header_font = Font(bold=True, size=11)
-        header_fill = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin'),
-        )
+        thin_border = {"border": 1}
+        header_format = export.add_format({
+            "bold": True, "font_size": 11, "bg_color": "#FFD700",
+            "align": "center", "valign": "vcenter", "text_wrap": True, **thin_border,
+        })
+        cell_format = export.add_format(thin_border)
         
         # Headers (matching Excel template)
         headers = [
@@ -710,50 +707,45 @@ class ContractService:
             "Yil boshiga qoldiq",
             "Yil yakuniga qoldiq",
         ]
-        
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
+        export.row(headers, header_format)
         
         # Data rows
-        for idx, contract in enumerate(contracts, 1):
-            row = idx + 1
-            ws.cell(row=row, column=1, value=idx).border = thin_border
-            ws.cell(row=row, column=2, value=contract.student_name or "").border = thin_border
-            ws.cell(row=row, column=3, value=contract.student_jshshir or "").border = thin_border
-            ws.cell(row=row, column=4, value=contract.student.passport if contract.student else "").border = thin_border
-            ws.cell(row=row, column=5, value=contract.student.phone if contract.student else "").border = thin_border
-            ws.cell(row=row, column=6, value=contract.course or "").border = thin_border
-            ws.cell(row=row, column=7, value=contract.student_status or "").border = thin_border
-            ws.cell(row=row, column=8, value=contract.group_name or "").border = thin_border
-            ws.cell(row=row, column=9, value=contract.direction or "").border = thin_border
-            ws.cell(row=row, column=10, value=contract.education_form or "").border = thin_border
-            ws.cell(row=row, column=11, value=float(contract.contract_amount)).border = thin_border
-            ws.cell(row=row, column=12, value=contract.grant_percentage or 0).border = thin_border
-            ws.cell(row=row, column=13, value=float(contract.grant_amount)).border = thin_border
-            ws.cell(row=row, column=14, value=float(contract.debt_amount)).border = thin_border
-            ws.cell(row=row, column=15, value=contract.payment_percentage or 0).border = thin_border
-            ws.cell(row=row, column=16, value=float(contract.total_paid)).border = thin_border
-            ws.cell(row=row, column=17, value=float(contract.refund_amount)).border = thin_border
-            ws.cell(row=row, column=18, value=float(contract.year_start_balance)).border = thin_border
-            ws.cell(row=row, column=19, value=float(contract.year_end_balance)).border = thin_border
+        def write(rows, first: int) -> None:
+            for idx, row in enumerate(rows, first):
+                (name, jshshir, passport, phone, course, student_status, group_name,
+                 direction, education_form, contract_amount, grant_percentage, *amounts) = row
+                grant_amount, debt_amount, payment_percentage, total_paid, refund, start, end = amounts
+                export.row([
+                    idx,
+                    name or "",
+                    jshshir or "",
+                    passport or "",
+                    phone or "",
+                    course or "",
+                    student_status or "",
+                    group_name or "",
+                    direction or "",
+                    education_form or "",
+                    float(contract_amount),
+                    grant_percentage or 0,
+                    float(grant_amount),
+                    float(debt_amount),
+                    payment_percentage or 0,
+                    float(total_paid),
+                    float(refund),
+                    float(start),
+                    float(end),
+                ], cell_format)
+        
+        written = 0
+        try:
+            async for rows in stream_rows(self.db, query):
+                await export.write(lambda rows=rows, first=written + 1: write(rows, first))
+                written += len(rows)
+        except BaseException:
+            export.discard()
+            raise
         
         # Auto-width columns
-        for col in ws.columns:
-            max_length = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                try:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except Exception:
-                    pass
-            ws.column_dimensions[col_letter].width = min(max_length + 4, 30)
-        
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output.getvalue()
+        export.fit_columns(padding=4, limit=30)
+        return export
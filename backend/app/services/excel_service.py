@@ -20,10 +20,12 @@ Version: 2.0.0
 
 import io
 import re
+import time
 import logging
+from collections import Counter
 from datetime import datetime, date, time as dt_time
 from decimal import Decimal
-from typing import Optional, List, Dict, Any, Set
+from typing import Optional, List, Dict, Any, Set, Iterable, Tuple, Callable, Awaitable
 from difflib import SequenceMatcher
 
 import pandas as pd
@@ -31,7 +33,8 @@ from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils import get_column_letter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, text
+from sqlalchemy import column, select, func, text, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import joinedload
 
 from app.config import now_tashkent, today_tashkent
@@ -39,7 +42,14 @@ from app.models.student import Student
 from app.models.group import Group
 from app.models.attendance import Attendance, AttendanceStatus
 from app.models.schedule import Schedule, WeekDay, ScheduleType, WeekType
+from app.core.auth_cache import invalidate_users
+from app.core.cache import invalidate
 from app.core.exceptions import BadRequestException
+from app.services.attendance_events import add_bulk_events, status_changed_column
+from app.services.attendance_rollup_service import AttendanceRollupService
+from app.services.schedule_grid import SheetGrid, load_schedule_grids
+from app.services.search_service import SearchService, build_document
+from app.services.table_export import CsvExport, TableExport, XlsxExport, stream_rows
 
 logger = logging.getLogger(__name__)
 
@@ -104,6 +114,129 @@ def build_group_lookup(groups: list) -> Dict[str, Any]:
     return lookup
 
 
+class GroupIndex:
+    """
+    Group name -> id index for resolving many rows against the same groups.
+
+    Normalized names are computed once per group instead of once per
+    candidate per row, and resolved names are memoized, so the fuzzy scan
+    runs at most once per distinct spelling in a file. Matching follows
+    fuzzy_match_group: exact name, exact normalized name, then the best
+    SequenceMatcher ratio >= threshold.
+    """
+
+    def __init__(self, groups: Iterable[Tuple[int, str]], threshold: float = 0.70):
+        self.threshold = threshold
+        self._by_name: Dict[str, int] = {}
+        self._by_norm: Dict[str, int] = {}
+        self._resolved: Dict[str, int] = {}
+        for group_id, name in groups:
+            self.add(name, group_id)
+
+    def add(self, name: str, group_id: int, exact_only: bool = False) -> None:
+        """exact_only: match this name verbatim but never as a fuzzy candidate."""
+        self._by_name[name] = group_id
+        if not exact_only:
+            self._by_norm[normalize_group_name(name)] = group_id
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Group id for a (possibly misspelled) name, or None."""
+        group_id = self._by_name.get(name) or self._resolved.get(name)
+        if group_id is not None:
+            return group_id
+        norm = normalize_group_name(name)
+        group_id = self._by_norm.get(norm)
+        if group_id is None:
+            best_score = 0.0
+            for candidate, candidate_id in self._by_norm.items():
+                matcher = SequenceMatcher(None, norm, candidate)
+                # Cheap upper bounds first; ratio() is the expensive part
+                if matcher.real_quick_ratio() < self.threshold or matcher.quick_ratio() < self.threshold:
+                    continue
+                score = matcher.ratio()
+                if score > best_score and score >= self.threshold:
+                    best_score = score
+                    group_id = candidate_id
+        if group_id is not None:
+            self._resolved[name] = group_id
+        return group_id
+
+
+def _cell_str(row: tuple, index: int) -> str:
+    return str(row[index] or "").strip() if len(row) > index else ""
+
+
+def text_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """A column as stripped strings ("" for blanks); whole-number floats lose ".0"."""
+    if column not in df.columns:
+        return pd.Series("", index=df.index)
+    values = df[column].astype(object).where(df[column].notna(), "")
+    return values.astype(str).str.strip().str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+
+
+def parse_kontingent_row(row: tuple) -> Optional[Dict[str, Any]]:
+    """
+    Parse one Kontingent data row (row 3+) into student fields.
+    Returns None for rows without a student id or name.
+    """
+    if not row or len(row) < 2:
+        return None
+
+    student_id = _cell_str(row, 0)
+    full_name = _cell_str(row, 1)
+    if not student_id or not full_name:
+        return None
+
+    birth_date_raw = row[6] if len(row) > 6 else None
+    course = row[13] if len(row) > 13 else None
+
+    # Address fields
+    address_parts = [p for p in (_cell_str(row, i) for i in (15, 16, 17, 18)) if p]
+    full_address = (
+        ", ".join(address_parts) if address_parts
+        else _cell_str(row, 22) or _cell_str(row, 21)
+    )
+
+    # Parse birth_date
+    parsed_birth_date = None
+    if birth_date_raw:
+        if isinstance(birth_date_raw, datetime):
+            parsed_birth_date = birth_date_raw.date()
+        elif isinstance(birth_date_raw, date):
+            parsed_birth_date = birth_date_raw
+        elif isinstance(birth_date_raw, str):
+            for fmt in ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y"]:
+                try:
+                    parsed_birth_date = datetime.strptime(birth_date_raw.strip(), fmt).date()
+                    break
+                except Exception:
+                    pass
+
+    # Parse course number
+    course_num = 1
+    if course:
+        if isinstance(course, (int, float)):
+            course_num = int(course)
+        elif isinstance(course, str):
+            match = re.search(r'(\d+)', str(course))
+            if match:
+                course_num = int(match.group(1))
+
+    return {
+        "student_id": student_id,
+        "name": full_name,
+        "phone": _cell_str(row, 7) or None,
+        "passport": _cell_str(row, 3) or None,
+        "jshshir": _cell_str(row, 4) or None,
+        "birth_date": parsed_birth_date,
+        "address": full_address or None,
+        "commute": _cell_str(row, 23) or None,
+        "group_name": _cell_str(row, 14),
+        "specialty": _cell_str(row, 12),
+        "course": course_num,
+    }
+
+
 # ═══════════════════════════════════════════════════════════════
 # HELPER: Day / Time Parsing
 # ═══════════════════════════════════════════════════════════════
@@ -197,45 +330,63 @@ class ExcelService:
     async def export_students(
         self,
         group_id: Optional[int] = None,
-        include_all_columns: bool = False
-    ) -> io.BytesIO:
-        """Export students to Excel."""
-        query = select(Student).options(joinedload(Student.group))
+        include_all_columns: bool = False,
+        fmt: str = "xlsx",
+    ) -> TableExport:
+        """Export students to Excel or CSV, streamed from the database."""
+        columns = [
+            Student.student_id, Student.name, Group.name, Student.phone, Student.email,
+            Student.birth_date, Student.gender, Student.contract_amount, Student.contract_paid,
+            Student.is_active,
+        ]
+        headers = [
+            "ID", "F.I.O", "Guruh", "Telefon", "Email", "Tug'ilgan sana", "Jinsi",
+            "Kontrakt", "To'langan", "Qoldi", "Holati",
+        ]
+        if include_all_columns:
+            columns += [
+                Student.address, Student.commute, Student.passport, Student.jshshir,
+                Student.enrollment_date, Student.graduation_date, Student.is_leader,
+            ]
+            headers += [
+                "Manzil", "Transport", "Pasport", "JSHSHIR",
+                "Qabul sanasi", "Bitirish sanasi", "Guruh lideri",
+            ]
+        query = select(*columns).outerjoin(Group, Group.id == Student.group_id)
         if group_id:
             query = query.where(Student.group_id == group_id)
         query = query.order_by(Student.name)
 
-        result = await self.db.execute(query)
-        students = result.unique().scalars().all()
-
-        data = []
-        for s in students:
-            row = {
-                "ID": s.student_id,
-                "F.I.O": s.name,
-                "Guruh": s.group.name if s.group else "",
-                "Telefon": s.phone or "",
-                "Email": s.email or "",
-                "Tug'ilgan sana": s.birth_date.strftime("%d.%m.%Y") if s.birth_date else "",
-                "Jinsi": "Erkak" if s.gender == "male" else "Ayol" if s.gender == "female" else "",
-                "Kontrakt": float(s.contract_amount),
-                "To'langan": float(s.contract_paid),
-                "Qoldi": float(s.contract_remaining),
-                "Holati": "Faol" if s.is_active else "Nofaol",
-            }
+        def cells(row) -> list:
+            (student_id, name, group_name, phone, email, birth_date, gender,
+             amount, paid, is_active) = row[:10]
+            values = [
+                student_id,
+                name,
+                group_name or "",
+                phone or "",
+                email or "",
+                birth_date.strftime("%d.%m.%Y") if birth_date else "",
+                "Erkak" if gender == "male" else "Ayol" if gender == "female" else "",
+                float(amount),
+                float(paid),
+                float(amount - paid),
+                "Faol" if is_active else "Nofaol",
+            ]
             if include_all_columns:
-                row.update({
-                    "Manzil": s.address or "",
-                    "Transport": s.commute or "",
-                    "Pasport": s.passport or "",
-                    "JSHSHIR": s.jshshir or "",
-                    "Qabul sanasi": s.enrollment_date.strftime("%d.%m.%Y") if s.enrollment_date else "",
-                    "Bitirish sanasi": s.graduation_date.strftime("%d.%m.%Y") if s.graduation_date else "",
-                    "Guruh lideri": "Ha" if s.is_leader else "Yo'q",
-                })
-            data.append(row)
-
-        return self._create_excel_file(pd.DataFrame(data), "Talabalar ro'yxati")
+                address, commute, passport, jshshir, enrolled, graduated, is_leader = row[10:]
+                values += [
+                    address or "",
+                    commute or "",
+                    passport or "",
+                    jshshir or "",
+                    enrolled.strftime("%d.%m.%Y") if enrolled else "",
+                    graduated.strftime("%d.%m.%Y") if graduated else "",
+                    "Ha" if is_leader else "Yo'q",
+                ]
+            return values
+
+        return await self._stream_table(query, "Talabalar ro'yxati", headers, cells, fmt)
 
     async def export_my_data(self, current_user) -> io.BytesIO:
         """
@@ -426,42 +577,49 @@ class ExcelService:
         self,
         group_id: Optional[int] = None,
         date_from: Optional[date] = None,
-        date_to: Optional[date] = None
-    ) -> io.BytesIO:
-        """Export attendance to Excel."""
-        query = select(Attendance).options(
-            joinedload(Attendance.student).joinedload(Student.group)
+        date_to: Optional[date] = None,
+        fmt: str = "xlsx",
+    ) -> TableExport:
+        """Export attendance to Excel or CSV, streamed from the database."""
+        query = (
+            select(
+                Attendance.date, Student.name, Group.name, Attendance.status,
+                Attendance.late_minutes, Attendance.subject, Attendance.lesson_number, Attendance.note,
+            )
+            .select_from(Attendance)
+            .outerjoin(Student, Student.id == Attendance.student_id)
+            .outerjoin(Group, Group.id == Student.group_id)
         )
         if group_id:
-            query = query.join(Student).where(Student.group_id == group_id)
+            query = query.where(Student.group_id == group_id)
         if date_from:
             query = query.where(Attendance.date >= date_from)
         if date_to:
             query = query.where(Attendance.date <= date_to)
         query = query.order_by(Attendance.date.desc(), Attendance.student_id)
 
-        result = await self.db.execute(query)
-        attendances = result.unique().scalars().all()
-
         status_map = {
             AttendanceStatus.PRESENT: "Keldi",
             AttendanceStatus.ABSENT: "Kelmadi",
             AttendanceStatus.LATE: "Kech qoldi",
             AttendanceStatus.EXCUSED: "Sababli",
         }
-        data = []
-        for a in attendances:
-            data.append({
-                "Sana": a.date.strftime("%d.%m.%Y"),
-                "Talaba": a.student.name if a.student else "",
-                "Guruh": a.student.group.name if a.student and a.student.group else "",
-                "Holat": status_map.get(a.status, ""),
-                "Kechikish (min)": a.late_minutes,
-                "Fan": a.subject or "",
-                "Para": a.lesson_number or "",
-                "Izoh": a.note or "",
-            })
-        return self._create_excel_file(pd.DataFrame(data), "Davomat")
+
+        def cells(row) -> list:
+            day, student, group_name, status, late_minutes, subject, lesson_number, note = row
+            return [
+                day.strftime("%d.%m.%Y"),
+                student or "",
+                group_name or "",
+                status_map.get(status, ""),
+                late_minutes,
+                subject or "",
+                lesson_number or "",
+                note or "",
+            ]
+
+        headers = ["Sana", "Talaba", "Guruh", "Holat", "Kechikish (min)", "Fan", "Para", "Izoh"]
+        return await self._stream_table(query, "Davomat", headers, cells, fmt)
 
     async def export_attendance_printable(
         self,
@@ -470,19 +628,29 @@ class ExcelService:
         date_to: Optional[date] = None,
         status_filter: Optional[str] = None,
         faculty: Optional[str] = None,
-    ) -> io.BytesIO:
+    ) -> XlsxExport:
         """
         Export attendance to print-ready Excel.
         Large cells, bold fonts, borders — ready to print and paste on boards.
+
+        Everything in the sheet comes from one streamed query, so the title,
+        rows and totals agree: the group name of the title is taken from the
+        first batch, and the totals are counted while the rows are written
+        and follow them.
         """
         query = (
-            select(Attendance)
-            .options(joinedload(Attendance.student).joinedload(Student.group))
+            select(
+                Attendance.date, Student.name, Group.name, Attendance.status,
+                Attendance.subject, Attendance.lesson_number, Attendance.late_minutes, Attendance.note,
+            )
+            .select_from(Attendance)
+            .outerjoin(Student, Student.id == Attendance.student_id)
+            .outerjoin(Group, Group.id == Student.group_id)
         )
         if group_id:
-            query = query.join(Student, Student.id == Attendance.student_id).where(Student.group_id == group_id)
+            query = query.where(Student.group_id == group_id)
         elif faculty:
-            query = query.join(Student, Student.id == Attendance.student_id).join(Group, Group.id == Student.group_id).where(Group.faculty == faculty)
+            query = query.where(Group.faculty == faculty)
 
         if date_from:
             query = query.where(Attendance.date >= date_from)
@@ -494,10 +662,10 @@ class ExcelService:
             except ValueError:
                 pass
 
-        query = query.order_by(Attendance.date.desc(), Attendance.student_id)
-
-        result = await self.db.execute(query)
-        attendances = result.unique().scalars().all()
+        batches = stream_rows(self.db, query.order_by(Attendance.date.desc(), Attendance.student_id))
+        first_batch = await anext(batches, [])
+        # Group name for the title: that of the first row
+        group_name = first_batch[0][2] if first_batch else None
 
         status_map = {
             AttendanceStatus.PRESENT: "✅ Keldi",
@@ -507,65 +675,49 @@ class ExcelService:
         }
 
         # Build print-ready Excel
-        output = io.BytesIO()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Davomat"
+        export = XlsxExport("Davomat")
+        ws = export.sheet
 
         # Print setup — A4 landscape
-        ws.page_setup.orientation = 'landscape'
-        ws.page_setup.paperSize = 9  # A4
-        ws.page_setup.fitToWidth = 1
-        ws.page_setup.fitToHeight = 0
-        ws.page_margins.left = 0.4
-        ws.page_margins.right = 0.4
-        ws.page_margins.top = 0.5
-        ws.page_margins.bottom = 0.5
+        ws.set_landscape()
+        ws.set_paper(9)  # A4
+        ws.fit_to_pages(1, 0)
+        ws.set_margins(left=0.4, right=0.4, top=0.5, bottom=0.5)
 
         # Styles
-        title_font = Font(bold=True, size=16, color="1B4332")
-        subtitle_font = Font(size=11, color="6B7280")
-        header_font = Font(bold=True, size=12, color="FFFFFF")
-        header_fill = PatternFill(start_color="059669", end_color="059669", fill_type="solid")
-        data_font = Font(size=12)
-        data_font_bold = Font(bold=True, size=12)
-        center_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        left_align = Alignment(horizontal="left", vertical="center", wrap_text=True)
-        thick_border = Border(
-            left=Side(style='medium'), right=Side(style='medium'),
-            top=Side(style='medium'), bottom=Side(style='medium')
-        )
-        thin_border = Border(
-            left=Side(style='thin'), right=Side(style='thin'),
-            top=Side(style='thin'), bottom=Side(style='thin')
-        )
+        center = {"align": "center", "valign": "vcenter", "text_wrap": True}
+        left = {"align": "left", "valign": "vcenter", "text_wrap": True}
+        title_format = export.add_format({"bold": True, "font_size": 16, "font_color": "#1B4332", **center})
+        subtitle_format = export.add_format({"font_size": 11, "font_color": "#6B7280", **center})
+        stats_format = export.add_format({"bold": True, "font_size": 11, "font_color": "#374151", **center})
+        header_format = export.add_format({
+            "bold": True, "font_size": 12, "font_color": "#FFFFFF", "bg_color": "#059669",
+            "border": 2, **center,
+        })
+        data_center = export.add_format({"font_size": 12, "border": 1, **center})
+        data_center_bold = export.add_format({"bold": True, "font_size": 12, "border": 1, **center})
+        data_left = export.add_format({"font_size": 12, "border": 1, **left})
+        data_left_bold = export.add_format({"bold": True, "font_size": 12, "border": 1, **left})
 
         # Status colors
-        status_fills = {
-            AttendanceStatus.PRESENT: PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid"),
-            AttendanceStatus.ABSENT: PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid"),
-            AttendanceStatus.LATE: PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid"),
-            AttendanceStatus.EXCUSED: PatternFill(start_color="DBEAFE", end_color="DBEAFE", fill_type="solid"),
+        status_formats = {
+            status: export.add_format({"bold": True, "font_size": 12, "border": 1, "bg_color": color, **center})
+            for status, color in (
+                (AttendanceStatus.PRESENT, "#D1FAE5"),
+                (AttendanceStatus.ABSENT, "#FEE2E2"),
+                (AttendanceStatus.LATE, "#FEF3C7"),
+                (AttendanceStatus.EXCUSED, "#DBEAFE"),
+            )
         }
 
-        # Determine group name for title
-        group_name = ""
-        if attendances and attendances[0].student and attendances[0].student.group:
-            group_name = attendances[0].student.group.name
-
         # Title row
         ncols = 7
-        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=ncols)
         title_text = "DAVOMAT HISOBOTI"
         if group_name:
             title_text += f" — {group_name}"
-        title_cell = ws.cell(1, 1, title_text)
-        title_cell.font = title_font
-        title_cell.alignment = center_align
-        ws.row_dimensions[1].height = 40
+        export.merged_row(title_text, ncols, title_format, height=40)
 
         # Subtitle row (date range)
-        ws.merge_cells(start_row=2, start_column=1, end_row=2, end_column=ncols)
         date_text = f"Sana: {now_tashkent().strftime('%d.%m.%Y %H:%M')}"
         if date_from and date_to:
             date_text = f"{date_from.strftime('%d.%m.%Y')} — {date_to.strftime('%d.%m.%Y')}"
@@ -573,103 +725,64 @@ class ExcelService:
             date_text = f"{date_from.strftime('%d.%m.%Y')} dan"
         elif date_to:
             date_text = f"{date_to.strftime('%d.%m.%Y')} gacha"
-        sub_cell = ws.cell(2, 1, date_text)
-        sub_cell.font = subtitle_font
-        sub_cell.alignment = center_align
-        ws.row_dimensions[2].height = 25
+        export.merged_row(date_text, ncols, subtitle_format, height=25)
+        export.skip()
+
+        # Header row (row 4)
+        export.column_widths([6, 16, 35, 20, 20, 25, 25])
+        export.row(["#", "Sana", "Talaba", "Guruh", "Holat", "Fan / Para", "Izoh"], header_format, height=35, measure=False)
+
+        # Data rows — large cells, big height for easy reading / printing
+        counts: Counter = Counter()
+
+        def write(rows, first: int) -> None:
+            for idx, (day, student, group, status, subject, lesson_number, late_minutes, note) in enumerate(rows, first):
+                counts[status] += 1
+                fan_text = subject or ""
+                if lesson_number:
+                    fan_text += f" ({lesson_number}-para)"
+                if late_minutes and late_minutes > 0:
+                    fan_text += f" [{late_minutes} min]"
+                export.row(
+                    [idx, day.strftime("%d.%m.%Y"), student or "", group or "",
+                     status_map.get(status, ""), fan_text, note or ""],
+                    [data_center, data_center_bold, data_left_bold, data_center,
+                     status_formats.get(status, data_center_bold), data_left, data_left],
+                    height=38,
+                    measure=False,
+                )
+
+        written = 0
+        try:
+            if first_batch:
+                await export.write(lambda: write(first_batch, 1))
+                written = len(first_batch)
+            async for rows in batches:
+                await export.write(lambda rows=rows, first=written + 1: write(rows, first))
+                written += len(rows)
+        except BaseException:
+            export.discard()
+            raise
+        finally:
+            await batches.aclose()
 
         # Stats row
-        total = len(attendances)
-        present = sum(1 for a in attendances if a.status == AttendanceStatus.PRESENT)
-        absent = sum(1 for a in attendances if a.status == AttendanceStatus.ABSENT)
-        late = sum(1 for a in attendances if a.status == AttendanceStatus.LATE)
-        excused = sum(1 for a in attendances if a.status == AttendanceStatus.EXCUSED)
-        ws.merge_cells(start_row=3, start_column=1, end_row=3, end_column=ncols)
-        stats_text = f"Jami: {total}  |  ✅ Keldi: {present}  |  ❌ Kelmadi: {absent}  |  ⏰ Kechikdi: {late}  |  📋 Sababli: {excused}"
-        stats_cell = ws.cell(3, 1, stats_text)
-        stats_cell.font = Font(size=11, bold=True, color="374151")
-        stats_cell.alignment = center_align
-        ws.row_dimensions[3].height = 30
-
-        # Header row (row 5)
-        headers = ["#", "Sana", "Talaba", "Guruh", "Holat", "Fan / Para", "Izoh"]
-        col_widths = [6, 16, 35, 20, 20, 25, 25]
-        for col_idx, (h, w) in enumerate(zip(headers, col_widths), 1):
-            cell = ws.cell(5, col_idx, h)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = thick_border
-            ws.column_dimensions[get_column_letter(col_idx)].width = w
-        ws.row_dimensions[5].height = 35
-
-        # Data rows — large cells
-        for idx, a in enumerate(attendances, 1):
-            row = idx + 5
-
-            # Row height — big for easy reading / printing
-            ws.row_dimensions[row].height = 38
-
-            # #
-            c = ws.cell(row, 1, idx)
-            c.font = data_font
-            c.alignment = center_align
-            c.border = thin_border
-
-            # Date
-            c = ws.cell(row, 2, a.date.strftime("%d.%m.%Y"))
-            c.font = data_font_bold
-            c.alignment = center_align
-            c.border = thin_border
-
-            # Student name
-            c = ws.cell(row, 3, a.student.name if a.student else "")
-            c.font = data_font_bold
-            c.alignment = left_align
-            c.border = thin_border
-
-            # Group
-            c = ws.cell(row, 4, a.student.group.name if a.student and a.student.group else "")
-            c.font = data_font
-            c.alignment = center_align
-            c.border = thin_border
-
-            # Status — colored
-            status_text = status_map.get(a.status, "")
-            c = ws.cell(row, 5, status_text)
-            c.font = data_font_bold
-            c.alignment = center_align
-            c.border = thin_border
-            if a.status in status_fills:
-                c.fill = status_fills[a.status]
-
-            # Subject / Para
-            fan_text = a.subject or ""
-            if a.lesson_number:
-                fan_text += f" ({a.lesson_number}-para)"
-            if a.late_minutes and a.late_minutes > 0:
-                fan_text += f" [{a.late_minutes} min]"
-            c = ws.cell(row, 6, fan_text)
-            c.font = data_font
-            c.alignment = left_align
-            c.border = thin_border
-
-            # Note
-            c = ws.cell(row, 7, a.note or "")
-            c.font = data_font
-            c.alignment = left_align
-            c.border = thin_border
+        export.skip()
+        stats_text = (
+            f"Jami: {written}  |  ✅ Keldi: {counts[AttendanceStatus.PRESENT]}"
+            f"  |  ❌ Kelmadi: {counts[AttendanceStatus.ABSENT]}"
+            f"  |  ⏰ Kechikdi: {counts[AttendanceStatus.LATE]}"
+            f"  |  📋 Sababli: {counts[AttendanceStatus.EXCUSED]}"
+        )
+        export.merged_row(stats_text, ncols, stats_format, height=30)
 
         # Footer
-        footer_row = len(attendances) + 7
-        ws.merge_cells(start_row=footer_row, start_column=1, end_row=footer_row, end_column=ncols)
-        footer_cell = ws.cell(footer_row, 1, f"UniControl — {now_tashkent().strftime('%d.%m.%Y %H:%M')}")
-        footer_cell.font = Font(size=9, italic=True, color="9CA3AF")
-        footer_cell.alignment = Alignment(horizontal="right")
-
-        wb.save(output)
-        output.seek(0)
-        return output
+        export.skip()
+        export.merged_row(
+            f"UniControl — {now_tashkent().strftime('%d.%m.%Y %H:%M')}", ncols,
+            export.add_format({"font_size": 9, "italic": True, "font_color": "#9CA3AF", "align": "right"}),
+        )
+        return export
 
     async def export_payments(self, group_id: Optional[int] = None) -> io.BytesIO:
         """Export payment report to Excel."""
@@ -769,6 +882,64 @@ class ExcelService:
         }]
         return self._create_excel_file(pd.DataFrame(data), f"Hisobot #{report_id}")
 
+    # ══════════════════════════════════════════════════════
+    # STREAMED TABLE EXPORT
+    # ══════════════════════════════════════════════════════
+
+    async def _stream_table(
+        self,
+        query,
+        title: str,
+        headers: List[str],
+        cells: Callable[[Any], list],
+        fmt: str = "xlsx",
+    ) -> TableExport:
+        """
+        The layout of _create_excel_file, or a plain CSV, written batch by
+        batch as the query's rows are read (see table_export); `cells` turns
+        a result row into the row's values.
+        """
+        if fmt == "csv":
+            export = CsvExport()
+            export.row(headers)
+            row_format = None
+        else:
+            export = XlsxExport(title)
+            border = {"border": 1}
+            plain = export.add_format(border)
+            number = export.add_format({**border, "num_format": "#,##0"})
+            export.merged_row(title, len(headers), export.add_format({"bold": True, "font_size": 14, "align": "center"}))
+            export.merged_row(
+                f"Sana: {now_tashkent().strftime('%d.%m.%Y %H:%M')}", len(headers),
+                export.add_format({"align": "right"}),
+            )
+            export.skip()
+            export.row(headers, export.add_format({
+                "bold": True, "font_color": "#FFFFFF", "bg_color": "#4472C4",
+                "align": "center", "valign": "vcenter", **border,
+            }))
+
+            def row_format(values: list) -> list:
+                return [
+                    number if isinstance(value, (int, float)) and not isinstance(value, bool) else plain
+                    for value in values
+                ]
+
+        def write(rows) -> None:
+            for row in rows:
+                values = cells(row)
+                export.row(values, row_format(values) if row_format else None)
+
+        try:
+            async for rows in stream_rows(self.db, query):
+                await export.write(lambda rows=rows: write(rows))
+        except BaseException:
+            export.discard()
+            raise
+        if isinstance(export, XlsxExport):
+            export.fit_columns(padding=2, limit=50)
+        return export
+
     # ══════════════════════════════════════════════════════
     # STYLED EXCEL FILE CREATOR
     # ══════════════════════════════════════════════════════
@@ -878,6 +1049,9 @@ class ExcelService:
     # IMPORT: KONTINGENT (Students + Users + Groups) — UPSERT
     # ══════════════════════════════════════════════════════
 
+    # Rows written per INSERT ... ON CONFLICT batch
+    KONTINGENT_BATCH_SIZE = 1000
+
     async def import_kontingent(
         self,
         file_data: bytes,
@@ -885,255 +1059,105 @@ class ExcelService:
         create_users: bool = True,
         default_password: str = "12345678",
         deactivate_missing: bool = False,
+        dry_run: bool = False,
+        progress: Optional[Callable[[int, Optional[int]], Awaitable[None]]] = None,
     ) -> Dict[str, Any]:
         """
         Import students from Kontingent Excel file with FULL UPSERT logic.
 
         - New students -> INSERT (+ create User account)
         - Existing students (by student_id) -> UPDATE name, group, phone, passport, etc.
+          (or left untouched when update_existing is False)
         - Students in DB but NOT in file -> optionally deactivate
         - New groups -> auto-create
         - Group changes -> update student's group_id
 
+        Rows are streamed from the sheet and written in batches of
+        KONTINGENT_BATCH_SIZE with INSERT ... ON CONFLICT, all in one
+        transaction. dry_run runs the same pipeline and rolls it back, so
+        the returned counts are exact but nothing is saved. progress, if
+        given, is awaited after every batch with (rows read, total rows).
+        The core writes skip the session hooks, so the rollup, search
+        index, cached responses and auth snapshots are updated explicitly.
+
         Handles year-end scenarios: students move to new groups,
         new kontingent file has updated group assignments.
         """
-        from app.models.user import User, UserRole
-        from app.core.security import get_password_hash
+        from app.core.password_hasher import password_hasher
 
         wb = load_workbook(io.BytesIO(file_data), read_only=True, data_only=True)
         ws = wb.active
+        total_rows = max((ws.max_row or 0) - 2, 0) or None
 
         # Pre-hash password once
-        hashed_password = get_password_hash(default_password)
-
-        # Load existing data in bulk
-        existing_students_result = await self.db.execute(
-            select(Student.id, Student.student_id, Student.name, Student.group_id, Student.is_active)
-        )
-        existing_students = {row.student_id: row for row in existing_students_result.fetchall()}
-        all_student_ids_in_db = set(existing_students.keys())
-
-        existing_users_result = await self.db.execute(select(User.login))
-        existing_user_logins = set(row[0] for row in existing_users_result.fetchall())
+        hashed_password = await password_hasher.hash(default_password)
 
-        groups_result = await self.db.execute(select(Group))
-        db_groups = groups_result.scalars().all()
-        groups_cache = {g.name: g.id for g in db_groups}
-        groups_lookup = build_group_lookup(db_groups)
+        existing_result = await self.db.execute(select(Student.student_id))
+        existing_student_ids: Set[str] = set(existing_result.scalars().all())
+        all_student_ids_in_db = set(existing_student_ids)
 
-        # Parse all rows (skip header rows — row 1 & 2)
-        rows = list(ws.iter_rows(min_row=3, values_only=True))
+        groups_result = await self.db.execute(select(Group.id, Group.name))
+        groups = GroupIndex(groups_result.all())
 
-        imported = 0
-        updated = 0
-        skipped = 0
+        stats = {"imported": 0, "updated": 0, "skipped": 0, "groups_created": 0, "users_created": 0}
         failed = 0
-        groups_created = 0
-        users_created = 0
         errors = []
         student_ids_in_file: Set[str] = set()
+        batch: Dict[str, Dict[str, Any]] = {}
+        processed = 0
+        moved_users: Set[int] = set()
 
-        # Batch collections
-        new_groups: Dict[str, Dict[str, Any]] = {}
-        student_upserts: List[Dict[str, Any]] = []
-        new_users: List[Dict[str, Any]] = []
-
-        for row_idx, row in enumerate(rows, start=3):
-            try:
-                if not row or len(row) < 2:
-                    continue
-
-                student_id = str(row[0] or "").strip()
-                full_name = str(row[1] or "").strip()
-                if not student_id or not full_name:
-                    continue
-
-                student_ids_in_file.add(student_id)
-
-                # Parse fields from kontingent columns
-                passport = str(row[3] or "").strip() if len(row) > 3 else ""
-                jshshir = str(row[4] or "").strip() if len(row) > 4 else ""
-                birth_date_raw = row[6] if len(row) > 6 else None
-                phone = str(row[7] or "").strip() if len(row) > 7 else ""
-                specialty_name = str(row[12] or "").strip() if len(row) > 12 else ""
-                course = row[13] if len(row) > 13 else None
-                group_name = str(row[14] or "").strip() if len(row) > 14 else ""
-
-                # Address fields
-                country = str(row[15] or "").strip() if len(row) > 15 else ""
-                region = str(row[16] or "").strip() if len(row) > 16 else ""
-                district = str(row[17] or "").strip() if len(row) > 17 else ""
-                address_detail = str(row[18] or "").strip() if len(row) > 18 else ""
-                full_living_address = str(row[22] or "").strip() if len(row) > 22 else ""
-                living_address = str(row[21] or "").strip() if len(row) > 21 else ""
-                commute = str(row[23] or "").strip() if len(row) > 23 else ""
-
-                address_parts = [p for p in [country, region, district, address_detail] if p]
-                full_address = ", ".join(address_parts) if address_parts else full_living_address or living_address
-
-                # Parse birth_date
-                parsed_birth_date = None
-                if birth_date_raw:
-                    if isinstance(birth_date_raw, datetime):
-                        parsed_birth_date = birth_date_raw.date()
-                    elif isinstance(birth_date_raw, date):
-                        parsed_birth_date = birth_date_raw
-                    elif isinstance(birth_date_raw, str):
-                        for fmt in ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y"]:
-                            try:
-                                parsed_birth_date = datetime.strptime(birth_date_raw.strip(), fmt).date()
-                                break
-                            except Exception:
-                                pass
-
-                # Parse course number
-                course_num = 1
-                if course:
-                    if isinstance(course, (int, float)):
-                        course_num = int(course)
-                    elif isinstance(course, str):
-                        match = re.search(r'(\d+)', str(course))
-                        if match:
-                            course_num = int(match.group(1))
-
-                # Resolve group — fuzzy match against existing DB groups
-                group_id = None
-                if group_name:
-                    # Exact cache hit
-                    if group_name in groups_cache:
-                        group_id = groups_cache[group_name]
-                    else:
-                        # Fuzzy match
-                        matched = fuzzy_match_group(group_name, {g.name: g for g in db_groups})
-                        if matched:
-                            group_id = groups_cache[matched]
-                        elif group_name not in new_groups:
-                            # Mark for creation
-                            new_groups[group_name] = {
-                                "name": group_name,
-                                "faculty": specialty_name or "Noma'lum",
-                                "course_year": course_num,
-                                "is_active": True,
-                            }
-                            groups_created += 1
-
-                # Determine UPSERT or INSERT
-                is_existing = student_id in existing_students
-
-                student_upserts.append({
-                    "student_id": student_id,
-                    "name": full_name,
-                    "phone": phone or None,
-                    "passport": passport or None,
-                    "jshshir": jshshir or None,
-                    "birth_date": parsed_birth_date,
-                    "address": full_address or None,
-                    "commute": commute or None,
-                    "group_name": group_name,
-                    "group_id": group_id,
-                    "is_active": True,
-                    "is_existing": is_existing,
-                })
-
-                if is_existing:
-                    updated += 1
-                else:
-                    imported += 1
-                    # Create user if needed
-                    if create_users and student_id not in existing_user_logins:
-                        new_users.append({
-                            "login": student_id,
-                            "password_hash": hashed_password,
-                            "name": full_name,
-                            "phone": phone or None,
-                            "role": UserRole.STUDENT,
-                            "is_active": True,
-                            "is_first_login": True,
-                        })
-                        existing_user_logins.add(student_id)
-                        users_created += 1
-
-            except Exception as e:
-                failed += 1
-                errors.append({
-                    "row": row_idx,
-                    "student_id": str(row[0] if row and len(row) > 0 else ""),
-                    "error": str(e)
-                })
-
-        wb.close()
-
-        # ── BATCH WRITE ──
-
-        # 1. Create new groups
-        if new_groups:
-            for gdata in new_groups.values():
-                g = Group(**gdata)
-                self.db.add(g)
-            await self.db.flush()
-            # Refresh cache
-            new_groups_result = await self.db.execute(select(Group.id, Group.name))
-            groups_cache = {row[1]: row[0] for row in new_groups_result.fetchall()}
-
-        # 2. Upsert students
-        for sdata in student_upserts:
-            # Resolve group_id for newly created groups
-            if sdata["group_id"] is None and sdata["group_name"]:
-                sdata["group_id"] = groups_cache.get(sdata["group_name"])
-
-            if sdata["is_existing"]:
-                # UPDATE existing student
-                update_fields: Dict[str, Any] = {
-                    "name": sdata["name"],
-                    "is_active": True,
-                }
-                if sdata["group_id"]:
-                    update_fields["group_id"] = sdata["group_id"]
-                if sdata["phone"]:
-                    update_fields["phone"] = sdata["phone"]
-                if sdata["passport"]:
-                    update_fields["passport"] = sdata["passport"]
-                if sdata["jshshir"]:
-                    update_fields["jshshir"] = sdata["jshshir"]
-                if sdata["birth_date"]:
-                    update_fields["birth_date"] = sdata["birth_date"]
-                if sdata["address"]:
-                    update_fields["address"] = sdata["address"]
-                if sdata["commute"]:
-                    update_fields["commute"] = sdata["commute"]
-
-                set_clause = ", ".join(f"{k} = :{k}" for k in update_fields)
-                update_fields["sid"] = sdata["student_id"]
-                await self.db.execute(
-                    text(f"UPDATE students SET {set_clause} WHERE student_id = :sid"),
-                    update_fields
-                )
-            else:
-                # INSERT new student
-                student = Student(
-                    student_id=sdata["student_id"],
-                    name=sdata["name"],
-                    phone=sdata["phone"],
-                    passport=sdata["passport"],
-                    jshshir=sdata["jshshir"],
-                    birth_date=sdata["birth_date"],
-                    address=sdata["address"],
-                    commute=sdata["commute"],
-                    group_id=sdata["group_id"],
-                    is_active=True,
-                    contract_amount=0,
-                    contract_paid=0,
+        try:
+            # Skip header rows — row 1 & 2
+            for row_idx, row in enumerate(ws.iter_rows(min_row=3, values_only=True), start=3):
+                processed += 1
+                try:
+                    data = parse_kontingent_row(row)
+                    if data is None:
+                        continue
+                    student_ids_in_file.add(data["student_id"])
+
+                    group_id = None
+                    group_name = data.pop("group_name")
+                    specialty = data.pop("specialty")
+                    course = data.pop("course")
+                    if group_name:
+                        group_id = groups.resolve(group_name)
+                        if group_id is None:
+                            group_id = await self._create_import_group(group_name, specialty, course)
+                            # Like existing imports: new groups are not fuzzy candidates
+                            groups.add(group_name, group_id, exact_only=True)
+                            stats["groups_created"] += 1
+                    data["group_id"] = group_id
+
+                    # A repeated student_id within a batch keeps the last row
+                    batch[data["student_id"]] = data
+                except Exception as e:
+                    failed += 1
+                    errors.append({
+                        "row": row_idx,
+                        "student_id": str(row[0] if row and len(row) > 0 else ""),
+                        "error": str(e)
+                    })
+
+                if len(batch) >= self.KONTINGENT_BATCH_SIZE:
+                    await self._write_kontingent_batch(
+                        list(batch.values()), existing_student_ids, stats,
+                        update_existing, create_users, hashed_password, moved_users,
+                    )
+                    batch = {}
+                    if progress:
+                        await progress(processed, total_rows)
+
+            if batch:
+                await self._write_kontingent_batch(
+                    list(batch.values()), existing_student_ids, stats,
+                    update_existing, create_users, hashed_password, moved_users,
                 )
-                self.db.add(student)
+        finally:
+            wb.close()
 
-        # 3. Create users
-        from app.models.user import User as UserModel, UserRole as UR
-        for udata in new_users:
-            user = UserModel(**udata)
-            self.db.add(user)
-
-        # 4. Deactivate missing students (if requested)
+        # Deactivate missing students (if requested)
         deactivated = 0
         if deactivate_missing and student_ids_in_file:
             missing_ids = all_student_ids_in_db - student_ids_in_file
@@ -1144,44 +1168,144 @@ class ExcelService:
                 )
                 deactivated = len(missing_ids)
 
-        await self.db.commit()
-
-        # 5. Link users to students
-        if new_users:
-            new_logins = [u["login"] for u in new_users]
-            users_result = await self.db.execute(
-                select(UserModel.id, UserModel.login).where(UserModel.login.in_(new_logins))
-            )
-            user_id_map = {row[1]: row[0] for row in users_result.fetchall()}
-
-            students_result = await self.db.execute(
-                select(Student.id, Student.student_id).where(Student.student_id.in_(new_logins))
-            )
-            for student_db_id, student_sid in students_result.fetchall():
-                if student_sid in user_id_map:
-                    await self.db.execute(
-                        text("UPDATE students SET user_id = :uid WHERE id = :sid"),
-                        {"uid": user_id_map[student_sid], "sid": student_db_id}
-                    )
+        if dry_run:
+            await self.db.rollback()
+        else:
             await self.db.commit()
-
+            await invalidate("students", "users", "groups", "attendance_daily_stats")
+            # Auth snapshots carry the student's group
+            await invalidate_users(*moved_users)
+        if progress:
+            await progress(processed, total_rows)
+
+        imported = stats["imported"]
+        updated = stats["updated"]
+        groups_created = stats["groups_created"]
+        users_created = stats["users_created"]
         return {
             "success": True,
+            "dry_run": dry_run,
             "imported": imported,
             "updated": updated,
-            "skipped": skipped,
+            "skipped": stats["skipped"],
             "failed": failed,
             "groups_created": groups_created,
             "users_created": users_created,
             "deactivated": deactivated,
             "errors": errors[:50],
             "message": (
-                f"Kontingent: {imported} ta yangi, {updated} ta yangilandi, "
+                ("[Sinov] " if dry_run else "")
+                + f"Kontingent: {imported} ta yangi, {updated} ta yangilandi, "
                 f"{groups_created} ta guruh yaratildi, {users_created} ta foydalanuvchi yaratildi"
                 + (f", {deactivated} ta nofaol qilindi" if deactivated else "")
             ),
         }
 
+    async def _create_import_group(self, name: str, faculty: str, course_year: int) -> int:
+        """Insert a group seen for the first time in an import; returns its id."""
+        group_id = (await self.db.execute(
+            pg_insert(Group)
+            .values(
+                name=name, faculty=faculty or "Noma'lum", course_year=course_year, is_active=True,
+                search_text=build_document({"name": name, "faculty": faculty or "Noma'lum"}),
+            )
+            .on_conflict_do_nothing(index_elements=[Group.name])
+            .returning(Group.id)
+        )).scalar()
+        if group_id is None:
+            group_id = (await self.db.execute(select(Group.id).where(Group.name == name))).scalar_one()
+        return group_id
+
+    async def _write_kontingent_batch(
+        self,
+        rows: List[Dict[str, Any]],
+        existing_student_ids: Set[str],
+        stats: Dict[str, int],
+        update_existing: bool,
+        create_users: bool,
+        hashed_password: str,
+        moved_users: Set[int],
+    ) -> None:
+        """
+        Write one batch of parsed kontingent rows: user accounts for new
+        students, then one INSERT ... ON CONFLICT (student_id) for the batch.
+        Users of students moved to another group are added to moved_users.
+        """
+        from app.models.user import User, UserRole
+
+        new_rows = [r for r in rows if r["student_id"] not in existing_student_ids]
+        stats["imported"] += len(new_rows)
+        stats["updated" if update_existing else "skipped"] += len(rows) - len(new_rows)
+
+        # 1. User accounts (login = student_id) for new students
+        user_ids: Dict[str, int] = {}
+        if create_users and new_rows:
+            created = await self.db.execute(
+                pg_insert(User)
+                .on_conflict_do_nothing(index_elements=[User.login])
+                .returning(User.id, User.login),
+                [
+                    {
+                        "login": r["student_id"],
+                        "password_hash": hashed_password,
+                        "name": r["name"],
+                        "phone": r["phone"],
+                        "role": UserRole.STUDENT,
+                        "is_active": True,
+                        "is_first_login": True,
+                    }
+                    for r in new_rows
+                ],
+            )
+            user_ids = {login: uid for uid, login in created.all()}
+            stats["users_created"] += len(user_ids)
+
+        # 2. Students: insert new, update existing (non-empty file values win)
+        for r in rows:
+            r["user_id"] = user_ids.get(r["student_id"])
+            r["is_active"] = True
+            r["contract_amount"] = 0
+            r["contract_paid"] = 0
+
+        stmt = pg_insert(Student)
+        if update_existing:
+            # Students moved to another group take their attendance counts along
+            new_groups = {r["student_id"]: r["group_id"] for r in rows if r["group_id"] is not None}
+            current_rows = (await self.db.execute(
+                select(Student.id, Student.student_id, Student.group_id, Student.user_id)
+                .where(Student.student_id.in_(list(new_groups)))
+            )).all() if new_groups else []
+            moved = [row for row in current_rows if row.group_id != new_groups[row.student_id]]
+            await AttendanceRollupService(self.db).move_students({
+                row.id: (row.group_id, new_groups[row.student_id]) for row in moved
+            })
+            moved_users.update(row.user_id for row in moved if row.user_id)
+            current = Student.__table__.c
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Student.student_id],
+                set_={
+                    "name": stmt.excluded.name,
+                    "is_active": True,
+                    "updated_at": stmt.excluded.updated_at,
+                    **{
+                        field: func.coalesce(stmt.excluded[field], current[field])
+                        for field in ("group_id", "phone", "passport", "jshshir",
+                                      "birth_date", "address", "commute")
+                    },
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Student.student_id])
+        await self.db.execute(stmt, rows)
+
+        # Core writes bypass the search_text hook
+        search = SearchService(self.db)
+        await search.reindex(Student, Student.student_id.in_([r["student_id"] for r in rows]))
+        if user_ids:
+            await search.reindex(User, User.id.in_(list(user_ids.values())))
+
+        existing_student_ids.update(r["student_id"] for r in new_rows)
+
     # ══════════════════════════════════════════════════════
     # IMPORT: SCHEDULE from Excel — UPSERT with fuzzy group matching
     # ══════════════════════════════════════════════════════
@@ -1215,11 +1339,6 @@ class ExcelService:
         - Reports unmatched groups so admin can fix
         - Auto-detects format
         """
-        try:
-            wb = load_workbook(io.BytesIO(file_data), data_only=True)
-        except Exception as e:
-            raise BadRequestException(f"Excel faylni o'qib bo'lmadi: {str(e)}")
-
         # Load groups from DB
         groups_result = await self.db.execute(select(Group))
         db_groups = groups_result.scalars().all()
@@ -1235,23 +1354,43 @@ class ExcelService:
         # Sheets to skip (not schedule data)
         skip_sheet_keywords = ["bandligi", "bandlik", "o'qituvchi", "oqituvchi", "teacher"]
 
-        for ws in wb.worksheets:
-            # Skip non-schedule sheets
-            sheet_lower = ws.title.lower().strip()
-            if any(kw in sheet_lower for kw in skip_sheet_keywords):
-                logger.info(f"Skipping non-schedule sheet: '{ws.title}'")
-                continue
-
-            logger.info(f"Parsing sheet: '{ws.title}', max_row={ws.max_row}, max_col={ws.max_column}")
-            records = self._parse_schedule_sheet(ws, group_lookup, group_name_map)
-            logger.info(f"Sheet '{ws.title}': {len(records)} records parsed")
+        def is_schedule_sheet(title: str) -> bool:
+            if any(kw in title.lower().strip() for kw in skip_sheet_keywords):
+                logger.info(f"Skipping non-schedule sheet: '{title}'")
+                return False
+            return True
+
+        # Sheets are streamed (read-only) into SheetGrids one at a time
+        sheet_stats: List[Dict[str, Any]] = []
+        grids = load_schedule_grids(file_data, include=is_schedule_sheet)
+        while True:
+            started = time.perf_counter()
+            try:
+                grid = next(grids, None)
+            except Exception as e:
+                raise BadRequestException(f"Excel faylni o'qib bo'lmadi: {str(e)}")
+            if grid is None:
+                break
+            loaded = time.perf_counter()
+
+            records = self._parse_schedule_sheet(grid, group_lookup, group_name_map)
+            parsed = time.perf_counter()
+            sheet_stats.append({
+                "name": grid.title,
+                "records": len(records),
+                "load_ms": round((loaded - started) * 1000, 1),
+                "parse_ms": round((parsed - loaded) * 1000, 1),
+            })
+            logger.info(
+                f"Sheet '{grid.title}': {len(records)} records parsed "
+                f"(max_row={grid.max_row}, max_col={grid.max_column}, "
+                f"load={sheet_stats[-1]['load_ms']}ms, parse={sheet_stats[-1]['parse_ms']}ms)"
+            )
             # Log first 3 records for debug
             for r in records[:3]:
                 logger.info(f"  Sample: group={r.get('sheet_group_name')}, day={r.get('day')}, para={r.get('lesson_number')}, subj={r.get('subject')}, teacher={r.get('teacher')}")
             all_records.extend(records)
 
-        wb.close()
-
         # ── DEDUPLICATE records across sheets ──
         # "bosqich" (stage/phase) sheets contain COMPLEMENTARY schedule data (lectures vs practicals).
         # When the SAME (group, day, lesson_number) appears with DIFFERENT subjects across sheets,
@@ -1341,7 +1480,7 @@ class ExcelService:
         if use_ai:
             try:
                 from app.services.ai_schedule_agent import AIScheduleAgent
-                agent = AIScheduleAgent()
+                agent = AIScheduleAgent(db=self.db)
                 if agent.is_available():
                     logger.info("AI Schedule Agent activated for import enhancement")
                     ai_result = await agent.enhance_import(
@@ -1462,6 +1601,7 @@ class ExcelService:
             "matched_groups": list(matched_groups),
             "unmatched_groups": list(unmatched_groups),
             "group_name_map": group_name_map,
+            "sheets": sheet_stats,
             "errors": errors[:20],
             "message": (
                 f"Jadval: {updated} ta yangilandi, {inserted} ta qo'shildi, {skipped} ta o'tkazib yuborildi. "
@@ -1475,6 +1615,7 @@ class ExcelService:
             ai_parsed = ai_result.get("ai_parsed_cells", 0)
             analysis = ai_result.get("analysis")
             tokens = ai_result.get("tokens_used", 0)
+            cache = ai_result.get("cache") or {}
 
             response["ai"] = {
                 "enabled": True,
@@ -1482,6 +1623,7 @@ class ExcelService:
                 "matched_groups_count": len(ai_matched),
                 "parsed_cells_count": ai_parsed,
                 "tokens_used": tokens,
+                "cache": cache,
                 "analysis": analysis,
             }
 
@@ -1492,6 +1634,8 @@ class ExcelService:
                     ai_msg_parts.append(f"AI {len(ai_matched)} ta guruhni moslashtirdi")
                 if ai_parsed:
                     ai_msg_parts.append(f"{ai_parsed} ta katakchani tahlil qildi")
+                if cache.get("hits"):
+                    ai_msg_parts.append(f"{cache['hits']} ta javob keshdan olindi")
                 response["message"] += " | AI: " + ", ".join(ai_msg_parts) + "."
         else:
             response["ai"] = {"enabled": False}
@@ -1500,12 +1644,12 @@ class ExcelService:
 
     def _parse_schedule_sheet(
         self,
-        ws,
+        grid: SheetGrid,
         group_lookup: Dict[str, Any],
         group_name_map: Dict[str, str],
     ) -> List[Dict[str, Any]]:
         """
-        Parse a single worksheet for schedule data.
+        Parse a single worksheet (as a SheetGrid) for schedule data.
         Auto-detects format:
         - If row 1 or row 2 has flat table headers ('Guruh', 'Fan', 'Kun') -> flat table
         - Otherwise -> Google Sheets grid format (groups as columns)
@@ -1516,21 +1660,19 @@ class ExcelService:
         flat_keywords = ["guruh", "group", "fan", "subject", "kun", "day"]
         
         for check_row in [1, 2]:
-            header_vals = []
-            for cell in ws[check_row]:
-                header_vals.append(str(cell.value or "").strip().lower())
+            header_vals = [str(v or "").strip().lower() for v in grid.row(check_row)]
             joined = " ".join(header_vals)
             if any(kw in joined for kw in flat_keywords):
-                records = self._parse_flat_schedule(ws, group_lookup, group_name_map, header_row=check_row)
+                records = self._parse_flat_schedule(grid, group_lookup, group_name_map, header_row=check_row)
                 return records
 
         # Grid format
-        records = self._parse_grid_schedule(ws, group_lookup, group_name_map)
+        records = self._parse_grid_schedule(grid, group_lookup, group_name_map)
         return records
 
     def _parse_flat_schedule(
         self,
-        ws,
+        grid: SheetGrid,
         group_lookup: Dict[str, Any],
         group_name_map: Dict[str, str],
         header_row: int = 1,
@@ -1543,8 +1685,8 @@ class ExcelService:
 
         # Map header columns
         headers: Dict[str, int] = {}
-        for col_idx, cell in enumerate(ws[header_row], 1):
-            val = str(cell.value or "").strip().lower()
+        for col_idx, cell_val in enumerate(grid.row(header_row), 1):
+            val = str(cell_val or "").strip().lower()
             if val in ("guruh", "group", "guruh nomi"):
                 headers["group"] = col_idx
             elif val in ("kun", "day", "hafta kuni"):
@@ -1579,13 +1721,13 @@ class ExcelService:
         }
 
         data_start = header_row + 1
-        for row_idx in range(data_start, ws.max_row + 1):
-            group_val = ws.cell(row_idx, headers["group"]).value
+        for row_idx in range(data_start, grid.max_row + 1):
+            group_val = grid.raw(row_idx, headers["group"])
             if not group_val:
                 continue
 
             group_name = str(group_val).strip()
-            subject_val = ws.cell(row_idx, headers.get("subject", 0)).value if "subject" in headers else None
+            subject_val = grid.raw(row_idx, headers.get("subject", 0)) if "subject" in headers else None
             subject = str(subject_val or "").strip()
             if not subject:
                 continue
@@ -1599,26 +1741,26 @@ class ExcelService:
                 db_group_name = matched
                 group_name_map[group_name] = matched
 
-            day = parse_day(ws.cell(row_idx, headers["day"]).value) if "day" in headers else None
+            day = parse_day(grid.raw(row_idx, headers["day"])) if "day" in headers else None
             lesson_num = None
             if "lesson" in headers:
-                lv = ws.cell(row_idx, headers["lesson"]).value
+                lv = grid.raw(row_idx, headers["lesson"])
                 if lv is not None:
                     try:
                         lesson_num = int(float(str(lv)))
                     except (ValueError, TypeError):
                         pass
 
-            start_time = parse_time(ws.cell(row_idx, headers["start"]).value) if "start" in headers else None
-            end_time = parse_time(ws.cell(row_idx, headers["end"]).value) if "end" in headers else None
+            start_time = parse_time(grid.raw(row_idx, headers["start"])) if "start" in headers else None
+            end_time = parse_time(grid.raw(row_idx, headers["end"])) if "end" in headers else None
 
-            teacher = str(ws.cell(row_idx, headers["teacher"]).value or "").strip() if "teacher" in headers else None
-            room = str(ws.cell(row_idx, headers["room"]).value or "").strip() if "room" in headers else None
-            building = str(ws.cell(row_idx, headers["building"]).value or "").strip() if "building" in headers else None
+            teacher = str(grid.raw(row_idx, headers["teacher"]) or "").strip() if "teacher" in headers else None
+            room = str(grid.raw(row_idx, headers["room"]) or "").strip() if "room" in headers else None
+            building = str(grid.raw(row_idx, headers["building"]) or "").strip() if "building" in headers else None
 
             stype = ScheduleType.LECTURE
             if "type" in headers:
-                tval = str(ws.cell(row_idx, headers["type"]).value or "").strip().lower()
+                tval = str(grid.raw(row_idx, headers["type"]) or "").strip().lower()
                 stype = type_map.get(tval, ScheduleType.LECTURE)
 
             records.append({
@@ -2047,20 +2189,9 @@ class ExcelService:
 
         return text, ScheduleType.LECTURE, None, None, None
 
-    def _get_merged_cell_value(self, ws, row, col):
-        """
-        Get cell value considering merged cells.
-        If a cell is part of a merged range, return the value from the top-left cell.
-        """
-        for merged_range in ws.merged_cells.ranges:
-            if (merged_range.min_row <= row <= merged_range.max_row and
-                merged_range.min_col <= col <= merged_range.max_col):
-                return ws.cell(merged_range.min_row, merged_range.min_col).value
-        return ws.cell(row, col).value
-
     def _parse_grid_schedule(
         self,
-        ws,
+        grid: SheetGrid,
         group_lookup: Dict[str, Any],
         group_name_map: Dict[str, str],
     ) -> List[Dict[str, Any]]:
@@ -2083,29 +2214,8 @@ class ExcelService:
         """
         records: List[Dict[str, Any]] = []
 
-        # --- Build merged cell lookups ---
-        # 1) Standard merged lookup for meta cells (day, lesson, time)
-        merged_lookup = {}  # (row, col) -> value from top-left
-        # 2) Data merge ranges for distributing one cell value to multiple group columns
-        data_merge_ranges = []  # list of (min_row, max_row, min_col, max_col, value)
-
-        for merged_range in ws.merged_cells.ranges:
-            top_val = ws.cell(merged_range.min_row, merged_range.min_col).value
-            for r in range(merged_range.min_row, merged_range.max_row + 1):
-                for c in range(merged_range.min_col, merged_range.max_col + 1):
-                    merged_lookup[(r, c)] = top_val
-            # Save data merge ranges (we'll use these for data cells)
-            data_merge_ranges.append((
-                merged_range.min_row, merged_range.max_row,
-                merged_range.min_col, merged_range.max_col,
-                top_val
-            ))
-
-        def get_cell(row, col):
-            """Get cell value, resolving merged cells."""
-            if (row, col) in merged_lookup:
-                return merged_lookup[(row, col)]
-            return ws.cell(row, col).value
+        # Merged cells resolve to their top-left value via the grid's range index
+        get_cell = grid.value
 
         # --- Detect group row: try rows 2, 3, 4, then row 1 ---
         group_cols: Dict[int, tuple] = {}  # col_idx -> (sheet_name, group_id, db_name)
@@ -2120,7 +2230,7 @@ class ExcelService:
         for try_row in [2, 3, 4]:
             found_groups = 0
             temp_cols = {}
-            for col_idx in range(1, ws.max_column + 1):
+            for col_idx in range(1, grid.max_column + 1):
                 val = get_cell(try_row, col_idx)
                 if not val:
                     continue
@@ -2153,7 +2263,7 @@ class ExcelService:
         # Fallback: try row 1
         if not group_cols:
             group_header_row = 1
-            for col_idx in range(1, ws.max_column + 1):
+            for col_idx in range(1, grid.max_column + 1):
                 val = get_cell(1, col_idx)
                 if not val:
                     continue
@@ -2172,13 +2282,13 @@ class ExcelService:
                         group_cols[col_idx] = (name, None, None)
 
         if not group_cols:
-            logger.warning(f"Grid parser: No groups found in sheet '{ws.title}'")
+            logger.warning(f"Grid parser: No groups found in sheet '{grid.title}'")
             return records
 
         data_start_row = group_header_row + 1
 
-        logger.info(f"Grid parser '{ws.title}': group_header_row={group_header_row}, "
-                     f"groups={len(group_cols)}, merged_cells={len(ws.merged_cells.ranges)}")
+        logger.info(f"Grid parser '{grid.title}': group_header_row={group_header_row}, "
+                     f"groups={len(group_cols)}, merged_cells={len(grid.merged_ranges)}")
 
         # --- Detect BLOCKS: each block has its own day/lesson/time columns ---
         # A block = (day_col, lesson_col, time_col, set_of_group_col_indices)
@@ -2193,7 +2303,7 @@ class ExcelService:
 
         # Method: look for day names in data_start_row across all columns
         day_columns = []
-        for col_idx in range(1, ws.max_column + 1):
+        for col_idx in range(1, grid.max_column + 1):
             if col_idx in group_cols:
                 continue
             val = get_cell(data_start_row, col_idx)
@@ -2240,7 +2350,7 @@ class ExcelService:
             if i + 1 < len(meta_col_sets_sorted):
                 next_meta_start = meta_col_sets_sorted[i + 1][0]
             else:
-                next_meta_start = ws.max_column + 1
+                next_meta_start = grid.max_column + 1
 
             block_groups = {
                 col: group_cols[col]
@@ -2260,7 +2370,7 @@ class ExcelService:
             time_c = meta_cols[2] if len(meta_cols) >= 3 else None
             blocks = [(day_c, lesson_c, time_c, group_cols)]
 
-        logger.info(f"Grid parser '{ws.title}': {len(blocks)} block(s) detected")
+        logger.info(f"Grid parser '{grid.title}': {len(blocks)} block(s) detected")
         for bi, (dc, lc, tc, bg) in enumerate(blocks):
             grp_names = [bg[c][0] for c in sorted(bg.keys())][:5]
             logger.info(f"  Block {bi}: day_col={dc}, lesson_col={lc}, time_col={tc}, "
@@ -2271,8 +2381,8 @@ class ExcelService:
         # We index by (row, min_col) -> list of group cols covered
         merged_data_coverage = {}  # (min_row, min_col) -> set of group col indices covered
         group_col_set = set(group_cols.keys())
-        for min_r, max_r, min_c, max_c, val in data_merge_ranges:
-            if not val:
+        for min_r, min_c, max_r, max_c in grid.merged_ranges:
+            if not grid.raw(min_r, min_c):
                 continue
             covered_groups = group_col_set & set(range(min_c, max_c + 1))
             if covered_groups and len(covered_groups) > 1:
@@ -2286,7 +2396,7 @@ class ExcelService:
             current_start_time = None
             current_end_time = None
 
-            for row_idx in range(data_start_row, ws.max_row + 1):
+            for row_idx in range(data_start_row, grid.max_row + 1):
                 # Day of week (merged cells auto-resolved via get_cell)
                 day_val = get_cell(row_idx, day_col)
                 if day_val:
@@ -2346,11 +2456,8 @@ class ExcelService:
                     target_groups = [(col_idx, sheet_name, gid, db_name)]
 
                     # Find the origin cell of this merged range
-                    origin_col = col_idx
-                    for min_r, max_r, min_c, max_c, val in data_merge_ranges:
-                        if min_r <= row_idx <= max_r and min_c <= col_idx <= max_c:
-                            origin_col = min_c
-                            break
+                    merged = grid.merged_range(row_idx, col_idx)
+                    origin_col = merged[1] if merged else col_idx
 
                     coverage_key = (row_idx, origin_col)
                     if coverage_key in merged_data_coverage:
@@ -2605,7 +2712,17 @@ class ExcelService:
         group_id: int,
         attendance_date: date,
     ) -> Dict[str, Any]:
-        """Import attendance from Excel — UPSERT by student + date."""
+        """
+        Import attendance from Excel — UPSERT by student + date.
+
+        Rows are mapped to students and statuses with vectorized pandas
+        lookups. A row with a lesson number (Para column) is upserted on
+        (student, date, lesson) with one INSERT ... ON CONFLICT; a row
+        without one updates every record of that student and date, and is
+        inserted as a whole-day record only when there is none.
+        """
+        from app.services.attendance_service import AttendanceService
+
         try:
             df = pd.read_excel(io.BytesIO(file_data), engine='openpyxl')
         except Exception as e:
@@ -2616,8 +2733,10 @@ class ExcelService:
             "F.I.O": "name", "FIO": "name", "Ism": "name",
             "Holat": "status", "Status": "status",
             "Izoh": "note", "Note": "note", "Sabab": "note",
+            "Para": "lesson_number", "Dars": "lesson_number", "Lesson": "lesson_number",
         }
         df = df.rename(columns={k: v for k, v in column_map.items() if k in df.columns})
+        df = df.loc[:, ~df.columns.duplicated()]
 
         status_map = {
             "keldi": AttendanceStatus.PRESENT, "present": AttendanceStatus.PRESENT,
@@ -2631,66 +2750,71 @@ class ExcelService:
 
         # Load group students
         students_result = await self.db.execute(
-            select(Student).where(Student.group_id == group_id)
+            select(Student.id, Student.student_id, Student.name).where(Student.group_id == group_id)
         )
-        students = students_result.scalars().all()
-        student_by_id = {s.student_id: s for s in students}
-        student_by_name = {s.name.upper(): s for s in students}
-
-        imported = 0
-        failed = 0
-        errors = []
-
-        for idx, row in df.iterrows():
-            try:
-                # Find student
-                student = None
-                sid = str(row.get("student_id", "")).strip()
-                if sid and sid in student_by_id:
-                    student = student_by_id[sid]
-                else:
-                    name = str(row.get("name", "")).strip().upper()
-                    if name in student_by_name:
-                        student = student_by_name[name]
-
-                if not student:
-                    failed += 1
-                    errors.append({"row": idx + 2, "error": "Talaba topilmadi"})
-                    continue
-
-                status_str = str(row.get("status", "")).strip().lower()
-                status = status_map.get(status_str, AttendanceStatus.PRESENT)
-                note = str(row.get("note", "")).strip() or None
-
-                # UPSERT attendance
-                existing = await self.db.execute(
-                    select(Attendance).where(
-                        Attendance.student_id == student.id,
-                        Attendance.date == attendance_date,
-                    )
+        students = students_result.all()
+        id_by_student_id = {s.student_id: s.id for s in students}
+        id_by_name = {s.name.upper(): s.id for s in students}
+
+        # Find students: by student ID, then by full name
+        rows = pd.DataFrame({"row": df.index + 2}, index=df.index)
+        rows["student_db_id"] = text_column(df, "student_id").map(id_by_student_id)
+        rows["student_db_id"] = rows["student_db_id"].fillna(
+            text_column(df, "name").str.upper().map(id_by_name)
+        )
+        rows["status"] = text_column(df, "status").str.lower().map(
+            {k: v.value for k, v in status_map.items()}
+        ).fillna(AttendanceStatus.PRESENT.value)
+        rows["note"] = text_column(df, "note")
+        rows["lesson_number"] = pd.to_numeric(text_column(df, "lesson_number"), errors="coerce")
+
+        missing = rows["student_db_id"].isna()
+        errors = [{"row": int(r), "error": "Talaba topilmadi"} for r in rows.loc[missing, "row"]]
+
+        # The last row wins when a student (and lesson) appears twice
+        found = rows[~missing].drop_duplicates(["student_db_id", "lesson_number"], keep="last")
+        records = [
+            {
+                "student_id": int(r.student_db_id),
+                "date": attendance_date,
+                "lesson_number": None if pd.isna(r.lesson_number) else int(r.lesson_number),
+                "status": AttendanceStatus(r.status),
+                "note": r.note or None,
+            }
+            for r in found.itertuples(index=False)
+        ]
+
+        # Rows without a lesson update the student's records of the day
+        whole_day = [r for r in records if r["lesson_number"] is None]
+        if whole_day:
+            marked = set((await self.db.execute(
+                select(Attendance.student_id).distinct().where(
+                    Attendance.date == attendance_date,
+                    Attendance.student_id.in_([r["student_id"] for r in whole_day]),
                 )
-                att = existing.scalar_one_or_none()
-
-                if att:
-                    att.status = status
-                    att.note = note
-                else:
-                    att = Attendance(
-                        student_id=student.id,
-                        date=attendance_date,
-                        status=status,
-                        note=note,
-                    )
-                    self.db.add(att)
-
-                imported += 1
-
-            except Exception as e:
-                failed += 1
-                errors.append({"row": idx + 2, "error": str(e)})
-
+            )).scalars())
+            day_updates = [r for r in whole_day if r["student_id"] in marked]
+            if day_updates:
+                table = Attendance.__table__
+                day_rows = values(
+                    column("student_id", table.c.student_id.type),
+                    column("status", table.c.status.type),
+                    column("note", table.c.note.type),
+                    name="day_rows",
+                ).data([(r["student_id"], r["status"], r["note"]) for r in day_updates])
+                changed = (await self.db.execute(
+                    table.update()
+                    .where(table.c.student_id == day_rows.c.student_id, table.c.date == attendance_date)
+                    .values(status=day_rows.c.status, note=day_rows.c.note)
+                    .returning(table.c.id, status_changed_column(table))
+                )).all()
+                await add_bulk_events(self.db, ((row_id, "updated") for row_id, flag in changed if flag))
+                records = [r for r in records if r["lesson_number"] is not None or r["student_id"] not in marked]
+        await AttendanceService(self.db).upsert_rows(records, update_columns=("status", "note"))
+
+        await AttendanceRollupService(self.db).refresh([(group_id, attendance_date)])
         await self.db.commit()
         return {
-            "success": True, "imported": imported, "failed": failed,
+            "success": True, "imported": len(found), "failed": len(errors),
             "errors": errors[:50],
         }
@@ -0,0 +1,171 @@
+"""
+UniControl - File Previews
+==========================
+WebP thumbnails of uploaded images for the file manager.
+
+Every image in the content store gets PREVIEW_SIZES previews (sm/md/lg,
+longest side 160/480/1024 px), kept with the blob as
+derived/<sha[:2]>/<sha[2:4]>/<sha>.<size>.webp and deleted with it.
+Because they are keyed by content, a re-upload of the same image reuses
+them and they can be cached by the browser for good.
+
+Decoding and resizing are CPU-bound and hold the GIL, so they run in a
+small process pool of spawned workers; the task module, app.imaging,
+needs only Pillow. An upload schedules its previews after the commit and
+does not wait for them; a download with ?size= renders any that are
+missing (not rendered yet, skipped or lost) before answering. Renders of
+the same content share one job. Like the password hasher, the pool is
+bounded: when PREVIEW_MAX_PENDING renders are queued or running, uploads
+skip theirs (they are rendered on first view) and preview downloads get
+503.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.imaging import PREVIEW_MIME_TYPES, PREVIEW_SIZES, render_previews
+from app.services.file_storage import FileStorage
+
+
+PREVIEW_MEDIA_TYPE = "image/webp"
+# A preview URL always names the same content: cache it until evicted
+PREVIEW_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def is_previewable(sha256: Optional[str], mime_type: Optional[str]) -> bool:
+    """Images in the content store; files uploaded before it have no sha256."""
+    return bool(sha256) and mime_type in PREVIEW_MIME_TYPES
+
+
+class PreviewRenderer:
+    """Renders previews on a bounded process pool; see the module docstring."""
+
+    def __init__(self, workers: int = 2, max_pending: int = 64, root: Optional[Path] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.storage = FileStorage(root)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._unreadable: Set[str] = set()
+        self.pending = 0
+        self.peak_pending = 0
+        self.rendered = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def path(self, sha256: str, size: str) -> Path:
+        return self.storage.derived_path(sha256, f"{size}.webp")
+
+    def _missing(self, sha256: str) -> Dict[str, str]:
+        return {
+            size: str(self.path(sha256, size))
+            for size in PREVIEW_SIZES
+            if not self.path(sha256, size).exists()
+        }
+
+    async def _render(self, sha256: str, source: str, targets: Dict[str, str]) -> bool:
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._get_executor(), render_previews, source, targets)
+            self.rendered += 1
+            return True
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory): start a fresh pool next time
+            self.failed += 1
+            logger.error(f"Preview worker pool broke: {e}")
+            self._executor = None
+            return False
+        except Exception as e:
+            # Not an image Pillow can read (or a decompression bomb): not retried
+            self.failed += 1
+            self._unreadable.add(sha256)
+            logger.warning(f"Preview of blob {sha256[:12]} failed: {e}")
+            return False
+        finally:
+            self.pending -= 1
+
+    async def ensure(self, sha256: str, source: str) -> bool:
+        """
+        Render whatever previews of a blob are missing; False if it cannot
+        be previewed.
+
+        Raises:
+            ServiceUnavailableException: the pool is saturated
+        """
+        if sha256 in self._unreadable:
+            return False
+        job = self._inflight.get(sha256)
+        if job is None:
+            targets = self._missing(sha256)
+            if not targets:
+                return True
+            if self.pending >= self.max_pending:
+                raise ServiceUnavailableException("Server band. Birozdan so'ng qayta urinib ko'ring.")
+            job = asyncio.ensure_future(self._render(sha256, source, targets))
+            self._inflight[sha256] = job
+            job.add_done_callback(lambda _: self._inflight.pop(sha256, None))
+        # A cancelled request must not cancel the render others wait for
+        return await asyncio.shield(job)
+
+    def schedule(self, sha256: str, source: str, mime_type: Optional[str]) -> None:
+        """Render an upload's previews in the background (after its commit)."""
+        if not is_previewable(sha256, mime_type):
+            return
+        if self.pending >= self.max_pending:
+            self.skipped += 1  # rendered on first view instead
+            return
+        task = asyncio.create_task(self.ensure(sha256, source))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get(self, sha256: str, source: str, size: str) -> Optional[Path]:
+        """The preview file of a blob at `size`, rendered if missing."""
+        path = self.path(sha256, size)
+        if path.exists() or await self.ensure(sha256, source):
+            return path if path.exists() else None
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+    def shutdown(self) -> None:
+        for task in self._background:
+            task.cancel()
+        if self._executor is not None:
+            # Previews are rendered again on demand: queued ones can go
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+preview_renderer = PreviewRenderer(
+    workers=settings.PREVIEW_WORKERS,
+    max_pending=settings.PREVIEW_MAX_PENDING,
+)
@@ -4,8 +4,9 @@ UniControl - File Service
 Business logic for file management operations.
 
 This service handles:
-- File upload and storage
+- File upload and storage (content-addressed, see file_storage)
 - File retrieval and streaming
+- Image thumbnails (rendered in the background, see file_previews)
 - Folder management
 - File type detection
 - Storage statistics
@@ -16,14 +17,13 @@ Version: 1.0.0
 
 import os
 import uuid
-import shutil
 import mimetypes
 from datetime import datetime
 from typing import Optional, List, Tuple
 from pathlib import Path
 from loguru import logger
 
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import delete, select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from fastapi import UploadFile, HTTPException
@@ -35,6 +35,8 @@ from app.schemas.file import (
     FileManagerResponse, StorageStats
 )
 from app.config import settings, now_tashkent, now_tashkent_naive
+from app.services.file_previews import preview_renderer
+from app.services.file_storage import FileStorage, UploadTooLarge
 
 
 # File type mappings based on extension
@@ -89,6 +91,18 @@ MAX_FILE_SIZES = {
 }
 
 
+def _format_size(size: int) -> str:
+    """Human-readable byte count."""
+    if size < 1024:
+        return f"{size} B"
+    elif size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    elif size < 1024 * 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    else:
+        return f"{size / (1024 * 1024 * 1024):.1f} GB"
+
+
 class FileService:
     """
     Service class for file management operations.
@@ -110,6 +124,7 @@ class FileService:
         self.db = db
         self.upload_dir = Path(getattr(settings, 'UPLOAD_DIR', 'uploads'))
         self._ensure_upload_dir()
+        self.storage = FileStorage(self.upload_dir)
     
     def _ensure_upload_dir(self):
         """Ensure upload directory exists."""
@@ -155,20 +170,6 @@ class FileService:
         unique_id = uuid.uuid4().hex
         return f"{unique_id}.{ext}" if ext else unique_id
     
-    def _get_user_folder(self, user_id: int) -> Path:
-        """
-        Get user's upload folder path.
-        
-        Args:
-            user_id: User ID
-            
-        Returns:
-            Path to user's folder
-        """
-        user_folder = self.upload_dir / str(user_id)
-        user_folder.mkdir(parents=True, exist_ok=True)
-        return user_folder
-    
     async def upload_file(
         self,
         file: UploadFile,
@@ -202,40 +203,38 @@ class FileService:
         # Determine file type
         file_type = self._get_file_type(file.filename)
         
-        # Check file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
+        # Copy to storage, hashing and checking the size on the way
         max_size = MAX_FILE_SIZES.get(file_type, MAX_FILE_SIZES[FileType.OTHER])
-        if file_size > max_size:
+        try:
+            received = await self.storage.receive(file.file, max_size)
+        except UploadTooLarge:
             max_mb = max_size / (1024 * 1024)
             raise HTTPException(
                 status_code=400, 
                 detail=f"Fayl hajmi {max_mb:.0f} MB dan oshmasligi kerak"
             )
+        except OSError as e:
+            raise HTTPException(status_code=500, detail=f"Faylni saqlashda xatolik: {str(e)}")
         
-        # Generate stored name and path
         stored_name = self._generate_stored_name(file.filename)
-        user_folder = self._get_user_folder(user_id)
-        file_path = user_folder / stored_name
-        
-        # Save file to disk
-        try:
-            with open(file_path, 'wb') as buffer:
-                shutil.copyfileobj(file.file, buffer)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Faylni saqlashda xatolik: {str(e)}")
         
         # Get extension
         extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else None
         
+        try:
+            # Same content as an earlier upload: only a reference is added
+            blob_path = await self.storage.claim(self.db, received)
+        except Exception:
+            await self.storage.discard(received)
+            raise
+        
         # Create database record
         db_file = File(
             name=file.filename,
             stored_name=stored_name,
-            path=str(file_path),
-            size=file_size,
+            path=str(blob_path),
+            size=received.size,
+            sha256=received.sha256,
             file_type=file_type,
             mime_type=self._get_mime_type(file.filename),
             extension=extension,
@@ -250,6 +249,9 @@ class FileService:
         await self.db.commit()
         await self.db.refresh(db_file)
         
+        # Thumbnails are rendered in the background, off the request
+        preview_renderer.schedule(db_file.sha256, db_file.path, db_file.mime_type)
+        
         return db_file
     
     async def get_file(self, file_id: int, user_id: Optional[int] = None) -> Optional[File]:
@@ -376,17 +378,25 @@ class FileService:
         if not file or file.user_id != user_id:
             return False
         
-        # Delete physical file
-        try:
-            if os.path.exists(file.path):
-                os.remove(file.path)
-        except Exception as e:
-            logger.warning(f"Failed to delete physical file {file.path}: {e}")
+        sha256 = file.sha256
+        if sha256:
+            orphaned = await self.storage.release(self.db, sha256)
+        else:
+            # Stored before content-addressed storage: the file is its own
+            orphaned = False
+            try:
+                if os.path.exists(file.path):
+                    os.remove(file.path)
+            except Exception as e:
+                logger.warning(f"Failed to delete physical file {file.path}: {e}")
         
         # Delete database record
         await self.db.delete(file)
         await self.db.commit()
         
+        if orphaned:
+            await self.storage.collect(self.db, [sha256])
+        
         return True
     
     async def increment_download_count(self, file_id: int) -> None:
@@ -557,9 +567,35 @@ class FileService:
         if folder.is_system:
             raise HTTPException(status_code=400, detail="Tizim papkasini o'chirib bo'lmaydi")
         
-        await self.db.delete(folder)
+        # The folder, its subfolders at any depth and all their files
+        tree = select(Folder.id).where(Folder.id == folder.id).cte("folder_tree", recursive=True)
+        tree = tree.union_all(select(Folder.id).where(Folder.parent_id == tree.c.id))
+        folder_ids = select(tree.c.id)
+        files = (await self.db.execute(
+            select(File.sha256, File.path).where(File.folder_id.in_(folder_ids))
+        )).all()
+        
+        # Drop their blob references
+        orphaned = []
+        for sha256, _ in files:
+            if sha256 and await self.storage.release(self.db, sha256):
+                orphaned.append(sha256)
+        
+        await self.db.execute(delete(File).where(File.folder_id.in_(folder_ids)))
+        await self.db.execute(delete(Folder).where(Folder.id.in_(folder_ids)))
         await self.db.commit()
         
+        if orphaned:
+            await self.storage.collect(self.db, orphaned)
+        # Stored before content-addressed storage: each file is its own
+        for sha256, path in files:
+            if not sha256 and path:
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except Exception as e:
+                    logger.warning(f"Failed to delete physical file {path}: {e}")
+        
         return True
     
     # ==================== COMBINED OPERATIONS ====================
@@ -638,6 +674,19 @@ class FileService:
         size_result = await self.db.execute(size_query)
         total_size = size_result.scalar() or 0
         
+        # Size on disk: each blob once, plus files stored before deduplication
+        blobs = (
+            select(File.sha256, func.max(File.size).label("size"))
+            .where(File.user_id == user_id, File.sha256.isnot(None))
+            .group_by(File.sha256)
+            .subquery()
+        )
+        blob_size = (await self.db.execute(select(func.sum(blobs.c.size)))).scalar() or 0
+        legacy_size = (await self.db.execute(
+            select(func.sum(File.size)).where(File.user_id == user_id, File.sha256.is_(None))
+        )).scalar() or 0
+        physical_size = blob_size + legacy_size
+        
         # Files by type
         type_query = select(
             File.file_type, func.count()
@@ -652,21 +701,13 @@ class FileService:
         recent_result = await self.db.execute(recent_query)
         recent_files = list(recent_result.scalars().all())
         
-        # Format size
-        if total_size < 1024:
-            size_formatted = f"{total_size} B"
-        elif total_size < 1024 * 1024:
-            size_formatted = f"{total_size / 1024:.1f} KB"
-        elif total_size < 1024 * 1024 * 1024:
-            size_formatted = f"{total_size / (1024 * 1024):.1f} MB"
-        else:
-            size_formatted = f"{total_size / (1024 * 1024 * 1024):.1f} GB"
-        
         return StorageStats(
             total_files=total_files,
             total_folders=total_folders,
             total_size=total_size,
-            total_size_formatted=size_formatted,
+            total_size_formatted=_format_size(total_size),
+            physical_size=physical_size,
+            physical_size_formatted=_format_size(physical_size),
             files_by_type=files_by_type,
             recent_uploads=[FileResponse.model_validate(f) for f in recent_files]
         )
@@ -0,0 +1,423 @@
+"""
+UniControl - File Storage
+=========================
+Content-addressed storage for uploaded files.
+
+- An upload is copied out of its spool file in CHUNK_SIZE pieces on a
+  pool of UPLOAD_COPY_WORKERS threads, hashed with SHA-256 on the way and
+  abandoned as soon as it passes its size limit. The event loop never
+  runs the copy, and the small pool keeps concurrent uploads from
+  crowding it out of the GIL.
+- Content is stored once, at blobs/<sha[:2]>/<sha[2:4]>/<sha> under
+  UPLOAD_DIR, however many File rows point at it. file_blobs counts the
+  references, and the blob is deleted with the last one. Adding a
+  reference and deleting an unreferenced blob both take a per-hash
+  advisory lock. An upload racing the delete of the last copy of the same
+  content therefore cannot lose the file.
+- Files rendered from a blob (image previews, see file_previews) live
+  under derived/ next to it and are deleted with it.
+- Downloads (blob_response) answer If-None-Match with 304 and a single
+  byte range with 206. Whole files go through Starlette's FileResponse,
+  which uses the pathsend extension where the server supports it. With
+  FILE_ACCEL_REDIRECT set, nginx sends the blob itself with sendfile
+  and handles ranges:
+      location /_blobs/ { internal; alias /app/uploads/blobs/; }
+- The periodic reconciliation recounts references from the files table.
+  This catches rows removed by database cascades, e.g. a deleted user.
+  It also deletes blob files without a file_blobs row, left by uploads
+  whose transaction did not commit.
+
+Files uploaded before this storage keep their own path and have no
+sha256; they are served and deleted as before.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request
+from loguru import logger
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from app.config import settings, now_tashkent_naive
+from app.database import async_session_maker, engine
+from app.models.file import File, FileBlob
+
+
+CHUNK_SIZE = 1024 * 1024
+BLOB_DIR = "blobs"
+DERIVED_DIR = "derived"  # previews and other files rendered from a blob
+TEMP_DIR = "tmp"
+TEMP_MAX_AGE = 24 * 3600  # seconds before an abandoned temp file is removed
+RECONCILE_LOCK_KEY = 0x626C6F62  # pg advisory lock held by the reconciling worker
+
+
+class UploadTooLarge(Exception):
+    """The upload passed its size limit while being copied."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class ReceivedUpload:
+    """An upload copied to a temp file, not yet stored as a blob."""
+    sha256: str
+    size: int
+    temp_path: Path
+
+
+def _copy_hashed(src: BinaryIO, dest: Path, max_size: int) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return digest.hexdigest(), size
+
+
+_copy_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_copy_executor() -> ThreadPoolExecutor:
+    global _copy_executor
+    if _copy_executor is None:
+        _copy_executor = ThreadPoolExecutor(
+            max_workers=settings.UPLOAD_COPY_WORKERS, thread_name_prefix="upload-copy"
+        )
+    return _copy_executor
+
+
+def _place(temp: Path, path: Path) -> None:
+    if path.exists():
+        temp.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp, path)
+
+
+async def _lock(db: AsyncSession, sha256: str) -> None:
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"blob:{sha256}"))))
+
+
+class FileStorage:
+    """Blob store under an upload directory; see the module docstring."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or settings.UPLOAD_DIR)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / BLOB_DIR / sha256[:2] / sha256[2:4] / sha256
+
+    def derived_path(self, sha256: str, variant: str) -> Path:
+        """Where a file rendered from a blob is kept, e.g. variant "sm.webp"."""
+        return self.root / DERIVED_DIR / sha256[:2] / sha256[2:4] / f"{sha256}.{variant}"
+
+    def _remove_blob(self, sha256: str) -> None:
+        self.blob_path(sha256).unlink(missing_ok=True)
+        for derived in self.derived_path(sha256, "x").parent.glob(f"{sha256}.*"):
+            derived.unlink(missing_ok=True)
+
+    async def receive(self, src: BinaryIO, max_size: int) -> ReceivedUpload:
+        """
+        Copy an upload to a temp file, hashing it on the way.
+
+        Raises:
+            UploadTooLarge: as soon as more than max_size bytes were read
+        """
+        temp_dir = self.root / TEMP_DIR
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = temp_dir / uuid.uuid4().hex
+        src.seek(0)
+        sha256, size = await asyncio.get_running_loop().run_in_executor(
+            _get_copy_executor(), _copy_hashed, src, temp_path, max_size
+        )
+        return ReceivedUpload(sha256, size, temp_path)
+
+    async def claim(self, db: AsyncSession, upload: ReceivedUpload) -> Path:
+        """
+        Reference the upload's blob in the current transaction, storing the
+        content unless the blob already exists. Returns the blob's path.
+        """
+        await _lock(db, upload.sha256)
+        await db.execute(
+            pg_insert(FileBlob)
+            .values(sha256=upload.sha256, size=upload.size, ref_count=1, created_at=now_tashkent_naive())
+            .on_conflict_do_update(
+                index_elements=["sha256"],
+                set_={"ref_count": FileBlob.ref_count + 1},
+            )
+        )
+        path = self.blob_path(upload.sha256)
+        await run_in_threadpool(_place, upload.temp_path, path)
+        return path
+
+    async def discard(self, upload: ReceivedUpload) -> None:
+        """Remove an upload's temp file if it was not stored."""
+        await run_in_threadpool(upload.temp_path.unlink, True)
+
+    async def release(self, db: AsyncSession, sha256: str) -> bool:
+        """
+        Drop a reference in the current transaction. Returns True if it was
+        the last one; pass the hash to collect() after the commit.
+        """
+        refs = (await db.execute(
+            update(FileBlob)
+            .where(FileBlob.sha256 == sha256)
+            .values(ref_count=FileBlob.ref_count - 1)
+            .returning(FileBlob.ref_count)
+        )).scalar()
+        if refs is not None and refs <= 0:
+            await db.execute(delete(FileBlob).where(FileBlob.sha256 == sha256, FileBlob.ref_count <= 0))
+            return True
+        return False
+
+    async def collect(self, db: AsyncSession, hashes: Iterable[str]) -> int:
+        """
+        Delete the blobs among `hashes` that are no longer referenced, and
+        the files derived from them (commits).
+        """
+        hashes = sorted(set(hashes))
+        if not hashes:
+            return 0
+        for sha256 in hashes:
+            await _lock(db, sha256)
+        # Re-checked under the locks: an upload may have claimed one again
+        alive = set((await db.execute(
+            select(FileBlob.sha256).where(FileBlob.sha256.in_(hashes))
+        )).scalars().all())
+        removed = 0
+        for sha256 in hashes:
+            if sha256 not in alive:
+                await run_in_threadpool(self._remove_blob, sha256)
+                removed += 1
+        await db.commit()
+        return removed
+
+    async def reconcile(self, db: AsyncSession) -> int:
+        """
+        Set ref_count to the number of File rows for every blob where they
+        differ, delete blobs left without references and temp files of
+        abandoned uploads. Returns the number of blobs fixed.
+        """
+        counted = (
+            select(FileBlob.sha256)
+            .outerjoin(File, File.sha256 == FileBlob.sha256)
+            .group_by(FileBlob.sha256, FileBlob.ref_count)
+            .having(func.count(File.id) != FileBlob.ref_count)
+        )
+        drifted = (await db.execute(counted)).scalars().all()
+        await db.commit()
+        orphaned = []
+        for sha256 in drifted:
+            # One short transaction per blob, serialized with uploads by the lock
+            await _lock(db, sha256)
+            refs = (await db.execute(
+                select(func.count(File.id)).where(File.sha256 == sha256)
+            )).scalar()
+            if refs:
+                await db.execute(update(FileBlob).where(FileBlob.sha256 == sha256).values(ref_count=refs))
+            else:
+                await db.execute(delete(FileBlob).where(FileBlob.sha256 == sha256))
+                orphaned.append(sha256)
+            await db.commit()
+        await self.collect(db, orphaned)
+        await self.collect(db, await self._unreferenced_blob_files(db))
+        await run_in_threadpool(self._remove_stale_temp_files)
+        return len(drifted)
+
+    async def _unreferenced_blob_files(self, db: AsyncSession) -> List[str]:
+        """
+        Hashes of blob files on disk without a file_blobs row. collect()
+        checks them again under the lock an upload holds until it commits.
+        """
+        on_disk = await run_in_threadpool(self._blob_files)
+        missing = []
+        for start in range(0, len(on_disk), 1000):
+            chunk = on_disk[start:start + 1000]
+            known = set((await db.execute(
+                select(FileBlob.sha256).where(FileBlob.sha256.in_(chunk))
+            )).scalars().all())
+            missing.extend(sha256 for sha256 in chunk if sha256 not in known)
+        await db.commit()
+        return missing
+
+    def _blob_files(self) -> List[str]:
+        blob_dir = self.root / BLOB_DIR
+        if not blob_dir.is_dir():
+            return []
+        return [path.name for path in blob_dir.glob("*/*/*") if path.is_file()]
+
+    def _remove_stale_temp_files(self) -> None:
+        temp_dir = self.root / TEMP_DIR
+        if not temp_dir.is_dir():
+            return
+        cutoff = time.time() - TEMP_MAX_AGE
+        for entry in temp_dir.iterdir():
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    entry.unlink()
+            except OSError:
+                pass
+
+
+async def file_blob_reconcile_loop() -> None:
+    """
+    Background loop started from the lifespan handler: reconciles blob
+    reference counts at startup and then every FILE_BLOBS_RECONCILE_SECONDS.
+    Only one worker at a time does the work.
+    """
+    storage = FileStorage()
+    while True:
+        try:
+            # The lock lives in its own transaction: reconcile() commits often
+            async with engine.connect() as lock_conn:
+                locked = await lock_conn.scalar(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_KEY)))
+                if locked:
+                    async with async_session_maker() as db:
+                        fixed = await storage.reconcile(db)
+                    if fixed:
+                        logger.info(f"Reconciled {fixed} file blob reference counts")
+        except Exception as e:
+            logger.error(f"File blob reconciliation failed: {e}")
+        await asyncio.sleep(settings.FILE_BLOBS_RECONCILE_SECONDS)
+
+
+# ==================== Downloads ====================
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive (first, last) byte of a single-range Range header, or
+    None to send the whole file (no header, several ranges, or a header
+    that does not parse).
+
+    Raises:
+        ValueError: the range lies outside the file (416)
+    """
+    match = _RANGE_RE.fullmatch((header or "").strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if match[1]:
+        first = int(match[1])
+        last = min(int(match[2]), size - 1) if match[2] else size - 1
+    else:
+        suffix = int(match[2])
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        first, last = max(size - suffix, 0), size - 1
+    if first > last or first >= size:
+        raise ValueError("range not satisfiable")
+    return first, last
+
+
+def _content_disposition(filename: str, inline: bool = False) -> str:
+    kind = "inline" if inline else "attachment"
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{kind}; filename*=utf-8''{quoted}"
+    return f'{kind}; filename="{filename}"'
+
+
+async def _read_range(path: str, first: int, last: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def is_first_request(request: Request) -> bool:
+    """False for follow-up range requests (resumes, media seeking)."""
+    try:
+        first = parse_range(request.headers.get("range"), 1 << 62)
+    except ValueError:
+        return False
+    return first is None or first[0] == 0
+
+
+async def blob_response(
+    request: Request,
+    path: str,
+    filename: str,
+    media_type: str,
+    etag: Optional[str] = None,
+    cache_control: str = "private, max-age=0, must-revalidate",
+    inline: bool = False,
+) -> Response:
+    """
+    Download response for a stored file: 304 on a matching If-None-Match,
+    206 for a single byte range, else the whole file. `etag` is the
+    content hash; files without one get size and mtime instead. `inline`
+    lets the browser display the file rather than save it.
+    """
+    stat = await run_in_threadpool(os.stat, path)
+    tag = f'"{etag}"' if etag else f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    headers = {
+        "ETag": tag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+        "Content-Disposition": _content_disposition(filename, inline),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and tag in {t.strip() for t in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+
+    root = (Path(settings.UPLOAD_DIR) / BLOB_DIR).resolve()
+    if settings.FILE_ACCEL_REDIRECT and etag and Path(path).resolve().is_relative_to(root):
+        relative = Path(path).resolve().relative_to(root).as_posix()
+        headers["X-Accel-Redirect"] = settings.FILE_ACCEL_REDIRECT.rstrip("/") + "/" + relative
+        return Response(media_type=media_type, headers=headers)
+
+    # If-Range with another version: send the whole current file
+    if_range = request.headers.get("if-range")
+    try:
+        span = parse_range(request.headers.get("range"), stat.st_size) if if_range in (None, tag) else None
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{stat.st_size}"
+        return Response(status_code=416, headers=headers)
+
+    if span is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+    first, last = span
+    headers["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(
+        _read_range(path, first, last), status_code=206, media_type=media_type, headers=headers
+    )
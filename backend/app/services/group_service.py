@@ -20,7 +20,7 @@ from app.models.student import Student
 from app.models.user import User, UserRole
 from app.schemas.group import GroupCreate, GroupUpdate, GroupStats
 from app.core.exceptions import NotFoundException, ConflictException
-from app.core.security import get_password_hash
+from app.core.password_hasher import password_hasher
 
 
 class GroupService:
@@ -236,7 +236,7 @@ class GroupService:
                     login=login,
                     email=student.email if hasattr(student, 'email') and student.email else None,
                     name=student.name,
-                    password_hash=get_password_hash(default_password),
+                    password_hash=await password_hasher.hash(default_password),
                     role=UserRole.LEADER,
                     phone=student.phone if hasattr(student, 'phone') else None,
                     is_first_login=True,
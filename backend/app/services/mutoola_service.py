@@ -26,6 +26,8 @@ from app.models.mutoola import (
     SyncDirection,
 )
 from app.core.exceptions import ExternalAPIException, BadRequestException
+from app.services.attendance_rollup_service import AttendanceRollupService
+from app.services.search_service import SearchService
 
 
 class MutoolaService:
@@ -210,12 +212,20 @@ class MutoolaService:
                 student_data["group_id"] = group_mapping.local_id
         
         if mapping:
-            # Update existing student
+            # Update existing student; a group change moves its rollup counts
+            if "group_id" in student_data:
+                old_group_id = (await self.db.execute(
+                    select(Student.group_id).where(Student.id == mapping.local_id)
+                )).scalar_one_or_none()
+                await AttendanceRollupService(self.db).move_students(
+                    {mapping.local_id: (old_group_id, student_data["group_id"])}
+                )
             await self.db.execute(
                 update(Student)
                 .where(Student.id == mapping.local_id)
                 .values(**student_data)
             )
+            await SearchService(self.db).reindex(Student, Student.id == mapping.local_id)
             sync.updated_records += 1
             
             # Update mapping
@@ -324,6 +334,7 @@ class MutoolaService:
                 .where(Group.id == mapping.local_id)
                 .values(**group_data)
             )
+            await SearchService(self.db).reindex(Group, Group.id == mapping.local_id)
             sync.updated_records += 1
             mapping.last_synced_at = now_tashkent()
         else:
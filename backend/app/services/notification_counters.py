@@ -0,0 +1,303 @@
+"""
+UniControl - Unread Notification Counters
+=========================================
+Per-user unread counts (the notification badge) kept in
+notification_counters, so reading the badge never counts the
+notifications table.
+
+- Personal notifications: a session hook adjusts the counter in the same
+  flush that creates, reads or deletes Notification rows through the ORM.
+  NotificationService applies the deltas of its bulk Core statements
+  itself (add_deltas, reset).
+- Broadcasts: a counter includes the broadcasts that became visible up to
+  its broadcasts_at. Newer ones are folded in when the badge is read (see
+  NotificationService.get_unread_count). A read receipt decrements only
+  for broadcasts that were already folded in.
+- Expiry, deactivated broadcasts and any drift (e.g. raw SQL) are fixed
+  by the periodic reconciliation (NotificationService.reconcile_unread_counters).
+
+The database row is authoritative. Redis keeps a copy per user
+(notif:unread:<id>) that is dropped after every commit that changes the
+counter; reads fall back to the row when the copy is missing or Redis is
+down. Waiters in this process (long-polling badge requests) are woken on
+the same commits.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import json
+from collections import Counter as Tally
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import DateTime, Integer, bindparam, event, func, inspect as sa_inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from app.config import now_tashkent
+from app.database import get_redis
+from app.models.notification import BroadcastNotification, Notification, NotificationCounter
+
+
+COUNTER_PREFIX = "notif:unread:"
+# Bounds how long a copy written by a read racing a commit can stay stale
+COUNTER_TTL = 60
+
+_SESSION_KEY = "notification_counter_users"
+_pending_tasks: Set[asyncio.Task] = set()
+_changed: Dict[int, asyncio.Event] = {}
+# Users whose Redis copy is being dropped; reads here go to the row meanwhile
+_dropping: Tally = Tally()
+
+
+@dataclass(frozen=True)
+class UnreadCounter:
+    """A user's unread count and how far broadcasts are included in it."""
+    unread: int
+    broadcasts_at: Optional[datetime] = None
+
+
+# ==================== Reads ====================
+
+async def load(db: AsyncSession, user_id: int, fresh: bool = False) -> UnreadCounter:
+    """
+    The user's counter from Redis, or from notification_counters on a miss
+    (or always, with fresh=True).
+    """
+    redis = None
+    try:
+        redis = await get_redis()
+        fresh = fresh or user_id in _dropping
+        cached = None if fresh else await redis.get(f"{COUNTER_PREFIX}{user_id}")
+        if cached is not None:
+            data = json.loads(cached)
+            at = data["broadcasts_at"]
+            return UnreadCounter(data["unread"], datetime.fromisoformat(at) if at else None)
+    except Exception as e:
+        logger.debug(f"Notification counter cache unavailable: {e}")
+        redis = None
+
+    row = (await db.execute(
+        select(NotificationCounter.unread, NotificationCounter.broadcasts_at)
+        .where(NotificationCounter.user_id == user_id)
+    )).first()
+    # No row yet: nothing personal is unread, no broadcast folded in
+    counter = UnreadCounter(*row) if row else UnreadCounter(0)
+
+    if redis is not None and user_id not in _dropping:
+        try:
+            await redis.set(
+                f"{COUNTER_PREFIX}{user_id}",
+                json.dumps({
+                    "unread": counter.unread,
+                    "broadcasts_at": counter.broadcasts_at.isoformat() if counter.broadcasts_at else None,
+                }),
+                ex=COUNTER_TTL,
+            )
+        except Exception as e:
+            logger.debug(f"Notification counter cache write failed: {e}")
+    return counter
+
+
+def changed_event(user_id: int) -> asyncio.Event:
+    """Event set after the next commit in this process that changes the user's counter."""
+    waiter = _changed.get(user_id)
+    if waiter is None:
+        waiter = _changed[user_id] = asyncio.Event()
+    return waiter
+
+
+def badge_etag(count: int) -> str:
+    """ETag of an unread-count response."""
+    return f'W/"unread-{count}"'
+
+
+# ==================== Writes ====================
+
+def _delta_upsert():
+    delta = bindparam("delta", type_=Integer)
+    now = bindparam("now", type_=DateTime(timezone=True))
+    return (
+        pg_insert(NotificationCounter)
+        .values(user_id=bindparam("user_id"), unread=func.greatest(delta, 0), updated_at=now)
+        .on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"unread": func.greatest(NotificationCounter.unread + delta, 0), "updated_at": now},
+        )
+    )
+
+
+_DELTA_UPSERT = _delta_upsert()
+
+
+def _delta_rows(deltas: Dict[int, int]) -> List[Dict]:
+    now = now_tashkent()
+    return [
+        {"user_id": user_id, "delta": delta, "now": now}
+        for user_id, delta in deltas.items() if delta
+    ]
+
+
+def mark_changed(session: Session, user_ids: Iterable[int]) -> None:
+    """Drop the users' Redis copies and wake their waiters after commit."""
+    session.info.setdefault(_SESSION_KEY, set()).update(user_ids)
+
+
+async def add_deltas(db: AsyncSession, deltas: Dict[int, int]) -> None:
+    """Add signed deltas to users' counters in the current transaction."""
+    rows = _delta_rows(deltas)
+    if not rows:
+        return
+    await db.execute(_DELTA_UPSERT, rows)
+    mark_changed(db.sync_session, deltas)
+
+
+async def reset(db: AsyncSession, user_id: int, broadcasts_at: datetime) -> None:
+    """Set the user's counter to zero with every broadcast up to broadcasts_at read."""
+    await db.execute(
+        pg_insert(NotificationCounter)
+        .values(user_id=user_id, unread=0, broadcasts_at=broadcasts_at, updated_at=now_tashkent())
+        .on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"unread": 0, "broadcasts_at": broadcasts_at, "updated_at": now_tashkent()},
+        )
+    )
+    mark_changed(db.sync_session, [user_id])
+
+
+async def advance(
+    db: AsyncSession,
+    user_id: int,
+    since: Optional[datetime],
+    until: datetime,
+    added: int
+) -> Optional[int]:
+    """
+    Fold `added` newly visible broadcasts into the counter and move
+    broadcasts_at from `since` to `until`. Returns the new count, or None
+    if another request moved broadcasts_at first.
+    """
+    if since is None:
+        stmt = (
+            pg_insert(NotificationCounter)
+            .values(user_id=user_id, unread=added, broadcasts_at=until, updated_at=now_tashkent())
+            .on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={
+                    "unread": NotificationCounter.unread + added,
+                    "broadcasts_at": until,
+                    "updated_at": now_tashkent(),
+                },
+                where=NotificationCounter.broadcasts_at.is_(None),
+            )
+        )
+    else:
+        stmt = (
+            update(NotificationCounter)
+            .where(
+                NotificationCounter.user_id == user_id,
+                NotificationCounter.broadcasts_at == since,
+            )
+            .values(
+                unread=NotificationCounter.unread + added,
+                broadcasts_at=until,
+                updated_at=now_tashkent(),
+            )
+        )
+    row = (await db.execute(stmt.returning(NotificationCounter.unread))).first()
+    mark_changed(db.sync_session, [user_id])
+    return row[0] if row else None
+
+
+async def uncount_broadcasts(db: AsyncSession, user_id: int, broadcast_ids: List[int]) -> None:
+    """Decrement for broadcasts that were just read or hidden, if already folded in."""
+    if not broadcast_ids:
+        return
+    folded = (
+        select(func.count(BroadcastNotification.id))
+        .where(
+            BroadcastNotification.id.in_(broadcast_ids),
+            func.coalesce(BroadcastNotification.scheduled_at, BroadcastNotification.created_at)
+            <= NotificationCounter.broadcasts_at,
+        )
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(NotificationCounter)
+        .where(
+            NotificationCounter.user_id == user_id,
+            NotificationCounter.broadcasts_at.isnot(None),
+        )
+        .values(unread=func.greatest(NotificationCounter.unread - folded, 0), updated_at=now_tashkent())
+    )
+    mark_changed(db.sync_session, [user_id])
+
+
+# ==================== Session hooks ====================
+
+def _on_after_flush(session: Session, flush_context) -> None:
+    deltas: Tally = Tally()
+    for obj in session.new:
+        if isinstance(obj, Notification) and sa_inspect(obj).dict.get("is_read") is not True:
+            deltas[obj.user_id] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = attributes.get_history(obj, "is_read")
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                deltas[obj.user_id] += -1 if history.added[0] else 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and sa_inspect(obj).dict.get("is_read") is False:
+            deltas[obj.user_id] -= 1
+    rows = _delta_rows(deltas)
+    if rows:
+        session.connection().execute(_DELTA_UPSERT, rows)
+        mark_changed(session, deltas)
+
+
+def _on_after_commit(session: Session) -> None:
+    user_ids = session.info.pop(_SESSION_KEY, None)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        waiter = _changed.pop(user_id, None)
+        if waiter is not None:
+            waiter.set()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _dropping.update(user_ids)
+    task = loop.create_task(_drop_copies(user_ids))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+def _on_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+async def _drop_copies(user_ids: Set[int]) -> None:
+    try:
+        redis = await get_redis()
+        await redis.delete(*(f"{COUNTER_PREFIX}{uid}" for uid in user_ids))
+    except Exception as e:
+        logger.debug(f"Notification counter cache invalidation failed: {e}")
+    finally:
+        _dropping.subtract(user_ids)
+        for user_id in user_ids:
+            if _dropping[user_id] <= 0:
+                del _dropping[user_id]
+
+
+def register_notification_counters() -> None:
+    """Install session hooks that keep notification_counters in step."""
+    if event.contains(Session, "after_commit", _on_after_commit):
+        return
+    event.listen(Session, "after_flush", _on_after_flush)
+    event.listen(Session, "after_commit", _on_after_commit)
+    event.listen(Session, "after_rollback", _on_after_rollback)
@@ -3,19 +3,38 @@ UniControl - Notification Service
 =================================
 Handles notification management.
 
+Broadcasts are stored once in broadcast_notifications and joined into
+each recipient's feed at read time, so sending one costs a single row
+however large the audience. Per-user state is only written when the user
+acts on it: a broadcast_notification_receipts row with read_at or
+deleted_at. In every list and action, a broadcast appears with
+id = -broadcast_id next to the user's personal notifications.
+
 Author: UniControl Team
 Version: 1.0.0
 """
 
+import asyncio
+import bisect
+import time
+from collections import Counter
 from datetime import datetime
-from app.config import now_tashkent
+from app.config import now_tashkent, settings
 from typing import Optional, List, Tuple
+from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, update
+from sqlalchemy import (
+    DateTime, Integer, String, Text,
+    and_, case, delete, distinct, false, func, insert, literal, null, or_, select, union_all, update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
 
 from app.models.notification import (
     Notification,
     BroadcastNotification,
+    BroadcastNotificationReceipt,
+    NotificationCounter,
     NotificationType,
     NotificationPriority,
 )
@@ -26,7 +45,68 @@ from app.schemas.notification import (
     BroadcastNotificationCreate,
     NotificationResponse,
 )
+from app.core.cache import table_versions
 from app.core.exceptions import NotFoundException
+from app.database import async_session_maker
+from app.services import notification_counters
+
+
+# Per-process list of broadcast visibility times (see _broadcasts_pending)
+TIMELINE_LOCAL_TTL = 30  # seconds, when Redis versions are unavailable
+BADGE_POLL_SECONDS = 2  # long-poll re-check for commits made by other workers
+RECONCILE_LOCK_KEY = 0x6E6F7469  # pg advisory lock held by the reconciling worker
+
+_timeline: Tuple[Optional[str], float, Optional[List[datetime]]] = (None, 0.0, None)
+
+
+def _not_expired(expires_at, now: datetime):
+    return or_(expires_at.is_(None), expires_at > now)
+
+
+def _in_feeds():
+    """
+    Broadcasts joined into feeds: active ones from the lazy fan-out on.
+    Earlier ones (fanned_out) reached every recipient as a Notification copy.
+    """
+    return and_(BroadcastNotification.is_active == True, BroadcastNotification.fanned_out == False)
+
+
+def _visible_at():
+    return func.coalesce(BroadcastNotification.scheduled_at, BroadcastNotification.created_at)
+
+
+def _forget_timeline() -> None:
+    """Reload the timeline on next use (other workers see the version bump)."""
+    global _timeline
+    _timeline = (None, 0.0, None)
+
+
+async def _broadcasts_pending(db: AsyncSession, since: Optional[datetime], now: datetime) -> bool:
+    """
+    Whether any active broadcast became visible in (since, now]. Answered
+    from a per-process list of visibility times that is reloaded when
+    broadcast_notifications changes, so badge reads normally cost no query.
+    """
+    global _timeline
+    try:
+        version = await table_versions("broadcast_notifications")
+    except Exception:
+        version = None
+    cached_version, loaded_at, times = _timeline
+    if times is None or version != cached_version or (
+        version is None and time.monotonic() - loaded_at > TIMELINE_LOCAL_TTL
+    ):
+        result = await db.execute(
+            select(_visible_at())
+            .where(
+                _in_feeds(),
+                _not_expired(BroadcastNotification.expires_at, now),
+            )
+        )
+        times = sorted(row[0] for row in result.all())
+        _timeline = (version, time.monotonic(), times)
+    start = bisect.bisect_right(times, since) if since is not None else 0
+    return start < len(times) and times[start] <= now
 
 
 class NotificationService:
@@ -42,48 +122,174 @@ class NotificationService:
         )
         return result.scalar_one_or_none()
     
+    async def _get_audience(self, user_id: int) -> Optional[Tuple[UserRole, datetime, Optional[int]]]:
+        """Role, registration time and student group of a user."""
+        result = await self.db.execute(
+            select(User.role, User.created_at, Student.group_id)
+            .outerjoin(Student, Student.user_id == User.id)
+            .where(User.id == user_id)
+            .limit(1)
+        )
+        return result.first()
+    
+    def _visible_broadcasts(self, audience: Tuple[UserRole, datetime, Optional[int]], now: datetime):
+        """Condition on BroadcastNotification for broadcasts a user receives."""
+        role, registered_at, group_id = audience
+        by_role = and_(
+            BroadcastNotification.target_group_id.is_(None),
+            or_(
+                BroadcastNotification.target_role.is_(None),
+                BroadcastNotification.target_role == "all",
+                BroadcastNotification.target_role == role.value,
+            ),
+        )
+        if group_id is not None:
+            by_role = or_(by_role, BroadcastNotification.target_group_id == group_id)
+        return and_(
+            _in_feeds(),
+            func.coalesce(BroadcastNotification.scheduled_at, BroadcastNotification.created_at) <= now,
+            _not_expired(BroadcastNotification.expires_at, now),
+            # Users registered later did not exist when it was sent
+            BroadcastNotification.created_at >= registered_at,
+            by_role,
+        )
+    
+    async def _feed(self, user_id: int):
+        """
+        The user's notifications: personal rows UNION ALL the broadcasts
+        they receive, minus those they deleted and expired ones.
+        Broadcasts appear with id = -broadcast_id. Returns None for an
+        unknown user.
+        """
+        audience = await self._get_audience(user_id)
+        if audience is None:
+            return None
+        
+        personal = select(
+            Notification.id,
+            Notification.user_id,
+            Notification.title,
+            Notification.message,
+            Notification.type,
+            Notification.priority,
+            Notification.is_read,
+            Notification.read_at,
+            Notification.action_url,
+            Notification.action_text,
+            Notification.sender_id,
+            Notification.data,
+            Notification.push_sent,
+            Notification.email_sent,
+            Notification.expires_at,
+            Notification.created_at,
+        ).where(
+            Notification.user_id == user_id,
+            _not_expired(Notification.expires_at, now_tashkent()),
+        )
+        
+        receipt = BroadcastNotificationReceipt
+        broadcasts = (
+            select(
+                (-BroadcastNotification.id).label("id"),
+                literal(user_id, Integer).label("user_id"),
+                BroadcastNotification.title,
+                BroadcastNotification.message,
+                BroadcastNotification.type,
+                BroadcastNotification.priority,
+                receipt.read_at.isnot(None).label("is_read"),
+                receipt.read_at,
+                BroadcastNotification.action_url,
+                null().cast(String(100)).label("action_text"),
+                BroadcastNotification.sender_id,
+                null().cast(Text).label("data"),
+                false().label("push_sent"),
+                false().label("email_sent"),
+                BroadcastNotification.expires_at,
+                func.coalesce(
+                    BroadcastNotification.scheduled_at, BroadcastNotification.created_at
+                ).label("created_at"),
+            )
+            .outerjoin(receipt, and_(
+                receipt.broadcast_id == BroadcastNotification.id,
+                receipt.user_id == user_id,
+            ))
+            .where(
+                self._visible_broadcasts(audience, now_tashkent()),
+                receipt.deleted_at.is_(None),
+            )
+        )
+        return union_all(personal, broadcasts).subquery("feed")
+    
+    async def _list_feed(
+        self,
+        user_id: int,
+        page: int,
+        page_size: int,
+        is_read: Optional[bool] = None,
+        notification_type = None,
+        unread_first: bool = False
+    ) -> Tuple[List[dict], int]:
+        feed = await self._feed(user_id)
+        if feed is None:
+            return [], 0
+        
+        conditions = []
+        if is_read is not None:
+            conditions.append(feed.c.is_read == is_read)
+        if notification_type is not None:
+            conditions.append(feed.c.type == notification_type)
+        
+        total_result = await self.db.execute(
+            select(func.count()).select_from(feed).where(*conditions)
+        )
+        total = total_result.scalar() or 0
+        
+        order = [feed.c.created_at.desc(), feed.c.id.desc()]
+        if unread_first:
+            order.insert(0, feed.c.is_read)
+        sender = aliased(User)
+        result = await self.db.execute(
+            select(feed, sender.name.label("sender_name"))
+            .outerjoin(sender, sender.id == feed.c.sender_id)
+            .where(*conditions)
+            .order_by(*order)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )
+        return [dict(row) for row in result.mappings().all()], total
+    
+    async def get_feed_item(self, notification_id: int, user_id: int) -> Optional[dict]:
+        """A single notification or broadcast as it appears in the user's feed."""
+        feed = await self._feed(user_id)
+        if feed is None:
+            return None
+        sender = aliased(User)
+        result = await self.db.execute(
+            select(feed, sender.name.label("sender_name"))
+            .outerjoin(sender, sender.id == feed.c.sender_id)
+            .where(feed.c.id == notification_id)
+        )
+        row = result.mappings().first()
+        return dict(row) if row else None
+    
     async def list_user_notifications(
         self,
         user_id: int,
         page: int = 1,
         page_size: int = 20,
         unread_only: bool = False
-    ) -> Tuple[List[Notification], int, int]:
+    ) -> Tuple[List[dict], int, int]:
         """
-        List notifications for a user.
+        List notifications for a user, broadcasts included.
         
         Returns:
             Tuple of (notifications, total count, unread count)
         """
-        query = select(Notification).where(Notification.user_id == user_id)
-        count_query = select(func.count(Notification.id)).where(
-            Notification.user_id == user_id
+        notifications, total = await self._list_feed(
+            user_id, page, page_size, is_read=False if unread_only else None
         )
-        unread_query = select(func.count(Notification.id)).where(
-            and_(
-                Notification.user_id == user_id,
-                Notification.is_read == False
-            )
-        )
-        
-        if unread_only:
-            query = query.where(Notification.is_read == False)
-        
-        # Get counts
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
-        
-        unread_result = await self.db.execute(unread_query)
-        unread = unread_result.scalar()
-        
-        # Get notifications
-        query = query.order_by(Notification.created_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
-        
-        result = await self.db.execute(query)
-        notifications = result.scalars().all()
-        
-        return list(notifications), total, unread
+        unread = await self.get_unread_count(user_id)
+        return notifications, total, unread
 
     async def list_notifications(
         self,
@@ -91,47 +297,143 @@ class NotificationService:
         page: int = 1,
         page_size: int = 20,
         is_read: Optional[bool] = None,
-        notification_type = None
-    ) -> Tuple[List[Notification], int]:
+        notification_type = None,
+        unread_first: bool = False
+    ) -> Tuple[List[dict], int]:
         """
-        List notifications for a user (simplified for route).
+        List notifications for a user (simplified for route), broadcasts
+        included. Items are NotificationResponse-shaped dicts.
         """
-        query = select(Notification).where(Notification.user_id == user_id)
-        count_query = select(func.count(Notification.id)).where(
-            Notification.user_id == user_id
+        return await self._list_feed(
+            user_id, page, page_size,
+            is_read=is_read,
+            notification_type=notification_type,
+            unread_first=unread_first,
         )
-        
-        if is_read is not None:
-            query = query.where(Notification.is_read == is_read)
-            count_query = count_query.where(Notification.is_read == is_read)
-        
-        if notification_type is not None:
-            query = query.where(Notification.type == notification_type)
-            count_query = count_query.where(Notification.type == notification_type)
-        
-        # Get total count
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar() or 0
-        
-        # Get notifications
-        query = query.order_by(Notification.created_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
-        
-        result = await self.db.execute(query)
-        notifications = result.scalars().all()
-        
-        return list(notifications), total
 
     async def get_unread_count(self, user_id: int) -> int:
-        """Get count of unread notifications for a user."""
-        query = select(func.count(Notification.id)).where(
-            and_(
-                Notification.user_id == user_id,
-                Notification.is_read == False
+        """
+        Get count of unread notifications for a user, broadcasts included.
+        
+        Read from the maintained counter (see notification_counters); the
+        notifications table is not touched. Broadcasts that became visible
+        since the counter last included them are folded in first.
+        """
+        counter = await notification_counters.load(self.db, user_id)
+        now = now_tashkent()
+        while await _broadcasts_pending(self.db, counter.broadcasts_at, now):
+            audience = await self._get_audience(user_id)
+            if audience is None:
+                break
+            receipt = BroadcastNotificationReceipt
+            query = (
+                select(func.count(BroadcastNotification.id))
+                .outerjoin(receipt, and_(
+                    receipt.broadcast_id == BroadcastNotification.id,
+                    receipt.user_id == user_id,
+                ))
+                .where(
+                    self._visible_broadcasts(audience, now),
+                    receipt.read_at.is_(None),
+                    receipt.deleted_at.is_(None),
+                )
+            )
+            if counter.broadcasts_at is not None:
+                query = query.where(_visible_at() > counter.broadcasts_at)
+            added = (await self.db.execute(query)).scalar() or 0
+            unread = await notification_counters.advance(
+                self.db, user_id, counter.broadcasts_at, now, added
             )
+            if unread is not None:
+                return unread
+            # Another request folded them in first
+            counter = await notification_counters.load(self.db, user_id, fresh=True)
+        return counter.unread
+    
+    async def reconcile_unread_counters(self) -> List[int]:
+        """
+        Recompute every user's counter from notifications, broadcasts and
+        receipts, and fix those that differ (expired notifications,
+        deactivated broadcasts, writes that bypassed the hooks). Set-based:
+        one statement for all users. Returns the ids of changed counters.
+        """
+        now = now_tashkent()
+        personal = (
+            select(Notification.user_id, func.count().label("unread"))
+            .where(Notification.is_read == False, _not_expired(Notification.expires_at, now))
+            .group_by(Notification.user_id)
+            .subquery()
         )
-        result = await self.db.execute(query)
-        return result.scalar() or 0
+        # Same rules as _visible_broadcasts, for all users at once
+        receipt = BroadcastNotificationReceipt
+        role_value = case(*[(User.role == role, role.value) for role in UserRole])
+        broadcasts = (
+            select(User.id.label("user_id"), func.count(distinct(BroadcastNotification.id)).label("unread"))
+            .select_from(User)
+            .outerjoin(Student, Student.user_id == User.id)
+            .join(BroadcastNotification, and_(
+                _in_feeds(),
+                _visible_at() <= now,
+                _not_expired(BroadcastNotification.expires_at, now),
+                BroadcastNotification.created_at >= User.created_at,
+                or_(
+                    BroadcastNotification.target_group_id == Student.group_id,
+                    and_(
+                        BroadcastNotification.target_group_id.is_(None),
+                        or_(
+                            BroadcastNotification.target_role.is_(None),
+                            BroadcastNotification.target_role == "all",
+                            BroadcastNotification.target_role == role_value,
+                        ),
+                    ),
+                ),
+            ))
+            .outerjoin(receipt, and_(
+                receipt.broadcast_id == BroadcastNotification.id,
+                receipt.user_id == User.id,
+            ))
+            .where(receipt.read_at.is_(None), receipt.deleted_at.is_(None))
+            .group_by(User.id)
+            .subquery()
+        )
+        expected = (
+            select(
+                User.id,
+                (func.coalesce(personal.c.unread, 0) + func.coalesce(broadcasts.c.unread, 0)),
+                literal(now, DateTime(timezone=True)),
+                literal(now, DateTime(timezone=True)),
+            )
+            .outerjoin(personal, personal.c.user_id == User.id)
+            .outerjoin(broadcasts, broadcasts.c.user_id == User.id)
+        )
+        latest_visible = (
+            select(func.max(_visible_at()))
+            .where(_in_feeds(), _visible_at() <= now)
+            .scalar_subquery()
+        )
+        
+        stmt = pg_insert(NotificationCounter).from_select(
+            ["user_id", "unread", "broadcasts_at", "updated_at"], expected
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "unread": stmt.excluded.unread,
+                "broadcasts_at": stmt.excluded.broadcasts_at,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=or_(
+                NotificationCounter.unread != stmt.excluded.unread,
+                NotificationCounter.broadcasts_at.is_(None),
+                NotificationCounter.broadcasts_at < latest_visible,
+            ),
+        ).returning(NotificationCounter.user_id)
+        
+        result = await self.db.execute(stmt)
+        user_ids = [row[0] for row in result.all()]
+        notification_counters.mark_changed(self.db.sync_session, user_ids)
+        await self.db.commit()
+        return user_ids
     
     async def create(
         self,
@@ -157,12 +459,63 @@ class NotificationService:
         
         return notification
     
+    async def _mark_broadcasts_read(
+        self,
+        user_id: int,
+        broadcast_ids: Optional[List[int]] = None,
+        now: Optional[datetime] = None
+    ) -> List[int]:
+        """
+        Write read receipts for the user's unread broadcasts (or the given
+        ones). Returns the ids of the broadcasts that were marked.
+        """
+        audience = await self._get_audience(user_id)
+        if audience is None:
+            return []
+        now = now or now_tashkent()
+        receipt = BroadcastNotificationReceipt
+        unread = (
+            select(BroadcastNotification.id, literal(user_id, Integer), literal(now, DateTime(timezone=True)))
+            .outerjoin(receipt, and_(
+                receipt.broadcast_id == BroadcastNotification.id,
+                receipt.user_id == user_id,
+            ))
+            .where(
+                self._visible_broadcasts(audience, now),
+                receipt.read_at.is_(None),
+                receipt.deleted_at.is_(None),
+            )
+        )
+        if broadcast_ids is not None:
+            unread = unread.where(BroadcastNotification.id.in_(broadcast_ids))
+        result = await self.db.execute(
+            pg_insert(receipt)
+            .from_select(["broadcast_id", "user_id", "read_at"], unread)
+            .on_conflict_do_update(
+                index_elements=["user_id", "broadcast_id"],
+                set_={"read_at": now},
+            )
+            .returning(receipt.broadcast_id)
+        )
+        return [row[0] for row in result.all()]
+    
     async def mark_as_read(
         self,
         notification_id: int,
         user_id: int
-    ) -> Notification:
-        """Mark notification as read."""
+    ) -> dict:
+        """Mark notification (or broadcast, negative id) as read; returns the feed item."""
+        if notification_id < 0:
+            item = await self.get_feed_item(notification_id, user_id)
+            if not item:
+                raise NotFoundException("Notification not found")
+            if item["is_read"]:
+                return item
+            marked = await self._mark_broadcasts_read(user_id, [-notification_id])
+            await notification_counters.uncount_broadcasts(self.db, user_id, marked)
+            await self.db.commit()
+            return await self.get_feed_item(notification_id, user_id)
+        
         notification = await self.get_by_id(notification_id)
         
         if not notification:
@@ -175,12 +528,11 @@ class NotificationService:
         notification.read_at = now_tashkent()
         
         await self.db.commit()
-        await self.db.refresh(notification)
         
-        return notification
+        return await self.get_feed_item(notification_id, user_id)
     
     async def mark_all_as_read(self, user_id: int) -> int:
-        """Mark all notifications as read for a user."""
+        """Mark all notifications, broadcasts included, as read for a user."""
         result = await self.db.execute(
             update(Notification)
             .where(
@@ -191,33 +543,66 @@ class NotificationService:
             )
             .values(is_read=True, read_at=now_tashkent())
         )
+        now = now_tashkent()
+        count = result.rowcount + len(await self._mark_broadcasts_read(user_id, now=now))
+        await notification_counters.reset(self.db, user_id, now)
         
         await self.db.commit()
-        return result.rowcount
+        return count
     
     async def mark_selected_as_read(
         self,
         notification_ids: List[int],
         user_id: int
     ) -> int:
-        """Mark selected notifications as read."""
-        result = await self.db.execute(
-            update(Notification)
-            .where(
-                and_(
-                    Notification.id.in_(notification_ids),
-                    Notification.user_id == user_id,
-                    Notification.is_read == False
+        """Mark selected notifications (negative ids: broadcasts) as read."""
+        personal_ids = [i for i in notification_ids if i > 0]
+        broadcast_ids = [-i for i in notification_ids if i < 0]
+        count = 0
+        if personal_ids:
+            result = await self.db.execute(
+                update(Notification)
+                .where(
+                    and_(
+                        Notification.id.in_(personal_ids),
+                        Notification.user_id == user_id,
+                        Notification.is_read == False
+                    )
                 )
+                .values(is_read=True, read_at=now_tashkent())
             )
-            .values(is_read=True, read_at=now_tashkent())
-        )
+            count += result.rowcount
+            await notification_counters.add_deltas(self.db, {user_id: -result.rowcount})
+        if broadcast_ids:
+            marked = await self._mark_broadcasts_read(user_id, broadcast_ids)
+            await notification_counters.uncount_broadcasts(self.db, user_id, marked)
+            count += len(marked)
         
         await self.db.commit()
-        return result.rowcount
+        return count
     
     async def delete(self, notification_id: int, user_id: int = None) -> bool:
-        """Delete a notification. If user_id provided, check ownership."""
+        """
+        Delete a notification. If user_id provided, check ownership.
+        A broadcast (negative id) is only removed from that user's feed.
+        """
+        if notification_id < 0:
+            item = await self.get_feed_item(notification_id, user_id) if user_id is not None else None
+            if not item:
+                raise NotFoundException("Notification not found")
+            await self.db.execute(
+                pg_insert(BroadcastNotificationReceipt)
+                .values(broadcast_id=-notification_id, user_id=user_id, deleted_at=now_tashkent())
+                .on_conflict_do_update(
+                    index_elements=["user_id", "broadcast_id"],
+                    set_={"deleted_at": now_tashkent()},
+                )
+            )
+            if not item["is_read"]:
+                await notification_counters.uncount_broadcasts(self.db, user_id, [-notification_id])
+            await self.db.commit()
+            return True
+        
         notification = await self.get_by_id(notification_id)
         
         if not notification:
@@ -229,20 +614,27 @@ class NotificationService:
         return True
     
     async def delete_all_read(self, user_id: int) -> int:
-        """Delete all read notifications for a user."""
+        """Delete all read notifications (and read broadcasts) for a user."""
         result = await self.db.execute(
-            select(Notification).where(
+            delete(Notification).where(
                 and_(
                     Notification.user_id == user_id,
                     Notification.is_read == True
                 )
             )
         )
-        notifications = result.scalars().all()
+        count = result.rowcount
         
-        count = len(notifications)
-        for notification in notifications:
-            await self.db.delete(notification)
+        result = await self.db.execute(
+            update(BroadcastNotificationReceipt)
+            .where(
+                BroadcastNotificationReceipt.user_id == user_id,
+                BroadcastNotificationReceipt.read_at.isnot(None),
+                BroadcastNotificationReceipt.deleted_at.is_(None),
+            )
+            .values(deleted_at=now_tashkent())
+        )
+        count += result.rowcount
         
         await self.db.commit()
         return count
@@ -258,24 +650,29 @@ class NotificationService:
         action_url: Optional[str] = None,
         action_text: Optional[str] = None,
     ) -> int:
-        """Send a notification to multiple users."""
-        count = 0
-        for user_id in user_ids:
-            notification = Notification(
-                user_id=user_id,
-                title=title,
-                message=message,
-                type=notification_type,
-                priority=priority,
-                sender_id=sender_id,
-                action_url=action_url,
-                action_text=action_text,
-            )
-            self.db.add(notification)
-            count += 1
+        """Send a notification to multiple users (one multi-row INSERT)."""
+        if not user_ids:
+            return 0
+        await self.db.execute(
+            insert(Notification),
+            [
+                {
+                    "user_id": user_id,
+                    "title": title,
+                    "message": message,
+                    "type": notification_type,
+                    "priority": priority,
+                    "sender_id": sender_id,
+                    "action_url": action_url,
+                    "action_text": action_text,
+                }
+                for user_id in user_ids
+            ],
+        )
+        await notification_counters.add_deltas(self.db, Counter(user_ids))
         
         await self.db.commit()
-        return count
+        return len(user_ids)
 
     async def create_broadcast(
         self,
@@ -285,10 +682,12 @@ class NotificationService:
         """
         Create a broadcast notification.
         
+        Only the broadcast row is written; recipients see it through
+        their feed (see _feed) from scheduled_at on.
+        
         Returns:
-            Tuple of (broadcast, number of notifications sent)
+            Tuple of (broadcast, number of recipients)
         """
-        # Create broadcast record
         broadcast = BroadcastNotification(
             title=broadcast_data.title,
             message=broadcast_data.message,
@@ -302,79 +701,50 @@ class NotificationService:
             sender_id=sender_id,
         )
         
-        self.db.add(broadcast)
-        await self.db.flush()
-        
-        # Get target users
-        target_users = await self._get_broadcast_targets(
+        sent_count = await self._count_broadcast_targets(
             broadcast_data.target_role,
             broadcast_data.target_group_id
         )
-        
-        # Create individual notifications
-        sent_count = 0
-        for user_id in target_users:
-            notification = Notification(
-                user_id=user_id,
-                title=broadcast_data.title,
-                message=broadcast_data.message,
-                type=broadcast_data.type,
-                priority=broadcast_data.priority,
-                action_url=broadcast_data.action_url,
-                expires_at=broadcast_data.expires_at,
-                sender_id=sender_id,
-            )
-            self.db.add(notification)
-            sent_count += 1
-        
         broadcast.sent_count = sent_count
         broadcast.sent_at = now_tashkent()
         
+        self.db.add(broadcast)
         await self.db.commit()
         await self.db.refresh(broadcast)
+        _forget_timeline()
         
         return broadcast, sent_count
     
-    async def _get_broadcast_targets(
+    async def _count_broadcast_targets(
         self,
         target_role: Optional[str],
         target_group_id: Optional[int]
-    ) -> List[int]:
-        """Get user IDs for broadcast targets."""
-        user_ids = []
-        
+    ) -> int:
+        """Count the users a broadcast reaches (same rules as _visible_broadcasts)."""
         if target_group_id:
-            # Get students in group
-            result = await self.db.execute(
-                select(Student.user_id)
+            # Students in group
+            query = (
+                select(func.count(Student.user_id))
                 .where(Student.group_id == target_group_id)
                 .where(Student.user_id.isnot(None))
             )
-            user_ids.extend([row[0] for row in result.all()])
         elif target_role and target_role != "all":
-            # Get users by role
-            role_map = {
-                "student": UserRole.STUDENT,
-                "leader": UserRole.LEADER,
-                "admin": UserRole.ADMIN,
-            }
-            role = role_map.get(target_role)
-            
-            if role:
-                result = await self.db.execute(
-                    select(User.id)
-                    .where(User.role == role)
-                    .where(User.is_active == True)
-                )
-                user_ids.extend([row[0] for row in result.all()])
+            # Users by role
+            try:
+                role = UserRole(target_role)
+            except ValueError:
+                return 0
+            query = (
+                select(func.count(User.id))
+                .where(User.role == role)
+                .where(User.is_active == True)
+            )
         else:
             # All active users
-            result = await self.db.execute(
-                select(User.id).where(User.is_active == True)
-            )
-            user_ids.extend([row[0] for row in result.all()])
+            query = select(func.count(User.id)).where(User.is_active == True)
         
-        return user_ids
+        result = await self.db.execute(query)
+        return result.scalar() or 0
     
     async def send_attendance_notification(
         self,
@@ -441,3 +811,66 @@ class NotificationService:
         await self.db.commit()
         
         return notification
+
+
+async def wait_for_unread_change(user_id: int, known: int, timeout: float) -> int:
+    """
+    Wait up to `timeout` seconds for the user's unread count to differ
+    from `known` and return the current count. Commits in this process
+    wake the waiter at once; other workers' commits are seen on the next
+    re-check. No connection is held between checks.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        changed = notification_counters.changed_event(user_id)
+        async with async_session_maker() as db:
+            count = await NotificationService(db).get_unread_count(user_id)
+            await db.commit()
+        remaining = deadline - time.monotonic()
+        if count != known or remaining <= 0:
+            return count
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=min(remaining, BADGE_POLL_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def read_badge(
+    db: AsyncSession,
+    user_id: int,
+    if_none_match: Optional[str] = None,
+    wait: int = 0
+) -> Tuple[int, str]:
+    """
+    Unread count and its ETag for the badge endpoints. With wait > 0 and
+    an If-None-Match equal to the current ETag, long-polls until the count
+    changes or `wait` seconds pass.
+    """
+    count = await NotificationService(db).get_unread_count(user_id)
+    if wait and if_none_match == notification_counters.badge_etag(count):
+        # Release the request's connection while waiting
+        await db.commit()
+        count = await wait_for_unread_change(user_id, count, wait)
+    return count, notification_counters.badge_etag(count)
+
+
+async def unread_counter_reconcile_loop() -> None:
+    """
+    Background loop started from the lifespan handler: reconciles every
+    counter at startup (creating missing ones) and then every
+    NOTIFICATION_COUNTERS_RECONCILE_SECONDS. Only one worker at a time
+    does the work.
+    """
+    while True:
+        try:
+            async with async_session_maker() as db:
+                locked = (await db.execute(
+                    select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_KEY))
+                )).scalar()
+                if locked:
+                    changed = await NotificationService(db).reconcile_unread_counters()
+                    if changed:
+                        logger.info(f"Reconciled {len(changed)} unread notification counters")
+        except Exception as e:
+            logger.error(f"Unread counter reconciliation failed: {e}")
+        await asyncio.sleep(settings.NOTIFICATION_COUNTERS_RECONCILE_SECONDS)
@@ -0,0 +1,160 @@
+"""
+UniControl - Report Artifacts
+=============================
+Rendered report files (PDF, Excel, CSV), made in worker processes and
+cached on disk.
+
+ReportLab and openpyxl are CPU-bound and hold the GIL: a large attendance
+report rendered on the request's event loop stalls every other request of
+that worker. Reports are therefore rendered in two steps:
+
+1. the report services collect the report's data as plain values, with a
+   few aggregate queries (ReportService.collect);
+2. a small process pool of spawned workers lays it out
+   (app.report_rendering.render_report) straight into the artifact file.
+
+An artifact is stored as reports/<report id>/<fingerprint>.<ext> under
+UPLOAD_DIR. The fingerprint is a hash of the format, the collected data
+and the renderer version, so a download of an unchanged report is served
+from disk and any change in its data renders a new file (older ones of the
+same format are removed). Concurrent requests for the same artifact share
+one render. Like the other pools, this one is bounded: at
+REPORT_MAX_PENDING renders queued or running, new ones get 503.
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.report_rendering import RENDERER_VERSION, render_report
+
+
+REPORT_DIR = "reports"
+
+# format -> (media type, file extension)
+REPORT_FORMATS = {
+    "pdf": ("application/pdf", "pdf"),
+    "excel": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def fingerprint(fmt: str, data: Dict[str, Any]) -> str:
+    """Content key of an artifact: format, collected data and renderer version."""
+    payload = json.dumps([RENDERER_VERSION, fmt, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class ReportRenderer:
+    """Renders report artifacts on a bounded process pool; see the module docstring."""
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, root: Optional[Path] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.root = Path(root or settings.UPLOAD_DIR) / REPORT_DIR
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.pending = 0
+        self.peak_pending = 0
+        self.rendered = 0
+        self.cache_hits = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def path(self, report_id: int, fmt: str, key: str) -> Path:
+        return self.root / str(report_id) / f"{key}.{REPORT_FORMATS[fmt][1]}"
+
+    async def _render(self, fmt: str, data: Dict[str, Any], path: Path) -> Path:
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(self._get_executor(), render_report, fmt, data, str(path))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): start a fresh pool next time
+            self.failed += 1
+            self._executor = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.rendered += 1
+        logger.info(f"Report artifact rendered: {path.parent.name}/{path.name} ({size} bytes)")
+        await run_in_threadpool(self._remove_stale, path)
+        return path
+
+    @staticmethod
+    def _remove_stale(path: Path) -> None:
+        """Earlier artifacts of the same report and format."""
+        for old in path.parent.glob(f"*{path.suffix}"):
+            if old != path:
+                old.unlink(missing_ok=True)
+
+    async def render(self, report_id: int, fmt: str, data: Dict[str, Any]) -> Path:
+        """
+        The artifact of a report's collected data, rendered unless cached.
+
+        Raises:
+            ServiceUnavailableException: the pool is saturated
+        """
+        key = fingerprint(fmt, data)
+        path = self.path(report_id, fmt, key)
+        if path.exists():
+            self.cache_hits += 1
+            return path
+        job = self._inflight.get((report_id, key))
+        if job is None:
+            if self.pending >= self.max_pending:
+                raise ServiceUnavailableException("Server band. Birozdan so'ng qayta urinib ko'ring.")
+            job = asyncio.ensure_future(self._render(fmt, data, path))
+            self._inflight[(report_id, key)] = job
+            job.add_done_callback(lambda _: self._inflight.pop((report_id, key), None))
+        # A cancelled download must not cancel the render others wait for
+        return await asyncio.shield(job)
+
+    async def remove(self, report_id: int) -> None:
+        """Delete every artifact of a report."""
+        await run_in_threadpool(shutil.rmtree, self.root / str(report_id), True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "rendered": self.rendered,
+            "cache_hits": self.cache_hits,
+            "failed": self.failed,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+report_renderer = ReportRenderer(
+    workers=settings.REPORT_WORKERS,
+    max_pending=settings.REPORT_MAX_PENDING,
+)
@@ -3,13 +3,22 @@ UniControl - Report Service
 ===========================
 Handles report generation, statistics, and management.
 
+Report files (PDF, Excel, CSV) are rendered from collected data in worker
+processes and cached by data fingerprint; see report_artifacts. The
+artifact found for a report is remembered per process while the tables it
+is collected from and the report's own fields are unchanged, so repeated
+requests for the same download (revalidations, range requests) do not
+collect it again.
+
 Author: UniControl Team
 Version: 2.0.0
 """
 
+from collections import OrderedDict
 from datetime import datetime, date
+from pathlib import Path
 from app.config import now_tashkent, today_tashkent
-from typing import Optional, List, Tuple
+from typing import Any, Dict, Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from loguru import logger
@@ -18,7 +27,35 @@ from app.models.report import Report, ReportType, ReportFormat, ReportStatus
 from app.models.student import Student
 from app.models.attendance import Attendance, AttendanceStatus
 from app.schemas.report import ReportCreate, ReportUpdate, ReportResponse
+from app.core.cache import table_versions
 from app.core.exceptions import NotFoundException
+from app.services.report_artifacts import REPORT_FORMATS, report_renderer
+
+
+def report_fields(report: Report) -> Dict[str, Any]:
+    """The report's own fields that appear in its rendered files."""
+    return {
+        "id": report.id,
+        "name": report.name,
+        "description": report.description,
+        "report_type": report.report_type.value,
+        "format": report.format.value,
+        "status": report.status.value,
+        "date_from": report.date_from,
+        "date_to": report.date_to,
+        "created_by": report.created_by,
+        "created_at": report.created_at,
+        "ai_result": report.ai_result,
+    }
+
+
+# Tables a report's data is collected from; its own row is compared directly,
+# so a download counted on it does not drop the remembered artifact
+DEPENDS_ON = ("attendances", "students", "groups")
+KNOWN_ARTIFACTS_SIZE = 1024
+
+# (report id, format) -> (state the artifact was collected at, its path)
+_known_artifacts: "OrderedDict[Tuple[int, str], Tuple[Any, Path]]" = OrderedDict()
 
 
 class ReportService:
@@ -159,6 +196,7 @@ class ReportService:
         
         await self.db.delete(report)
         await self.db.commit()
+        await report_renderer.remove(report_id)
         logger.info(f"Report deleted: id={report_id}")
         
         return True
@@ -228,221 +266,110 @@ class ReportService:
         # Process the report
         return await self.process_report(report.id)
 
-    async def download_report(
-        self, report_id: int, format: str = "pdf"
-    ) -> tuple:
+    async def collect(self, report: Report, format: str) -> dict:
         """
-        Download report file.
-        Returns (file_data, content_type, filename).
+        The data a report's file is rendered from, as plain values: the
+        PDF layout's for "pdf", the table for "excel" and "csv".
         """
-        report = await self.get_by_id(report_id)
-        if not report:
-            raise NotFoundException("Report not found")
-
-        # Increment download counter
-        report.download_count = (report.download_count or 0) + 1
-        await self.db.commit()
-
-        report_name = (report.name or "report").replace(" ", "_")
-
         if format == "pdf":
             from app.services.pdf_service import PDFReportGenerator
-            pdf_gen = PDFReportGenerator(self.db)
-            file_data = await pdf_gen.generate_pdf(report)
-            return (
-                file_data,
-                "application/pdf",
-                f"{report_name}_{report_id}.pdf",
-            )
-
-        elif format == "excel":
-            file_data = await self._generate_excel(report)
-            return (
-                file_data,
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                f"{report_name}_{report_id}.xlsx",
-            )
-
-        elif format == "csv":
-            file_data = await self._generate_csv(report)
-            return file_data, "text/csv; charset=utf-8", f"{report_name}_{report_id}.csv"
-
-        else:
-            # Default to PDF
-            from app.services.pdf_service import PDFReportGenerator
-            pdf_gen = PDFReportGenerator(self.db)
-            file_data = await pdf_gen.generate_pdf(report)
-            return (
-                file_data,
-                "application/pdf",
-                f"{report_name}_{report_id}.pdf",
+            return await PDFReportGenerator(self.db).collect(report)
+        return {"report": report_fields(report), **await self._table_data(report, format)}
+
+    async def _table_data(self, report: Report, format: str) -> dict:
+        """Rows of the Excel/CSV report, read in one query."""
+        if report.report_type == ReportType.ATTENDANCE:
+            query = (
+                select(Student.name, Attendance.student_id, Attendance.date, Attendance.status, Attendance.note)
+                .outerjoin(Student, Student.id == Attendance.student_id)
             )
-
-    async def _generate_excel(self, report) -> bytes:
-        """Generate Excel report with real data."""
-        import io
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Hisobot"
-
-        # Styles
-        header_font = Font(name='Arial', bold=True, size=11, color='FFFFFF')
-        header_fill = PatternFill(start_color='1E293B', end_color='1E293B', fill_type='solid')
-        header_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin', color='E2E8F0'),
-            right=Side(style='thin', color='E2E8F0'),
-            top=Side(style='thin', color='E2E8F0'),
-            bottom=Side(style='thin', color='E2E8F0'),
-        )
-
-        # Title row
-        ws.merge_cells('A1:G1')
-        title_cell = ws['A1']
-        title_cell.value = report.name or "Hisobot"
-        title_cell.font = Font(name='Arial', bold=True, size=16, color='6D28D9')
-        title_cell.alignment = Alignment(horizontal='center')
-        ws.row_dimensions[1].height = 30
-
-        # Info rows
-        ws['A3'] = "Turi:"
-        ws['B3'] = report.report_type.value.replace("_", " ").title()
-        ws['A4'] = "Holat:"
-        ws['B4'] = report.status.value.upper()
-        ws['A5'] = "Davr:"
-        ws['B5'] = f"{report.date_from or '—'} — {report.date_to or '—'}"
-
-        start_row = 7
-
-        # Fetch data based on type
-        if report.report_type.value in ("attendance",):
-            headers = ["#", "Talaba", "Sana", "Holat", "Izoh"]
-            for col, h in enumerate(headers, 1):
-                cell = ws.cell(row=start_row, column=col, value=h)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_align
-                cell.border = thin_border
-
-            query = select(Attendance)
             if report.date_from:
                 query = query.where(Attendance.date >= report.date_from)
             if report.date_to:
                 query = query.where(Attendance.date <= report.date_to)
-            if report.group_id:
-                query = query.join(Student, Student.id == Attendance.student_id).where(
-                    Student.group_id == report.group_id
-                )
-            result = await self.db.execute(query.order_by(Attendance.date.desc()))
-            attendances = result.scalars().all()
-
-            for idx, att in enumerate(attendances, 1):
-                row = start_row + idx
-                ws.cell(row=row, column=1, value=idx).border = thin_border
-                # Try to get student name
-                s_result = await self.db.execute(select(Student.name).where(Student.id == att.student_id))
-                s_name = s_result.scalar() or f"ID: {att.student_id}"
-                ws.cell(row=row, column=2, value=s_name).border = thin_border
-                ws.cell(row=row, column=3, value=str(att.date)).border = thin_border
-                status_map = {"present": "Keldi", "absent": "Kelmadi", "late": "Kechikdi"}
-                ws.cell(row=row, column=4, value=status_map.get(att.status.value, att.status.value)).border = thin_border
-                ws.cell(row=row, column=5, value=att.note if hasattr(att, 'note') and att.note else "").border = thin_border
-
-        elif report.report_type.value in ("payment", "students"):
-            headers = ["#", "Talaba", "ID", "Telefon", "Kontrakt", "To'langan", "Qoldiq"]
-            for col, h in enumerate(headers, 1):
-                cell = ws.cell(row=start_row, column=col, value=h)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_align
-                cell.border = thin_border
-
-            query = select(Student).where(Student.is_active == True)
             if report.group_id:
                 query = query.where(Student.group_id == report.group_id)
-            result = await self.db.execute(query.order_by(Student.name))
-            students = result.scalars().all()
-
-            for idx, s in enumerate(students, 1):
-                row = start_row + idx
-                amount = float(s.contract_amount or 0)
-                paid = float(s.contract_paid or 0)
-                ws.cell(row=row, column=1, value=idx).border = thin_border
-                ws.cell(row=row, column=2, value=s.name).border = thin_border
-                ws.cell(row=row, column=3, value=s.student_id or "—").border = thin_border
-                ws.cell(row=row, column=4, value=s.phone or "—").border = thin_border
-                ws.cell(row=row, column=5, value=amount).border = thin_border
-                ws.cell(row=row, column=5).number_format = '#,##0'
-                ws.cell(row=row, column=6, value=paid).border = thin_border
-                ws.cell(row=row, column=6).number_format = '#,##0'
-                ws.cell(row=row, column=7, value=max(amount - paid, 0)).border = thin_border
-                ws.cell(row=row, column=7).number_format = '#,##0'
-        else:
-            # Generic
-            ws.cell(row=start_row, column=1, value="Ma'lumot").font = header_font
-            ws.cell(row=start_row, column=1).fill = header_fill
-            ws.cell(row=start_row + 1, column=1, value=report.description or "Maxsus hisobot")
-
-        # Auto-width
-        for col in ws.columns:
-            max_length = 0
-            column_letter = None
-            for cell in col:
-                try:
-                    if hasattr(cell, 'column_letter'):
-                        column_letter = cell.column_letter
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except Exception:
-                    pass
-            if column_letter:
-                ws.column_dimensions[column_letter].width = min(max_length + 4, 40)
-
-        output = io.BytesIO()
-        wb.save(output)
-        return output.getvalue()
-
-    async def _generate_csv(self, report) -> bytes:
-        """Generate CSV report with real data."""
-        import csv as csv_module
-        import io as io_module
-
-        output = io_module.StringIO()
-        writer = csv_module.writer(output)
-
-        if report.report_type.value in ("attendance",):
-            writer.writerow(["#", "Talaba", "Sana", "Holat"])
-            query = select(Attendance)
-            if report.date_from:
-                query = query.where(Attendance.date >= report.date_from)
-            if report.date_to:
-                query = query.where(Attendance.date <= report.date_to)
-            if report.group_id:
-                query = query.join(Student, Student.id == Attendance.student_id).where(
-                    Student.group_id == report.group_id
-                )
-            result = await self.db.execute(query.order_by(Attendance.date.desc()))
-            attendances = result.scalars().all()
-            for idx, att in enumerate(attendances, 1):
-                s_result = await self.db.execute(select(Student.name).where(Student.id == att.student_id))
-                s_name = s_result.scalar() or f"ID: {att.student_id}"
-                writer.writerow([idx, s_name, str(att.date), att.status.value])
-        else:
-            writer.writerow(["#", "Talaba", "ID", "Kontrakt", "To'langan", "Qoldiq"])
-            query = select(Student).where(Student.is_active == True)
+            result = await self.db.execute(query.order_by(Attendance.date.desc(), Attendance.id.desc()))
+            return {
+                "kind": "attendance",
+                "rows": [
+                    [name or f"ID: {student_id}", day, status.value, note]
+                    for name, student_id, day, status, note in result.all()
+                ],
+            }
+
+        if format == "csv" or report.report_type in (ReportType.PAYMENT, ReportType.STUDENTS):
+            query = select(
+                Student.name, Student.student_id, Student.phone, Student.contract_amount, Student.contract_paid
+            ).where(Student.is_active == True)
             if report.group_id:
                 query = query.where(Student.group_id == report.group_id)
             result = await self.db.execute(query.order_by(Student.name))
-            students = result.scalars().all()
-            for idx, s in enumerate(students, 1):
-                amount = float(s.contract_amount or 0)
-                paid = float(s.contract_paid or 0)
-                writer.writerow([idx, s.name, s.student_id or "", amount, paid, max(amount - paid, 0)])
+            return {
+                "kind": "students",
+                "rows": [
+                    [name, student_id, phone, float(amount or 0), float(paid or 0)]
+                    for name, student_id, phone, amount, paid in result.all()
+                ],
+            }
+
+        return {"kind": "generic"}
+
+    async def render(self, report: Report, format: str) -> Path:
+        """The report's file in `format`, from the artifact cache or rendered now."""
+        data = await self.collect(report, format)
+        return await report_renderer.render(report.id, format, data)
+
+    async def artifact(self, report: Report, format: str) -> Path:
+        """
+        The report's file in `format`: the one found last time while its
+        tables and fields are unchanged, without collecting, else render().
+        Without table versions (no Redis) it is collected every time.
+        """
+        try:
+            versions = await table_versions(*DEPENDS_ON)
+        except Exception:
+            versions = None
+        key = (report.id, format)
+        state = (versions, report.group_id, report_fields(report))
+        known = _known_artifacts.get(key)
+        if versions is not None and known is not None and known[0] == state and known[1].exists():
+            _known_artifacts.move_to_end(key)
+            return known[1]
+
+        path = await self.render(report, format)
+        if versions is not None:
+            _known_artifacts[key] = (state, path)
+            _known_artifacts.move_to_end(key)
+            while len(_known_artifacts) > KNOWN_ARTIFACTS_SIZE:
+                _known_artifacts.popitem(last=False)
+        return path
 
-        return output.getvalue().encode("utf-8-sig")
+    async def download_report(
+        self, report_id: int, format: str = "pdf"
+    ) -> tuple:
+        """
+        Download report file.
+        Returns (file_path, content_type, filename).
+        """
+        report = await self.get_by_id(report_id)
+        if not report:
+            raise NotFoundException("Report not found")
+
+        if format not in REPORT_FORMATS:
+            format = "pdf"
+
+        report_name = (report.name or "report").replace(" ", "_")
+        content_type, extension = REPORT_FORMATS[format]
+        file_path = await self.artifact(report, format)
+        return file_path, content_type, f"{report_name}_{report_id}.{extension}"
+
+    async def increment_download_count(self, report_id: int) -> None:
+        """Increment report download counter."""
+        report = await self.get_by_id(report_id)
+        if report:
+            report.download_count = (report.download_count or 0) + 1
+            await self.db.commit()
 
     async def get_report_stats(
         self,
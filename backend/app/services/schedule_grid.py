@@ -0,0 +1,133 @@
+"""
+UniControl - Schedule Grid Engine
+=================================
+Loads a timetable worksheet once into a dense 2D array of values plus an
+interval index of its merged ranges, so the schedule parsers can read
+any cell (merged or not) without openpyxl's random-access ws.cell().
+
+Workbooks are opened in openpyxl read-only mode, which streams each
+sheet's rows. Read-only worksheets do not expose merged ranges, so those
+are read from the sheet XML's <mergeCells> section directly.
+
+Usage:
+    for grid in load_schedule_grids(file_data):
+        grid.value(5, 3)          # resolves merged cells to the top-left value
+        grid.merged_range(5, 3)   # (min_row, min_col, max_row, max_col) or None
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import io
+import re
+import zipfile
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
+
+
+# (min_row, min_col, max_row, max_col), 1-based inclusive
+CellRange = Tuple[int, int, int, int]
+
+_MERGE_CELL_RE = re.compile(rb'<(?:\w+:)?mergeCell\s+ref="([^"]+)"')
+
+
+class SheetGrid:
+    """One worksheet: dense values (1-based access) and merged-range index."""
+
+    def __init__(self, title: str, rows: List[tuple], merged_ranges: List[CellRange]):
+        self.title = title
+        self.max_column = max((len(r) for r in rows), default=0)
+        self.max_row = len(rows)
+        self._rows: List[List[Any]] = [
+            list(r) + [None] * (self.max_column - len(r)) for r in rows
+        ]
+        self.merged_ranges = merged_ranges
+
+        # row -> (sorted min_cols, ranges); ranges in a row never overlap
+        starts: Dict[int, List[Tuple[int, CellRange]]] = {}
+        for rng in merged_ranges:
+            min_row, min_col, max_row, _ = rng
+            for r in range(min_row, max_row + 1):
+                starts.setdefault(r, []).append((min_col, rng))
+        self._row_index: Dict[int, Tuple[List[int], List[CellRange]]] = {}
+        for r, entries in starts.items():
+            entries.sort()
+            self._row_index[r] = ([c for c, _ in entries], [rng for _, rng in entries])
+
+    @classmethod
+    def from_worksheet(cls, ws, archive: Optional[zipfile.ZipFile] = None) -> "SheetGrid":
+        """
+        Build from an openpyxl worksheet. Read-only worksheets need the
+        workbook's zip archive to read merged ranges.
+        """
+        if hasattr(ws, "reset_dimensions"):
+            ws.reset_dimensions()  # read-only: trust the data, not the stored dimension
+        rows = list(ws.iter_rows(values_only=True))
+        return cls(ws.title, rows, _merged_ranges(ws, archive))
+
+    def raw(self, row: int, col: int) -> Any:
+        """Stored value of a cell (None for merged cells other than the top-left)."""
+        if 1 <= row <= self.max_row and 1 <= col <= self.max_column:
+            return self._rows[row - 1][col - 1]
+        return None
+
+    def row(self, row: int) -> List[Any]:
+        """Stored values of a row."""
+        if 1 <= row <= self.max_row:
+            return self._rows[row - 1]
+        return []
+
+    def merged_range(self, row: int, col: int) -> Optional[CellRange]:
+        """The merged range containing a cell, if any."""
+        entry = self._row_index.get(row)
+        if entry is None:
+            return None
+        min_cols, ranges = entry
+        i = bisect_right(min_cols, col) - 1
+        if i >= 0 and ranges[i][3] >= col:
+            return ranges[i]
+        return None
+
+    def value(self, row: int, col: int) -> Any:
+        """Cell value, resolving merged cells to their top-left value."""
+        rng = self.merged_range(row, col)
+        if rng is not None:
+            return self.raw(rng[0], rng[1])
+        return self.raw(row, col)
+
+
+def _merged_ranges(ws, archive: Optional[zipfile.ZipFile]) -> List[CellRange]:
+    merged = getattr(ws, "merged_cells", None)
+    if merged is not None:
+        return [(r.min_row, r.min_col, r.max_row, r.max_col) for r in merged.ranges]
+    if archive is None:
+        return []
+    xml = archive.read(ws._worksheet_path)
+    # <mergeCells> follows <sheetData>; skip scanning the cell data
+    start = max(xml.rfind(b"sheetData>"), 0)
+    ranges = []
+    for ref in _MERGE_CELL_RE.findall(xml, start):
+        min_col, min_row, max_col, max_row = range_boundaries(ref.decode())
+        ranges.append((min_row, min_col, max_row, max_col))
+    return ranges
+
+
+def load_schedule_grids(
+    file_data: bytes,
+    include: Optional[Callable[[str], bool]] = None,
+) -> Iterator[SheetGrid]:
+    """
+    Yield a SheetGrid per worksheet, loading one sheet at a time.
+    Sheets whose title fails include(title) are not loaded.
+    """
+    wb = load_workbook(io.BytesIO(file_data), read_only=True, data_only=True)
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_data)) as archive:
+            for ws in wb.worksheets:
+                if include is None or include(ws.title):
+                    yield SheetGrid.from_worksheet(ws, archive)
+    finally:
+        wb.close()
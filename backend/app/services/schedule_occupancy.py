@@ -0,0 +1,554 @@
+"""
+UniControl - Schedule Occupancy Engine
+======================================
+Who is busy when, for every room, teacher and group, as bitsets over
+the weekly timetable grid, so schedule conflicts, free rooms and
+occupancy rates are a few integer operations per slot instead of a
+query per lesson.
+
+A slot is (day, lesson, week parity): bit
+    (day_index * LESSONS_PER_DAY + lesson - 1) * 2 + parity
+of a resource's mask, where parity 0 is an odd week and 1 an even one.
+A WeekType.ALL lesson occupies both parities. Lessons without a
+lesson_number occupy every para their time range overlaps.
+
+- Groups never share a slot. A room or teacher may: lessons with the
+  same subject and type at the same slot are one lecture given to
+  several groups (see /academic/schedules/lecture-multi).
+- The engine is per process and built from active weekly schedules and
+  active rooms. Commits of this process that add, change or delete
+  Schedule rows through the ORM update it in place and bump
+  OCCUPANCY_VERSION_KEY; the engine then takes the bumped version as
+  its own, so only other workers' schedule writes, bulk statements and
+  room changes (the rooms table version, see app.core.cache) make it
+  rebuild. The schedules table version is not used: it is bumped by
+  every schedule write, local ones included.
+
+Usage:
+    engine = await get_occupancy()
+    engine.conflicts([Booking(...), ...])       # against the timetable and each other
+    engine.free_rooms(WeekDay.MONDAY, 3)
+    engine.occupancy_rate(("room", "401"))
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import asyncio
+import time as monotonic_time
+from dataclasses import dataclass, field, replace
+from datetime import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import event, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core.cache import VERSION_PREFIX
+from app.database import async_session_maker, get_redis
+from app.models.group import Group
+from app.models.room import Room
+from app.models.schedule import Schedule, WeekDay, WeekType
+
+
+# Para windows. The third para starts at 11:30 or 12:00 depending on the
+# building's timetable, so its window covers both.
+LESSON_SLOTS: Dict[int, Tuple[time, time]] = {
+    1: (time(8, 30), time(9, 50)),
+    2: (time(10, 0), time(11, 20)),
+    3: (time(11, 30), time(13, 20)),
+    4: (time(13, 30), time(14, 50)),
+    5: (time(15, 0), time(16, 20)),
+    6: (time(16, 30), time(17, 50)),
+    7: (time(18, 0), time(19, 20)),
+}
+LESSONS_PER_DAY = len(LESSON_SLOTS)
+DAYS: List[WeekDay] = list(WeekDay)
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+DAY_NAMES_UZ = {
+    WeekDay.MONDAY: "Dushanba", WeekDay.TUESDAY: "Seshanba", WeekDay.WEDNESDAY: "Chorshanba",
+    WeekDay.THURSDAY: "Payshanba", WeekDay.FRIDAY: "Juma", WeekDay.SATURDAY: "Shanba",
+    WeekDay.SUNDAY: "Yakshanba",
+}
+# Occupancy rates are relative to the teaching week: Monday-Saturday, paras 1-6
+TEACHING_DAYS = DAYS[:6]
+TEACHING_LESSONS = 6
+
+LOCAL_TTL = 30  # seconds, when Redis versions are unavailable
+# Bumped by this module only, on commits that change schedules
+OCCUPANCY_VERSION_KEY = f"{VERSION_PREFIX}schedule_occupancy"
+ROOMS_VERSION_KEY = f"{VERSION_PREFIX}rooms"
+
+# ("group", group_id) / ("room", normalized name) / ("teacher", id or normalized name)
+Resource = Tuple[str, object]
+
+
+def slot_bit(day: WeekDay, lesson: int, parity: int) -> int:
+    return (DAY_INDEX[day] * LESSONS_PER_DAY + lesson - 1) * 2 + parity
+
+
+def lessons_for(start: Optional[time], end: Optional[time], lesson_number: Optional[int] = None) -> List[int]:
+    """
+    Paras a lesson occupies: its lesson_number, else those its time range
+    overlaps. A lesson_number outside LESSON_SLOTS (rows saved before the
+    schemas limited it to 1-7) is treated as missing, so the lesson is
+    placed by its time range instead of being left out.
+    """
+    if lesson_number in LESSON_SLOTS:
+        return [lesson_number]
+    if start is None or end is None:
+        return []
+    return [n for n, (s, e) in LESSON_SLOTS.items() if start < e and s < end]
+
+
+def parities(week_type) -> Tuple[int, ...]:
+    week_type = WeekType(week_type) if week_type else WeekType.ALL
+    if week_type == WeekType.ODD:
+        return (0,)
+    if week_type == WeekType.EVEN:
+        return (1,)
+    return (0, 1)
+
+
+def slot_mask(day: Optional[WeekDay], lessons: Iterable[int], week_type=WeekType.ALL) -> int:
+    """Bitset of the slots of a weekly lesson."""
+    if day is None:
+        return 0
+    mask = 0
+    for lesson in lessons:
+        for parity in parities(week_type):
+            mask |= 1 << slot_bit(day, lesson, parity)
+    return mask
+
+
+def _days_mask(days: Iterable[WeekDay], lessons: Iterable[int]) -> int:
+    lessons = list(lessons)
+    mask = 0
+    for day in days:
+        mask |= slot_mask(day, lessons)
+    return mask
+
+
+_TEACHING_WINDOW = _days_mask(TEACHING_DAYS, range(1, TEACHING_LESSONS + 1))
+# Odd-week bit of every slot, to count slots regardless of parity
+_ODD_WEEK_BITS = sum(1 << (2 * i) for i in range(len(DAYS) * LESSONS_PER_DAY))
+
+
+def _decode(bit: int) -> Tuple[WeekDay, int, int]:
+    slot, parity = divmod(bit, 2)
+    day_index, lesson_index = divmod(slot, LESSONS_PER_DAY)
+    return DAYS[day_index], lesson_index + 1, parity
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def resource_key(name: Optional[str]) -> Optional[str]:
+    """Rooms and teachers without an id are matched on their trimmed, lower-cased name."""
+    key = (name or "").strip().lower()
+    return key or None
+
+
+# ==================== Bookings ====================
+
+@dataclass(frozen=True)
+class Booking:
+    """One weekly lesson as the engine sees it (a schedule row or a candidate)."""
+    group_id: int
+    subject: str
+    day: Optional[WeekDay]
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    lesson_number: Optional[int] = None
+    week_type: WeekType = WeekType.ALL
+    schedule_type: Optional[str] = None
+    room: Optional[str] = None
+    teacher_id: Optional[int] = None
+    teacher_name: Optional[str] = None
+    group_name: Optional[str] = None
+    id: Optional[int] = None
+
+    @classmethod
+    def from_schedule(cls, s: Schedule, group_name: Optional[str] = None) -> "Booking":
+        return cls(
+            id=s.id,
+            group_id=s.group_id,
+            group_name=group_name,
+            subject=s.subject,
+            schedule_type=s.schedule_type.value if s.schedule_type else None,
+            day=s.day_of_week,
+            start_time=s.start_time,
+            end_time=s.end_time,
+            lesson_number=s.lesson_number,
+            week_type=s.week_type or WeekType.ALL,
+            room=s.room,
+            teacher_id=s.teacher_id,
+            teacher_name=s.teacher_name,
+        )
+
+    @property
+    def lessons(self) -> List[int]:
+        return lessons_for(self.start_time, self.end_time, self.lesson_number)
+
+    @property
+    def mask(self) -> int:
+        return slot_mask(self.day, self.lessons, self.week_type)
+
+    @property
+    def activity(self) -> Tuple[str, Optional[str]]:
+        """Bookings with the same activity may share a room or teacher."""
+        return ((self.subject or "").strip().lower(), self.schedule_type)
+
+    def resources(self) -> List[Resource]:
+        found: List[Resource] = [("group", self.group_id)]
+        room = resource_key(self.room)
+        if room:
+            found.append(("room", room))
+        if self.teacher_id:
+            found.append(("teacher", self.teacher_id))
+        teacher = resource_key(self.teacher_name)
+        if teacher:
+            found.append(("teacher", teacher))
+        return found
+
+
+@dataclass
+class Conflict:
+    """A slot a booking wants that its group, room or teacher already uses."""
+    index: Optional[int]  # position of the booking in the checked batch
+    kind: str  # "group" | "room" | "teacher"
+    day: WeekDay
+    lesson: Optional[int]  # None when the clash is outside the para grid
+    booking: Booking
+    other: Booking
+
+    @property
+    def message(self) -> str:
+        if self.lesson:
+            when = f"{DAY_NAMES_UZ[self.day]} {self.lesson}-para"
+        else:
+            when = (f"{DAY_NAMES_UZ[self.day]} {self.other.start_time.strftime('%H:%M')}"
+                    f"-{self.other.end_time.strftime('%H:%M')}")
+        if self.kind == "group":
+            who = f"{self.booking.group_name or self.booking.group_id} guruhi"
+        elif self.kind == "room":
+            who = f"{(self.other.room or '').strip()} xonasi"
+        else:
+            who = f"{self.other.teacher_name or self.booking.teacher_name or self.other.teacher_id} o'qituvchi"
+        busy_with = self.other.subject
+        if self.other.group_name and self.kind != "group":
+            busy_with += f", {self.other.group_name}"
+        return f"{who} {when} band ({busy_with})"
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "kind": self.kind,
+            "day": self.day.value,
+            "lesson_number": self.lesson,
+            "schedule_id": self.other.id if self.other.id and self.other.id > 0 else None,
+            # Clash with an earlier booking of the same batch
+            "with_index": -self.other.id - 1 if self.other.id and self.other.id < 0 else None,
+            "message": self.message,
+        }
+
+
+# ==================== Engine ====================
+
+@dataclass
+class OccupancyEngine:
+    """Slot bitsets per resource; see the module docstring."""
+    bookings: Dict[int, Booking] = field(default_factory=dict)
+    # resource -> bitset of busy slots
+    masks: Dict[Resource, int] = field(default_factory=dict)
+    # resource -> slot bit -> booking ids (for sharing checks and removal)
+    occupants: Dict[Resource, Dict[int, Set[int]]] = field(default_factory=dict)
+    # active rooms: key -> display name, and room bit positions per slot
+    rooms: Dict[str, str] = field(default_factory=dict)
+    room_bits: Dict[str, int] = field(default_factory=dict)
+    busy_rooms: Dict[int, int] = field(default_factory=dict)
+    group_names: Dict[int, str] = field(default_factory=dict)
+
+    def set_rooms(self, names: Iterable[str]) -> None:
+        for name in names:
+            key = resource_key(name)
+            if key and key not in self.rooms:
+                self.rooms[key] = name
+                self.room_bits[key] = len(self.room_bits)
+        for booking in self.bookings.values():
+            self._mark_room(booking, add=True)
+
+    def _mark_room(self, booking: Booking, add: bool) -> None:
+        key = resource_key(booking.room)
+        if key not in self.room_bits:
+            return
+        room_bit = 1 << self.room_bits[key]
+        resource = ("room", key)
+        for bit in _bits(booking.mask):
+            if add:
+                self.busy_rooms[bit] = self.busy_rooms.get(bit, 0) | room_bit
+            elif not self.occupants.get(resource, {}).get(bit):
+                self.busy_rooms[bit] = self.busy_rooms.get(bit, 0) & ~room_bit
+
+    def add(self, booking: Booking) -> None:
+        if booking.id is None:
+            raise ValueError("Only stored bookings can be added")
+        self.remove(booking.id)
+        mask = booking.mask
+        if not mask:
+            return
+        self.bookings[booking.id] = booking
+        for resource in booking.resources():
+            self.masks[resource] = self.masks.get(resource, 0) | mask
+            slots = self.occupants.setdefault(resource, {})
+            for bit in _bits(mask):
+                slots.setdefault(bit, set()).add(booking.id)
+        self._mark_room(booking, add=True)
+
+    def remove(self, booking_id: int) -> None:
+        booking = self.bookings.pop(booking_id, None)
+        if booking is None:
+            return
+        for resource in booking.resources():
+            slots = self.occupants.get(resource, {})
+            for bit in _bits(booking.mask):
+                ids = slots.get(bit)
+                if ids is None:
+                    continue
+                ids.discard(booking_id)
+                if not ids:
+                    del slots[bit]
+                    self.masks[resource] &= ~(1 << bit)
+        self._mark_room(booking, add=False)
+
+    # ---------- Queries ----------
+
+    def is_free(self, resource: Resource, day: WeekDay, lesson: int, week_type=WeekType.ALL) -> bool:
+        return not self.masks.get(resource, 0) & slot_mask(day, [lesson], week_type)
+
+    def free_rooms(self, day: WeekDay, lesson: int, week_type=WeekType.ALL) -> List[str]:
+        """Active rooms with no lesson at the slot (in either parity it covers)."""
+        busy = 0
+        for bit in _bits(slot_mask(day, [lesson], week_type)):
+            busy |= self.busy_rooms.get(bit, 0)
+        return [name for key, name in self.rooms.items() if not busy >> self.room_bits[key] & 1]
+
+    def occupancy_rate(self, resource: Resource, days: Optional[Iterable[WeekDay]] = None) -> float:
+        """Share of the teaching week's slots (percent) the resource is busy."""
+        window = _days_mask(days, range(1, TEACHING_LESSONS + 1)) if days else _TEACHING_WINDOW
+        return round((self.masks.get(resource, 0) & window).bit_count() / window.bit_count() * 100, 1)
+
+    def busy_lessons(self, resource: Resource, days: Optional[Iterable[WeekDay]] = None) -> int:
+        """Distinct (day, para) slots in which the resource is busy in any week."""
+        mask = self.masks.get(resource, 0)
+        if days is not None:
+            mask &= _days_mask(days, LESSON_SLOTS)
+        return ((mask | mask >> 1) & _ODD_WEEK_BITS).bit_count()
+
+    def bookings_of(self, resource: Resource) -> List[Booking]:
+        ids = set().union(*self.occupants.get(resource, {}).values()) if self.occupants.get(resource) else set()
+        return sorted(
+            (self.bookings[i] for i in ids),
+            key=lambda b: (DAY_INDEX.get(b.day, 99), b.lessons[:1], b.id),
+        )
+
+    def _first_clash(
+        self, booking: Booking, resource: Resource, excluded: Set[int]
+    ) -> Optional[Tuple[int, Booking]]:
+        slots = self.occupants.get(resource, {})
+        for bit in _bits(self.masks.get(resource, 0) & booking.mask):
+            for other_id in slots.get(bit, ()):
+                other = self.bookings[other_id]
+                if other_id in excluded or other_id == booking.id:
+                    continue
+                if resource[0] != "group" and other.activity == booking.activity:
+                    continue  # the same lecture for several groups
+                return bit, other
+        return None
+
+    def conflicts(self, batch: List[Booking], exclude_ids: Iterable[int] = ()) -> List[Conflict]:
+        """
+        Conflicts of each booking in the batch with the timetable (minus
+        exclude_ids, e.g. the rows being edited) and with earlier bookings
+        of the batch that had none (conflicting ones are taken as dropped).
+        """
+        excluded = set(exclude_ids)
+        pending = OccupancyEngine()
+        found: List[Conflict] = []
+        for index, booking in enumerate(batch):
+            booking = _with_group_name(booking, self.group_names)
+            kinds = set()
+            for resource in booking.resources():
+                if resource[0] in kinds:
+                    continue  # a teacher is indexed by id and by name
+                clash = (
+                    self._first_clash(booking, resource, excluded)
+                    or pending._first_clash(booking, resource, excluded)
+                )
+                if clash is not None:
+                    kinds.add(resource[0])
+                    day, lesson, _ = _decode(clash[0])
+                    found.append(Conflict(index, resource[0], day, lesson, booking, clash[1]))
+            # Later bookings of the batch are checked against this one
+            if not kinds:
+                pending.add(booking if booking.id is not None else replace(booking, id=-(index + 1)))
+        return found
+
+
+def _with_group_name(booking: Booking, names: Dict[int, str]) -> Booking:
+    if booking.group_name or booking.group_id not in names:
+        return booking
+    return replace(booking, group_name=names[booking.group_id])
+
+
+# ==================== Process-wide engine ====================
+
+_engine: Optional[OccupancyEngine] = None
+# (occupancy version, rooms version) the engine reflects
+_engine_version: Optional[Tuple[int, str]] = None
+_engine_loaded_at = 0.0
+_build_lock: Optional[asyncio.Lock] = None
+_pending_tasks: Set[asyncio.Task] = set()
+
+
+async def _read_version() -> Optional[Tuple[int, str]]:
+    try:
+        redis = await get_redis()
+        occupancy, rooms = await redis.mget([OCCUPANCY_VERSION_KEY, ROOMS_VERSION_KEY])
+    except Exception:
+        return None
+    return int(occupancy or 0), rooms or "0"
+
+
+async def build_occupancy() -> OccupancyEngine:
+    """A fresh engine from active weekly schedules and active rooms."""
+    engine = OccupancyEngine()
+    async with async_session_maker() as db:
+        engine.group_names = dict((await db.execute(select(Group.id, Group.name))).all())
+        result = await db.execute(
+            select(Schedule).where(Schedule.is_active == True, Schedule.day_of_week.isnot(None))
+        )
+        for schedule in result.scalars().all():
+            engine.add(Booking.from_schedule(schedule, engine.group_names.get(schedule.group_id)))
+        rooms = await db.execute(select(Room.name).where(Room.is_active == True).order_by(Room.building, Room.name))
+        engine.set_rooms(rooms.scalars().all())
+    return engine
+
+
+async def get_occupancy() -> OccupancyEngine:
+    """This process's engine, rebuilt first if the timetable or rooms changed."""
+    global _engine, _engine_version, _engine_loaded_at, _build_lock
+    version = await _read_version()
+
+    def current() -> bool:
+        return _engine is not None and version == _engine_version and (
+            version is not None or monotonic_time.monotonic() - _engine_loaded_at < LOCAL_TTL
+        )
+
+    if current():
+        return _engine
+    if _build_lock is None:
+        _build_lock = asyncio.Lock()
+    async with _build_lock:
+        if not current():
+            started = monotonic_time.monotonic()
+            _engine = await build_occupancy()
+            _engine_version, _engine_loaded_at = version, monotonic_time.monotonic()
+            logger.debug(
+                f"Schedule occupancy built: {len(_engine.bookings)} lessons "
+                f"in {(_engine_loaded_at - started) * 1000:.1f} ms"
+            )
+    return _engine
+
+
+def forget_occupancy() -> None:
+    """Rebuild on next use."""
+    global _engine
+    _engine = None
+
+
+# ==================== Session hooks ====================
+
+_SESSION_KEY = "schedule_occupancy_changes"
+
+
+def _on_after_flush(session: Session, flush_context) -> None:
+    changes = session.info.setdefault(_SESSION_KEY, {})
+    if changes is False:
+        return
+    for obj in session.new.union(session.dirty):
+        if isinstance(obj, Schedule) and obj not in session.deleted:
+            active = obj.is_active and obj.day_of_week is not None
+            changes[obj.id] = Booking.from_schedule(obj) if active else None
+    for obj in session.deleted:
+        if isinstance(obj, Schedule):
+            changes[obj.id] = None
+
+
+def _on_orm_execute(state: ORMExecuteState) -> None:
+    # Bulk statements: the rows are unknown, rebuild after commit
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None and mapper.local_table.name == "schedules":
+        state.session.info[_SESSION_KEY] = False
+
+
+async def _publish(engine: Optional[OccupancyEngine]) -> None:
+    """
+    Bump the occupancy version so other workers rebuild. `engine` is the
+    one the commit's changes were applied to: it takes the new version if
+    it was current just before the bump, else it is stale (another
+    worker's write came in between) and the version is left to rebuild it.
+    """
+    global _engine_version
+    try:
+        redis = await get_redis()
+        version = await redis.incr(OCCUPANCY_VERSION_KEY)
+    except Exception as e:
+        logger.debug(f"Schedule occupancy version bump failed: {e}")
+        return
+    if engine is not None and engine is _engine and _engine_version is not None \
+            and _engine_version[0] == version - 1:
+        _engine_version = (version, _engine_version[1])
+
+
+def _on_after_commit(session: Session) -> None:
+    changes = session.info.pop(_SESSION_KEY, None)
+    if not changes and changes is not False:
+        return
+    engine = _engine
+    if changes is False:
+        forget_occupancy()
+        engine = None
+    elif engine is not None:
+        for booking_id, booking in changes.items():
+            if booking is None:
+                engine.remove(booking_id)
+            else:
+                engine.add(_with_group_name(booking, engine.group_names))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_publish(engine))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+def _on_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def register_schedule_occupancy() -> None:
+    """Install session hooks that keep the process's occupancy engine current."""
+    if event.contains(Session, "after_commit", _on_after_commit):
+        return
+    event.listen(Session, "after_flush", _on_after_flush)
+    event.listen(Session, "do_orm_execute", _on_orm_execute)
+    event.listen(Session, "after_commit", _on_after_commit)
+    event.listen(Session, "after_rollback", _on_after_rollback)
@@ -23,6 +23,8 @@ from app.schemas.schedule import (
     ScheduleResponse,
 )
 from app.core.exceptions import NotFoundException, ConflictException
+from app.services.schedule_occupancy import Booking, get_occupancy
+from app.services.schedule_validator import ScheduleValidator
 from app.config import today_tashkent
 
 
@@ -118,15 +120,24 @@ class ScheduleService:
         if not schedule:
             raise NotFoundException("Schedule not found")
         
-        # Check for time conflicts if time is changing
-        if schedule_data.start_time or schedule_data.end_time or schedule_data.day_of_week:
+        # Check for conflicts if the slot, room or teacher is changing
+        if schedule_data.model_fields_set & {
+            "start_time", "end_time", "day_of_week", "lesson_number", "week_type",
+            "room", "teacher_id", "teacher_name",
+        }:
             # Build a schedule-like object for conflict check
             check_data = ScheduleCreate(
                 group_id=schedule.group_id,
-                subject=schedule.subject,
+                subject=schedule_data.subject or schedule.subject,
+                schedule_type=schedule_data.schedule_type or schedule.schedule_type,
                 start_time=schedule_data.start_time or schedule.start_time,
                 end_time=schedule_data.end_time or schedule.end_time,
                 day_of_week=schedule_data.day_of_week or schedule.day_of_week,
+                lesson_number=schedule_data.lesson_number or schedule.lesson_number,
+                week_type=schedule_data.week_type or schedule.week_type,
+                room=schedule_data.room or schedule.room,
+                teacher_id=schedule_data.teacher_id or schedule.teacher_id,
+                teacher_name=schedule_data.teacher_name or schedule.teacher_name,
             )
             await self._check_time_conflict(check_data, exclude_id=schedule_id)
         
@@ -155,44 +166,35 @@ class ScheduleService:
         schedule_data: ScheduleCreate,
         exclude_id: Optional[int] = None
     ) -> None:
-        """Check for time conflicts."""
-        query = select(Schedule).where(
-            and_(
-                Schedule.group_id == schedule_data.group_id,
-                Schedule.day_of_week == schedule_data.day_of_week,
-                Schedule.is_active == True,
-                or_(
-                    # New schedule starts during existing
-                    and_(
-                        Schedule.start_time <= schedule_data.start_time,
-                        Schedule.end_time > schedule_data.start_time
-                    ),
-                    # New schedule ends during existing
-                    and_(
-                        Schedule.start_time < schedule_data.end_time,
-                        Schedule.end_time >= schedule_data.end_time
-                    ),
-                    # New schedule contains existing
-                    and_(
-                        Schedule.start_time >= schedule_data.start_time,
-                        Schedule.end_time <= schedule_data.end_time
-                    )
-                )
-            )
+        """Check the group, room and teacher are free (see schedule_occupancy)."""
+        occupancy = await get_occupancy()
+        conflicts = occupancy.conflicts(
+            [self._booking(schedule_data)], exclude_ids=[exclude_id] if exclude_id else ()
         )
         
-        if exclude_id:
-            query = query.where(Schedule.id != exclude_id)
-        
-        result = await self.db.execute(query)
-        conflict = result.scalar_one_or_none()
-        
-        if conflict:
+        if conflicts:
+            conflict = conflicts[0].other
             raise ConflictException(
-                f"Time conflict with existing schedule: {conflict.subject} "
+                f"Time conflict with existing schedule ({conflicts[0].kind}): {conflict.subject} "
                 f"({conflict.start_time.strftime('%H:%M')} - {conflict.end_time.strftime('%H:%M')})"
             )
     
+    @staticmethod
+    def _booking(schedule_data: ScheduleCreate) -> Booking:
+        return Booking(
+            group_id=schedule_data.group_id,
+            subject=schedule_data.subject,
+            schedule_type=schedule_data.schedule_type.value if schedule_data.schedule_type else None,
+            day=schedule_data.day_of_week,
+            start_time=schedule_data.start_time,
+            end_time=schedule_data.end_time,
+            lesson_number=schedule_data.lesson_number,
+            week_type=schedule_data.week_type,
+            room=schedule_data.room,
+            teacher_id=schedule_data.teacher_id,
+            teacher_name=schedule_data.teacher_name,
+        )
+    
     async def get_group_week_schedule(
         self,
         group_id: int,
@@ -316,17 +318,37 @@ class ScheduleService:
         self,
         schedules_data: List[ScheduleCreate]
     ) -> Tuple[int, int, List[str]]:
-        """Bulk create schedules."""
-        created = 0
-        skipped = 0
+        """
+        Bulk create schedules. The batch is validated in one pass (see
+        schedule_validator); items of unknown groups or with conflicts are
+        skipped, the rest are saved in one commit.
+        """
         errors = []
         
-        for data in schedules_data:
-            try:
-                await self.create(data)
+        group_ids = {data.group_id for data in schedules_data}
+        existing_groups = set((await self.db.execute(
+            select(Group.id).where(Group.id.in_(group_ids))
+        )).scalars().all())
+        
+        valid = [i for i, data in enumerate(schedules_data) if data.group_id in existing_groups]
+        conflicts = await ScheduleValidator(self.db).validate(
+            [self._booking(schedules_data[i]) for i in valid]
+        )
+        messages = {}
+        for conflict in conflicts:
+            messages.setdefault(valid[conflict.index], []).append(conflict.message)
+        
+        created = 0
+        for index, data in enumerate(schedules_data):
+            if data.group_id not in existing_groups:
+                errors.append(f"{data.subject}: Group not found")
+            elif index in messages:
+                errors.append(f"{data.subject}: Time conflict: " + "; ".join(messages[index]))
+            else:
+                self.db.add(Schedule(**data.model_dump()))
                 created += 1
-            except Exception as e:
-                skipped += 1
-                errors.append(f"{data.subject}: {str(e)}")
         
-        return created, skipped, errors
+        if created:
+            await self.db.commit()
+        
+        return created, len(schedules_data) - created, errors
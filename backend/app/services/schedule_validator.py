@@ -0,0 +1,248 @@
+"""
+UniControl - Schedule Batch Validator
+=====================================
+Checks a batch of new lessons (a semester upload, one lecture for
+several groups) against the timetable and against each other in one
+pass, reporting every clash of each item.
+
+The lessons the batch can clash with (active, on one of its days, and
+with one of its groups, rooms or teachers) are loaded in one query. Each
+(resource, day, week parity) gets an interval tree of the para ranges
+of those lessons and the batch, and each item asks its trees for every
+range overlapping its own.
+
+The conflict model is the occupancy engine's (schedule_occupancy), which
+answers single checks, room queries and AI generation: a lesson occupies
+the paras Booking.lessons gives (lessons_for: its lesson_number, else the
+paras its times overlap), so the batch and single checks always agree.
+The engine keeps one bit per para and reports the first clash; this
+validator keeps [first, last + 1) para ranges and reports every one. A
+group never shares a para, a room or teacher only with a lesson of the
+same subject and type. An item that clashes is taken as dropped, so later
+items of the batch are not reported against it.
+
+Usage:
+    conflicts = await ScheduleValidator(db).validate([Booking(...), ...])
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.group import Group
+from app.models.schedule import Schedule, WeekType
+from app.services.schedule_occupancy import (
+    Booking,
+    Conflict,
+    Resource,
+    parities,
+    resource_key,
+)
+
+
+def lesson_range(booking: Booking) -> Optional[Tuple[int, int]]:
+    """
+    [first, last + 1) of the paras a lesson occupies in the engine's grid.
+    The paras a time range overlaps are consecutive, so the range holds
+    exactly the lesson's slots.
+    """
+    lessons = booking.lessons
+    if not lessons:
+        return None
+    return min(lessons), max(lessons) + 1
+
+
+class IntervalTree:
+    """
+    Static interval tree: a balanced search tree over the ranges sorted by
+    start, each node keeping the largest end in its subtree, so a query
+    skips every subtree that ends before the range it asks about.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Booking]]):
+        self._items = sorted(intervals, key=lambda item: item[0])
+        self._max_end = [0] * len(self._items)
+        self._build(0, len(self._items))
+
+    def _build(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -1
+        mid = (lo + hi) // 2
+        self._max_end[mid] = max(self._items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        return self._max_end[mid]
+
+    def overlapping(self, start: int, end: int) -> List[Booking]:
+        """Every stored range overlapping [start, end)."""
+        found = []
+        stack = [(0, len(self._items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue  # the whole subtree ends before the range
+            item_start, item_end, booking = self._items[mid]
+            stack.append((lo, mid))
+            if item_start < end:
+                if start < item_end:
+                    found.append(booking)
+                stack.append((mid + 1, hi))
+        return found
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+TreeKey = Tuple[Resource, object, int]  # (resource, day, parity)
+
+
+def tree_keys(booking: Booking) -> List[TreeKey]:
+    if booking.day is None:
+        return []
+    return [
+        (resource, booking.day, parity)
+        for resource in set(booking.resources())
+        for parity in parities(booking.week_type)
+    ]
+
+
+def build_trees(
+    bookings: Iterable[Booking],
+    only: Optional[Set[TreeKey]] = None
+) -> Dict[TreeKey, IntervalTree]:
+    """One interval tree per (resource, day, week parity), or per key in `only`."""
+    ranges: Dict[TreeKey, List[Tuple[int, int, Booking]]] = defaultdict(list)
+    for booking in bookings:
+        span = lesson_range(booking)
+        if span is None:
+            continue
+        for key in tree_keys(booking):
+            if only is None or key in only:
+                ranges[key].append((span[0], span[1], booking))
+    return {key: IntervalTree(items) for key, items in ranges.items()}
+
+
+def find_conflicts(
+    batch: List[Booking],
+    existing: Iterable[Booking],
+    exclude_ids: Iterable[int] = ()
+) -> List[Conflict]:
+    """
+    Every clash of each batch item with `existing` (minus exclude_ids) and
+    with earlier batch items that had none. Batch items are numbered with
+    negative ids, so Conflict.to_dict reports them as with_index.
+    """
+    excluded = set(exclude_ids)
+    batch = [replace(booking, id=-(index + 1)) for index, booking in enumerate(batch)]
+    # Only the trees the batch asks about
+    wanted = {key for booking in batch for key in tree_keys(booking)}
+    trees = build_trees([*(b for b in existing if b.id not in excluded), *batch], only=wanted)
+    rejected: Set[int] = set()
+    found: List[Conflict] = []
+    for index, booking in enumerate(batch):
+        span = lesson_range(booking)
+        if booking.day is None or span is None:
+            continue
+        seen: Set[Tuple[str, int]] = set()
+        clashes: List[Conflict] = []
+        for resource in booking.resources():
+            for parity in parities(booking.week_type):
+                tree = trees.get((resource, booking.day, parity))
+                for other in tree.overlapping(*span) if tree else ():
+                    if other.id < 0 and (-other.id - 1 >= index or -other.id - 1 in rejected):
+                        continue  # itself, a later item, or an item that is dropped
+                    if resource[0] != "group" and other.activity == booking.activity:
+                        continue  # the same lecture for several groups
+                    if (resource[0], other.id) in seen:
+                        continue  # a teacher is indexed by id and by name
+                    seen.add((resource[0], other.id))
+                    clashes.append(Conflict(
+                        index, resource[0], booking.day,
+                        max(span[0], lesson_range(other)[0]), booking, other,
+                    ))
+        if clashes:
+            rejected.add(index)
+            clashes.sort(key=lambda c: (lesson_range(c.other), c.other.id))
+            found.extend(clashes)
+    return found
+
+
+class ScheduleValidator:
+    """Validates schedule batches against the database; see the module docstring."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def load_related(self, batch: List[Booking]) -> List[Booking]:
+        """Active lessons sharing a day and a group, room or teacher with the batch."""
+        days = {b.day for b in batch if b.day is not None}
+        if not days:
+            return []
+        group_ids = {b.group_id for b in batch}
+        rooms = {resource_key(b.room) for b in batch} - {None}
+        teacher_ids = {b.teacher_id for b in batch if b.teacher_id}
+        teacher_names = {resource_key(b.teacher_name) for b in batch} - {None}
+
+        related = [Schedule.group_id.in_(group_ids)]
+        if rooms:
+            related.append(func.lower(func.trim(Schedule.room)).in_(rooms))
+        if teacher_ids:
+            related.append(Schedule.teacher_id.in_(teacher_ids))
+        if teacher_names:
+            related.append(func.lower(func.trim(Schedule.teacher_name)).in_(teacher_names))
+
+        # Plain columns: no ORM instances for a few thousand rows
+        result = await self.db.execute(
+            select(
+                Schedule.id, Schedule.group_id, Group.name, Schedule.subject,
+                Schedule.schedule_type, Schedule.day_of_week, Schedule.start_time,
+                Schedule.end_time, Schedule.lesson_number, Schedule.week_type,
+                Schedule.room, Schedule.teacher_id, Schedule.teacher_name,
+            )
+            .outerjoin(Group, Group.id == Schedule.group_id)
+            .where(
+                Schedule.is_active == True,
+                Schedule.day_of_week.in_(days),
+                or_(*related),
+            )
+        )
+        return [
+            Booking(
+                id=row.id,
+                group_id=row.group_id,
+                group_name=row.name,
+                subject=row.subject,
+                schedule_type=row.schedule_type.value if row.schedule_type else None,
+                day=row.day_of_week,
+                start_time=row.start_time,
+                end_time=row.end_time,
+                lesson_number=row.lesson_number,
+                week_type=row.week_type or WeekType.ALL,
+                room=row.room,
+                teacher_id=row.teacher_id,
+                teacher_name=row.teacher_name,
+            )
+            for row in result.all()
+        ]
+
+    async def validate(self, batch: List[Booking], exclude_ids: Iterable[int] = ()) -> List[Conflict]:
+        """Every conflict of the batch, with the timetable and within itself."""
+        if not batch:
+            return []
+        unnamed = {b.group_id for b in batch if not b.group_name}
+        if unnamed:
+            names = dict((await self.db.execute(
+                select(Group.id, Group.name).where(Group.id.in_(unnamed))
+            )).all())
+            batch = [
+                replace(b, group_name=names[b.group_id]) if not b.group_name and b.group_id in names else b
+                for b in batch
+            ]
+        return find_conflicts(batch, await self.load_related(batch), exclude_ids)
@@ -0,0 +1,499 @@
+"""
+UniControl - Search Service
+===========================
+Name search over students, users and groups that works across the
+spellings people actually type: Cyrillic or Latin Uzbek, o'/oʻ/o`/o,
+Xamidov/Hamidov/Khamidov, +998 90 123-45-67 or 901234567.
+
+- Every searchable row carries a search_text column: its name, codes
+  and contacts passed through normalize(). A session hook fills it on
+  every ORM write; Core writers (Excel import, Mutoola sync) call
+  SearchService.reindex for the rows they touch, and init_db backfills
+  rows that have none.
+- On PostgreSQL search_text has a pg_trgm GIN index, so both substring
+  matches (LIKE '%q%') and typo-tolerant word matches (%>) use it, and
+  the global search is a single ranked UNION ALL query.
+- Elsewhere (SQLite in development and tests, or a server without
+  pg_trgm) the same ranking is served by SearchIndex, an in-memory
+  trigram index per table, rebuilt when the table's version changes
+  (see app.core.cache).
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import String, bindparam, case, cast, event, func, literal, null, select, text, true, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from app.core.cache import table_versions
+from app.database import async_session_maker
+from app.models.group import Group
+from app.models.student import Student
+from app.models.user import User, UserRole
+
+
+# pg_trgm's default pg_trgm.word_similarity_threshold, used by %>
+WORD_SIMILARITY_THRESHOLD = 0.6
+LOCAL_INDEX_TTL = 30  # seconds, when Redis versions are unavailable
+REINDEX_BATCH_SIZE = 1000
+
+# Columns that make up each model's search document
+DOCUMENT_FIELDS = {
+    Student: ("name", "student_id", "phone", "passport", "jshshir", "email"),
+    User: ("name", "login", "email", "phone"),
+    Group: ("name", "faculty"),
+}
+PHONE_FIELDS = {"phone"}
+
+
+# ==================== Normalization ====================
+
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    # Uzbek letters: ў -> o', ғ -> g' (apostrophes are dropped below)
+    "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}
+_TRANSLITERATE = str.maketrans(_CYRILLIC)
+# o'/g' and the tutuq belgisi, in every form keyboards produce
+_APOSTROPHES = str.maketrans("", "", "'`ʻʼ‘’´ʹ′")
+# Russian-style and Uzbek Latin spellings of the same sounds
+_FOLDS = (("kh", "h"), ("x", "h"), ("q", "k"))
+# Latin writes е after a vowel as "ye" (Aliyev), Russian spelling as "e" (Aliev)
+_VOWEL_YE = re.compile(r"(?<=[aeiou])ye")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_PHONE_QUERY = re.compile(r"[\d\s()+.-]+")
+
+
+def normalize(value: Optional[str]) -> str:
+    """
+    Search form of a text: lower-case Latin letters and digits separated
+    by single spaces, with Cyrillic transliterated, apostrophes dropped
+    (o'g'li -> ogli) and x/kh/h, q/k, -iye-/-ie- folded together.
+    """
+    if not value:
+        return ""
+    value = value.lower().translate(_TRANSLITERATE)
+    value = "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+    value = value.translate(_APOSTROPHES)
+    for variant, canonical in _FOLDS:
+        value = value.replace(variant, canonical)
+    value = _VOWEL_YE.sub("e", value)
+    return _NON_WORD.sub(" ", value).strip()
+
+
+def normalize_query(query: str) -> str:
+    """normalize() for a search box; a phone number becomes its digits."""
+    if _PHONE_QUERY.fullmatch(query) and any(c.isdigit() for c in query):
+        return re.sub(r"\D", "", query)
+    return normalize(query)
+
+
+def build_document(values: Dict[str, Optional[str]]) -> str:
+    """search_text for a row, from its DOCUMENT_FIELDS values (in order)."""
+    parts = []
+    for field, value in values.items():
+        if not value:
+            continue
+        parts.append(re.sub(r"\D", "", value) if field in PHONE_FIELDS else normalize(value))
+    return " ".join(p for p in parts if p)
+
+
+def document_of(obj) -> str:
+    return build_document({field: getattr(obj, field) for field in DOCUMENT_FIELDS[type(obj)]})
+
+
+# ==================== Ranking ====================
+
+def trigrams(word: str) -> Set[str]:
+    """pg_trgm's trigrams of one word (padded with two spaces in front, one behind)."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def word_similarity(query: str, document: str) -> float:
+    """
+    Close to pg_trgm's word_similarity(query, document): the best trigram
+    similarity between the query and a run of as many consecutive words
+    of the document.
+    """
+    words = document.split()
+    size = max(len(query.split()), 1)
+    wanted = set().union(*(trigrams(w) for w in query.split())) if query else set()
+    best = 0.0
+    for i in range(max(len(words) - size + 1, 1)):
+        window = set().union(*(trigrams(w) for w in words[i:i + size])) if words else set()
+        best = max(best, _similarity(wanted, window))
+    return best
+
+
+def rank(query: str, document: str) -> float:
+    """
+    Score of a document for a normalized query, or 0 for no match:
+    3+ starts with the query, 2+ a word starts with it, 1+ contains it,
+    and word similarity alone for a near miss. Mirrors rank_expression().
+    """
+    if not query or not document:
+        return 0.0
+    similarity = word_similarity(query, document)
+    if document.startswith(query):
+        return 3 + similarity
+    if f" {query}" in f" {document}":
+        return 2 + similarity
+    if query in document:
+        return 1 + similarity
+    return similarity if similarity >= WORD_SIMILARITY_THRESHOLD else 0.0
+
+
+def match_condition(column, query: str):
+    """WHERE clause for a normalized query on search_text (both indexable by gin_trgm_ops)."""
+    return column.like(f"%{query}%") | column.op("%>")(query)
+
+
+def rank_expression(column, query: str):
+    """SQL version of rank()."""
+    q = literal(query)
+    return case(
+        (column.like(f"{query}%"), 3),
+        (column.like(f"% {query}%"), 2),
+        (column.like(f"%{query}%"), 1),
+        else_=0,
+    ) + func.word_similarity(q, column)
+
+
+# ==================== In-memory index ====================
+
+class SearchIndex:
+    """
+    Trigram index of normalized documents, for databases without pg_trgm.
+    Candidates share at least one trigram with the query and are then
+    scored with rank(); queries shorter than a trigram scan everything.
+    """
+
+    def __init__(self):
+        self._documents: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, key: int, document: str) -> None:
+        self.discard(key)
+        self._documents[key] = document
+        for word in document.split():
+            for gram in trigrams(word):
+                self._postings.setdefault(gram, set()).add(key)
+
+    def discard(self, key: int) -> None:
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        for word in document.split():
+            for gram in trigrams(word):
+                keys = self._postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._postings[gram]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(key, score) of matching documents, best first."""
+        if not query:
+            return []
+        if len(query) < 3:
+            candidates: Iterable[int] = self._documents
+        else:
+            candidates = set()
+            for word in query.split():
+                # Padded trigrams only match at word edges; a substring
+                # shares the inner ones
+                grams = trigrams(word)
+                for gram in {g for g in grams if " " not in g} or grams:
+                    candidates |= self._postings.get(gram, set())
+        hits = [
+            (key, score) for key in candidates
+            if (score := rank(query, self._documents[key])) > 0
+        ]
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:limit] if limit else hits
+
+
+_local_indexes: Dict[str, Tuple[Optional[str], float, SearchIndex]] = {}
+_trigram_available: Optional[bool] = None
+
+
+async def _local_index(db: AsyncSession, model) -> SearchIndex:
+    """The process-wide SearchIndex of a table, rebuilt when the table changes."""
+    table = model.__tablename__
+    try:
+        version = await table_versions(table)
+    except Exception:
+        version = None
+    cached_version, loaded_at, index = _local_indexes.get(table, (None, 0.0, None))
+    if index is None or version != cached_version or (
+        version is None and time.monotonic() - loaded_at > LOCAL_INDEX_TTL
+    ):
+        index = SearchIndex()
+        fields = DOCUMENT_FIELDS[model]
+        result = await db.execute(select(model.id, *[getattr(model, f) for f in fields]))
+        for row in result.all():
+            index.add(row[0], build_document(dict(zip(fields, row[1:]))))
+        _local_indexes[table] = (version, time.monotonic(), index)
+    return index
+
+
+# ==================== Search ====================
+
+@dataclass
+class SearchHit:
+    """One global search result."""
+    type: str
+    id: int
+    title: str
+    code: Optional[str]
+    detail: Optional[str]
+    avatar: Optional[str]
+    rank: float
+
+
+class SearchService:
+    """Ranked search over students, users and groups."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def has_trigram_index(self) -> bool:
+        """Whether queries can run in the database (PostgreSQL with pg_trgm)."""
+        global _trigram_available
+        if self.db.bind.dialect.name != "postgresql":
+            return False
+        if _trigram_available is None:
+            _trigram_available = bool((await self.db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            )).first())
+            if not _trigram_available:
+                logger.warning("pg_trgm is not installed; search uses the in-memory index")
+        return _trigram_available
+
+    async def matching_ids(self, model, query: str, limit: Optional[int] = None) -> List[int]:
+        """Ids of the model's rows matching the query, best first."""
+        q = normalize_query(query)
+        if not q:
+            return []
+        if not await self.has_trigram_index():
+            index = await _local_index(self.db, model)
+            return [key for key, _ in index.search(q, limit)]
+        stmt = (
+            select(model.id)
+            .where(match_condition(model.search_text, q))
+            .order_by(rank_expression(model.search_text, q).desc(), model.id)
+        )
+        if limit:
+            stmt = stmt.limit(limit)
+        return list((await self.db.execute(stmt)).scalars().all())
+
+    async def condition(self, model, query: str):
+        """
+        WHERE clause restricting a list query on the model to rows that
+        match the search box (for lists with their own order and paging).
+        """
+        q = normalize_query(query)
+        if not q:
+            return true()
+        if await self.has_trigram_index():
+            return match_condition(model.search_text, q)
+        return model.id.in_(await self.matching_ids(model, query))
+
+    async def search(self, query: str, limit: int = 20, include_users: bool = True) -> List[SearchHit]:
+        """
+        Students, groups and (optionally) staff users matching the query,
+        best first: one UNION ALL query on PostgreSQL.
+        """
+        q = normalize_query(query)
+        if not q:
+            return []
+        if not await self.has_trigram_index():
+            return await self._search_local(q, limit, include_users)
+
+        def branch(kind: str, model, title, code, detail, avatar, source=None):
+            return (
+                select(
+                    literal(kind).label("type"),
+                    model.id.label("id"),
+                    title.label("title"),
+                    code.label("code"),
+                    detail.label("detail"),
+                    avatar.label("avatar"),
+                    rank_expression(model.search_text, q).label("rank"),
+                )
+                .select_from(source if source is not None else model)
+                .where(match_condition(model.search_text, q))
+                .order_by(text("rank DESC"))
+                .limit(limit)
+            )
+
+        no_value = cast(null(), String)
+        parts = [
+            branch(
+                "student", Student, Student.name, Student.student_id, Group.name, no_value,
+                source=Student.__table__.outerjoin(Group.__table__, Group.id == Student.group_id),
+            ),
+            branch("group", Group, Group.name, no_value, Group.faculty, no_value),
+        ]
+        if include_users:
+            role = case(*[(User.role == r, r.value) for r in UserRole])
+            parts.append(
+                branch("user", User, func.coalesce(User.name, User.login), role, User.email, User.avatar)
+                .where(User.role != UserRole.STUDENT)
+            )
+        combined = union_all(*[part.subquery().select() for part in parts]).subquery()
+        result = await self.db.execute(
+            select(combined)
+            .order_by(combined.c.rank.desc(), combined.c.type, combined.c.title)
+            .limit(limit)
+        )
+        return [SearchHit(*row) for row in result.all()]
+
+    async def _search_local(self, q: str, limit: int, include_users: bool) -> List[SearchHit]:
+        hits: List[SearchHit] = []
+
+        index = await _local_index(self.db, Student)
+        ranked = dict(index.search(q, limit))
+        if ranked:
+            result = await self.db.execute(
+                select(Student.id, Student.name, Student.student_id, Group.name)
+                .outerjoin(Group, Group.id == Student.group_id)
+                .where(Student.id.in_(ranked))
+            )
+            hits += [
+                SearchHit("student", sid, name, code, group_name, None, ranked[sid])
+                for sid, name, code, group_name in result.all()
+            ]
+
+        index = await _local_index(self.db, Group)
+        ranked = dict(index.search(q, limit))
+        if ranked:
+            result = await self.db.execute(
+                select(Group.id, Group.name, Group.faculty).where(Group.id.in_(ranked))
+            )
+            hits += [
+                SearchHit("group", gid, name, None, faculty, None, ranked[gid])
+                for gid, name, faculty in result.all()
+            ]
+
+        if include_users:
+            index = await _local_index(self.db, User)
+            ranked = dict(index.search(q))
+            if ranked:
+                result = await self.db.execute(
+                    select(User.id, User.name, User.login, User.role, User.email, User.avatar)
+                    .where(User.id.in_(ranked), User.role != UserRole.STUDENT)
+                )
+                hits += [
+                    SearchHit("user", uid, name or login, role.value, email, avatar, ranked[uid])
+                    for uid, name, login, role, email, avatar in result.all()
+                ]
+
+        hits.sort(key=lambda hit: (-hit.rank, hit.type, hit.title or ""))
+        return hits[:limit]
+
+    # ==================== Maintenance ====================
+
+    async def reindex(self, model, where=None) -> int:
+        """
+        Recompute search_text for the model's rows (those matching
+        `where`, or rows without one). For Core writes that bypass the
+        session hook. Returns the number of rows updated.
+        """
+        fields = DOCUMENT_FIELDS[model]
+        stmt = select(model.id, *[getattr(model, f) for f in fields])
+        stmt = stmt.where(where if where is not None else model.search_text.is_(None))
+        result = await self.db.execute(stmt)
+        rows = [
+            {"row_id": row[0], "document": build_document(dict(zip(fields, row[1:])))}
+            for row in result.all()
+        ]
+        table = model.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            # Keep updated_at: the row's data did not change
+            .values(search_text=bindparam("document"), updated_at=table.c.updated_at)
+        )
+        for start in range(0, len(rows), REINDEX_BATCH_SIZE):
+            await self.db.execute(statement, rows[start:start + REINDEX_BATCH_SIZE])
+        return len(rows)
+
+    async def ensure_search_index(self) -> None:
+        """Trigram indexes on search_text (needs pg_trgm)."""
+        global _trigram_available
+        if self.db.bind.dialect.name != "postgresql":
+            return
+        _trigram_available = None
+        await self.db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for model in DOCUMENT_FIELDS:
+            table = model.__tablename__
+            await self.db.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS ix_{table}_search_trgm
+                ON {table} USING gin (search_text gin_trgm_ops)
+            """))
+
+
+# ==================== Session hook ====================
+
+def _document_changed(obj) -> bool:
+    return any(
+        attributes.get_history(obj, field).has_changes()
+        for field in DOCUMENT_FIELDS[type(obj)]
+    )
+
+
+def _on_before_flush(session: Session, flush_context, instances) -> None:
+    for obj in session.new:
+        if type(obj) in DOCUMENT_FIELDS:
+            obj.search_text = document_of(obj)
+    for obj in session.dirty:
+        if type(obj) in DOCUMENT_FIELDS and obj not in session.deleted and _document_changed(obj):
+            obj.search_text = document_of(obj)
+
+
+def register_search_index() -> None:
+    """Install the session hook that fills search_text on ORM writes."""
+    if event.contains(Session, "before_flush", _on_before_flush):
+        return
+    event.listen(Session, "before_flush", _on_before_flush)
+
+
+async def setup_search_index() -> None:
+    """Backfill search_text and create the trigram indexes; run from init_db."""
+    async with async_session_maker() as session:
+        service = SearchService(session)
+        for model in DOCUMENT_FIELDS:
+            filled = await service.reindex(model)
+            if filled:
+                logger.info(f"Search text backfilled for {filled} {model.__tablename__}")
+        await session.commit()
+
+    try:
+        async with async_session_maker() as session:
+            await SearchService(session).ensure_search_index()
+            await session.commit()
+    except Exception as e:
+        logger.warning(f"Search trigram indexes not created (pg_trgm unavailable?): {e}")
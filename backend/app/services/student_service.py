@@ -19,8 +19,9 @@ from app.models.student import Student
 from app.models.user import User, UserRole
 from app.models.group import Group
 from app.schemas.student import StudentCreate, StudentUpdate, StudentStats
-from app.core.security import get_password_hash
+from app.core.password_hasher import password_hasher
 from app.core.exceptions import NotFoundException, ConflictException, BadRequestException
+from app.services.attendance_rollup_service import AttendanceRollupService
 
 
 class StudentService:
@@ -201,7 +202,7 @@ class StudentService:
                 login=student_id,  # Use student_id as login
                 email=student_data.email,
                 name=student_data.name,
-                password_hash=get_password_hash(plain_pwd),
+                password_hash=await password_hasher.hash(plain_pwd),
                 plain_password=plain_pwd,
                 role=UserRole.STUDENT,
                 phone=student_data.phone,
@@ -230,6 +231,11 @@ class StudentService:
         
         # Update fields
         update_data = student_data.model_dump(exclude_unset=True)
+        if "group_id" in update_data and update_data["group_id"] != student.group_id:
+            # The student's attendance counts follow them to the new group
+            await AttendanceRollupService(self.db).move_students(
+                {student.id: (student.group_id, update_data["group_id"])}
+            )
         for field, value in update_data.items():
             setattr(student, field, value)
         
@@ -253,6 +259,8 @@ class StudentService:
             if user:
                 await self.db.delete(user)
         
+        # Their attendance goes with them: take it out of the group's rollup
+        await AttendanceRollupService(self.db).move_students({student.id: (student.group_id, None)})
         await self.db.delete(student)
         await self.db.commit()
         
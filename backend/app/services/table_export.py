@@ -0,0 +1,208 @@
+"""
+UniControl - Table Export
+=========================
+Constant-memory Excel and CSV exports.
+
+Rows are read as plain column tuples through a server-side cursor,
+EXPORT_YIELD_PER at a time (stream_rows), and each batch is written
+straight to a temp file: xlsxwriter in constant_memory mode, which
+flushes every finished row, or the csv module. The file is then sent as
+a StreamingResponse in CHUNK_SIZE pieces and deleted, so memory stays
+flat however many rows are exported. Batches are written in the thread
+pool, which keeps the event loop free.
+
+The file is complete before the response starts. The rows are read with
+the request's session, which FastAPI closes before a streaming body
+runs, and an xlsx is a zip finished only on close.
+
+Usage:
+    export = XlsxExport("Davomat")
+    export.row(["Sana", "Talaba"], export.add_format({"bold": True}))
+    async for rows in stream_rows(db, query):
+        await export.write(lambda: [export.row(r) for r in rows])
+    return await export.response("davomat.xlsx")
+
+Author: UniControl Team
+Version: 1.0.0
+"""
+
+import csv
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+import anyio
+import xlsxwriter
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from app.services.file_storage import CHUNK_SIZE
+
+
+EXPORT_YIELD_PER = 2000  # rows fetched from the cursor per batch
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+
+async def stream_rows(db: AsyncSession, query: Select) -> AsyncIterator[Sequence[Row]]:
+    """The query's rows in batches of EXPORT_YIELD_PER, from a server-side cursor."""
+    result = await db.stream(query.execution_options(yield_per=EXPORT_YIELD_PER))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def _file_chunks(path: str):
+    async with await anyio.open_file(path, "rb") as f:
+        while chunk := await f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def _temp_path(suffix: str) -> str:
+    fd, path = tempfile.mkstemp(prefix="export-", suffix=suffix)
+    os.close(fd)
+    return path
+
+
+class TableExport(ABC):
+    """Rows written in order to a temp file, then streamed and removed."""
+
+    media_type = "application/octet-stream"
+    suffix = ""
+
+    def __init__(self):
+        self.path = _temp_path(self.suffix)
+        self.rows = 0
+
+    async def write(self, writer: Callable[[], Any]) -> None:
+        """Run a batch of row writes in the thread pool."""
+        await run_in_threadpool(writer)
+
+    @abstractmethod
+    def _close(self) -> None:
+        """Finish and close the file."""
+
+    def discard(self) -> None:
+        """Drop an export that will not be sent."""
+        try:
+            self._close()
+        finally:
+            _remove(self.path)
+
+    async def response(self, filename: str) -> StreamingResponse:
+        """
+        Finish the file and stream it. It is deleted by a background task,
+        which also runs when the client disconnects before the body starts.
+        """
+        try:
+            await run_in_threadpool(self._close)
+        except BaseException:
+            _remove(self.path)
+            raise
+        return StreamingResponse(
+            _file_chunks(self.path),
+            media_type=self.media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Content-Length": str(os.path.getsize(self.path)),
+            },
+            background=BackgroundTask(_remove, self.path),
+        )
+
+
+class XlsxExport(TableExport):
+    """
+    One-sheet xlsxwriter workbook in constant_memory mode. Rows must be
+    written top to bottom; column widths can be set at any time, so
+    fit_columns() sizes them from the longest value written.
+    """
+
+    media_type = XLSX_MEDIA_TYPE
+    suffix = ".xlsx"
+
+    def __init__(self, sheet_title: str):
+        super().__init__()
+        self.workbook = xlsxwriter.Workbook(self.path, {"constant_memory": True})
+        self.sheet = self.workbook.add_worksheet(sheet_title[:31])
+        self._widths: Dict[int, int] = {}
+
+    def add_format(self, props: Dict[str, Any]):
+        return self.workbook.add_format(props)
+
+    def row(
+        self,
+        values: Sequence[Any],
+        fmt=None,
+        height: Optional[float] = None,
+        measure: bool = True,
+    ) -> None:
+        """
+        Write the next row. `fmt` is one format or a list with one per
+        column; `measure` counts the values for fit_columns().
+        """
+        if height is not None:
+            self.sheet.set_row(self.rows, height)
+        for col, value in enumerate(values):
+            cell_fmt = fmt[col] if isinstance(fmt, list) else fmt
+            if value is None or value == "":
+                self.sheet.write_blank(self.rows, col, None, cell_fmt)
+            else:
+                self.sheet.write(self.rows, col, value, cell_fmt)
+            if measure:
+                self._widths[col] = max(self._widths.get(col, 0), len(str(value)))
+        self.rows += 1
+
+    def merged_row(self, value: Any, columns: int, fmt=None, height: Optional[float] = None) -> None:
+        """Write the next row as one cell across `columns` columns."""
+        if height is not None:
+            self.sheet.set_row(self.rows, height)
+        if columns > 1:
+            self.sheet.merge_range(self.rows, 0, self.rows, columns - 1, value, fmt)
+        else:
+            self.sheet.write(self.rows, 0, value, fmt)
+        self.rows += 1
+
+    def skip(self, rows: int = 1) -> None:
+        self.rows += rows
+
+    def column_widths(self, widths: List[float]) -> None:
+        for col, width in enumerate(widths):
+            self.sheet.set_column(col, col, width)
+
+    def fit_columns(self, padding: int, limit: int) -> None:
+        """Width of each column from its longest measured value."""
+        for col, length in self._widths.items():
+            self.sheet.set_column(col, col, min(length + padding, limit))
+
+    def _close(self) -> None:
+        self.workbook.close()
+
+
+class CsvExport(TableExport):
+    """CSV in UTF-8 with a BOM, so Excel opens Uzbek text correctly."""
+
+    media_type = CSV_MEDIA_TYPE
+    suffix = ".csv"
+
+    def __init__(self):
+        super().__init__()
+        self._file = open(self.path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file)
+
+    def row(self, values: Sequence[Any], *args, **kwargs) -> None:
+        self._writer.writerow(["" if value is None else value for value in values])
+        self.rows += 1
+
+    def _close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
@@ -14,7 +14,7 @@ from sqlalchemy import select, func, update, delete
 
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
-from app.core.security import get_password_hash
+from app.core.password_hasher import password_hasher
 from app.core.exceptions import NotFoundException, ConflictException, ForbiddenException
 
 
@@ -110,7 +110,7 @@ class UserService:
             login=login_value,
             email=user_data.email or None,
             name=user_data.name,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await password_hasher.hash(user_data.password),
             plain_password=user_data.password,
             role=user_data.role,
             phone=user_data.phone,
@@ -230,7 +230,7 @@ class UserService:
         if not user:
             raise NotFoundException("User not found")
         
-        user.password_hash = get_password_hash(new_password)
+        user.password_hash = await password_hasher.hash(new_password)
         user.plain_password = new_password
         await self.db.commit()
         
@@ -4,9 +4,10 @@
 # ========================================
 # Bu skript Docker konteyner ishga tushganda bajariladi
 # 1. Database ga ulanishni tekshiradi
-# 2. Alembic migratsiyalarni ishga tushiradi
-# 3. Userlarni yaratadi (agar mavjud bo'lmasa)
-# 4. Uvicorn serverni ishga tushiradi
+# 2. Takroriy davomat yozuvlarini o'chiradi (unique constraint uchun)
+# 3. Alembic migratsiyalarni ishga tushiradi
+# 4. Userlarni yaratadi (agar mavjud bo'lmasa)
+# 5. Uvicorn serverni ishga tushiradi
 
 set -e
 
@@ -15,7 +16,7 @@ echo " UniControl Backend Starting..."
 echo "=================================="
 
 # Database ga ulanishni kutish
-echo "[1/4] Waiting for database to be ready..."
+echo "[1/5] Waiting for database to be ready..."
 MAX_RETRIES=30
 RETRY_COUNT=0
 
@@ -56,8 +57,14 @@ if [ $RETRY_COUNT -eq $MAX_RETRIES ]; then
     exit 1
 fi
 
+# Takroriy davomat yozuvlari (har talaba, sana va para uchun oxirgi
+# yangilangani qoladi). Constraint qo'shilgach hech narsa qilmaydi;
+# ular qolsa init_db ishga tushmaydi
+echo "[2/5] Removing duplicate attendance records..."
+python -m scripts.dedupe_attendance --apply --limit 20
+
 # Database jadvallarini yaratish (Alembic o'rniga init_db ishlatamiz)
-echo "[2/4] Creating database tables..."
+echo "[3/5] Creating database tables..."
 python -c "
 import asyncio
 from app.database import init_db
@@ -66,7 +73,7 @@ print('  ✓ Database tables created!')
 " || echo "  ⚠ Table creation had issues (may already exist)"
 
 # Userlarni yaratish
-echo "[3/4] Creating initial users..."
+echo "[4/5] Creating initial users..."
 if [ -f "scripts/create_users.py" ]; then
     python scripts/create_users.py || echo "  ⚠ User creation skipped"
 else
@@ -74,7 +81,7 @@ else
 fi
 
 # Uvicorn serverni ishga tushirish
-echo "[4/4] Starting Uvicorn server..."
+echo "[5/5] Starting Uvicorn server..."
 echo "=================================="
 echo " Server ready at http://0.0.0.0:8000"
 echo "=================================="
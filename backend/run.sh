@@ -33,6 +33,10 @@ fi
 echo -e "${YELLOW}Running database migrations...${NC}"
 alembic upgrade head
 
+# Remove duplicate attendance before the unique constraint (no-op once it exists)
+echo -e "${YELLOW}Removing duplicate attendance records...${NC}"
+python -m scripts.dedupe_attendance --apply --limit 20
+
 # Run server
 echo -e "${GREEN}Starting server...${NC}"
 uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
@@ -0,0 +1,104 @@
+"""
+UniControl - Activity Log Writer Benchmark
+==========================================
+Compares one transaction per logged request (the previous middleware
+behaviour) with the batched ActivityLogWriter.
+
+Runs against a temporary SQLite database file.
+
+Usage:
+    python -m scripts.bench_activity_log_writer
+    python -m scripts.bench_activity_log_writer --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_DB_FILE = os.path.join(tempfile.mkdtemp(), "bench_activity.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_DB_FILE}")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import event, func, select
+
+from app.core.activity_log_writer import ActivityLogWriter
+from app.core.activity_middleware import _build_log_row
+from app.database import Base, async_session_maker, engine
+from app.models.activity_log import ActivityLog
+from app.models.user import User, UserRole
+
+
+def make_row(user_id: int, i: int) -> dict:
+    return _build_log_row(
+        user_id, "GET", f"/api/v1/students/{i}", 200, 1.5, None, "127.0.0.1", "bench"
+    )
+
+
+async def per_request(user_id: int, n: int) -> None:
+    """Previous behaviour: a session and a commit for every request."""
+    for i in range(n):
+        async with async_session_maker() as session:
+            session.add(ActivityLog(**make_row(user_id, i)))
+            await session.commit()
+
+
+async def batched(user_id: int, n: int) -> ActivityLogWriter:
+    writer = ActivityLogWriter(max_queue=n, batch_size=500, flush_interval_ms=50)
+    writer.start()
+    for i in range(n):
+        writer.submit(make_row(user_id, i))
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # let the flusher run, like a live event loop
+    await writer.stop()
+    return writer
+
+
+async def main(n: int):
+    commits = 0
+
+    def on_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    event.listen(engine.sync_engine, "commit", on_commit)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_session_maker() as session:
+            user = User(login="bench", password_hash="x", name="Bench", role=UserRole.ADMIN)
+            session.add(user)
+            await session.commit()
+            user_id = user.id
+
+        print(f"{n} logged requests\n")
+        for label, fn in (("before: one transaction per request", per_request),
+                          ("after: ActivityLogWriter batches", batched)):
+            commits = 0
+            start = time.perf_counter()
+            result = await fn(user_id, n)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"  {label:<40} {commits:>6} commits  {elapsed:>9.1f} ms")
+            if isinstance(result, ActivityLogWriter):
+                print(f"    writer stats: {result.stats()}")
+
+        async with async_session_maker() as session:
+            total = (await session.execute(select(func.count(ActivityLog.id)))).scalar()
+        print(f"\n  rows in activity_logs: {total}")
+    finally:
+        await engine.dispose()
+        if os.path.exists(_DB_FILE):
+            os.remove(_DB_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Activity log writer benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,137 @@
+"""
+UniControl - AI Cell Cache Benchmark
+====================================
+Runs AIScheduleAgent.parse_cells over every lesson cell of the sample
+timetable workbook against a stub Claude endpoint (httpx.MockTransport
+with a fixed latency and token cost per request), and reports requests
+sent, tokens used, cache hit rate and wall time for:
+
+1. before: every cell sent, batches of 40 one after another
+2. cold:   distinct cells only, concurrent batches, empty cache
+3. warm:   same import again (answers come from ai_result_cache)
+
+Needs PostgreSQL (ON CONFLICT): point DATABASE_URL at a scratch database.
+Missing tables are created; cached rows written by the run are removed.
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://user@localhost/scratch \\
+        python -m scripts.bench_ai_cell_cache
+    python -m scripts.bench_ai_cell_cache --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("CLAUDE_API_KEY", "stub")
+
+import httpx
+from sqlalchemy import delete
+
+from app.database import Base, async_session_maker, engine
+from app.models.ai_cache import AIResultCache
+from app.services import ai_result_cache
+from app.services.ai_schedule_agent import AIScheduleAgent, CELL_CACHE_KIND, CELL_BATCH_SIZE
+from app.services.schedule_grid import load_schedule_grids
+
+SAMPLE = next(Path(__file__).resolve().parents[2].glob("*dars jadvali*.xlsx"))
+TOKENS_PER_CELL = 60
+TOKENS_PER_REQUEST = 900  # system prompt
+
+
+def sample_cells() -> list:
+    """Non-empty text cells below the header rows of every sheet."""
+    cells = []
+    for grid in load_schedule_grids(SAMPLE.read_bytes()):
+        for r in range(4, grid.max_row + 1):
+            for value in grid.row(r):
+                text = str(value or "").strip()
+                if len(text) > 8 and not text.startswith("="):
+                    cells.append({"id": str(len(cells)), "content": text})
+    return cells
+
+
+def stub_transport(latency: float, counter: dict) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        counter["requests"] += 1
+        await asyncio.sleep(latency)
+        prompt = json.loads(request.content)["messages"][0]["content"]
+        ids = re.findall(r'"id": "([^"]+)"', prompt)
+        parsed = [{"id": i, "subject": f"Fan {i}", "schedule_type": "lecture",
+                   "teacher": None, "room": None, "building": None} for i in ids]
+        return httpx.Response(200, json={
+            "content": [{"text": json.dumps({"parsed": parsed})}],
+            "usage": {"input_tokens": TOKENS_PER_REQUEST + TOKENS_PER_CELL * len(ids),
+                      "output_tokens": TOKENS_PER_CELL * len(ids)},
+        })
+    return httpx.MockTransport(handler)
+
+
+async def before(cells: list, latency: float) -> None:
+    counter = {"requests": 0}
+    async with httpx.AsyncClient(transport=stub_transport(latency, counter)) as client:
+        agent = AIScheduleAgent(http_client=client)
+        start = time.perf_counter()
+        parsed = 0
+        for i in range(0, len(cells), CELL_BATCH_SIZE):
+            items, _ = await agent._parse_cells_batch(cells[i:i + CELL_BATCH_SIZE])
+            parsed += len(items)
+        elapsed = time.perf_counter() - start
+    print(f"  {'before: all cells, sequential':<34} {counter['requests']:>4} req  "
+          f"{agent.total_tokens_used:>8} tok  {'':>17}  {elapsed:>7.2f} s  ({parsed} parsed)")
+
+
+async def after(label: str, cells: list, latency: float) -> None:
+    counter = {"requests": 0}
+    async with httpx.AsyncClient(transport=stub_transport(latency, counter)) as client:
+        async with async_session_maker() as session:
+            agent = AIScheduleAgent(db=session, http_client=client)
+            start = time.perf_counter()
+            parsed = await agent.parse_cells(cells)
+            await session.commit()
+            elapsed = time.perf_counter() - start
+    stats = agent.cache.stats()
+    print(f"  {label:<34} {counter['requests']:>4} req  {agent.total_tokens_used:>8} tok  "
+          f"hit {stats['hit_rate']:>5.0%} saved {stats['tokens_saved']:>7}  "
+          f"{elapsed:>7.2f} s  ({len(parsed)} parsed)")
+
+
+async def main(latency: float):
+    if engine.dialect.name != "postgresql":
+        sys.exit("Set DATABASE_URL to a PostgreSQL scratch database")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with engine.begin() as conn:
+            await conn.execute(delete(AIResultCache).where(AIResultCache.kind == CELL_CACHE_KIND))
+
+        cells = sample_cells()
+        distinct = len({ai_result_cache.normalize_text(c["content"]) for c in cells})
+        print(f"{SAMPLE.name}: {len(cells)} cells, {distinct} distinct, "
+              f"stub latency {latency * 1000:.0f} ms/request\n")
+
+        await before(cells, latency)
+        await after("cold: distinct, concurrent", cells, latency)
+        ai_result_cache._lru.clear()  # a fresh worker: answers come from the table
+        await after("warm: next import (DB cache)", cells, latency)
+        await after("warm: same worker (LRU)", cells, latency)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(AIResultCache).where(AIResultCache.kind == CELL_CACHE_KIND))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI cell cache benchmark")
+    parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per request")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency))
@@ -0,0 +1,186 @@
+"""
+UniControl - Group Attendance Summary Benchmark
+===============================================
+Counts SQL round trips per request for the group attendance summary
+before (per-student loop) and after (one GROUP BY student_id query).
+
+Runs against an in-memory SQLite database seeded with one group.
+
+Usage:
+    python -m scripts.bench_attendance_summary
+    python -m scripts.bench_attendance_summary --students 60 --days 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import event, select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from app.config import today_tashkent
+from app.database import Base
+from app.models.attendance import Attendance, AttendanceStatus
+from app.models.group import Group
+from app.models.student import Student
+from app.services.attendance_service import AttendanceService
+
+
+class QueryCounter:
+    """Counts statements executed on an engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+async def seed(session: AsyncSession, students: int, days: int) -> int:
+    group = Group(name="BENCH_25-01", faculty="Bench", course_year=1)
+    session.add(group)
+    await session.flush()
+
+    statuses = list(AttendanceStatus)
+    today = today_tashkent()
+    for i in range(students):
+        student = Student(student_id=f"B{i:05d}", name=f"Student {i:03d}", group_id=group.id)
+        session.add(student)
+        await session.flush()
+        for d in range(days):
+            status = random.choice(statuses)
+            session.add(Attendance(
+                student_id=student.id,
+                date=today - timedelta(days=d),
+                status=status,
+                late_minutes=random.randint(1, 30) if status == AttendanceStatus.LATE else 0,
+            ))
+    await session.commit()
+    return group.id
+
+
+async def legacy_group_summary(db: AsyncSession, group_id: int, date_from, date_to):
+    """The previous implementation: stats + late minutes queried per student."""
+    students = (await db.execute(
+        select(Student)
+        .where(Student.group_id == group_id, Student.is_active == True)
+        .options(joinedload(Student.group))
+        .order_by(Student.name)
+    )).unique().scalars().all()
+
+    rows = []
+    for student in students:
+        attendances = (await db.execute(
+            select(Attendance).where(
+                Attendance.student_id == student.id,
+                Attendance.date >= date_from,
+                Attendance.date <= date_to,
+            )
+        )).scalars().all()
+        late_minutes = (await db.execute(
+            select(func.sum(Attendance.late_minutes)).where(
+                Attendance.student_id == student.id,
+                Attendance.date >= date_from,
+                Attendance.date <= date_to,
+            )
+        )).scalar() or 0
+        rows.append((student.id, len(attendances), late_minutes))
+    return rows
+
+
+async def legacy_teacher_summary(db: AsyncSession, group_id: int, date_from, date_to):
+    """The previous teacher summary: one aggregate query per student."""
+    from sqlalchemy import case
+
+    students = (await db.execute(
+        select(Student).where(Student.group_id == group_id, Student.is_active == True)
+    )).scalars().all()
+    rows = []
+    for s in students:
+        row = (await db.execute(
+            select(
+                func.count(Attendance.id).label("total"),
+                func.count(case((Attendance.status == AttendanceStatus.PRESENT, 1))).label("present"),
+            ).where(
+                Attendance.student_id == s.id,
+                Attendance.date >= date_from,
+                Attendance.date <= date_to,
+            )
+        )).one()
+        rows.append((s.id, row.total))
+    return rows
+
+
+async def new_teacher_summary(db: AsyncSession, group_id: int, date_from, date_to):
+    students = (await db.execute(
+        select(Student).where(Student.group_id == group_id, Student.is_active == True)
+    )).scalars().all()
+    aggregates = await AttendanceService(db).aggregate_by_student(
+        group_id=group_id, date_from=date_from, date_to=date_to
+    )
+    return [(s.id, aggregates.get(s.id, {}).get("total", 0)) for s in students]
+
+
+async def measure(label, fn, session_maker, counter, *args):
+    async with session_maker() as db:
+        counter.count = 0
+        start = time.perf_counter()
+        await fn(db, *args)
+        elapsed = (time.perf_counter() - start) * 1000
+    print(f"  {label:<42} {counter.count:>6} queries  {elapsed:>8.1f} ms")
+    return counter.count
+
+
+async def main(students: int, days: int):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with session_maker() as session:
+            group_id = await seed(session, students, days)
+
+        counter = QueryCounter(engine)
+        date_to = today_tashkent()
+        date_from = date_to - timedelta(days=days)
+        args = (group_id, date_from, date_to)
+
+        print(f"Group of {students} students x {days} days ({students * days} attendance rows)\n")
+        print("AttendanceService.get_group_attendance_summary")
+        before = await measure("before: per-student stats + late minutes", legacy_group_summary,
+                               session_maker, counter, *args)
+
+        async def service_summary(db, *a):
+            return await AttendanceService(db).get_group_attendance_summary(*a)
+        after = await measure("after: GROUP BY student_id", service_summary, session_maker, counter, *args)
+        print(f"  -> {before} -> {after} round trips\n")
+
+        print("teacher /attendance/summary")
+        before = await measure("before: one aggregate per student", legacy_teacher_summary,
+                               session_maker, counter, *args)
+        after = await measure("after: aggregate_by_student", new_teacher_summary,
+                              session_maker, counter, *args)
+        print(f"  -> {before} -> {after} round trips")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group attendance summary query benchmark")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--days", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.students, args.days))
@@ -0,0 +1,223 @@
+"""
+UniControl - Broadcast Notification Benchmark
+=============================================
+Sends one broadcast to every active user and compares:
+
+1. before: one Notification ORM object per recipient, added in a loop
+   (the previous create_broadcast)
+2. after: NotificationService.create_broadcast, a single
+   broadcast_notifications row joined into feeds at read time
+
+For each it reports write time and the growth of the notifications and
+broadcast_notification_receipts tables. It then times a feed page and
+the unread count for one user, and "read all" for a share of the users,
+which is when receipts are written.
+
+Needs PostgreSQL: point DATABASE_URL at a scratch database. Bench users
+(login bench_bc_*) and everything they sent or received are deleted at
+the end.
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://user@localhost/scratch \\
+        python -m scripts.bench_broadcast_notifications
+    python -m scripts.bench_broadcast_notifications --users 50000 --readers 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import delete, func, insert, select, text
+
+from app.config import now_tashkent
+from app.database import Base, async_session_maker, engine
+from app.models.notification import (
+    BroadcastNotification,
+    BroadcastNotificationReceipt,
+    Notification,
+    NotificationPriority,
+    NotificationType,
+)
+from app.models.user import User, UserRole
+from app.schemas.notification import BroadcastNotificationCreate
+from app.services.notification_service import NotificationService
+
+LOGIN_PREFIX = "bench_bc_"
+TABLES = ("notifications", "broadcast_notifications", "broadcast_notification_receipts")
+
+
+def payload() -> BroadcastNotificationCreate:
+    return BroadcastNotificationCreate(
+        title="Bench broadcast",
+        message="Ertaga darslar soat 9:00 da boshlanadi.",
+        type=NotificationType.ANNOUNCEMENT,
+        priority=NotificationPriority.NORMAL,
+        target_role="all",
+    )
+
+
+async def create_users(n: int) -> list:
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(User),
+            [
+                {
+                    "login": f"{LOGIN_PREFIX}{i}",
+                    "password_hash": "x",
+                    "role": UserRole.STUDENT,
+                    "name": f"Bench {i}",
+                    "is_active": True,
+                }
+                for i in range(n)
+            ],
+        )
+        await session.commit()
+        result = await session.execute(
+            select(User.id).where(User.login.like(f"{LOGIN_PREFIX}%")).order_by(User.id)
+        )
+        return [row[0] for row in result.all()]
+
+
+async def table_stats() -> dict:
+    async with async_session_maker() as session:
+        stats = {}
+        for table in TABLES:
+            rows = (await session.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+            size = (await session.execute(
+                text("SELECT pg_total_relation_size(CAST(:t AS regclass))"), {"t": table}
+            )).scalar()
+            stats[table] = (rows, size)
+        return stats
+
+
+def print_growth(before: dict, after: dict, tables=TABLES) -> None:
+    for table in tables:
+        rows = after[table][0] - before[table][0]
+        size = (after[table][1] - before[table][1]) / 1024 / 1024
+        print(f"    {table:<33} +{rows:>8} rows  +{size:>7.2f} MB")
+
+
+async def fan_out_before(sender_id: int) -> tuple:
+    """The previous create_broadcast: one ORM Notification per recipient."""
+    data = payload()
+    async with async_session_maker() as session:
+        broadcast = BroadcastNotification(
+            title=data.title, message=data.message, type=data.type,
+            priority=data.priority, target_role=data.target_role, sender_id=sender_id,
+        )
+        session.add(broadcast)
+        await session.flush()
+        result = await session.execute(select(User.id).where(User.is_active == True))
+        count = 0
+        for (user_id,) in result.all():
+            session.add(Notification(
+                user_id=user_id, title=data.title, message=data.message,
+                type=data.type, priority=data.priority, sender_id=sender_id,
+            ))
+            count += 1
+        broadcast.sent_count = count
+        broadcast.sent_at = now_tashkent()
+        await session.commit()
+        return broadcast.id, count
+
+
+async def fan_out_after(sender_id: int) -> tuple:
+    async with async_session_maker() as session:
+        broadcast, count = await NotificationService(session).create_broadcast(payload(), sender_id)
+        return broadcast.id, count
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def cleanup(sender_id: int) -> None:
+    async with async_session_maker() as session:
+        await session.execute(
+            delete(BroadcastNotification).where(BroadcastNotification.sender_id == sender_id)
+        )
+        await session.execute(delete(User).where(User.login.like(f"{LOGIN_PREFIX}%")))
+        await session.commit()
+
+
+async def main(users: int, readers: float):
+    if engine.dialect.name != "postgresql":
+        sys.exit("Set DATABASE_URL to a PostgreSQL scratch database")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_ids = await create_users(users)
+    sender_id, reader_id = user_ids[0], user_ids[-1]
+    try:
+        async with async_session_maker() as session:
+            active = (await session.execute(
+                select(func.count(User.id)).where(User.is_active == True)
+            )).scalar()
+        print(f"Broadcast to all {active} active users ({users} bench users)\n")
+
+        broadcast_ids = []
+        for label, fn in (("before: ORM row per recipient", fan_out_before),
+                          ("after: single broadcast row", fan_out_after)):
+            stats = await table_stats()
+            (broadcast_id, count), elapsed = await timed(fn(sender_id))
+            broadcast_ids.append(broadcast_id)
+            print(f"  {label:<32} {elapsed:>9.1f} ms  ({count} recipients)")
+            print_growth(stats, await table_stats())
+
+        # Keep only the lazy broadcast so every feed holds one unread item
+        async with async_session_maker() as session:
+            await session.execute(delete(Notification).where(Notification.sender_id == sender_id))
+            await session.execute(
+                delete(BroadcastNotification).where(BroadcastNotification.id == broadcast_ids[0])
+            )
+            await session.commit()
+
+        print("\nReads for one recipient")
+        async with async_session_maker() as session:
+            service = NotificationService(session)
+            for label, coro in (
+                ("feed page (20 items)", service.list_notifications(reader_id, page_size=20)),
+                ("unread count", service.get_unread_count(reader_id)),
+            ):
+                _, elapsed = await timed(coro)
+                print(f"  {label:<32} {elapsed:>9.1f} ms")
+
+        n_readers = int(len(user_ids) * readers)
+        stats = await table_stats()
+        start = time.perf_counter()
+        for user_id in user_ids[:n_readers]:
+            async with async_session_maker() as session:
+                await NotificationService(session).mark_all_as_read(user_id)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\nRead all by {n_readers} users ({readers:.0%}): "
+              f"{elapsed / max(n_readers, 1):.2f} ms per user")
+        print_growth(stats, await table_stats(), tables=("broadcast_notification_receipts",))
+
+        async with async_session_maker() as session:
+            receipts = (await session.execute(
+                select(func.count(BroadcastNotificationReceipt.id))
+                .where(BroadcastNotificationReceipt.user_id.in_(user_ids))
+            )).scalar()
+        print(f"  receipts written: {receipts}")
+    finally:
+        await cleanup(sender_id)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Broadcast notification benchmark")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--readers", type=float, default=0.1,
+                        help="share of users who open 'read all' afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.readers))
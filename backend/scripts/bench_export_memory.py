@@ -0,0 +1,194 @@
+"""
+UniControl - Export Memory Benchmark
+====================================
+Peak RSS of a large attendance export (a faculty's semester), each run in
+a fresh process so the numbers do not mix:
+
+- before: ORM rows with joinedloads, a pandas DataFrame and an openpyxl
+          workbook in memory, returned as BytesIO (the previous export)
+- after:  column tuples from a server-side cursor (yield_per), written to
+          an xlsxwriter constant_memory file and streamed (table_export)
+- csv:    the same, as CSV
+
+A bench group with its students and attendance is inserted first and
+removed at the end.
+
+Needs PostgreSQL (server-side cursors): point DATABASE_URL at a scratch
+database. Missing tables are created.
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://user@localhost/scratch \\
+        python -m scripts.bench_export_memory
+    python -m scripts.bench_export_memory --students 1500 --days 90
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import pandas as pd
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import joinedload
+
+from app.database import Base, async_session_maker, engine
+from app.models.attendance import Attendance, AttendanceStatus
+from app.models.group import Group
+from app.models.student import Student
+from app.services.excel_service import ExcelService
+
+GROUP_NAME = "BENCH_EXPORT-01"
+START = date(2026, 2, 2)
+STATUSES = [AttendanceStatus.PRESENT] * 8 + [AttendanceStatus.ABSENT, AttendanceStatus.LATE]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(students: int, days: int, seed_value: int) -> int:
+    rng = random.Random(seed_value)
+    async with async_session_maker() as db:
+        group = Group(name=GROUP_NAME, faculty="Bench", course_year=1)
+        db.add(group)
+        await db.flush()
+        student_ids = (await db.execute(
+            insert(Student).returning(Student.id),
+            [
+                {"student_id": f"BX{i:06d}", "name": f"Bench Talaba {i:05d}", "group_id": group.id}
+                for i in range(students)
+            ],
+        )).scalars().all()
+        for d in range(days):
+            await db.execute(insert(Attendance), [
+                {
+                    "student_id": sid,
+                    "date": START + timedelta(days=d),
+                    "lesson_number": 1,
+                    "subject": "Matematika",
+                    "status": (status := rng.choice(STATUSES)),
+                    "late_minutes": rng.randint(1, 30) if status == AttendanceStatus.LATE else 0,
+                }
+                for sid in student_ids
+            ])
+        await db.commit()
+        return group.id
+
+
+async def cleanup() -> None:
+    async with async_session_maker() as db:
+        group_ids = select(Group.id).where(Group.name == GROUP_NAME).scalar_subquery()
+        student_ids = select(Student.id).where(Student.group_id.in_(group_ids)).scalar_subquery()
+        await db.execute(delete(Attendance).where(Attendance.student_id.in_(student_ids)))
+        await db.execute(delete(Student).where(Student.group_id.in_(group_ids)))
+        await db.execute(delete(Group).where(Group.name == GROUP_NAME))
+        await db.commit()
+
+
+async def export_before(db, group_id: int, date_from: date, date_to: date) -> int:
+    """The previous ExcelService.export_attendance."""
+    result = await db.execute(
+        select(Attendance)
+        .options(joinedload(Attendance.student).joinedload(Student.group))
+        .join(Student).where(Student.group_id == group_id)
+        .where(Attendance.date >= date_from, Attendance.date <= date_to)
+        .order_by(Attendance.date.desc(), Attendance.student_id)
+    )
+    attendances = result.unique().scalars().all()
+    data = [{
+        "Sana": a.date.strftime("%d.%m.%Y"),
+        "Talaba": a.student.name if a.student else "",
+        "Guruh": a.student.group.name if a.student and a.student.group else "",
+        "Holat": a.status.value,
+        "Kechikish (min)": a.late_minutes,
+        "Fan": a.subject or "",
+        "Para": a.lesson_number or "",
+        "Izoh": a.note or "",
+    } for a in attendances]
+    output: io.BytesIO = ExcelService(db)._create_excel_file(pd.DataFrame(data), "Davomat")
+    # StreamingResponse(BytesIO) iterates it line by line
+    return sum(len(chunk) for chunk in output)
+
+
+async def export_after(db, group_id: int, date_from: date, date_to: date, fmt: str) -> int:
+    export = await ExcelService(db).export_attendance(group_id, date_from, date_to, fmt=fmt)
+    response = await export.response(f"bench.{fmt}")
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    await response.background()  # removes the temp file
+    return size
+
+
+async def run_mode(mode: str, group_id: int, days: int) -> None:
+    """One export in this process; prints 'baseline peak seconds size'."""
+    date_from, date_to = START, START + timedelta(days=days)
+    async with async_session_maker() as db:
+        await db.execute(select(1))
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        if mode == "before":
+            size = await export_before(db, group_id, date_from, date_to)
+        else:
+            size = await export_after(db, group_id, date_from, date_to, "xlsx" if mode == "after" else "csv")
+        elapsed = time.perf_counter() - start
+    print(baseline, peak_rss_mb(), elapsed, size)
+
+
+async def main(students: int, days: int, seed_value: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("Set DATABASE_URL to a PostgreSQL scratch database")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await cleanup()
+    print(f"Seeding {students} students x {days} days ({students * days:,} attendance rows)...")
+    group_id = await seed(students, days, seed_value)
+    await engine.dispose()
+
+    labels = {
+        "before": "before: ORM + pandas + openpyxl",
+        "after": "after:  cursor + xlsxwriter",
+        "csv": "after:  cursor + csv",
+    }
+    try:
+        print(f"\n  {'':<34} {'peak RSS':>10} {'growth':>10} {'time':>9} {'file':>10}")
+        for mode, label in labels.items():
+            out = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_export_memory",
+                 "--mode", mode, "--group-id", str(group_id), "--days", str(days)],
+                cwd=Path(__file__).resolve().parents[1],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            baseline, peak, elapsed, size = map(float, out.split())
+            print(f"  {label:<34} {peak:>7.0f} MB {peak - baseline:>+7.0f} MB "
+                  f"{elapsed:>7.1f} s {size / 1024 / 1024:>7.1f} MB")
+    finally:
+        await cleanup()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export memory benchmark")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=["before", "after", "csv"], help=argparse.SUPPRESS)
+    parser.add_argument("--group-id", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        asyncio.run(run_mode(args.mode, args.group_id, args.days))
+    else:
+        asyncio.run(main(args.students, args.days, args.seed))
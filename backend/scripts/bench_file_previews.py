@@ -0,0 +1,96 @@
+"""
+UniControl - File Preview Benchmark
+===================================
+Bytes a file manager page of photos costs the browser:
+
+- before: the grid shows each image through its download URL, i.e. the
+  original upload
+- after:  the grid uses thumbnail_url, the "sm" WebP preview (160 px);
+  "md" is listed for a larger gallery view
+
+Synthetic camera-sized JPEGs are written to a temp directory and their
+previews rendered through PreviewRenderer, the process pool uploads use,
+which also reports render time per image. No database is needed.
+
+Usage:
+    python -m scripts.bench_file_previews
+    python -m scripts.bench_file_previews --page 50 --width 4000 --height 3000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from PIL import Image, ImageFilter
+
+from app.services.file_previews import PreviewRenderer
+
+
+def photo(rng: random.Random, width: int, height: int) -> Image.Image:
+    """Smooth colour regions with sensor-like noise: compresses like a photo."""
+    base = Image.new("RGB", (16, 12))
+    base.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(16 * 12)])
+    image = base.resize((width, height), Image.Resampling.BICUBIC)
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    return Image.blend(image, noise, 0.12).filter(ImageFilter.SMOOTH)
+
+
+def human(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+async def main(page: int, width: int, height: int, workers: int, seed: int):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        sources = []
+        for i in range(page):
+            path = root / f"IMG_{i:04d}.jpg"
+            photo(rng, width, height).save(path, "JPEG", quality=90)
+            sources.append((hashlib.sha256(path.read_bytes()).hexdigest(), str(path)))
+        print(f"{page} photos of {width}x{height} on one file manager page\n")
+
+        renderer = PreviewRenderer(workers=workers, max_pending=page, root=root)
+        try:
+            # Start the worker processes outside the timing
+            await renderer.ensure(*sources[0])
+            start = time.perf_counter()
+            await asyncio.gather(*(renderer.ensure(sha, src) for sha, src in sources[1:]))
+            elapsed = (time.perf_counter() - start) * 1000
+        finally:
+            renderer.shutdown()
+        print(f"  render sm+md+lg, {workers} workers   {elapsed / max(page - 1, 1):>8.1f} ms per image\n")
+
+        originals = sum(os.path.getsize(src) for _, src in sources)
+        print(f"  before: originals            {human(originals):>10}")
+        for size in ("sm", "md"):
+            total = sum(renderer.path(sha, size).stat().st_size for sha, _ in sources)
+            print(f"  after:  {size} previews           {human(total):>10}  "
+                  f"({originals / total:,.0f}x fewer bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File preview benchmark")
+    parser.add_argument("--page", type=int, default=50, help="images per page (list_files default)")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.page, args.width, args.height, args.workers, args.seed))
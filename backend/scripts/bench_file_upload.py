@@ -0,0 +1,120 @@
+"""
+UniControl - File Upload Benchmark
+==================================
+Stores concurrent uploads (spooled temp files, as Starlette hands them
+to the endpoint) and measures how long the event loop is blocked:
+
+- before: seek to the end for the size, then shutil.copyfileobj on the
+  event loop into a per-user folder (the previous upload_file)
+- after:  FileStorage.receive, chunked copy and SHA-256 on the
+  UPLOAD_COPY_WORKERS pool with the size limit checked on the way
+
+A ticker coroutine records the gaps between its 5 ms ticks, i.e. how
+long other requests would have waited; the longest and the 95th
+percentile over --rounds rounds are reported. Each mode is run once
+untimed first, so starting the worker threads is not counted. Hashing
+costs CPU, so the total time is higher. No database is needed: the
+reference counting half of an upload (FileStorage.claim) is not timed.
+
+Usage:
+    python -m scripts.bench_file_upload
+    python -m scripts.bench_file_upload --uploads 16 --size-mb 40
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.config import settings
+from app.services.file_storage import CHUNK_SIZE, FileStorage
+
+
+def spooled(data: bytes):
+    f = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    f.write(data)
+    f.seek(0)
+    return f
+
+
+async def store_before(root: Path, src) -> int:
+    src.seek(0, 2)
+    size = src.tell()
+    src.seek(0)
+    folder = root / "1"
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / uuid.uuid4().hex, "wb") as out:
+        shutil.copyfileobj(src, out)
+    return size
+
+
+async def store_after(storage: FileStorage, src) -> int:
+    received = await storage.receive(src, max_size=1 << 40)
+    await storage.discard(received)
+    return received.size
+
+
+async def run(label: str, store, uploads: list, gaps: list) -> float:
+    """Store the uploads concurrently; appends the loop's tick gaps, returns seconds."""
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(store(src) for src in uploads))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return elapsed
+
+
+async def measure(label: str, store, data: bytes, uploads: int, rounds: int) -> None:
+    await run(label, store, [spooled(data[:CHUNK_SIZE])], [])  # warm-up
+    gaps, elapsed = [], []
+    for _ in range(rounds):
+        elapsed.append(await run(label, store, [spooled(data) for _ in range(uploads)], gaps))
+    gaps.sort()
+    p95 = gaps[int(len(gaps) * 0.95)] if gaps else 0
+    print(f"  {label:<36} {statistics.median(elapsed) * 1000:>8.0f} ms median total, "
+          f"loop stall max {gaps[-1] * 1000 if gaps else 0:>6.1f} ms, p95 {p95 * 1000:>5.1f} ms")
+
+
+async def main(uploads: int, size_mb: int, rounds: int):
+    data = os.urandom(size_mb * 1024 * 1024)
+    print(f"{uploads} concurrent uploads of {size_mb} MB, {rounds} rounds, "
+          f"{settings.UPLOAD_COPY_WORKERS} copy workers, {os.cpu_count()} CPUs\n")
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        await measure("before: copyfileobj on the loop",
+                      lambda src: store_before(root / "before", src), data, uploads, rounds)
+        storage = FileStorage(root / "after")
+        await measure("after:  chunked copy + SHA-256 in pool",
+                      lambda src: store_after(storage, src), data, uploads, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File upload benchmark")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.size_mb, args.rounds))
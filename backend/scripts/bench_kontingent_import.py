@@ -0,0 +1,168 @@
+"""
+UniControl - Kontingent Import Benchmark
+========================================
+Scales test_1000.xlsx up to N rows (unique student ids, same groups) and
+measures:
+
+1. Parse + group resolution, before (rows materialized with list(),
+   fuzzy_match_group per row) and after (streamed rows, GroupIndex).
+2. The full streaming import (INSERT ... ON CONFLICT batches), run as a
+   dry run so the database is left unchanged, with peak Python memory.
+
+Needs PostgreSQL (ON CONFLICT): point DATABASE_URL at a scratch database.
+Missing tables are created.
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://user@localhost/scratch \\
+        python -m scripts.bench_kontingent_import
+    python -m scripts.bench_kontingent_import --rows 20000 --groups 300
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import event
+
+from app.database import Base, async_session_maker, engine
+from app.services.excel_service import (
+    ExcelService,
+    GroupIndex,
+    fuzzy_match_group,
+    parse_kontingent_row,
+)
+
+SAMPLE = Path(__file__).resolve().parents[2] / "test_1000.xlsx"
+
+
+def scale_workbook(rows: int) -> bytes:
+    """test_1000.xlsx repeated until it has `rows` data rows."""
+    src = load_workbook(SAMPLE, read_only=True, data_only=True)
+    all_rows = list(src.active.iter_rows(values_only=True))
+    src.close()
+    header, data = all_rows[:2], [r for r in all_rows[2:] if r and r[0]]
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for r in header:
+        ws.append(r)
+    for i in range(rows):
+        r = list(data[i % len(data)])
+        r[0] = f"BENCH{i:07d}"
+        r[4] = None  # jshshir is unique; repeated rows would collide
+        ws.append(r)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def db_group_names(file_bytes: bytes, extra: int) -> list:
+    """Groups as the DB might spell them (KI_25-04 vs KI-25-04) plus unrelated ones."""
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    names = {str(r[14]).strip() for r in wb.active.iter_rows(min_row=3, values_only=True) if r[14]}
+    wb.close()
+    spelled = [n.replace("-", "_", 1) for n in sorted(names)]
+    return spelled + [f"XX{i % 90:02d}_{20 + i % 6}-{i:03d}" for i in range(extra)]
+
+
+def parse_before(file_bytes: bytes, group_names: list) -> int:
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    rows = list(wb.active.iter_rows(min_row=3, values_only=True))
+    groups_cache = {name: i for i, name in enumerate(group_names)}
+    candidates = {name: i for i, name in enumerate(group_names)}
+    resolved = 0
+    for row in rows:
+        data = parse_kontingent_row(row)
+        if data and data["group_name"]:
+            name = data["group_name"]
+            if name in groups_cache or fuzzy_match_group(name, candidates):
+                resolved += 1
+    wb.close()
+    return resolved
+
+
+def parse_after(file_bytes: bytes, group_names: list) -> int:
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    index = GroupIndex(enumerate(group_names))
+    resolved = 0
+    for row in wb.active.iter_rows(min_row=3, values_only=True):
+        data = parse_kontingent_row(row)
+        if data and data["group_name"] and index.resolve(data["group_name"]) is not None:
+            resolved += 1
+    wb.close()
+    return resolved
+
+
+def timed(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+async def full_import(file_bytes: bytes):
+    statements = 0
+
+    def on_execute(*args, **kwargs):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    tracemalloc.start()
+    start = time.perf_counter()
+    async with async_session_maker() as session:
+        result = await ExcelService(session).import_kontingent(
+            file_bytes, default_password="bench", dry_run=True
+        )
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak, statements
+
+
+async def main(rows: int, extra_groups: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("Set DATABASE_URL to a PostgreSQL scratch database")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        file_bytes = scale_workbook(rows)
+        group_names = db_group_names(file_bytes, extra_groups)
+        print(f"{rows} rows, {len(group_names)} groups in DB\n")
+
+        print("Parse + group resolution")
+        for label, fn in (("before: list() + fuzzy per row", parse_before),
+                          ("after: streamed + GroupIndex", parse_after)):
+            resolved, elapsed, peak = timed(fn, file_bytes, group_names)
+            print(f"  {label:<34} {elapsed:>9.1f} ms  peak {peak:>6.1f} MB  ({resolved} resolved)")
+
+        print("\nFull streaming import (dry run, rolled back)")
+        result, elapsed, peak, statements = await full_import(file_bytes)
+        print(f"  {elapsed:>9.1f} ms  peak {peak:>6.1f} MB  {statements} SQL statements")
+        print(f"  {rows / (elapsed / 1000):>9.0f} rows/s")
+        print(f"  {result['message']}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kontingent import benchmark")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--groups", type=int, default=300, help="unrelated groups in the DB")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.groups))
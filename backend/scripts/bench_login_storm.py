@@ -0,0 +1,88 @@
+"""
+UniControl - Login Storm Benchmark
+==================================
+Simulates a burst of concurrent logins while other (cheap) requests keep
+arriving, and compares verifying passwords inline on the event loop (the
+previous behaviour) with the PasswordHasher worker pool.
+
+Reports total time for the burst and how long the cheap requests had to
+wait for the event loop (p50 / max), which is what every other user
+feels during a morning login spike.
+
+Usage:
+    python -m scripts.bench_login_storm
+    python -m scripts.bench_login_storm --logins 100 --rounds 12 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import bcrypt
+
+from app.core.password_hasher import PasswordHasher
+from app.core.security import verify_password
+
+
+async def inline_verify(password: str, hashed: str) -> bool:
+    """Previous behaviour: bcrypt called directly inside the handler."""
+    return verify_password(password, hashed)
+
+
+async def probe(stop: asyncio.Event, lags: list, interval: float = 0.005) -> None:
+    """A cheap request every `interval` seconds; records event-loop delay."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - expected) * 1000)
+
+
+async def storm(verify, n: int, password: str, hashed: str):
+    stop = asyncio.Event()
+    lags: list = []
+    prober = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify(password, hashed) for _ in range(n)))
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    await prober
+    assert all(results)
+    return elapsed, lags
+
+
+async def main(n: int, rounds: int, workers: int):
+    password = "Student123!"
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+    hasher = PasswordHasher(workers=workers, max_pending=n)
+
+    print(f"{n} concurrent logins, bcrypt cost {rounds}, {workers} workers\n")
+    for label, verify in (("before: inline bcrypt", inline_verify),
+                          ("after: PasswordHasher pool", hasher.verify)):
+        elapsed, lags = await storm(verify, n, password, hashed)
+        lags = lags or [0.0]
+        print(
+            f"  {label:<28} {elapsed:>9.1f} ms total   "
+            f"loop lag p50 {statistics.median(lags):>7.1f} ms  max {max(lags):>8.1f} ms"
+        )
+    print(f"\n  hasher stats: {hasher.stats()}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login storm benchmark")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds, args.workers))
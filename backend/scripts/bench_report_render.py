@@ -0,0 +1,127 @@
+"""
+UniControl - Report Rendering Benchmark
+=======================================
+Renders a large synthetic attendance report (a faculty's semester) while
+a ticker coroutine measures how long the event loop is blocked, i.e. how
+long every other request of the worker would wait:
+
+- before: ReportLab/openpyxl on the event loop (the previous download)
+- after:  ReportRenderer, the process pool, first download
+- cached: the same data again, served from the artifact cache
+
+The data is built in memory as ReportService.collect returns it, so no
+database is needed and only the rendering is timed.
+
+Usage:
+    python -m scripts.bench_report_render
+    python -m scripts.bench_report_render --students 1500 --days 90 --format pdf
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.report_rendering import render_report
+from app.services.report_artifacts import ReportRenderer
+
+STATUSES = ["present"] * 8 + ["absent", "late"]
+
+
+def report_data(fmt: str, students: int, days: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    start = date(2026, 2, 2)
+    report = {
+        "id": 1, "name": "Semestr davomati", "description": None,
+        "report_type": "attendance", "format": fmt, "status": "completed",
+        "date_from": start, "date_to": start + timedelta(days=days), "created_by": 1,
+        "created_at": None, "ai_result": None,
+    }
+    names = [f"Talaba {i:04d}" for i in range(students)]
+    if fmt == "pdf":
+        rows = []
+        for name in names:
+            counts = [rng.choice(STATUSES) for _ in range(days)]
+            rows.append([name, days, counts.count("present"), counts.count("absent"), counts.count("late")])
+        total = [sum(col) for col in zip(*(row[1:] for row in rows))]
+        return {
+            "kind": "attendance", "report": report, "group_name": "Bench",
+            "totals": dict(zip(("total", "present", "absent", "late"), total)),
+            "students": rows,
+        }
+    return {
+        "kind": "attendance", "report": report,
+        "rows": [
+            [name, start + timedelta(days=d), rng.choice(STATUSES), None]
+            for d in range(days) for name in names
+        ],
+    }
+
+
+async def run(label: str, render) -> None:
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    size = await render()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    print(f"  {label:<30} {elapsed * 1000:>8.0f} ms, longest loop stall "
+          f"{max(gaps, default=0) * 1000:>7.1f} ms  ({size / 1024:,.0f} KB)")
+
+
+async def main(fmt: str, students: int, days: int, seed: int):
+    data = report_data(fmt, students, days, seed)
+    rows = len(data["students"] if fmt == "pdf" else data["rows"])
+    print(f"{fmt} attendance report, {students} students x {days} days ({rows} table rows)\n")
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+
+        async def inline():
+            return render_report(fmt, data, str(root / f"inline.{fmt}"))
+
+        renderer = ReportRenderer(workers=1, root=root)
+        # Start the worker process outside the timing
+        await renderer.render(0, "csv", {"kind": "generic", "report": data["report"], "rows": []})
+
+        async def pooled():
+            return (await renderer.render(1, fmt, data)).stat().st_size
+
+        try:
+            await run("before: on the event loop", inline)
+            await run("after:  process pool", pooled)
+            await run("cached: artifact on disk", pooled)
+        finally:
+            renderer.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report rendering benchmark")
+    parser.add_argument("--format", choices=["pdf", "excel", "csv"], default="excel")
+    parser.add_argument("--students", type=int, default=600)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.format, args.students, args.days, args.seed))
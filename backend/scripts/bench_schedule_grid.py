@@ -0,0 +1,126 @@
+"""
+UniControl - Schedule Grid Benchmark
+====================================
+Compares the schedule parsers on the sample timetable workbooks in the
+repository root, per sheet:
+
+- before: full-mode load_workbook, merged ranges expanded into a
+  (row, col) dict, other cells read with ws.cell(), and the merged range
+  of a data cell found by a linear scan over all ranges
+- after:  read-only load into a SheetGrid (dense rows + merged-range
+  interval index)
+
+Both run the same ExcelService._parse_schedule_sheet, so the records
+are checked to be identical.
+
+Usage:
+    python -m scripts.bench_schedule_grid
+    python -m scripts.bench_schedule_grid path/to/jadval.xlsx
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from openpyxl import load_workbook
+
+from app.services.excel_service import ExcelService
+from app.services.schedule_grid import load_schedule_grids
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+class LegacySheet:
+    """SheetGrid interface implemented the way the parsers used to read cells."""
+
+    def __init__(self, ws):
+        self.title = ws.title
+        self.max_row = ws.max_row
+        self.max_column = ws.max_column
+        self._ws = ws
+        self._merged = {}
+        self.merged_ranges = []
+        for rng in ws.merged_cells.ranges:
+            top_val = ws.cell(rng.min_row, rng.min_col).value
+            for r in range(rng.min_row, rng.max_row + 1):
+                for c in range(rng.min_col, rng.max_col + 1):
+                    self._merged[(r, c)] = top_val
+            self.merged_ranges.append((rng.min_row, rng.min_col, rng.max_row, rng.max_col))
+
+    def raw(self, row, col):
+        return self._ws.cell(row, col).value
+
+    def row(self, row):
+        return [cell.value for cell in self._ws[row]]
+
+    def merged_range(self, row, col):
+        for rng in self.merged_ranges:
+            if rng[0] <= row <= rng[2] and rng[1] <= col <= rng[3]:
+                return rng
+        return None
+
+    def value(self, row, col):
+        if (row, col) in self._merged:
+            return self._merged[(row, col)]
+        return self._ws.cell(row, col).value
+
+
+def legacy_sheets(file_data: bytes):
+    wb = load_workbook(io.BytesIO(file_data), data_only=True)
+    for ws in wb.worksheets:
+        yield LegacySheet(ws)
+    wb.close()
+
+
+def run(label: str, sheets, svc: ExcelService, lookup: dict) -> dict:
+    results = {}
+    total_load = total_parse = 0.0
+    print(f"  {label}")
+    started = time.perf_counter()
+    while True:
+        sheet = next(sheets, None)
+        if sheet is None:
+            break
+        loaded = time.perf_counter()
+        records = svc._parse_schedule_sheet(sheet, lookup, {})
+        parsed = time.perf_counter()
+        load_ms, parse_ms = (loaded - started) * 1000, (parsed - loaded) * 1000
+        total_load += load_ms
+        total_parse += parse_ms
+        results[sheet.title] = records
+        print(f"    {sheet.title[:34]:<34} {len(records):>5} rec  "
+              f"load {load_ms:>8.1f} ms  parse {parse_ms:>8.1f} ms")
+        started = time.perf_counter()
+    print(f"    {'total':<34} {sum(map(len, results.values())):>5} rec  "
+          f"load {total_load:>8.1f} ms  parse {total_parse:>8.1f} ms\n")
+    return results
+
+
+def main(paths):
+    svc = ExcelService(None)
+    lookup = {}  # no DB groups: every group header is reported as unmatched
+    for path in paths:
+        file_data = path.read_bytes()
+        print(f"{path.name} ({len(file_data) / 1024:.0f} KB)")
+        before = run("before: full load + ws.cell", legacy_sheets(file_data), svc, lookup)
+        after = run("after: read-only SheetGrid", load_schedule_grids(file_data), svc, lookup)
+        print(f"  identical records: {before == after}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule grid benchmark")
+    parser.add_argument("files", nargs="*", type=Path)
+    args = parser.parse_args()
+    files = args.files or sorted(REPO_ROOT.glob("*dars jadvali*.xlsx"))
+    if not files:
+        sys.exit("No timetable workbooks found")
+    main(files)
@@ -0,0 +1,170 @@
+"""
+UniControl - Schedule Occupancy Benchmark
+=========================================
+Builds a synthetic weekly timetable (groups, rooms, teachers) in memory
+and compares, without a database:
+
+- before: the previous per-item check, i.e. the overlap test of
+  _check_time_conflict's OR query (same group, same day, times overlap)
+  applied to every lesson of the day, plus rooms occupancy as
+  per-room lists counted one by one
+- after:  OccupancyEngine bitsets (group, room and teacher conflicts of a
+  whole batch, free rooms for every slot, occupancy rates)
+
+The "before" checks cover groups only, as the old query did, and leave
+out the database round trip it made per item; the engine also checks
+rooms and teachers, so it does more work per item.
+
+Usage:
+    python -m scripts.bench_schedule_occupancy
+    python -m scripts.bench_schedule_occupancy --groups 600 --rooms 250 --batch 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.models.schedule import WeekType
+from app.services.schedule_occupancy import (
+    LESSON_SLOTS,
+    TEACHING_DAYS,
+    TEACHING_LESSONS,
+    Booking,
+    OccupancyEngine,
+    resource_key,
+)
+
+SUBJECTS = ["Matematika", "Fizika", "Informatika", "Ingliz tili", "Tarix", "Iqtisodiyot"]
+
+
+def random_booking(rng: random.Random, groups: int, rooms: int, teachers: int, booking_id=None) -> Booking:
+    start, end = LESSON_SLOTS[rng.randint(1, TEACHING_LESSONS)]
+    return Booking(
+        id=booking_id,
+        group_id=rng.randrange(groups) + 1,
+        subject=rng.choice(SUBJECTS),
+        schedule_type=rng.choice(["lecture", "practice", "lab"]),
+        day=rng.choice(TEACHING_DAYS),
+        start_time=start,
+        end_time=end,
+        week_type=rng.choice([WeekType.ALL, WeekType.ALL, WeekType.ODD, WeekType.EVEN]),
+        room=f"{rng.randrange(rooms) + 100}",
+        teacher_name=f"Teacher {rng.randrange(teachers)}",
+    )
+
+
+def timetable(rng: random.Random, groups: int, rooms: int, teachers: int, per_group: int):
+    """Bookings with no group clashes (rooms and teachers may clash)."""
+    taken = set()
+    bookings = []
+    while len(bookings) < groups * per_group:
+        b = random_booking(rng, groups, rooms, teachers, booking_id=len(bookings) + 1)
+        key = (b.group_id, b.day, b.start_time)
+        if key not in taken:
+            taken.add(key)
+            bookings.append(b)
+    return bookings
+
+
+def legacy_conflicts(by_group_day, batch):
+    """The old OR query in Python: overlapping lessons of the group that day."""
+    found = 0
+    for b in batch:
+        for other in by_group_day.get((b.group_id, b.day), ()):
+            if (
+                (other.start_time <= b.start_time < other.end_time)
+                or (other.start_time < b.end_time <= other.end_time)
+                or (b.start_time <= other.start_time and b.end_time >= other.end_time)
+            ):
+                found += 1
+                break
+    return found
+
+
+def legacy_rooms(bookings, room_names):
+    occupancy = defaultdict(list)
+    for b in bookings:
+        occupancy[resource_key(b.room)].append(b)
+    return {name: round(len(occupancy.get(resource_key(name), [])) / 36 * 100, 1) for name in room_names}
+
+
+def legacy_free_rooms(bookings, room_names):
+    free = {}
+    for day in TEACHING_DAYS:
+        for lesson in range(1, TEACHING_LESSONS + 1):
+            start = LESSON_SLOTS[lesson][0]
+            busy = {resource_key(b.room) for b in bookings if b.day == day and b.start_time == start}
+            free[(day, lesson)] = [name for name in room_names if resource_key(name) not in busy]
+    return free
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main(groups: int, rooms: int, teachers: int, per_group: int, batch_size: int, seed: int):
+    rng = random.Random(seed)
+    bookings = timetable(rng, groups, rooms, teachers, per_group)
+    room_names = [f"{100 + i}" for i in range(rooms)]
+    batch = [random_booking(rng, groups, rooms, teachers) for _ in range(batch_size)]
+    print(f"{len(bookings)} lessons, {groups} groups, {rooms} rooms, {teachers} teachers; "
+          f"batch of {batch_size}\n")
+
+    def build():
+        engine = OccupancyEngine()
+        engine.set_rooms(room_names)
+        for b in bookings:
+            engine.add(b)
+        return engine
+
+    engine, elapsed = timed(build)
+    print(f"  build engine                     {elapsed:>9.1f} ms")
+
+    by_group_day = defaultdict(list)
+    for b in bookings:
+        by_group_day[(b.group_id, b.day)].append(b)
+
+    print("\nBatch conflicts")
+    found, elapsed = timed(legacy_conflicts, by_group_day, batch)
+    print(f"  before: overlap scan (group)     {elapsed:>9.1f} ms  {found} conflicting items")
+    conflicts, elapsed = timed(engine.conflicts, batch)
+    print(f"  after:  bitsets (group/room/teacher) {elapsed:>5.1f} ms  "
+          f"{len({c.index for c in conflicts})} conflicting items, "
+          f"{sum(c.kind == 'group' for c in conflicts)} by group")
+
+    print("\nRooms")
+    _, elapsed = timed(legacy_rooms, bookings, room_names)
+    print(f"  before: occupancy lists          {elapsed:>9.1f} ms")
+    _, elapsed = timed(lambda: {n: engine.occupancy_rate(("room", resource_key(n))) for n in room_names})
+    print(f"  after:  occupancy rates          {elapsed:>9.1f} ms")
+    _, elapsed = timed(legacy_free_rooms, bookings, room_names)
+    print(f"  before: free rooms, every slot   {elapsed:>9.1f} ms")
+    _, elapsed = timed(lambda: {
+        (day, lesson): engine.free_rooms(day, lesson)
+        for day in TEACHING_DAYS for lesson in range(1, TEACHING_LESSONS + 1)
+    })
+    print(f"  after:  free rooms, every slot   {elapsed:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule occupancy benchmark")
+    parser.add_argument("--groups", type=int, default=400)
+    parser.add_argument("--rooms", type=int, default=150)
+    parser.add_argument("--teachers", type=int, default=300)
+    parser.add_argument("--per-group", type=int, default=18, help="weekly lessons per group")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.groups, args.rooms, args.teachers, args.per_group, args.batch, args.seed)
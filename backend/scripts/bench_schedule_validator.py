@@ -0,0 +1,178 @@
+"""
+UniControl - Schedule Batch Validation Benchmark
+================================================
+Fills a scratch database with a weekly timetable for bench groups and
+validates a semester upload against it:
+
+1. before: the previous per-item check, one overlap query per entry
+   (same group and day, OR of three time comparisons); batch entries are
+   not checked against each other
+2. after: ScheduleValidator, one query for the related lessons and
+   interval trees per (group/room/teacher, day, week parity)
+
+Needs PostgreSQL: point DATABASE_URL at a scratch database. Bench groups
+(name BENCH-V-*) and their schedules are deleted at the end.
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://user@localhost/scratch \\
+        python -m scripts.bench_schedule_validator
+    python -m scripts.bench_schedule_validator --groups 300 --batch 500
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import and_, delete, insert, or_, select
+
+from app.database import Base, async_session_maker, engine
+from app.models.group import Group
+from app.models.schedule import Schedule, ScheduleType, WeekType
+from app.services.schedule_occupancy import LESSON_SLOTS, TEACHING_DAYS, TEACHING_LESSONS, Booking
+from app.services.schedule_validator import ScheduleValidator
+
+NAME_PREFIX = "BENCH-V-"
+SUBJECTS = ["Matematika", "Fizika", "Informatika", "Ingliz tili", "Tarix", "Iqtisodiyot"]
+
+
+def random_lesson(rng: random.Random, group_ids: list, rooms: int, teachers: int) -> dict:
+    lesson = rng.randint(1, TEACHING_LESSONS)
+    start, end = LESSON_SLOTS[lesson]
+    return {
+        "group_id": rng.choice(group_ids),
+        "subject": rng.choice(SUBJECTS),
+        "schedule_type": rng.choice(list(ScheduleType)[:3]),
+        "day_of_week": rng.choice(TEACHING_DAYS),
+        "start_time": start,
+        "end_time": end,
+        "lesson_number": lesson,
+        "week_type": rng.choice([WeekType.ALL, WeekType.ALL, WeekType.ODD, WeekType.EVEN]),
+        "room": f"B-{rng.randrange(rooms)}",
+        "teacher_name": f"Bench Teacher {rng.randrange(teachers)}",
+        "is_active": True,
+    }
+
+
+async def setup(rng: random.Random, groups: int, rooms: int, teachers: int, per_group: int) -> list:
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(Group),
+            [{"name": f"{NAME_PREFIX}{i}", "faculty": "Bench", "course_year": 1} for i in range(groups)],
+        )
+        group_ids = list((await session.execute(
+            select(Group.id).where(Group.name.like(f"{NAME_PREFIX}%"))
+        )).scalars().all())
+        taken, rows = set(), []
+        while len(rows) < groups * per_group:
+            row = random_lesson(rng, group_ids, rooms, teachers)
+            key = (row["group_id"], row["day_of_week"], row["lesson_number"])
+            if key not in taken:
+                taken.add(key)
+                rows.append(row)
+        await session.execute(insert(Schedule), rows)
+        await session.commit()
+        return group_ids
+
+
+async def check_before(batch: list) -> int:
+    """The previous _check_time_conflict, once per entry."""
+    found = 0
+    async with async_session_maker() as session:
+        for item in batch:
+            result = await session.execute(
+                select(Schedule).where(
+                    and_(
+                        Schedule.group_id == item["group_id"],
+                        Schedule.day_of_week == item["day_of_week"],
+                        Schedule.is_active == True,
+                        or_(
+                            and_(Schedule.start_time <= item["start_time"], Schedule.end_time > item["start_time"]),
+                            and_(Schedule.start_time < item["end_time"], Schedule.end_time >= item["end_time"]),
+                            and_(Schedule.start_time >= item["start_time"], Schedule.end_time <= item["end_time"]),
+                        ),
+                    )
+                ).limit(1)
+            )
+            if result.scalar_one_or_none() is not None:
+                found += 1
+    return found
+
+
+async def check_after(batch: list) -> list:
+    bookings = [
+        Booking(
+            group_id=item["group_id"],
+            subject=item["subject"],
+            schedule_type=item["schedule_type"].value,
+            day=item["day_of_week"],
+            start_time=item["start_time"],
+            end_time=item["end_time"],
+            lesson_number=item["lesson_number"],
+            week_type=item["week_type"],
+            room=item["room"],
+            teacher_name=item["teacher_name"],
+        )
+        for item in batch
+    ]
+    async with async_session_maker() as session:
+        return await ScheduleValidator(session).validate(bookings)
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def cleanup() -> None:
+    async with async_session_maker() as session:
+        groups = select(Group.id).where(Group.name.like(f"{NAME_PREFIX}%"))
+        await session.execute(delete(Schedule).where(Schedule.group_id.in_(groups)))
+        await session.execute(delete(Group).where(Group.name.like(f"{NAME_PREFIX}%")))
+        await session.commit()
+
+
+async def main(groups: int, rooms: int, teachers: int, per_group: int, batch_size: int, seed: int):
+    if engine.dialect.name != "postgresql":
+        sys.exit("Set DATABASE_URL to a PostgreSQL scratch database")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(seed)
+    try:
+        group_ids = await setup(rng, groups, rooms, teachers, per_group)
+        batch = [random_lesson(rng, group_ids, rooms, teachers) for _ in range(batch_size)]
+        print(f"{groups * per_group} lessons in {groups} groups; upload of {batch_size} entries\n")
+
+        found, elapsed = await timed(check_before(batch))
+        print(f"  before: query per entry (group)  {elapsed:>9.1f} ms  {found} conflicting entries")
+        conflicts, elapsed = await timed(check_after(batch))
+        print(f"  after:  one query + trees        {elapsed:>9.1f} ms  "
+              f"{len({c.index for c in conflicts})} conflicting entries, {len(conflicts)} conflicts")
+        for kind in ("group", "room", "teacher"):
+            in_batch = sum(c.kind == kind and c.other.id < 0 for c in conflicts)
+            print(f"    {kind:<8} {sum(c.kind == kind for c in conflicts):>6}  ({in_batch} within the upload)")
+    finally:
+        await cleanup()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule batch validation benchmark")
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=120)
+    parser.add_argument("--teachers", type=int, default=250)
+    parser.add_argument("--per-group", type=int, default=18, help="weekly lessons per group")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.groups, args.rooms, args.teachers, args.per_group, args.batch, args.seed))
@@ -0,0 +1,88 @@
+"""
+UniControl - Attendance Duplicates Cleanup
+==========================================
+Cleanup before the uq_attendance_student_date_lesson constraint (one
+attendance per student, date and lesson) can be added: lists the records
+that share a student, date and lesson with a later updated one, which are
+the ones removed. The app refuses to start while they exist.
+
+Without --apply nothing is changed. With it, the listed records are
+deleted, the constraint is added and the attendance rollup is rebuilt for
+the affected dates, in one transaction. docker-entrypoint.sh and run.sh
+run it with --apply before the server starts; once the constraint is in
+place it does nothing.
+
+Usage:
+    python -m scripts.dedupe_attendance
+    python -m scripts.dedupe_attendance --apply
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import sqlalchemy as sa
+
+from app.database import (
+    ATTENDANCE_DUPLICATES_SQL,
+    ATTENDANCE_UNIQUE_CONSTRAINT_SQL,
+    async_session_maker,
+)
+from app.services.attendance_rollup_service import AttendanceRollupService
+
+
+async def main(apply: bool, limit: int):
+    async with async_session_maker() as session:
+        if not await session.scalar(sa.text("SELECT to_regclass('attendances') IS NOT NULL")):
+            print("✅ No attendance table yet, nothing to do")
+            return
+        exists = await session.scalar(sa.text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_attendance_student_date_lesson'"
+        ))
+        if exists:
+            print("✅ Constraint already in place, nothing to do")
+            return
+
+        rows = (await session.execute(sa.text(ATTENDANCE_DUPLICATES_SQL))).all()
+        print(f"{len(rows)} duplicate attendance records (the latest updated of each set is kept)\n")
+        print(f"  {'id':>10} {'student':>8} {'date':<10} {'lesson':>6} {'status':<8} {'kept id':>10}")
+        for row in rows[:limit]:
+            print(f"  {row.id:>10} {row.student_id:>8} {row.date.isoformat():<10} "
+                  f"{row.lesson_number if row.lesson_number is not None else '-':>6} "
+                  f"{row.status:<8} {row.kept_id:>10}")
+        if len(rows) > limit:
+            print(f"  ... and {len(rows) - limit} more")
+
+        if not apply:
+            print("\nDry run: run again with --apply to delete them and add the constraint")
+            return
+
+        if rows:
+            await session.execute(
+                sa.text("DELETE FROM attendances WHERE id = ANY(:ids)"),
+                {"ids": [row.id for row in rows]},
+            )
+        await session.execute(sa.text(ATTENDANCE_UNIQUE_CONSTRAINT_SQL))
+        rollup_exists = await session.scalar(sa.text(
+            "SELECT to_regclass('attendance_daily_stats') IS NOT NULL"
+        ))
+        if rows and rollup_exists:
+            # Commits the whole cleanup (a missing rollup is built by init_db)
+            await AttendanceRollupService(session).rebuild(
+                min(row.date for row in rows), max(row.date for row in rows)
+            )
+        else:
+            await session.commit()
+    print(f"\n✅ {len(rows)} records deleted, constraint added")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicate attendance records")
+    parser.add_argument("--apply", action="store_true", help="delete them and add the constraint")
+    parser.add_argument("--limit", type=int, default=200, help="records listed")
+    args = parser.parse_args()
+    asyncio.run(main(args.apply, args.limit))
@@ -0,0 +1,36 @@
+"""
+UniControl - Attendance Rollup Rebuild
+======================================
+Recomputes the attendance_daily_stats rollup and its distinct-student counts
+(attendance_daily_students) from the attendances table.
+
+Usage:
+    python -m scripts.rebuild_attendance_rollup
+    python -m scripts.rebuild_attendance_rollup --from 2026-02-01 --to 2026-02-28
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import async_session_maker
+from app.services.attendance_rollup_service import AttendanceRollupService
+
+
+async def main(date_from: date | None, date_to: date | None):
+    async with async_session_maker() as session:
+        rows = await AttendanceRollupService(session).rebuild(date_from, date_to)
+    print(f"✅ Attendance rollup rebuilt: {rows} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild attendance_daily_stats")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.date_from, args.date_to))
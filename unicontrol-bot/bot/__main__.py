@@ -20,6 +20,7 @@ from bot.middlewares import (
 )
 from bot.scheduler import AttendanceNotifier
 from bot.scheduler import BirthdayNotifier
+from bot.services import resume_broadcasts
 
 # Configure logging
 logging.basicConfig(
@@ -126,6 +127,11 @@ async def main():
     await birthday_notifier.start()
     logger.info("Birthday notifier started")
     
+    # Resume broadcasts interrupted by the last shutdown
+    resumed = await resume_broadcasts(bot)
+    if resumed:
+        logger.info(f"Resumed {len(resumed)} broadcast(s)")
+    
     # Get bot info
     bot_info = await bot.get_me()
     logger.info(f"Bot started: @{bot_info.username}")
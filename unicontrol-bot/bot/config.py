@@ -4,6 +4,7 @@ from typing import Optional, List
 from datetime import datetime
 import pytz
 import json
+import socket
 
 # Timezone helpers
 TIMEZONE_NAME = "Asia/Tashkent"
@@ -39,6 +40,20 @@ class Settings(BaseSettings):
     # Scheduler settings
     attendance_check_interval: int = Field(default=300)  # 5 minutes
     
+    # Attendance events pushed by the backend (Redis Stream).
+    # Must point at the backend's Redis database; empty = poll the API instead.
+    events_redis_url: str = Field(default="", env="EVENTS_REDIS_URL")
+    events_stream: str = Field(default="attendance:events", env="EVENTS_STREAM")
+    events_group: str = Field(default="unicontrol-bot", env="EVENTS_GROUP")
+    events_consumer: str = Field(default_factory=socket.gethostname, env="EVENTS_CONSUMER")
+    events_batch_size: int = Field(default=200)
+    events_retry_seconds: int = Field(default=30)  # idle time before a failed entry is retried
+    events_max_deliveries: int = Field(default=10)  # then it is logged and dropped
+    
+    # Broadcasts (Telegram allows ~30 msg/s per bot)
+    broadcast_rate: float = Field(default=25.0)  # messages per second
+    broadcast_workers: int = Field(default=20)  # concurrent sends
+    
     # Rate limiting
     rate_limit: int = Field(default=1)  # requests per second
     rate_limit_period: int = Field(default=1)  # seconds
@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
@@ -21,10 +22,36 @@ async_session = async_sessionmaker(
 Base = declarative_base()
 
 
+# Columns added after their table was first created: (table, column, DDL type)
+ADDED_COLUMNS = [
+    ("broadcasts", "last_user_id", "INTEGER DEFAULT 0"),
+    ("broadcasts", "done_user_ids", "TEXT"),
+]
+
+
+# Index changes on existing tables, run in order
+INDEX_CHANGES = [
+    # One row per notified status now, not per record
+    "DROP INDEX IF EXISTS ix_sent_notification_unique",
+    "CREATE INDEX IF NOT EXISTS ix_sent_notification_attendance ON sent_notifications (chat_id, attendance_id)",
+]
+
+
+def _add_missing_columns(sync_conn):
+    inspector = inspect(sync_conn)
+    for table, column, ddl in ADDED_COLUMNS:
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing:
+            sync_conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    for ddl in INDEX_CHANGES:
+        sync_conn.execute(text(ddl))
+
+
 async def init_db():
     """Initialize database and create tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
 
 
 async def get_session() -> AsyncSession:
@@ -71,6 +71,8 @@ class UserRegistration(Base):
 class SentNotification(Base):
     """
     Tracks sent notifications to prevent duplicates.
+    One row per notified status of a record: a status change is
+    notified again, a repeat of the last notified status is not.
     """
     __tablename__ = "sent_notifications"
     
@@ -89,7 +91,7 @@ class SentNotification(Base):
     message_id = Column(Integer, nullable=True)  # Telegram message ID
     
     __table_args__ = (
-        Index("ix_sent_notification_unique", "chat_id", "attendance_id", unique=True),
+        Index("ix_sent_notification_attendance", "chat_id", "attendance_id"),
     )
 
 
@@ -226,6 +228,11 @@ class Broadcast(Base):
     failed_count = Column(Integer, default=0)
     blocked_count = Column(Integer, default=0)
     
+    # Resume checkpoint: every recipient with BotUser.id <= this is done,
+    # plus the comma-separated ids above it that finished out of order
+    last_user_id = Column(Integer, default=0)
+    done_user_ids = Column(Text, nullable=True)
+    
     # Metadata
     created_by = Column(BigInteger, nullable=False)
     created_at = Column(DateTime, default=now_tashkent)
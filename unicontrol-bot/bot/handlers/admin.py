@@ -37,6 +37,7 @@ from bot.keyboards.admin import (
     get_broadcast_progress_keyboard,
     get_admin_logs_keyboard
 )
+from bot.services import send_broadcast, cancel_broadcast
 
 router = Router(name="admin")
 logger = logging.getLogger(__name__)
@@ -388,118 +389,6 @@ async def callback_broadcast_confirm(callback: CallbackQuery, bot: Bot):
     )
 
 
-async def send_broadcast(bot: Bot, broadcast_id: int, status_message: Message):
-    """Send broadcast to all users"""
-    async with async_session() as session:
-        # Get broadcast
-        result = await session.execute(
-            select(Broadcast).where(Broadcast.id == broadcast_id)
-        )
-        broadcast = result.scalar_one_or_none()
-        
-        if not broadcast:
-            return
-        
-        # Get all active users
-        result = await session.execute(
-            select(BotUser.telegram_id).where(
-                BotUser.is_blocked == False,
-                BotUser.is_banned == False
-            )
-        )
-        user_ids = [row[0] for row in result.fetchall()]
-    
-    sent = 0
-    failed = 0
-    blocked = 0
-    
-    for i, user_id in enumerate(user_ids):
-        # Check if cancelled
-        async with async_session() as session:
-            result = await session.execute(
-                select(Broadcast.status).where(Broadcast.id == broadcast_id)
-            )
-            status = result.scalar_one_or_none()
-            if status == "cancelled":
-                break
-        
-        try:
-            if broadcast.message_type == "text":
-                await bot.send_message(user_id, broadcast.message_text)
-            elif broadcast.message_type == "photo":
-                await bot.send_photo(user_id, broadcast.media_file_id, caption=broadcast.message_text)
-            elif broadcast.message_type == "video":
-                await bot.send_video(user_id, broadcast.media_file_id, caption=broadcast.message_text)
-            elif broadcast.message_type == "document":
-                await bot.send_document(user_id, broadcast.media_file_id, caption=broadcast.message_text)
-            sent += 1
-        except Exception as e:
-            if "blocked" in str(e).lower():
-                blocked += 1
-                # Mark user as blocked
-                async with async_session() as session:
-                    await session.execute(
-                        update(BotUser).where(BotUser.telegram_id == user_id).values(is_blocked=True)
-                    )
-                    await session.commit()
-            else:
-                failed += 1
-        
-        # Update progress every 50 users
-        if (i + 1) % 50 == 0:
-            async with async_session() as session:
-                await session.execute(
-                    update(Broadcast).where(Broadcast.id == broadcast_id).values(
-                        sent_count=sent,
-                        failed_count=failed,
-                        blocked_count=blocked
-                    )
-                )
-                await session.commit()
-            
-            try:
-                await status_message.edit_text(
-                    f"📢 <b>E'lon yuborilmoqda...</b>\n\n"
-                    f"📊 <b>Jarayon:</b> {i+1}/{len(user_ids)}\n"
-                    f"✅ Yuborildi: {sent}\n"
-                    f"❌ Xato: {failed}\n"
-                    f"🚫 Bloklangan: {blocked}",
-                    parse_mode="HTML",
-                    reply_markup=get_broadcast_progress_keyboard(broadcast_id)
-                )
-            except:
-                pass
-        
-        # Rate limit
-        await asyncio.sleep(0.05)
-    
-    # Final update
-    async with async_session() as session:
-        await session.execute(
-            update(Broadcast).where(Broadcast.id == broadcast_id).values(
-                status="completed",
-                sent_count=sent,
-                failed_count=failed,
-                blocked_count=blocked,
-                completed_at=now_tashkent()
-            )
-        )
-        await session.commit()
-    
-    try:
-        await status_message.edit_text(
-            f"✅ <b>E'lon yuborildi!</b>\n\n"
-            f"📊 <b>Natija:</b>\n"
-            f"✅ Yuborildi: {sent}\n"
-            f"❌ Xato: {failed}\n"
-            f"🚫 Bloklangan: {blocked}\n"
-            f"👥 Jami: {len(user_ids)}",
-            parse_mode="HTML"
-        )
-    except:
-        pass
-
-
 @router.callback_query(F.data.startswith("admin:broadcast:stop:"))
 async def callback_broadcast_stop(callback: CallbackQuery):
     """Stop ongoing broadcast"""
@@ -516,6 +405,7 @@ async def callback_broadcast_stop(callback: CallbackQuery):
             )
         )
         await session.commit()
+    cancel_broadcast(broadcast_id)
     
     await callback.answer("E'lon to'xtatildi", show_alert=True)
 
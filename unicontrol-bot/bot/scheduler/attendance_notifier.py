@@ -1,22 +1,47 @@
 import asyncio
+import json
 import logging
+import time
 from datetime import datetime, timedelta
 from bot.config import now_tashkent
-from typing import Dict, List, Optional
-from sqlalchemy import select
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, or_
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import Message
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
 
 from bot.config import settings
 from bot.database import async_session, Subscription, SentNotification
 from bot.services import UniControlAPI, AttendanceFormatter
+from bot.services.broadcaster import get_bucket
 
 logger = logging.getLogger(__name__)
 
+# Telegram rejects messages longer than 4096 characters
+MESSAGE_LIMIT = 4000
+# Tries per message while Telegram answers RetryAfter
+SEND_ATTEMPTS = 3
+
 
 class AttendanceNotifier:
     """
-    Background service that checks for attendance updates
-    and sends notifications to subscribed Telegram chats.
+    Background service that delivers attendance updates
+    to subscribed Telegram chats.
+    
+    With EVENTS_REDIS_URL set, it consumes the backend's attendance event
+    stream through a consumer group: each read is grouped per chat and
+    sent as one message per chat. An entry is acknowledged once every chat
+    it concerns got it (or can never get it: bot blocked, chat gone).
+    Entries whose send failed stay pending and are claimed again after
+    events_retry_seconds (XAUTOCLAIM, which also takes over those of a
+    consumer that went away), up to events_max_deliveries times. Otherwise
+    it polls the API for every subscribed group every
+    attendance_check_interval.
+    
+    Sends go through the broadcaster's bot-wide token bucket; a RetryAfter
+    pauses it for the time Telegram asks and the message is sent again.
     """
     
     def __init__(self, bot: Bot):
@@ -25,6 +50,7 @@ class AttendanceNotifier:
         self.running = False
         self._task: Optional[asyncio.Task] = None
         self.last_check: Dict[int, datetime] = {}  # group_id -> last check time
+        self.redis: Optional[aioredis.Redis] = None
     
     async def start(self):
         """Start the notifier background task"""
@@ -32,8 +58,12 @@ class AttendanceNotifier:
             return
         
         self.running = True
-        self._task = asyncio.create_task(self._run_loop())
-        logger.info("Attendance notifier started")
+        if settings.events_redis_url:
+            self._task = asyncio.create_task(self._run_stream())
+            logger.info("Attendance notifier started (event stream)")
+        else:
+            self._task = asyncio.create_task(self._run_loop())
+            logger.info("Attendance notifier started (polling)")
     
     async def stop(self):
         """Stop the notifier"""
@@ -49,6 +79,9 @@ class AttendanceNotifier:
             await self.api.close()
         except Exception:
             pass
+        if self.redis:
+            await self.redis.aclose()
+            self.redis = None
         logger.info("Attendance notifier stopped")
     
     async def _run_loop(self):
@@ -62,6 +95,249 @@ class AttendanceNotifier:
             # Wait before next check
             await asyncio.sleep(settings.attendance_check_interval)
     
+    # ==================== Event stream ====================
+    
+    async def _ensure_group(self):
+        """Create the consumer group; new groups start at the stream's end"""
+        try:
+            await self.redis.xgroup_create(
+                settings.events_stream, settings.events_group, id="$", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def _run_stream(self):
+        """Consume attendance events pushed by the backend"""
+        self.redis = aioredis.from_url(settings.events_redis_url, decode_responses=True)
+        stream, group, consumer = (
+            settings.events_stream, settings.events_group, settings.events_consumer
+        )
+        group_ready = False
+        # After a (re)start, first go through entries read but not acked
+        # before; failed ones stay pending for the retry pass
+        backlog_from: Optional[str] = "0"
+        last_retry = time.monotonic()
+        
+        while self.running:
+            try:
+                if not group_ready:
+                    await self._ensure_group()
+                    group_ready = True
+                
+                if time.monotonic() - last_retry >= settings.events_retry_seconds:
+                    last_retry = time.monotonic()
+                    await self._retry_pending()
+                
+                entries = await self.redis.xreadgroup(
+                    group, consumer,
+                    {stream: backlog_from or ">"},
+                    count=settings.events_batch_size,
+                    block=None if backlog_from else 5000
+                )
+                messages = entries[0][1] if entries else []
+                if not messages:
+                    backlog_from = None
+                    continue
+                if backlog_from:
+                    backlog_from = messages[-1][0]
+                
+                done = await self._deliver_events(messages)
+                if done:
+                    await self.redis.xack(stream, group, *done)
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in attendance stream loop: {e}")
+                group_ready = False
+                backlog_from = "0"  # retry what was read but not acked
+                await asyncio.sleep(5)
+    
+    async def _retry_pending(self):
+        """Claim entries pending longer than events_retry_seconds and deliver them again"""
+        stream, group, consumer = (
+            settings.events_stream, settings.events_group, settings.events_consumer
+        )
+        start = "0-0"
+        while True:
+            response = await self.redis.xautoclaim(
+                stream, group, consumer,
+                min_idle_time=settings.events_retry_seconds * 1000,
+                start_id=start,
+                count=settings.events_batch_size
+            )
+            start, messages = response[0], [m for m in response[1] if m[0] is not None]
+            if messages:
+                pending = await self.redis.xpending_range(
+                    stream, group, min=messages[0][0], max=messages[-1][0],
+                    count=len(messages), consumername=consumer
+                )
+                deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+                expired = [
+                    message_id for message_id, _ in messages
+                    if deliveries.get(message_id, 0) > settings.events_max_deliveries
+                ]
+                if expired:
+                    logger.error(
+                        f"Dropping {len(expired)} attendance event(s) after "
+                        f"{settings.events_max_deliveries} failed deliveries"
+                    )
+                live = [m for m in messages if m[0] not in expired]
+                done = expired + (await self._deliver_events(live) if live else [])
+                if done:
+                    await self.redis.xack(stream, group, *done)
+            if start in ("0-0", b"0-0"):
+                return
+    
+    async def _deliver_events(self, messages: List[Tuple[str, Dict]]) -> List[str]:
+        """
+        Send one read of stream entries, one message per chat. Returns the
+        IDs of the entries that are done; those of a chat whose send failed
+        are left out, to be retried.
+        """
+        done: List[str] = []
+        events: List[Tuple[str, Dict]] = []
+        for message_id, fields in messages:
+            try:
+                events.append((message_id, json.loads(fields["data"])))
+            except (TypeError, KeyError, ValueError):
+                done.append(message_id)  # trimmed or malformed entry
+        if not events:
+            return done
+        
+        by_group: Dict[int, List[Tuple[str, Dict]]] = {}
+        group_ids: Dict[str, int] = {}
+        for message_id, event in events:
+            by_group.setdefault(event["group_id"], []).append((message_id, event))
+            group_ids[event["group_code"]] = event["group_id"]
+        
+        async with async_session() as session:
+            result = await session.execute(
+                select(Subscription).where(
+                    Subscription.is_active == True,
+                    or_(
+                        Subscription.group_id.in_(list(by_group)),
+                        Subscription.group_code.in_(list(group_ids))
+                    )
+                )
+            )
+            subscriptions = result.scalars().all()
+        
+        # chat_id -> (subscription, {attendance_id: latest event})
+        per_chat: Dict[int, Tuple[Subscription, Dict[int, Dict]]] = {}
+        # entry ID -> chats it is sent to
+        entry_chats: Dict[str, Set[int]] = {}
+        for sub in subscriptions:
+            group_id = sub.group_id if sub.group_id in by_group else group_ids.get(sub.group_code)
+            for message_id, event in by_group.get(group_id, []):
+                if self._should_notify(sub, event.get("status", "")):
+                    per_chat.setdefault(sub.chat_id, (sub, {}))[1][event["id"]] = event
+                    entry_chats.setdefault(message_id, set()).add(sub.chat_id)
+        
+        failed: Set[int] = set()
+        if per_chat:
+            # Created and status-changed records: skip those whose current
+            # status was already notified (replayed entries)
+            sent_before = await self._last_sent_statuses(
+                list(per_chat), {att_id for _, updates in per_chat.values() for att_id in updates}
+            )
+            
+            sent: List[Tuple[int, Dict, int]] = []
+            for chat_id, (sub, updates) in per_chat.items():
+                pending = [
+                    e for att_id, e in updates.items()
+                    if (chat_id, att_id) not in sent_before or sent_before[(chat_id, att_id)] != e.get("status")
+                ]
+                if not pending:
+                    continue
+                try:
+                    await self._send_updates(chat_id, sub.group_code, pending, sent)
+                except (TelegramForbiddenError, TelegramBadRequest) as e:
+                    # Sending again will not help: blocked, kicked or chat gone
+                    logger.warning(f"Dropping attendance updates for {chat_id}: {e}")
+                    continue
+                except Exception as e:
+                    logger.error(f"Error sending to {chat_id}, will retry: {e}")
+                    failed.add(chat_id)
+                    continue
+                logger.info(f"Sent {len(pending)} attendance update(s) to {chat_id}")
+            
+            if sent:
+                async with async_session() as session:
+                    session.add_all([
+                        SentNotification(
+                            chat_id=chat_id,
+                            attendance_id=e["id"],
+                            student_name=e.get("student_name"),
+                            status=e.get("status"),
+                            message_id=message_id
+                        )
+                        for chat_id, e, message_id in sent
+                    ])
+                    await session.commit()
+        
+        done.extend(
+            message_id for message_id, _ in events
+            if not entry_chats.get(message_id, set()) & failed
+        )
+        return done
+    
+    async def _last_sent_statuses(self, chat_ids: List[int], attendance_ids) -> Dict[Tuple[int, int], str]:
+        """(chat_id, attendance_id) -> last notified status, in one query"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(
+                    SentNotification.chat_id, SentNotification.attendance_id, SentNotification.status
+                ).where(
+                    SentNotification.chat_id.in_(chat_ids),
+                    SentNotification.attendance_id.in_(list(attendance_ids))
+                ).order_by(SentNotification.id)
+            )
+            return {(chat_id, att_id): status for chat_id, att_id, status in result.all()}
+    
+    async def _send_updates(
+        self,
+        chat_id: int,
+        group_code: str,
+        updates: List[Dict],
+        sent: List[Tuple[int, Dict, int]]
+    ):
+        """
+        Send updates as few messages as fit the length limit. Each update
+        is added to `sent` with its message ID as soon as its message is
+        sent, so a failure part way through keeps the ones already sent.
+        """
+        chunks: List[List[Dict]] = [[]]
+        length = 0
+        for update in updates:
+            size = len(AttendanceFormatter.format_single_attendance(update)) + 2
+            if chunks[-1] and length + size > MESSAGE_LIMIT - 100:
+                chunks.append([])
+                length = 0
+            chunks[-1].append(update)
+            length += size
+        
+        for chunk in chunks:
+            sent_message = await self._send_message(
+                chat_id, AttendanceFormatter.format_attendance_updates(chunk, group_code)
+            )
+            sent.extend((chat_id, update, sent_message.message_id) for update in chunk)
+    
+    async def _send_message(self, chat_id: int, text: str) -> Message:
+        """Send through the bot-wide limiter, waiting out Telegram's flood control"""
+        bucket = get_bucket()
+        for attempt in range(SEND_ATTEMPTS):
+            await bucket.acquire()
+            try:
+                return await self.bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+            except TelegramRetryAfter as e:
+                if attempt == SEND_ATTEMPTS - 1:
+                    raise
+                bucket.pause(e.retry_after)
+    
+    # ==================== Polling ====================
+    
     async def _check_all_subscriptions(self):
         """Check all active subscriptions for updates"""
         # Get all active subscriptions grouped by academic group
@@ -126,8 +402,8 @@ class AttendanceNotifier:
                 if not self._should_notify(sub, status):
                     continue
                 
-                # Check if already sent
-                if await self._is_already_sent(sub.chat_id, attendance_id):
+                # Check if this status was already sent
+                if await self._last_sent_status(sub.chat_id, attendance_id) == status:
                     continue
                 
                 # Format and send message
@@ -136,11 +412,7 @@ class AttendanceNotifier:
                     sub.group_code
                 )
                 
-                sent_message = await self.bot.send_message(
-                    chat_id=sub.chat_id,
-                    text=message_text,
-                    parse_mode="HTML"
-                )
+                sent_message = await self._send_message(sub.chat_id, message_text)
                 
                 # Record sent notification
                 await self._record_sent(
@@ -168,16 +440,16 @@ class AttendanceNotifier:
             return False
         return True
     
-    async def _is_already_sent(self, chat_id: int, attendance_id: int) -> bool:
-        """Check if notification was already sent"""
+    async def _last_sent_status(self, chat_id: int, attendance_id: int) -> Optional[str]:
+        """Status of the last notification sent for the record, if any"""
         async with async_session() as session:
             result = await session.execute(
-                select(SentNotification).where(
+                select(SentNotification.status).where(
                     SentNotification.chat_id == chat_id,
                     SentNotification.attendance_id == attendance_id
-                )
+                ).order_by(SentNotification.id.desc()).limit(1)
             )
-            return result.scalar_one_or_none() is not None
+            return result.scalar_one_or_none()
     
     async def _record_sent(
         self,
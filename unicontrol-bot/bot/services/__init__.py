@@ -2,5 +2,13 @@
 
 from .api_client import UniControlAPI
 from .attendance_formatter import AttendanceFormatter
+from .broadcaster import BroadcastEngine, send_broadcast, cancel_broadcast, resume_broadcasts
 
-__all__ = ["UniControlAPI", "AttendanceFormatter"]
+__all__ = [
+    "UniControlAPI",
+    "AttendanceFormatter",
+    "BroadcastEngine",
+    "send_broadcast",
+    "cancel_broadcast",
+    "resume_broadcasts",
+]
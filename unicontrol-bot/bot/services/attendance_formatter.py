@@ -109,6 +109,34 @@ class AttendanceFormatter:
         
         return header + body + footer
     
+    @classmethod
+    def format_attendance_updates(
+        cls,
+        attendances: List[Dict[str, Any]],
+        group_code: str
+    ) -> str:
+        """
+        Format several attendance updates of one group as one message.
+        
+        Args:
+            attendances: Attendance records
+            group_code: Academic group code
+            
+        Returns:
+            Formatted notification message
+        """
+        if len(attendances) == 1:
+            return cls.format_attendance_update(attendances[0], group_code)
+        
+        header = f"📋 <b>Davomat yangilandi - {group_code}</b> ({len(attendances)})\n"
+        header += "━" * 20 + "\n\n"
+        
+        body = "\n\n".join(cls.format_single_attendance(a) for a in attendances)
+        
+        footer = "\n\n" + "━" * 20
+        
+        return header + body + footer
+    
     @classmethod
     def format_group_attendance(
         cls,
@@ -0,0 +1,343 @@
+"""
+Broadcast Engine
+================
+Sends an admin broadcast to all bot users as fast as Telegram allows.
+
+- One token bucket, shared by all broadcasts, keeps the bot under the
+  global limit (settings.broadcast_rate, ~30 msg/s allowed). A
+  RetryAfter from Telegram pauses the whole bucket. A run sends each
+  recipient one message, so the 1 msg/s per-chat limit holds by
+  construction.
+- A pool of workers sends concurrently, so slow API calls overlap
+  instead of adding up.
+- Cancellation is an in-memory flag. The stop button sets it directly,
+  and the checkpoint re-reads the status from the database.
+- Every checkpoint writes the counters, marks newly blocked users in one
+  UPDATE and advances last_user_id, the highest BotUser.id below which
+  every recipient is done. Recipients above it that finished out of
+  order are saved in done_user_ids. A broadcast still "sending" after a
+  restart resumes from last_user_id and skips those (see
+  resume_broadcasts), so the counters match the deliveries. Only sends
+  made after the last checkpoint of a process that died without one (at
+  most CHECKPOINT_SECONDS of them) go out again.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import Message
+from sqlalchemy import select, update
+
+from bot.config import settings, now_tashkent
+from bot.database import async_session, Broadcast, BotUser
+from bot.keyboards.admin import get_broadcast_progress_keyboard
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+CHECKPOINT_SECONDS = 2.0
+STATUS_EDIT_SECONDS = 5.0
+
+
+class TokenBucket:
+    """Async token bucket: `rate` acquisitions per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` (Telegram flood control)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_bucket: Optional[TokenBucket] = None
+_active: Dict[int, "BroadcastEngine"] = {}
+
+
+def get_bucket() -> TokenBucket:
+    """The bot-wide send limiter"""
+    global _bucket
+    if _bucket is None:
+        _bucket = TokenBucket(settings.broadcast_rate)
+    return _bucket
+
+
+def cancel_broadcast(broadcast_id: int):
+    """Stop a running broadcast of this process right away"""
+    engine = _active.get(broadcast_id)
+    if engine:
+        engine.cancelled = True
+
+
+class BroadcastEngine:
+    """Delivers one broadcast; see the module docstring"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        broadcast_id: int,
+        status_message: Optional[Message] = None,
+        workers: Optional[int] = None,
+        bucket: Optional[TokenBucket] = None
+    ):
+        self.bot = bot
+        self.broadcast_id = broadcast_id
+        self.status_message = status_message
+        self.workers = workers or settings.broadcast_workers
+        self.bucket = bucket or get_bucket()
+        self.cancelled = False
+
+        self.broadcast: Optional[Broadcast] = None
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.last_user_id = 0
+        # BotUser.id -> done, in dispatch (= id) order; the done prefix moves the checkpoint
+        self._inflight: "OrderedDict[int, bool]" = OrderedDict()
+        # Done above last_user_id before a restart; not sent again
+        self._resumed_done: Set[int] = set()
+        self._blocked_ids: List[int] = []
+        self._last_edit = 0.0
+
+    async def run(self):
+        """Send to every remaining recipient, then record the result"""
+        async with async_session() as session:
+            self.broadcast = await session.get(Broadcast, self.broadcast_id)
+        if not self.broadcast or self.broadcast.status != "sending":
+            return
+
+        self.sent = self.broadcast.sent_count or 0
+        self.failed = self.broadcast.failed_count or 0
+        self.blocked = self.broadcast.blocked_count or 0
+        self.last_user_id = self.broadcast.last_user_id or 0
+        self._resumed_done = {
+            int(row_id) for row_id in (self.broadcast.done_user_ids or "").split(",") if row_id
+        }
+
+        _active[self.broadcast_id] = self
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.workers)]
+        checkpoints = asyncio.create_task(self._checkpoint_loop())
+        finished = False
+        try:
+            await self._produce(queue)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            finished = True
+        finally:
+            checkpoints.cancel()
+            for task in workers:
+                task.cancel()
+            _active.pop(self.broadcast_id, None)
+            # Also on shutdown: the broadcast stays "sending" and resumes from here
+            await self._checkpoint(final=finished)
+
+        await self._report()
+
+    async def _produce(self, queue: asyncio.Queue):
+        """Queue recipients page by page in BotUser.id order"""
+        cursor = self.last_user_id
+        while not self.cancelled:
+            async with async_session() as session:
+                result = await session.execute(
+                    select(BotUser.id, BotUser.telegram_id)
+                    .where(
+                        BotUser.id > cursor,
+                        BotUser.is_blocked == False,
+                        BotUser.is_banned == False
+                    )
+                    .order_by(BotUser.id)
+                    .limit(PAGE_SIZE)
+                )
+                page = result.all()
+            if not page:
+                return
+            for row_id, telegram_id in page:
+                if self.cancelled:
+                    return
+                if row_id in self._resumed_done:
+                    self._done(row_id)
+                    continue
+                self._inflight[row_id] = False
+                await queue.put((row_id, telegram_id))
+            cursor = page[-1][0]
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row_id, telegram_id = item
+            if self.cancelled:
+                continue
+            await self._deliver(telegram_id)
+            self._done(row_id)
+
+    async def _deliver(self, telegram_id: int):
+        for _ in range(3):
+            await self.bucket.acquire()
+            try:
+                await self._send(telegram_id)
+                self.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                self._mark_blocked(telegram_id)
+                return
+            except Exception as e:
+                if "blocked" in str(e).lower():
+                    self._mark_blocked(telegram_id)
+                else:
+                    self.failed += 1
+                return
+        self.failed += 1
+
+    async def _send(self, user_id: int):
+        broadcast = self.broadcast
+        if broadcast.message_type == "photo":
+            await self.bot.send_photo(user_id, broadcast.media_file_id, caption=broadcast.message_text)
+        elif broadcast.message_type == "video":
+            await self.bot.send_video(user_id, broadcast.media_file_id, caption=broadcast.message_text)
+        elif broadcast.message_type == "document":
+            await self.bot.send_document(user_id, broadcast.media_file_id, caption=broadcast.message_text)
+        else:
+            await self.bot.send_message(user_id, broadcast.message_text)
+
+    def _mark_blocked(self, telegram_id: int):
+        self.blocked += 1
+        self._blocked_ids.append(telegram_id)
+
+    def _done(self, row_id: int):
+        self._inflight[row_id] = True
+        while self._inflight:
+            first_id, done = next(iter(self._inflight.items()))
+            if not done:
+                break
+            self._inflight.popitem(last=False)
+            self.last_user_id = first_id
+
+    def _done_above_checkpoint(self) -> str:
+        done = {row_id for row_id, finished in self._inflight.items() if finished}
+        done.update(row_id for row_id in self._resumed_done if row_id > self.last_user_id)
+        return ",".join(map(str, sorted(done)))
+
+    # ==================== Checkpoints ====================
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(CHECKPOINT_SECONDS)
+            try:
+                await self._checkpoint()
+                await self._edit_progress()
+            except Exception as e:
+                logger.error(f"Broadcast {self.broadcast_id} checkpoint failed: {e}")
+
+    async def _checkpoint(self, final: bool = False):
+        """Persist progress and blocked users; refresh the cancel flag"""
+        blocked_ids, self._blocked_ids = self._blocked_ids, []
+        values = dict(
+            sent_count=self.sent,
+            failed_count=self.failed,
+            blocked_count=self.blocked,
+            last_user_id=self.last_user_id,
+            done_user_ids=self._done_above_checkpoint()
+        )
+        async with async_session() as session:
+            if blocked_ids:
+                await session.execute(
+                    update(BotUser).where(BotUser.telegram_id.in_(blocked_ids)).values(is_blocked=True)
+                )
+            status = await session.scalar(
+                select(Broadcast.status).where(Broadcast.id == self.broadcast_id)
+            )
+            if status == "cancelled":
+                self.cancelled = True
+            if final:
+                values.update(
+                    status="cancelled" if self.cancelled else "completed",
+                    completed_at=now_tashkent()
+                )
+            await session.execute(
+                update(Broadcast).where(Broadcast.id == self.broadcast_id).values(**values)
+            )
+            await session.commit()
+
+    async def _edit_progress(self):
+        if not self.status_message or time.monotonic() - self._last_edit < STATUS_EDIT_SECONDS:
+            return
+        self._last_edit = time.monotonic()
+        try:
+            await self.status_message.edit_text(
+                f"📢 <b>E'lon yuborilmoqda...</b>\n\n"
+                f"📊 <b>Jarayon:</b> {self.sent + self.failed + self.blocked}/{self.broadcast.total_users}\n"
+                f"✅ Yuborildi: {self.sent}\n"
+                f"❌ Xato: {self.failed}\n"
+                f"🚫 Bloklangan: {self.blocked}",
+                parse_mode="HTML",
+                reply_markup=get_broadcast_progress_keyboard(self.broadcast_id)
+            )
+        except Exception:
+            pass
+
+    async def _report(self):
+        title = "⛔️ <b>E'lon to'xtatildi</b>" if self.cancelled else "✅ <b>E'lon yuborildi!</b>"
+        text = (
+            f"{title}\n\n"
+            f"📊 <b>Natija:</b>\n"
+            f"✅ Yuborildi: {self.sent}\n"
+            f"❌ Xato: {self.failed}\n"
+            f"🚫 Bloklangan: {self.blocked}\n"
+            f"👥 Jami: {self.broadcast.total_users}"
+        )
+        try:
+            if self.status_message:
+                await self.status_message.edit_text(text, parse_mode="HTML")
+            else:
+                await self.bot.send_message(self.broadcast.created_by, text, parse_mode="HTML")
+        except Exception:
+            pass
+
+
+async def send_broadcast(bot: Bot, broadcast_id: int, status_message: Optional[Message] = None):
+    """Run a broadcast to completion (log instead of raising)"""
+    try:
+        await BroadcastEngine(bot, broadcast_id, status_message).run()
+    except Exception as e:
+        logger.error(f"Broadcast {broadcast_id} failed: {e}")
+
+
+async def resume_broadcasts(bot: Bot) -> List[asyncio.Task]:
+    """Restart broadcasts interrupted by a restart; progress is reported to their author"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(Broadcast.id).where(Broadcast.status == "sending")
+        )
+        broadcast_ids = [row[0] for row in result.all()]
+    for broadcast_id in broadcast_ids:
+        logger.info(f"Resuming broadcast {broadcast_id}")
+    return [asyncio.create_task(send_broadcast(bot, broadcast_id)) for broadcast_id in broadcast_ids]
@@ -0,0 +1,186 @@
+"""
+Broadcast Benchmark
+===================
+Sends a text broadcast to N bot users through a mocked Bot (API latency
+varying around --latency, so sends finish out of order, and a share of
+users who blocked the bot) and compares:
+
+1. before: the previous sequential loop (a status query per recipient,
+   an UPDATE per blocked user, 50 ms sleep between sends)
+2. engine: BroadcastEngine (token bucket + worker pool + checkpoints)
+3. resume: the engine killed halfway and restarted, counting messages
+   a user received twice or not at all, and the final sent_count
+
+Uses a throwaway SQLite database.
+
+Usage:
+    python -m scripts.bench_broadcast
+    python -m scripts.bench_broadcast --users 2000 --latency 0.15 --rate 25
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+_db_file = Path(tempfile.gettempdir()) / "bench_broadcast.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_file}"
+os.environ.setdefault("BOT_TOKEN", "bench")
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+from sqlalchemy import delete, func, select, update
+
+from bot.config import now_tashkent
+from bot.database import async_session, init_db, BotUser, Broadcast
+from bot.services.broadcaster import BroadcastEngine, TokenBucket
+
+ADMIN_ID = 1  # broadcast author; gets the final report
+
+
+class MockBot:
+    """Records deliveries; blocked users raise like Telegram does"""
+
+    def __init__(self, latency: float, blocked: set):
+        self.latency = latency
+        self.blocked = blocked
+        self.rng = random.Random(2)
+        self.received = Counter()
+        self.reports = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency * self.rng.uniform(0.2, 1.8))
+        if chat_id == ADMIN_ID:
+            self.reports += 1
+            return
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(
+                method=SendMessage(chat_id=chat_id, text=text),
+                message="Forbidden: bot was blocked by the user"
+            )
+        self.received[chat_id] += 1
+
+
+async def setup(users: int, blocked_share: float) -> set:
+    _db_file.unlink(missing_ok=True)
+    await init_db()
+    async with async_session() as session:
+        session.add_all([BotUser(telegram_id=10_000 + i) for i in range(users)])
+        await session.commit()
+    return set(random.Random(1).sample(range(10_000, 10_000 + users), int(users * blocked_share)))
+
+
+async def new_broadcast(users: int) -> int:
+    async with async_session() as session:
+        await session.execute(update(BotUser).values(is_blocked=False))
+        broadcast = Broadcast(
+            message_text="Bench", total_users=users, created_by=ADMIN_ID,
+            status="sending", started_at=now_tashkent()
+        )
+        session.add(broadcast)
+        await session.commit()
+        return broadcast.id
+
+
+async def before(bot: MockBot, broadcast_id: int):
+    """The previous admin.send_broadcast loop, without progress edits"""
+    async with async_session() as session:
+        broadcast = await session.get(Broadcast, broadcast_id)
+        result = await session.execute(
+            select(BotUser.telegram_id).where(BotUser.is_blocked == False, BotUser.is_banned == False)
+        )
+        user_ids = [row[0] for row in result.fetchall()]
+    for user_id in user_ids:
+        async with async_session() as session:
+            status = await session.scalar(select(Broadcast.status).where(Broadcast.id == broadcast_id))
+            if status == "cancelled":
+                break
+        try:
+            await bot.send_message(user_id, broadcast.message_text)
+        except Exception as e:
+            if "blocked" in str(e).lower():
+                async with async_session() as session:
+                    await session.execute(
+                        update(BotUser).where(BotUser.telegram_id == user_id).values(is_blocked=True)
+                    )
+                    await session.commit()
+        await asyncio.sleep(0.05)
+
+
+async def result_row(broadcast_id: int) -> Broadcast:
+    async with async_session() as session:
+        return await session.get(Broadcast, broadcast_id)
+
+
+def report(label: str, bot: MockBot, elapsed: float, users: int, extra: str = ""):
+    delivered = sum(bot.received.values())
+    print(f"  {label:<28} {elapsed:>8.2f} s  {users / elapsed:>7.1f} users/s  "
+          f"{delivered:>6} delivered  {extra}")
+
+
+async def main(args):
+    blocked = await setup(args.users, args.blocked)
+    expected = args.users - len(blocked)
+    print(f"{args.users} users ({len(blocked)} blocked), mocked API latency "
+          f"{args.latency * 1000:.0f} ms, rate limit {args.rate:g} msg/s, {args.workers} workers\n")
+
+    if not args.skip_before:
+        bot = MockBot(args.latency, blocked)
+        broadcast_id = await new_broadcast(args.users)
+        start = time.perf_counter()
+        await before(bot, broadcast_id)
+        report("before: sequential", bot, time.perf_counter() - start, args.users)
+
+    bot = MockBot(args.latency, blocked)
+    broadcast_id = await new_broadcast(args.users)
+    start = time.perf_counter()
+    await BroadcastEngine(bot, broadcast_id, workers=args.workers, bucket=TokenBucket(args.rate)).run()
+    row = await result_row(broadcast_id)
+    report("engine", bot, time.perf_counter() - start, args.users,
+           f"sent {row.sent_count}, blocked {row.blocked_count}, status {row.status}")
+    assert sum(bot.received.values()) == expected and bot.reports == 1
+
+    # Kill the engine halfway, then resume from the checkpoint
+    bot = MockBot(args.latency, blocked)
+    broadcast_id = await new_broadcast(args.users)
+    start = time.perf_counter()
+    task = asyncio.create_task(
+        BroadcastEngine(bot, broadcast_id, workers=args.workers, bucket=TokenBucket(args.rate)).run()
+    )
+    await asyncio.sleep(args.users / args.rate / 2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    checkpoint = (await result_row(broadcast_id)).last_user_id
+    await BroadcastEngine(bot, broadcast_id, workers=args.workers, bucket=TokenBucket(args.rate)).run()
+    twice = sum(1 for n in bot.received.values() if n > 1)
+    missed = expected - len(bot.received)
+    row = await result_row(broadcast_id)
+    report("engine, killed + resumed", bot, time.perf_counter() - start, args.users,
+           f"checkpoint id {checkpoint}, {twice} twice, {missed} missed, "
+           f"sent_count {row.sent_count}/{expected}")
+
+    async with async_session() as session:
+        marked = await session.scalar(select(func.count(BotUser.id)).where(BotUser.is_blocked == True))
+        await session.execute(delete(Broadcast))
+        await session.commit()
+    print(f"\n  blocked users marked in DB: {marked}/{len(blocked)}")
+    _db_file.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Broadcast engine benchmark")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.1, help="mocked seconds per API call")
+    parser.add_argument("--blocked", type=float, default=0.05, help="share of users who blocked the bot")
+    parser.add_argument("--rate", type=float, default=25.0, help="token bucket messages per second")
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--skip-before", action="store_true", help="skip the slow sequential baseline")
+    asyncio.run(main(parser.parse_args()))